@@ -0,0 +1,404 @@
+"""
+Benchmark Chuyển Đổi Dự Phòng và Khôi Phục
+Chạy tải đều lên một cụm cục bộ, lần lượt giết rồi khởi động lại từng node và đo:
+thời gian phát hiện node chết, thời gian key không đọc/ghi được, tỷ lệ lỗi trong
+từng giai đoạn, thời gian và lượng dữ liệu khôi phục khi node tham gia lại.
+Báo cáo in ra bảng và ghi JSON để so sánh giữa các phiên bản
+
+Cách dùng:
+    python bench_chuyen_doi_du_phong.py                          # 3 node, 1 lượt
+    python bench_chuyen_doi_du_phong.py --so-node 5 --so-luot 3 --json bao_cao.json
+    python bench_chuyen_doi_du_phong.py --che-do tien_trinh --dot-ngot
+    python bench_chuyen_doi_du_phong.py --so-sanh bao_cao_cu.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import ghi_log
+from bench_vi_mo import thong_tin_moi_truong
+from bench_ycsb import nap_du_lieu, ten_key
+from client import KVStoreClient
+from cum_thu_nghiem import CAC_CHE_DO, CumThuNghiem
+
+# (thời điểm bắt đầu, số thứ tự key, thành công, độ trễ giây)
+SuKien = Tuple[float, int, bool, float]
+
+CAC_GIAI_DOAN = ("truoc", "chuyen_doi", "sau_phat_hien", "tham_gia_lai")
+MO_TA_GIAI_DOAN = {
+    "truoc": "trước khi giết node",
+    "chuyen_doi": "giết -> mọi node phát hiện",
+    "sau_phat_hien": "phát hiện -> khởi động lại",
+    "tham_gia_lai": "khởi động lại -> kết thúc lượt",
+}
+
+
+class TaiDeu:
+    """
+    Tải đều lên cụm: so_thread thread, tổng toc_do thao tác/giây
+
+    Giải thích:
+    - Mỗi thread xoay vòng trên phần key của mình nên mọi key được chạm đều đặn:
+      thời gian không khả dụng của một key được đo với độ phân giải ~ so_key / toc_do giây
+    - GET thành công khi trả về đúng value đã nạp; PUT ghi lại đúng value đó
+      nên tỷ lệ ghi không làm thay đổi kết quả kiểm tra GET
+    - Chạy chậm hơn lịch (node treo) thì bỏ qua các lượt lỡ, không dồn tải bù
+    """
+
+    def __init__(self, tao_client: Callable[[int], KVStoreClient], so_key: int, value: bytes,
+                 toc_do: float, so_thread: int, ty_le_ghi: float):
+        self.tao_client = tao_client
+        self.so_key = so_key
+        self.value = value
+        self.khoang = so_thread / toc_do
+        self.so_thread = so_thread
+        self.ty_le_ghi = ty_le_ghi
+        self.cac_su_kien: List[List[SuKien]] = [[] for _ in range(so_thread)]
+        self.loi_cuoi = 0.0  # perf_counter của lỗi gần nhất
+        self._dung = threading.Event()
+        self._cac_thread: List[threading.Thread] = []
+
+    def bat_dau(self):
+        for i in range(self.so_thread):
+            thread = threading.Thread(target=self._chay, args=(i,), daemon=True, name=f"Tai-{i}")
+            thread.start()
+            self._cac_thread.append(thread)
+
+    def dung(self):
+        self._dung.set()
+        for thread in self._cac_thread:
+            thread.join()
+
+    def _chay(self, chi_so: int):
+        client = self.tao_client(chi_so)
+        ngau_nhien = random.Random(chi_so)
+        su_kien = self.cac_su_kien[chi_so]
+        cac_key = range(chi_so, self.so_key, self.so_thread)
+        # Các thread lệch pha nhau để tải rải đều trong mỗi khoảng
+        han = time.perf_counter() + self.khoang * chi_so / self.so_thread
+        while not self._dung.is_set():
+            for so in cac_key:
+                cho = han - time.perf_counter()
+                if cho > 0 and self._dung.wait(cho):
+                    return
+                han = max(han + self.khoang, time.perf_counter())
+
+                key = ten_key(so)
+                bat_dau = time.perf_counter()
+                if ngau_nhien.random() < self.ty_le_ghi:
+                    thanh_cong = client.put(key, self.value, hien_thi=False)
+                else:
+                    thanh_cong = client.get(key, hien_thi=False, dang_bytes=True) == self.value
+                su_kien.append((bat_dau, so, thanh_cong, time.perf_counter() - bat_dau))
+                if not thanh_cong:
+                    self.loi_cuoi = time.perf_counter()
+
+    def lay_su_kien(self, tu: float, den: float) -> List[SuKien]:
+        """Các thao tác bắt đầu trong [tu, den), theo thời gian"""
+        return sorted(su for ds in self.cac_su_kien for su in list(ds) if tu <= su[0] < den)
+
+
+def _phan_vi(cac_gia_tri: List[float], phan_tram: float) -> float:
+    if not cac_gia_tri:
+        return 0.0
+    cac_gia_tri = sorted(cac_gia_tri)
+    return cac_gia_tri[min(len(cac_gia_tri) - 1, int(len(cac_gia_tri) * phan_tram / 100))]
+
+
+def thong_ke_giai_doan(cac_su_kien: List[SuKien]) -> dict:
+    """Số thao tác, số lỗi, tỷ lệ lỗi và p50/p99 độ trễ (ms) của một giai đoạn"""
+    so_loi = sum(1 for su in cac_su_kien if not su[2])
+    cac_do_tre = [su[3] * 1000 for su in cac_su_kien]
+    return {
+        "so_thao_tac": len(cac_su_kien),
+        "so_loi": so_loi,
+        "ty_le_loi": round(so_loi / len(cac_su_kien), 4) if cac_su_kien else 0.0,
+        "p50_ms": round(_phan_vi(cac_do_tre, 50), 2),
+        "p99_ms": round(_phan_vi(cac_do_tre, 99), 2),
+    }
+
+
+def khong_kha_dung(cac_su_kien: List[SuKien], den: float) -> dict:
+    """
+    Thời gian không khả dụng theo key trong một cửa sổ
+
+    Giải thích:
+    - Với mỗi key có lỗi: từ lần lỗi đầu tiên đến lần thành công đầu tiên sau
+      lần lỗi cuối (chưa thành công lại thì tính đến hết cửa sổ)
+    - so_key_chua_hoi_phuc: key mà thao tác cuối cùng trong cửa sổ vẫn lỗi
+
+    Trả về:
+        {"so_key", "so_key_chua_hoi_phuc", "p50_s", "max_s", "tu_loi_dau_den_loi_cuoi_s"}
+    """
+    theo_key: Dict[int, List[Tuple[float, bool]]] = {}
+    for bat_dau, so, thanh_cong, _ in cac_su_kien:
+        theo_key.setdefault(so, []).append((bat_dau, thanh_cong))
+
+    cac_thoi_gian = []
+    so_chua_hoi_phuc = 0
+    cac_lan_loi = [su[0] for su in cac_su_kien if not su[2]]
+    for ds in theo_key.values():
+        lan_loi = [t for t, thanh_cong in ds if not thanh_cong]
+        if not lan_loi:
+            continue
+        hoi_phuc = next((t for t, thanh_cong in ds if thanh_cong and t > lan_loi[-1]), None)
+        if hoi_phuc is None:
+            so_chua_hoi_phuc += 1
+        cac_thoi_gian.append((hoi_phuc if hoi_phuc is not None else den) - lan_loi[0])
+    return {
+        "so_key": len(cac_thoi_gian),
+        "so_key_chua_hoi_phuc": so_chua_hoi_phuc,
+        "p50_s": round(_phan_vi(cac_thoi_gian, 50), 3),
+        "max_s": round(max(cac_thoi_gian, default=0.0), 3),
+        "tu_loi_dau_den_loi_cuoi_s": round(cac_lan_loi[-1] - cac_lan_loi[0], 3) if cac_lan_loi else 0.0,
+    }
+
+
+def cho_phat_hien(cum: CumThuNghiem, cac_node_song: List[int], bat_dau: float,
+                  timeout: float) -> Dict[int, Optional[float]]:
+    """
+    Thăm dò GET_STATS các node còn sống đến khi từng node không còn thấy node đã chết
+
+    Trả về:
+        {chỉ số node: số giây từ bat_dau đến khi node đó phát hiện (None = quá timeout)}
+    """
+    cac_lan_phat_hien: Dict[int, Optional[float]] = {i: None for i in cac_node_song}
+    han = bat_dau + timeout
+    while time.perf_counter() < han and None in cac_lan_phat_hien.values():
+        for i in cac_node_song:
+            if cac_lan_phat_hien[i] is not None:
+                continue
+            thong_ke = cum.lay_thong_ke(i)
+            if thong_ke is not None and thong_ke.get("so_peer") == len(cac_node_song) - 1:
+                cac_lan_phat_hien[i] = time.perf_counter() - bat_dau
+        time.sleep(0.05)
+    return cac_lan_phat_hien
+
+
+def cho_on_dinh(tai: TaiDeu, tu: float, on_dinh: float, timeout: float) -> bool:
+    """Chờ đến khi không có lỗi nào trong on_dinh giây liên tiếp (tính từ tu); False nếu quá timeout"""
+    han = time.perf_counter() + timeout
+    while time.perf_counter() < han:
+        bay_gio = time.perf_counter()
+        if bay_gio - max(tai.loi_cuoi, tu) >= on_dinh:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def chay_luot(cum: CumThuNghiem, tai: TaiDeu, chi_so_node: int, tham_so) -> dict:
+    """
+    Một lượt: tải nền -> giết node -> chờ phát hiện và ổn định -> khởi động lại -> chờ ổn định
+
+    Trả về:
+        Kết quả của lượt (các thời gian tính bằng giây)
+    """
+    t_bat_dau = time.perf_counter()
+    time.sleep(tham_so.truoc)
+
+    cac_node_song = [i for i in range(cum.so_node) if i != chi_so_node and cum.dang_song(i)]
+    t_giet = time.perf_counter()
+    cum.dung_node(chi_so_node, dot_ngot=tham_so.dot_ngot)
+    cac_lan_phat_hien = cho_phat_hien(cum, cac_node_song, t_giet, tham_so.cho_toi_da)
+    da_phat_hien = [giay for giay in cac_lan_phat_hien.values() if giay is not None]
+    t_phat_hien = t_giet + max(da_phat_hien, default=tham_so.cho_toi_da)
+    on_dinh_sau_giet = cho_on_dinh(tai, t_phat_hien, tham_so.on_dinh,
+                                   max(0.0, t_giet + tham_so.cho_toi_da - time.perf_counter()))
+
+    t_khoi_dong = time.perf_counter()
+    thoi_gian_khoi_dong_lai = cum.khoi_dong_lai_node(chi_so_node)
+    # Tiến trình con trả lời GET_STATS và hội tụ trước khi khôi phục dữ liệu xong
+    try:
+        cum.cho(lambda: (cum.lay_thong_ke(chi_so_node) or {}).get("so_lan_phuc_hoi", 0) > 0,
+                tham_so.cho_toi_da, mo_ta="khôi phục dữ liệu")
+    except TimeoutError:
+        pass
+    thoi_gian_den_khi_khoi_phuc = time.perf_counter() - t_khoi_dong
+    thong_ke_node = cum.lay_thong_ke(chi_so_node) or {}
+    on_dinh_sau_khoi_dong = cho_on_dinh(tai, t_khoi_dong, tham_so.on_dinh, tham_so.cho_toi_da)
+    t_ket_thuc = time.perf_counter()
+
+    cac_moc = {"truoc": (t_bat_dau, t_giet), "chuyen_doi": (t_giet, t_phat_hien),
+               "sau_phat_hien": (t_phat_hien, t_khoi_dong), "tham_gia_lai": (t_khoi_dong, t_ket_thuc)}
+    return {
+        "node": "%s:%d" % cum.cac_dia_chi[chi_so_node],
+        "phat_hien": {
+            "dau_tien_s": round(min(da_phat_hien), 3) if da_phat_hien else None,
+            "tat_ca_s": round(max(da_phat_hien), 3) if len(da_phat_hien) == len(cac_lan_phat_hien) else None,
+        },
+        "giai_doan": {ten: thong_ke_giai_doan(tai.lay_su_kien(tu, den)) for ten, (tu, den) in cac_moc.items()},
+        "khong_kha_dung_sau_giet": khong_kha_dung(tai.lay_su_kien(t_giet, t_khoi_dong), t_khoi_dong),
+        "khong_kha_dung_sau_khoi_dong": khong_kha_dung(tai.lay_su_kien(t_khoi_dong, t_ket_thuc), t_ket_thuc),
+        "on_dinh_truoc_khi_khoi_dong_lai": on_dinh_sau_giet,
+        "on_dinh_sau_khoi_dong_lai": on_dinh_sau_khoi_dong,
+        "khoi_phuc": {
+            "san_sang_va_hoi_tu_s": round(thoi_gian_khoi_dong_lai, 3),
+            "den_khi_khoi_phuc_xong_s": round(thoi_gian_den_khi_khoi_phuc, 3),
+            "chuyen_du_lieu_s": round(thong_ke_node.get("thoi_gian_phuc_hoi", 0.0), 3),
+            "so_key_nhan": thong_ke_node.get("so_key_phuc_hoi", 0),
+            "so_byte_nhan": thong_ke_node.get("so_byte_phuc_hoi", 0),
+            "so_key_sau_khoi_phuc": thong_ke_node.get("so_key", 0),
+        },
+    }
+
+
+# Các chỉ số tổng hợp (trung vị qua các lượt): tên -> đường dẫn trong kết quả lượt
+CAC_CHI_SO = {
+    "phat_hien_dau_tien_s": ("phat_hien", "dau_tien_s"),
+    "phat_hien_tat_ca_s": ("phat_hien", "tat_ca_s"),
+    "ty_le_loi_chuyen_doi": ("giai_doan", "chuyen_doi", "ty_le_loi"),
+    "ty_le_loi_sau_phat_hien": ("giai_doan", "sau_phat_hien", "ty_le_loi"),
+    "ty_le_loi_tham_gia_lai": ("giai_doan", "tham_gia_lai", "ty_le_loi"),
+    "so_key_khong_kha_dung": ("khong_kha_dung_sau_giet", "so_key"),
+    "khong_kha_dung_p50_s": ("khong_kha_dung_sau_giet", "p50_s"),
+    "khong_kha_dung_max_s": ("khong_kha_dung_sau_giet", "max_s"),
+    "so_key_loi_sau_khoi_dong": ("khong_kha_dung_sau_khoi_dong", "so_key"),
+    "khoi_dong_lai_s": ("khoi_phuc", "san_sang_va_hoi_tu_s"),
+    "den_khi_khoi_phuc_xong_s": ("khoi_phuc", "den_khi_khoi_phuc_xong_s"),
+    "chuyen_du_lieu_s": ("khoi_phuc", "chuyen_du_lieu_s"),
+    "so_byte_khoi_phuc": ("khoi_phuc", "so_byte_nhan"),
+}
+
+
+def tong_hop(cac_luot: List[dict]) -> Dict[str, Optional[float]]:
+    """Trung vị từng chỉ số qua các lượt (bỏ qua lượt không đo được)"""
+    ket_qua = {}
+    for ten, duong_dan in CAC_CHI_SO.items():
+        cac_gia_tri = []
+        for luot in cac_luot:
+            gia_tri = luot
+            for phan in duong_dan:
+                gia_tri = gia_tri.get(phan) if isinstance(gia_tri, dict) else None
+            if gia_tri is not None:
+                cac_gia_tri.append(gia_tri)
+        ket_qua[ten] = round(statistics.median(cac_gia_tri), 4) if cac_gia_tri else None
+    return ket_qua
+
+
+def in_luot(so_thu_tu: int, luot: dict):
+    phat_hien = luot["phat_hien"]
+    print(f"\n--- Lượt {so_thu_tu}: giết {luot['node']} ---")
+    print(f"Phát hiện: node đầu tiên {phat_hien['dau_tien_s']}s, tất cả {phat_hien['tat_ca_s']}s")
+    print(f"{'Giai đoạn':<34}{'thao tác':>10}{'lỗi':>8}{'tỷ lệ':>9}{'p50':>9}{'p99':>9}  (ms)")
+    for ten in CAC_GIAI_DOAN:
+        muc = luot["giai_doan"][ten]
+        print(f"{MO_TA_GIAI_DOAN[ten]:<34}{muc['so_thao_tac']:>10,}{muc['so_loi']:>8,}"
+              f"{muc['ty_le_loi']:>9.2%}{muc['p50_ms']:>9.2f}{muc['p99_ms']:>9.2f}")
+    for ten, mo_ta in (("khong_kha_dung_sau_giet", "sau khi giết"),
+                       ("khong_kha_dung_sau_khoi_dong", "sau khi khởi động lại")):
+        muc = luot[ten]
+        print(f"Key lỗi {mo_ta}: {muc['so_key']} key, p50 {muc['p50_s']}s, max {muc['max_s']}s, "
+              f"chưa hồi phục {muc['so_key_chua_hoi_phuc']}")
+    khoi_phuc = luot["khoi_phuc"]
+    print(f"Khởi động lại: sẵn sàng + hội tụ {khoi_phuc['san_sang_va_hoi_tu_s']}s, "
+          f"khôi phục xong sau {khoi_phuc['den_khi_khoi_phuc_xong_s']}s, chuyển dữ liệu {khoi_phuc['chuyen_du_lieu_s']}s, nhận {khoi_phuc['so_key_nhan']:,} key "
+          f"({khoi_phuc['so_byte_nhan'] / 1024:,.1f} KB), giữ {khoi_phuc['so_key_sau_khoi_phuc']:,} key")
+    if not (luot["on_dinh_truoc_khi_khoi_dong_lai"] and luot["on_dinh_sau_khoi_dong_lai"]):
+        print("⚠ Lỗi chưa dứt trong --cho-toi-da giây")
+
+
+def in_so_sanh(hien_tai: Dict[str, Optional[float]], cu: dict, duong_dan: str):
+    moi_truong = cu.get("moi_truong", {})
+    print(f"\nSo với {duong_dan} ({cu.get('thoi_diem')}, commit {moi_truong.get('commit')}):")
+    print(f"{'Chỉ số':<28}{'trước':>14}{'hiện tại':>14}")
+    for ten, gia_tri in hien_tai.items():
+        gia_tri_cu = cu.get("tong_hop", {}).get(ten)
+        print(f"{ten:<28}{'-' if gia_tri_cu is None else f'{gia_tri_cu:,.4g}':>14}"
+              f"{'-' if gia_tri is None else f'{gia_tri:,.4g}':>14}")
+
+
+def main(tham_so_dong_lenh: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Benchmark chuyển đổi dự phòng và khôi phục")
+    parser.add_argument("--so-node", type=int, default=3)
+    parser.add_argument("--che-do", default="trong_process", choices=CAC_CHE_DO)
+    parser.add_argument("--so-luot", type=int, default=1, help="số lần giết/khởi động lại (lần lượt từng node)")
+    parser.add_argument("--dot-ngot", action="store_true", help="tien_trinh: SIGKILL thay vì SIGINT")
+    parser.add_argument("--thanh-vien", default="gossip", choices=["gossip", "heartbeat"])
+    parser.add_argument("--tham-do-s", type=float, default=1.0, help="chu kỳ thăm dò/heartbeat của node")
+    parser.add_argument("--so-key", type=int, default=200, help="số key nhận tải")
+    parser.add_argument("--so-key-nen", type=int, default=5000,
+                        help="số key chỉ nạp (không nhận tải), làm dữ liệu khôi phục")
+    parser.add_argument("--kich-thuoc-value", type=int, default=100, help="bytes")
+    parser.add_argument("--toc-do", type=float, default=400.0, help="tổng thao tác/giây")
+    parser.add_argument("--so-thread", type=int, default=8)
+    parser.add_argument("--ty-le-ghi", type=float, default=0.1)
+    parser.add_argument("--truoc", type=float, default=3.0, help="giây tải nền trước khi giết node")
+    parser.add_argument("--on-dinh", type=float, default=3.0,
+                        help="số giây liên tiếp không lỗi được coi là đã ổn định")
+    parser.add_argument("--cho-toi-da", type=float, default=60.0,
+                        help="giây chờ tối đa cho phát hiện/ổn định mỗi giai đoạn")
+    parser.add_argument("--json", default=None, help="ghi báo cáo JSON ra file")
+    parser.add_argument("--so-sanh", default=None, help="báo cáo JSON trước đó để so sánh")
+    tham_so = parser.parse_args(tham_so_dong_lenh)
+    if tham_so.so_node < 2:
+        parser.error("Cần ít nhất 2 node")
+
+    value = os.urandom(tham_so.kich_thuoc_value)
+    # Log của các node trong process ghi ra file tạm, không lẫn vào báo cáo
+    ghi_log.cau_hinh_log(tep=os.path.join(tempfile.gettempdir(), "bench_chuyen_doi_du_phong.log"),
+                         muc=logging.WARNING, console=False)
+    if tham_so.che_do == "tien_trinh":
+        cum = CumThuNghiem(tham_so.so_node, che_do="tien_trinh", tham_so_dong_lenh=(
+            "--thanh-vien", tham_so.thanh_vien, "--tham-do-s", str(tham_so.tham_do_s)))
+    else:
+        cum = CumThuNghiem(tham_so.so_node, che_do=tham_so.che_do,
+                           che_do_thanh_vien=tham_so.thanh_vien, khoang_tham_do=tham_so.tham_do_s)
+
+    def tao_client(chi_so: int) -> KVStoreClient:
+        client = KVStoreClient(list(cum.cac_dia_chi), timeout=2.0, mang=cum.mang)
+        client.chi_so_node_hien_tai = chi_so % cum.so_node
+        return client
+
+    print("=" * 80)
+    print(" BENCHMARK CHUYỂN ĐỔI DỰ PHÒNG VÀ KHÔI PHỤC")
+    print("=" * 80)
+    print(f"Cụm: {tham_so.so_node} node ({tham_so.che_do}, {tham_so.thanh_vien}, thăm dò {tham_so.tham_do_s}s), "
+          f"tải {tham_so.toc_do:g} ops/s trên {tham_so.so_key} key ({tham_so.ty_le_ghi:.0%} ghi), "
+          f"thêm {tham_so.so_key_nen:,} key nền, value {tham_so.kich_thuoc_value} B")
+    print(f"Độ phân giải thời gian không khả dụng: ~{tham_so.so_key / tham_so.toc_do:.2f}s")
+
+    with cum:
+        nap_du_lieu(tao_client, tham_so.so_key + tham_so.so_key_nen, value, tham_so.so_thread)
+        tai = TaiDeu(tao_client, tham_so.so_key, value, tham_so.toc_do, tham_so.so_thread, tham_so.ty_le_ghi)
+        tai.bat_dau()
+        cac_luot = []
+        try:
+            for luot in range(tham_so.so_luot):
+                ket_qua_luot = chay_luot(cum, tai, (luot + 1) % tham_so.so_node, tham_so)
+                cac_luot.append(ket_qua_luot)
+                in_luot(luot + 1, ket_qua_luot)
+        finally:
+            tai.dung()
+
+    bao_cao = {
+        "thoi_diem": datetime.now().isoformat(timespec="seconds"),
+        "moi_truong": thong_tin_moi_truong(),
+        "cau_hinh": {ten: gia_tri for ten, gia_tri in vars(tham_so).items() if ten not in ("json", "so_sanh")},
+        "tong_hop": tong_hop(cac_luot),
+        "cac_luot": cac_luot,
+    }
+    print(f"\nTổng hợp (trung vị {len(cac_luot)} lượt):")
+    for ten, gia_tri in bao_cao["tong_hop"].items():
+        print(f"  {ten:<28}{'-' if gia_tri is None else f'{gia_tri:,.4g}'}")
+    if tham_so.so_sanh:
+        with open(tham_so.so_sanh, encoding="utf-8") as f:
+            in_so_sanh(bao_cao["tong_hop"], json.load(f), tham_so.so_sanh)
+    if tham_so.json:
+        with open(tham_so.json, "w", encoding="utf-8") as f:
+            json.dump(bao_cao, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ Đã ghi báo cáo vào {tham_so.json}")
+    print("=" * 80)
+    return bao_cao
+
+
+if __name__ == "__main__":
+    main()
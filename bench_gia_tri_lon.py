@@ -0,0 +1,120 @@
+"""
+Benchmark Value Lớn
+So sánh thông lượng PUT/GET value nhị phân 100 KB+ giữa JSON + base64 (cách cũ)
+và khung nhị phân (giao_thuc.py)
+"""
+
+import base64
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from client import KVStoreClient
+from node import Node
+
+# Cấu hình mặc định
+CAC_KICH_THUOC = (100 * 1024, 1024 * 1024, 4 * 1024 * 1024)
+SO_BYTE_MOI_LAN_DO = 64 * 1024 * 1024
+
+
+def khoi_dong_node():
+    """
+    Khởi động một node đơn trên cổng trống
+
+    Trả về:
+        (node, port)
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    node = Node(f"127.0.0.1:{port}", "127.0.0.1", port)
+    threading.Thread(target=node.bat_dau, daemon=True).start()
+    time.sleep(0.5)
+    return node, port
+
+
+def _json_gui_nhan(port, request):
+    """Gửi một request JSON một dòng, đọc một dòng response"""
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def do_json_base64(port, value, so_lan):
+    """
+    PUT/GET kiểu cũ: caller tự base64 value rồi nhúng vào JSON
+
+    Trả về:
+        (MB/s PUT, MB/s GET)
+    """
+    bat_dau = time.perf_counter()
+    for i in range(so_lan):
+        _json_gui_nhan(port, {"command": "PUT", "key": f"json:{i}",
+                              "value": base64.b64encode(value).decode()})
+    thoi_gian_put = time.perf_counter() - bat_dau
+
+    bat_dau = time.perf_counter()
+    for i in range(so_lan):
+        response = _json_gui_nhan(port, {"command": "GET", "key": f"json:{i}"})
+        assert len(base64.b64decode(response["value"])) == len(value)
+    thoi_gian_get = time.perf_counter() - bat_dau
+
+    tong_mb = len(value) * so_lan / (1024 * 1024)
+    return tong_mb / thoi_gian_put, tong_mb / thoi_gian_get
+
+
+def do_khung_nhi_phan(port, value, so_lan):
+    """
+    PUT/GET bằng KVStoreClient: bytes đi thẳng trong khung nhị phân
+
+    Trả về:
+        (MB/s PUT, MB/s GET)
+    """
+    client = KVStoreClient([("127.0.0.1", port)], timeout=30)
+
+    bat_dau = time.perf_counter()
+    for i in range(so_lan):
+        client.put(f"bin:{i}", value, hien_thi=False)
+    thoi_gian_put = time.perf_counter() - bat_dau
+
+    bat_dau = time.perf_counter()
+    for i in range(so_lan):
+        assert len(client.get(f"bin:{i}", hien_thi=False, dang_bytes=True)) == len(value)
+    thoi_gian_get = time.perf_counter() - bat_dau
+
+    tong_mb = len(value) * so_lan / (1024 * 1024)
+    return tong_mb / thoi_gian_put, tong_mb / thoi_gian_get
+
+
+def main():
+    so_byte_moi_lan_do = int(sys.argv[1]) * 1024 * 1024 if len(sys.argv) > 1 else SO_BYTE_MOI_LAN_DO
+
+    print("=" * 70)
+    print(" BENCHMARK VALUE LỚN: JSON + BASE64 vs KHUNG NHỊ PHÂN")
+    print("=" * 70)
+    print(f"Mỗi lần đo: {so_byte_moi_lan_do // (1024 * 1024)} MB dữ liệu, node đơn, không nhân bản\n")
+    print(f"{'Value':<10}{'Giao thức':<16}{'PUT MB/s':>12}{'GET MB/s':>12}")
+    print("-" * 50)
+
+    node, port = khoi_dong_node()
+    try:
+        for kich_thuoc in CAC_KICH_THUOC:
+            value = os.urandom(kich_thuoc)
+            so_lan = max(1, so_byte_moi_lan_do // kich_thuoc)
+            nhan = f"{kich_thuoc // 1024} KB"
+            put, get = do_json_base64(port, value, so_lan)
+            print(f"{nhan:<10}{'json+base64':<16}{put:>12,.1f}{get:>12,.1f}")
+            put, get = do_khung_nhi_phan(port, value, so_lan)
+            print(f"{'':<10}{'nhị phân':<16}{put:>12,.1f}{get:>12,.1f}")
+            node.du_lieu.clear()
+    finally:
+        node.dang_chay = False
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
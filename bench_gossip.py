@@ -0,0 +1,182 @@
+"""
+Benchmark Thành Viên Gossip (SWIM) bằng Mô Phỏng
+Đo thời gian phát hiện node chết và lưu lượng mỗi node cho cluster 50-200 node,
+so sánh với heartbeat tất cả-tới-tất cả (cách cũ)
+"""
+
+import heapq
+import random
+import sys
+
+from gossip import CHET, NGHI_NGO, ThanhVienSwim
+
+# Cấu hình mặc định
+CAC_KICH_THUOC = (50, 100, 200)
+KHOANG_THAM_DO = 1.0
+BUOC_TICK = 0.1
+THOI_GIAN_KHOI_DONG = 30.0
+THOI_GIAN_QUAN_SAT = 60.0
+TY_LE_MAT_GOI = 0.01
+KHOANG_HEARTBEAT_CU = 3.0
+TIMEOUT_HEARTBEAT_CU = 10.0
+CHU_KY_KIEM_TRA_CU = 5.0
+
+
+class MangMoPhong:
+    """
+    Mạng ảo theo đồng hồ ảo: hàng đợi sự kiện (thời điểm, thứ tự, hành động)
+
+    Tin nhắn có độ trễ ngẫu nhiên 0.5-2 ms và bị mất với xác suất ty_le_mat_goi;
+    node "chết" không gửi, không nhận, không tick.
+    """
+
+    def __init__(self, ty_le_mat_goi: float, ngau_nhien: random.Random):
+        self.bay_gio = 0.0
+        self._hang_doi = []
+        self._thu_tu = 0
+        self.ty_le_mat_goi = ty_le_mat_goi
+        self.ngau_nhien = ngau_nhien
+        self.cac_node = {}
+        self.cac_node_chet = set()
+        self.so_tin = 0
+        self.so_byte = 0
+
+    def dat_lich(self, thoi_diem: float, hanh_dong):
+        self._thu_tu += 1
+        heapq.heappush(self._hang_doi, (thoi_diem, self._thu_tu, hanh_dong))
+
+    def gui(self, tu: tuple, den: tuple, thong_diep: dict):
+        if tu in self.cac_node_chet:
+            return
+        self.so_tin += 1
+        # Ước lượng kích thước UDP: JSON gọn của tin nhắn
+        self.so_byte += len(str(thong_diep))
+        if self.ngau_nhien.random() < self.ty_le_mat_goi:
+            return
+        tre = self.ngau_nhien.uniform(0.0005, 0.002)
+        self.dat_lich(self.bay_gio + tre, lambda: self._giao(tu, den, thong_diep))
+
+    def _giao(self, tu: tuple, den: tuple, thong_diep: dict):
+        if den not in self.cac_node_chet and den in self.cac_node:
+            self.cac_node[den].nhan(thong_diep, tu)
+
+    def chay_den(self, thoi_diem: float):
+        while self._hang_doi and self._hang_doi[0][0] <= thoi_diem:
+            self.bay_gio, _, hanh_dong = heapq.heappop(self._hang_doi)
+            hanh_dong()
+        self.bay_gio = thoi_diem
+
+
+def mo_phong(so_node: int, ty_le_mat_goi: float, hat_giong: int = 1) -> dict:
+    """
+    Chạy một kịch bản: khởi động, đo lưu lượng ổn định, giết một node, đo thời gian phát hiện
+
+    Trả về:
+        dict kết quả (giây, tin/node/giây, bytes/node/giây, số node bị báo chết nhầm)
+    """
+    ngau_nhien = random.Random(hat_giong)
+    mang = MangMoPhong(ty_le_mat_goi, ngau_nhien)
+    cac_dia_chi = [("10.0.0.1", 5000 + i) for i in range(so_node)]
+    nhat_ky_su_kien = []
+
+    for dia_chi in cac_dia_chi:
+        def gui(den, thong_diep, tu=dia_chi):
+            mang.gui(tu, den, thong_diep)
+
+        def khi_thay_doi(node_id, dia_chi_tv, loai, nguoi_xem=dia_chi):
+            nhat_ky_su_kien.append((mang.bay_gio, nguoi_xem, node_id, loai))
+
+        mang.cac_node[dia_chi] = ThanhVienSwim(
+            f"{dia_chi[0]}:{dia_chi[1]}", dia_chi, gui,
+            khoang_tham_do=KHOANG_THAM_DO, khi_thay_doi=khi_thay_doi,
+            dong_ho=lambda: mang.bay_gio, ngau_nhien=random.Random(ngau_nhien.random())
+        )
+    # Mọi node biết toàn bộ cluster ngay từ đầu (như sau JOIN)
+    for dia_chi, tv in mang.cac_node.items():
+        for khac in cac_dia_chi:
+            if khac != dia_chi:
+                tv.them_thanh_vien(f"{khac[0]}:{khac[1]}", khac)
+
+    # Tick mỗi node lệch pha ngẫu nhiên để các chu kỳ không trùng nhau
+    def tick(dia_chi):
+        if dia_chi in mang.cac_node_chet:
+            return
+        mang.cac_node[dia_chi].tick()
+        mang.dat_lich(mang.bay_gio + BUOC_TICK, lambda: tick(dia_chi))
+
+    for dia_chi in cac_dia_chi:
+        mang.dat_lich(ngau_nhien.uniform(0, KHOANG_THAM_DO), lambda d=dia_chi: tick(d))
+
+    mang.chay_den(THOI_GIAN_KHOI_DONG)
+
+    # Lưu lượng trạng thái ổn định (trước khi giết node)
+    so_tin_truoc, so_byte_truoc = mang.so_tin, mang.so_byte
+    mang.chay_den(THOI_GIAN_KHOI_DONG + 10)
+    tin_moi_node = (mang.so_tin - so_tin_truoc) / 10 / so_node
+    byte_moi_node = (mang.so_byte - so_byte_truoc) / 10 / so_node
+
+    # Giết một node
+    nan_nhan = cac_dia_chi[ngau_nhien.randrange(so_node)]
+    id_nan_nhan = f"{nan_nhan[0]}:{nan_nhan[1]}"
+    thoi_diem_chet = mang.bay_gio
+    mang.cac_node_chet.add(nan_nhan)
+    so_su_kien_truoc = len(nhat_ky_su_kien)
+    mang.chay_den(thoi_diem_chet + THOI_GIAN_QUAN_SAT)
+
+    # Mỗi node còn sống báo "chet" đúng một lần khi tự kết luận hoặc nhận qua gossip
+    cac_lan_chet = [t for t, _, nid, loai in nhat_ky_su_kien[so_su_kien_truoc:]
+                    if nid == id_nan_nhan and loai == "chet"]
+    # Số node còn sống từng bị ít nhất một node khác kết luận là chết
+    so_bao_nham = len({nid for _, _, nid, loai in nhat_ky_su_kien
+                       if nid != id_nan_nhan and loai == "chet"})
+    con_song = [tv for dc, tv in mang.cac_node.items() if dc != nan_nhan]
+    chua_biet = sum(1 for tv in con_song
+                    if tv.cac_thanh_vien().get(id_nan_nhan, (None, None))[1] != CHET)
+    so_nghi_ngo = sum(1 for tv in con_song
+                      for _, trang_thai, _ in tv.cac_thanh_vien().values() if trang_thai == NGHI_NGO)
+
+    return {
+        "phat_hien_dau_tien": (min(cac_lan_chet) - thoi_diem_chet) if cac_lan_chet else None,
+        "toan_cluster": ((max(cac_lan_chet) - thoi_diem_chet)
+                         if len(cac_lan_chet) == len(con_song) else None),
+        "chua_biet": chua_biet,
+        "tin_moi_node": tin_moi_node,
+        "byte_moi_node": byte_moi_node,
+        "so_bao_nham": so_bao_nham,
+        "so_nghi_ngo_con_lai": so_nghi_ngo,
+    }
+
+
+def _giay(x) -> str:
+    return f"{x:.1f}s" if x is not None else "-"
+
+
+def main():
+    ty_le_mat_goi = float(sys.argv[1]) if len(sys.argv) > 1 else TY_LE_MAT_GOI
+
+    print("=" * 78)
+    print(" BENCHMARK THÀNH VIÊN: GOSSIP SWIM vs HEARTBEAT TẤT CẢ-TỚI-TẤT CẢ (mô phỏng)")
+    print("=" * 78)
+    print(f"Chu kỳ thăm dò {KHOANG_THAM_DO}s, mất gói {ty_le_mat_goi:.0%}, "
+          f"quan sát {THOI_GIAN_QUAN_SAT:.0f}s sau khi giết 1 node\n")
+    print(f"{'Node':>5} | {'Phát hiện':>10}{'Toàn cluster':>14}{'Tin/node/s':>12}"
+          f"{'Bytes/node/s':>14}{'Báo nhầm':>10} | {'HB cũ: tin/node/s':>18}")
+    print("-" * 92)
+
+    for so_node in CAC_KICH_THUOC:
+        kq = mo_phong(so_node, ty_le_mat_goi)
+        # Heartbeat cũ: mỗi node mở một kết nối TCP tới mọi peer mỗi 3 giây
+        # (request + response); phát hiện sau 10s timeout + tối đa 5s chu kỳ kiểm tra
+        tin_cu = 2 * (so_node - 1) / KHOANG_HEARTBEAT_CU
+        print(f"{so_node:>5} | {_giay(kq['phat_hien_dau_tien']):>10}{_giay(kq['toan_cluster']):>14}"
+              f"{kq['tin_moi_node']:>12.2f}{kq['byte_moi_node']:>14,.0f}{kq['so_bao_nham']:>10}"
+              f" | {tin_cu:>18.1f}")
+
+    print("-" * 92)
+    print(f"Heartbeat cũ phát hiện sau {TIMEOUT_HEARTBEAT_CU:.0f}-"
+          f"{TIMEOUT_HEARTBEAT_CU + CHU_KY_KIEM_TRA_CU:.0f}s; lưu lượng tăng tuyến tính theo số node")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
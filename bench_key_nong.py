@@ -0,0 +1,109 @@
+"""
+Benchmark Phát Hiện Key Nóng
+Đo chi phí mỗi lần ghi nhận, độ chính xác top-K trên luồng truy cập Zipf và
+chi phí thêm vào đường xử lý GET/PUT của node
+"""
+
+import itertools
+import random
+import sys
+import time
+from collections import Counter
+
+from key_nong import BoDemKeyNong
+from node import Node
+
+# Cấu hình mặc định
+SO_KEY = 100_000
+SO_TRUY_CAP = 500_000
+CAC_HE_SO_ZIPF = (0.8, 0.99, 1.2)
+TOP = 10
+SO_REQUEST_NODE = 100_000
+
+
+def sinh_luong_zipf(so_key: int, so_truy_cap: int, he_so: float, hat_giong: int = 1):
+    """Luồng key có tần suất truy cập key thứ i tỷ lệ với 1 / (i + 1)^he_so"""
+    ngau_nhien = random.Random(hat_giong)
+    cac_key = [f"user:{i}" for i in range(so_key)]
+    tich_luy = list(itertools.accumulate(1 / (i + 1) ** he_so for i in range(so_key)))
+    # Trộn thứ tự để key nóng không nằm liền nhau trong không gian key
+    ngau_nhien.shuffle(cac_key)
+    return [cac_key[i] for i in ngau_nhien.choices(range(so_key), cum_weights=tich_luy, k=so_truy_cap)]
+
+
+def do_chi_phi(luong) -> float:
+    """ns mỗi lần ghi_nhan (đã trừ chi phí vòng lặp rỗng)"""
+    bo_dem = BoDemKeyNong(cua_so=1e9)
+    ghi_nhan = bo_dem.ghi_nhan
+    bat_dau = time.perf_counter()
+    for key in luong:
+        ghi_nhan(key)
+    thoi_gian = time.perf_counter() - bat_dau
+
+    bat_dau = time.perf_counter()
+    for key in luong:
+        pass
+    thoi_gian_rong = time.perf_counter() - bat_dau
+    return (thoi_gian - thoi_gian_rong) / len(luong) * 1e9
+
+
+def do_chinh_xac(luong) -> dict:
+    """So sánh top-K ước lượng với top-K thật"""
+    bo_dem = BoDemKeyNong(cua_so=1e9)
+    for key in luong:
+        bo_dem.ghi_nhan(key)
+    that = dict(Counter(luong).most_common(TOP))
+    uoc_luong = {muc["key"]: muc["so_lan"] for muc in bo_dem.lay_key_nong(TOP)["cac_key"]}
+    chung = set(that) & set(uoc_luong)
+    sai_so = [(uoc_luong[key] - that[key]) / that[key] for key in chung]
+    return {
+        "do_phu": len(chung) / TOP,
+        "sai_so_tb": sum(sai_so) / len(sai_so) if sai_so else float("nan"),
+        "sai_so_max": max(sai_so) if sai_so else float("nan"),
+    }
+
+
+def do_duong_xu_ly(theo_doi_key_nong: bool, luong) -> float:
+    """µs mỗi request GET/PUT qua Node._xu_ly_request (một node, không mạng)"""
+    node = Node("127.0.0.1:1", "127.0.0.1", 1, theo_doi_key_nong=theo_doi_key_nong)
+    cac_request = [
+        {"command": "GET", "key": key} if i % 4 else {"command": "PUT", "key": key, "value": b"v"}
+        for i, key in enumerate(luong[:SO_REQUEST_NODE])
+    ]
+    xu_ly = node._xu_ly_request
+    bat_dau = time.perf_counter()
+    for request in cac_request:
+        xu_ly(request)
+    return (time.perf_counter() - bat_dau) / len(cac_request) * 1e6
+
+
+def main():
+    so_truy_cap = int(sys.argv[1]) if len(sys.argv) > 1 else SO_TRUY_CAP
+
+    print("=" * 72)
+    print(" BENCHMARK KEY NÓNG: COUNT-MIN SKETCH 4×2048 + TOP-32")
+    print("=" * 72)
+    print(f"Keys: {SO_KEY:,}, truy cập: {so_truy_cap:,}, so sánh top-{TOP}\n")
+    print(f"{'Zipf s':<10}{'ns/ghi nhận':>14}{'Độ phủ top-10':>16}{'Sai số TB':>12}{'Sai số max':>12}")
+    print("-" * 64)
+
+    luong_mac_dinh = None
+    for he_so in CAC_HE_SO_ZIPF:
+        luong = sinh_luong_zipf(SO_KEY, so_truy_cap, he_so)
+        if he_so == 0.99:
+            luong_mac_dinh = luong
+        chinh_xac = do_chinh_xac(luong)
+        print(f"{he_so:<10}{do_chi_phi(luong):>14.0f}{chinh_xac['do_phu']:>15.0%}"
+              f"{chinh_xac['sai_so_tb']:>12.2%}{chinh_xac['sai_so_max']:>12.2%}")
+
+    # Chi phí thêm vào đường xử lý request (75% GET, 25% PUT, Zipf 0.99)
+    tat = do_duong_xu_ly(False, luong_mac_dinh)
+    bat = do_duong_xu_ly(True, luong_mac_dinh)
+    print("-" * 64)
+    print(f"Node._xu_ly_request: tắt {tat:.2f} µs/request, bật {bat:.2f} µs/request "
+          f"(+{bat - tat:.2f} µs, {(bat - tat) / tat:+.1%})")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
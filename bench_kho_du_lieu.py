@@ -0,0 +1,79 @@
+"""
+Benchmark Kho Dữ Liệu Phân Mảnh
+Đo thông lượng GET/PUT đồng thời khi tăng số thread, so sánh 1 khóa toàn cục với N mảnh
+"""
+
+import random
+import sys
+import threading
+import time
+
+from kho_du_lieu import KhoDuLieuPhanManh
+
+# Cấu hình mặc định
+SO_KEY = 100_000
+SO_THAO_TAC_MOI_THREAD = 50_000
+TY_LE_GET = 0.9
+CAC_MUC_THREAD = (1, 2, 4, 8, 16)
+CAC_CAU_HINH_MANH = (1, 16, 64)
+
+
+def chay_mot_lan(kho, cac_key, so_thread, so_thao_tac):
+    """
+    Chạy so_thread thread, mỗi thread so_thao_tac thao tác GET/PUT ngẫu nhiên
+
+    Trả về:
+        Số thao tác mỗi giây
+    """
+    rao_chan = threading.Barrier(so_thread + 1)
+
+    def worker(hat_giong):
+        ngau_nhien = random.Random(hat_giong)
+        # Chuẩn bị trước chuỗi thao tác để không đo chi phí sinh số ngẫu nhiên
+        thao_tac = [
+            (ngau_nhien.random() < TY_LE_GET, cac_key[ngau_nhien.randrange(len(cac_key))])
+            for _ in range(so_thao_tac)
+        ]
+        get, dat = kho.get, kho.dat
+        rao_chan.wait()
+        for la_get, key in thao_tac:
+            if la_get:
+                get(key)
+            else:
+                dat(key, b"v")
+
+    cac_thread = [threading.Thread(target=worker, args=(i,)) for i in range(so_thread)]
+    for t in cac_thread:
+        t.start()
+    rao_chan.wait()
+    bat_dau = time.perf_counter()
+    for t in cac_thread:
+        t.join()
+    return (so_thread * so_thao_tac) / (time.perf_counter() - bat_dau)
+
+
+def main():
+    so_thao_tac = int(sys.argv[1]) if len(sys.argv) > 1 else SO_THAO_TAC_MOI_THREAD
+
+    print("=" * 70)
+    print(" BENCHMARK KHO DỮ LIỆU PHÂN MẢNH")
+    print("=" * 70)
+    print(f"Keys: {SO_KEY:,}, thao tác/thread: {so_thao_tac:,}, GET: {TY_LE_GET * 100:.0f}%\n")
+
+    cac_key = [f"key:{i}" for i in range(SO_KEY)]
+    tieu_de = f"{'Threads':<10}" + "".join(f"{f'{m} mảnh':>16}" for m in CAC_CAU_HINH_MANH)
+    print(tieu_de + "   (thao tác/giây)")
+    print("-" * len(tieu_de))
+
+    for so_thread in CAC_MUC_THREAD:
+        dong = f"{so_thread:<10}"
+        for so_manh in CAC_CAU_HINH_MANH:
+            kho = KhoDuLieuPhanManh(so_manh)
+            kho.ap_dung_hang_loat((key, b"v") for key in cac_key)
+            dong += f"{chay_mot_lan(kho, cac_key, so_thread, so_thao_tac):>16,.0f}"
+        print(dong)
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
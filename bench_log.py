@@ -0,0 +1,132 @@
+"""
+Benchmark Chi Phí Logging
+Đo số request/giây qua Node._xu_ly_request khi tắt log, ghi log đồng bộ
+(cấu hình basicConfig cũ) và ghi log qua hàng đợi + thread nền
+"""
+
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import ghi_log
+from node import Node
+
+# Cấu hình mặc định
+SO_REQUEST = 200_000
+SO_THREAD = 4
+SO_KEY = 10_000
+
+
+def tao_request(so_request: int, hat_giong: int = 1):
+    """60% GET, 30% PUT, 10% DELETE trên SO_KEY key"""
+    ngau_nhien = random.Random(hat_giong)
+    cac_request = []
+    for _ in range(so_request):
+        key = f"user:{ngau_nhien.randrange(SO_KEY)}"
+        r = ngau_nhien.random()
+        if r < 0.6:
+            cac_request.append({"command": "GET", "key": key})
+        elif r < 0.9:
+            cac_request.append({"command": "PUT", "key": key, "value": b"v" * 32})
+        else:
+            cac_request.append({"command": "DELETE", "key": key})
+    return cac_request
+
+
+def xoa_cau_hinh_log():
+    """Đưa root logger về trạng thái chưa cấu hình"""
+    ghi_log.dung_log()
+    goc = logging.getLogger()
+    for handler in list(goc.handlers):
+        goc.removeHandler(handler)
+        handler.close()
+    goc.setLevel(logging.WARNING)
+
+
+def cau_hinh_dong_bo(tep: str, muc: int):
+    """Cấu hình cũ: handler ghi file ngay trong thread gọi log"""
+    handler = logging.FileHandler(tep)
+    handler.setFormatter(logging.Formatter(ghi_log.DINH_DANG))
+    goc = logging.getLogger()
+    goc.addHandler(handler)
+    goc.setLevel(muc)
+
+
+def do_thong_luong(cac_request, so_thread: int) -> float:
+    """Request/giây của so_thread thread cùng gọi _xu_ly_request trên một node"""
+    node = Node("127.0.0.1:1", "127.0.0.1", 1, theo_doi_key_nong=False)
+    xu_ly = node._xu_ly_request
+    phan = len(cac_request) // so_thread
+    rao_chan = threading.Barrier(so_thread + 1)
+
+    def chay(cac_request_cua_thread):
+        rao_chan.wait()
+        for request in cac_request_cua_thread:
+            xu_ly(dict(request))
+
+    cac_thread = [threading.Thread(target=chay, args=(cac_request[i * phan:(i + 1) * phan],))
+                  for i in range(so_thread)]
+    for thread in cac_thread:
+        thread.start()
+    rao_chan.wait()
+    bat_dau = time.perf_counter()
+    for thread in cac_thread:
+        thread.join()
+    return phan * so_thread / (time.perf_counter() - bat_dau)
+
+
+def main():
+    so_request = int(sys.argv[1]) if len(sys.argv) > 1 else SO_REQUEST
+    cac_request = tao_request(so_request)
+    thu_muc = tempfile.mkdtemp(prefix="bench_log_")
+
+    cac_cau_hinh = [
+        ("Tắt log", None),
+        ("Đồng bộ, INFO", lambda tep: cau_hinh_dong_bo(tep, logging.INFO)),
+        ("Đồng bộ, DEBUG", lambda tep: cau_hinh_dong_bo(tep, logging.DEBUG)),
+        ("Hàng đợi, INFO", lambda tep: ghi_log.cau_hinh_log(tep, logging.INFO, console=False)),
+        ("Hàng đợi, DEBUG", lambda tep: ghi_log.cau_hinh_log(tep, logging.DEBUG, console=False,
+                                                              so_dong_moi_giay=0)),
+        ("Hàng đợi, DEBUG, 20 dòng/s", lambda tep: ghi_log.cau_hinh_log(tep, logging.DEBUG,
+                                                                         console=False)),
+    ]
+
+    print("=" * 72)
+    print(" BENCHMARK LOGGING: ĐỒNG BỘ vs HÀNG ĐỢI + THREAD NỀN")
+    print("=" * 72)
+    print(f"Requests: {so_request:,} (60% GET, 30% PUT, 10% DELETE), threads: {SO_THREAD}\n")
+    print(f"{'Cấu hình':<30}{'req/s':>12}{'so với tắt':>12}{'Dòng log':>12}{'Xả hàng đợi':>14}")
+    print("-" * 80)
+
+    goc = None
+    for i, (ten, cau_hinh) in enumerate(cac_cau_hinh):
+        xoa_cau_hinh_log()
+        tep = os.path.join(thu_muc, f"{i}.log")
+        if cau_hinh is not None:
+            cau_hinh(tep)
+        thong_luong = do_thong_luong(cac_request, SO_THREAD)
+
+        # Thời gian để thread nền ghi hết phần log còn trong hàng đợi
+        bat_dau = time.perf_counter()
+        xoa_cau_hinh_log()
+        xa = time.perf_counter() - bat_dau
+
+        so_dong = 0
+        if os.path.exists(tep):
+            with open(tep, "rb") as f:
+                so_dong = sum(1 for _ in f)
+            os.remove(tep)
+        if goc is None:
+            goc = thong_luong
+        print(f"{ten:<30}{thong_luong:>12,.0f}{thong_luong / goc:>11.0%} {so_dong:>12,}{xa * 1000:>11.1f} ms")
+
+    os.rmdir(thu_muc)
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark Bộ Phát Hiện Lỗi
+So sánh timeout cố định (10 giây, kiểm tra mỗi 5 giây - cách cũ) với phi-accrual
+trên chuỗi heartbeat mô phỏng của peer ổn định và peer đang tải cao
+"""
+
+import random
+import sys
+
+from phi_accrual import BoPhatHienPhiAccrual
+
+# Cấu hình mặc định
+SO_PEER = 100
+THOI_GIAN_MO_PHONG = 1800.0
+KHOANG_HEARTBEAT = 3.0
+TIMEOUT_CU = 10.0
+CHU_KY_KIEM_TRA_CU = 5.0
+CHU_KY_KIEM_TRA_PHI = 0.5
+CAC_NGUONG_PHI = (3.0, 8.0, 12.0)
+
+
+def sinh_heartbeat_on_dinh(ngau_nhien: random.Random, ket_thuc: float):
+    """
+    Peer ổn định: nhịp 3 giây ± 0.15 giây, 1% heartbeat bị trễ thêm 1-5 giây (GC)
+    """
+    t = ngau_nhien.uniform(0, KHOANG_HEARTBEAT)
+    cac_thoi_diem = []
+    while t < ket_thuc:
+        cac_thoi_diem.append(t)
+        t += max(0.05, ngau_nhien.gauss(KHOANG_HEARTBEAT, 0.15))
+        if ngau_nhien.random() < 0.01:
+            t += ngau_nhien.uniform(1.0, 5.0)
+    return cac_thoi_diem
+
+
+def sinh_heartbeat_tai_cao(ngau_nhien: random.Random, ket_thuc: float):
+    """
+    Peer tải cao: mỗi heartbeat trễ thêm một khoảng phân bố mũ (trung bình 1.5 giây),
+    thỉnh thoảng im lặng hơn 10 giây
+    """
+    t = ngau_nhien.uniform(0, KHOANG_HEARTBEAT)
+    cac_thoi_diem = []
+    while t < ket_thuc:
+        cac_thoi_diem.append(t)
+        t += KHOANG_HEARTBEAT + ngau_nhien.expovariate(1 / 1.5)
+    return cac_thoi_diem
+
+
+def danh_gia(cac_chuoi, thoi_diem_chet, bao_loi, chu_ky_kiem_tra: float, ghi_nhan):
+    """
+    Chạy một bộ phát hiện trên các chuỗi heartbeat
+
+    Tham số:
+        cac_chuoi: Thời điểm heartbeat của từng peer (đã cắt tại thời điểm chết)
+        thoi_diem_chet: Thời điểm peer chết (None = sống suốt mô phỏng)
+        bao_loi: Hàm (peer, bay_gio) -> bool
+        chu_ky_kiem_tra: Chu kỳ thread kiểm tra
+        ghi_nhan: Hàm (peer, thời điểm) khi heartbeat đến
+
+    Trả về:
+        (số lần báo nhầm, danh sách độ trễ phát hiện các peer chết)
+    """
+    so_bao_nham = 0
+    cac_do_tre = []
+    for peer, chuoi in enumerate(cac_chuoi):
+        i = 0
+        da_bao = False
+        t = chu_ky_kiem_tra
+        chet = thoi_diem_chet[peer]
+        while t < THOI_GIAN_MO_PHONG:
+            while i < len(chuoi) and chuoi[i] <= t:
+                ghi_nhan(peer, chuoi[i])
+                i += 1
+                da_bao = False
+            if not da_bao and i > 0 and bao_loi(peer, t):
+                da_bao = True
+                if chet is not None and t >= chet:
+                    cac_do_tre.append(t - chet)
+                    break
+                # Báo nhầm: peer được nhận lại ở heartbeat kế tiếp
+                so_bao_nham += 1
+            t += chu_ky_kiem_tra
+    return so_bao_nham, cac_do_tre
+
+
+def do_kich_ban(ten: str, sinh_heartbeat, so_peer: int):
+    """In kết quả của mọi bộ phát hiện cho một loại peer"""
+    ngau_nhien = random.Random(7)
+    # Một nửa số peer chết ở thời điểm ngẫu nhiên, nửa còn lại sống suốt mô phỏng
+    thoi_diem_chet = [
+        ngau_nhien.uniform(THOI_GIAN_MO_PHONG / 2, THOI_GIAN_MO_PHONG - 60) if p % 2 else None
+        for p in range(so_peer)
+    ]
+    cac_chuoi = [
+        [t for t in sinh_heartbeat(ngau_nhien, THOI_GIAN_MO_PHONG) if chet is None or t < chet]
+        for chet in thoi_diem_chet
+    ]
+
+    print(f"\n{ten}")
+    print(f"{'Bộ phát hiện':<28}{'Báo nhầm':>10}{'Phát hiện TB':>15}{'Phát hiện max':>15}")
+    print("-" * 68)
+
+    def in_ket_qua(nhan, so_bao_nham, cac_do_tre):
+        trung_binh = sum(cac_do_tre) / len(cac_do_tre) if cac_do_tre else float("nan")
+        lon_nhat = max(cac_do_tre) if cac_do_tre else float("nan")
+        print(f"{nhan:<28}{so_bao_nham:>10}{trung_binh:>14.1f}s{lon_nhat:>14.1f}s")
+
+    # Cách cũ: im lặng > 10 giây, kiểm tra mỗi 5 giây
+    lan_cuoi = {}
+    in_ket_qua(
+        f"Timeout {TIMEOUT_CU:.0f}s / {CHU_KY_KIEM_TRA_CU:.0f}s",
+        *danh_gia(cac_chuoi, thoi_diem_chet,
+                  lambda peer, t: t - lan_cuoi[peer] > TIMEOUT_CU,
+                  CHU_KY_KIEM_TRA_CU, lan_cuoi.__setitem__)
+    )
+
+    for nguong in CAC_NGUONG_PHI:
+        bo_phat_hien = BoPhatHienPhiAccrual(nguong_phi=nguong, khoang_du_kien=KHOANG_HEARTBEAT)
+        in_ket_qua(
+            f"Phi-accrual phi >= {nguong:.0f}",
+            *danh_gia(cac_chuoi, thoi_diem_chet,
+                      lambda peer, t: bo_phat_hien.phi(peer, t) >= nguong,
+                      CHU_KY_KIEM_TRA_PHI, bo_phat_hien.ghi_nhan)
+        )
+
+
+def main():
+    so_peer = int(sys.argv[1]) if len(sys.argv) > 1 else SO_PEER
+
+    print("=" * 68)
+    print(" BENCHMARK PHÁT HIỆN LỖI: TIMEOUT CỐ ĐỊNH vs PHI-ACCRUAL")
+    print("=" * 68)
+    print(f"{so_peer} peer × {THOI_GIAN_MO_PHONG:.0f}s mỗi kịch bản, heartbeat {KHOANG_HEARTBEAT}s, "
+          f"một nửa số peer chết giữa chừng")
+
+    do_kich_ban("Peer ổn định (3s ± 0.15s, 1% trễ thêm 1-5s do GC)", sinh_heartbeat_on_dinh, so_peer)
+    do_kich_ban("Peer tải cao (3s + trễ phân bố mũ, trung bình 1.5s)", sinh_heartbeat_tai_cao, so_peer)
+
+    print("=" * 68)
+
+
+if __name__ == "__main__":
+    main()
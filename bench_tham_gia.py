@@ -0,0 +1,122 @@
+"""
+Benchmark JOIN
+Đo độ trễ trả lời JOIN, thời gian đến khi mọi node biết node mới và số tin
+thành viên được gửi cho cluster 10-100 node (các node chạy trong cùng process)
+"""
+
+import socket
+import sys
+import threading
+import time
+
+import giao_thuc
+from node import Node
+
+# Cấu hình mặc định
+CAC_KICH_THUOC = (10, 25, 50, 100)
+SO_LAN_JOIN_MOI_KICH_THUOC = 3
+
+
+def cong_trong() -> int:
+    """Lấy một cổng trống (TCP); UDP cùng số cổng thường cũng trống"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def khoi_dong_node() -> Node:
+    """Khởi động một node (chế độ heartbeat, không WAL) và đợi nó nhận kết nối"""
+    port = cong_trong()
+    node = Node(f"127.0.0.1:{port}", "127.0.0.1", port, che_do_thanh_vien="heartbeat")
+    threading.Thread(target=node.bat_dau, daemon=True).start()
+    for _ in range(200):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return node
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"Node {node.node_id} không khởi động được")
+
+
+def tong_tin_thanh_vien(cac_node) -> int:
+    return sum(node.thong_ke['so_tin_thanh_vien'] for node in cac_node)
+
+
+def do_mot_lan_join(cac_node, seed: Node) -> dict:
+    """
+    Cho một node mới JOIN qua seed
+
+    Trả về:
+        {"tra_loi": giây đến khi JOIN được trả lời,
+         "hoi_tu": giây đến khi mọi node cũ đều biết node mới,
+         "so_tin": số MEMBERSHIP_UPDATE đã gửi,
+         "toi_thieu": số node cũ cần được báo (trừ seed)}
+    """
+    toi_thieu = len(cac_node) - 1
+    moi = khoi_dong_node()
+    so_tin_truoc = tong_tin_thanh_vien(cac_node)
+
+    bat_dau = time.perf_counter()
+    response = giao_thuc.gui_nhan((seed.host, seed.port), {
+        "command": "JOIN", "node_id": moi.node_id, "host": moi.host, "port": moi.port
+    }, timeout=30)
+    tra_loi = time.perf_counter() - bat_dau
+    assert response.get("status") == "success"
+
+    while not all(moi.node_id in node.cac_node_khac for node in cac_node):
+        if time.perf_counter() - bat_dau > 30:
+            raise RuntimeError("Thay đổi thành viên không lan tới mọi node sau 30 giây")
+        time.sleep(0.001)
+    hoi_tu = time.perf_counter() - bat_dau
+
+    # Đợi các thread lan truyền gửi xong tin cuối cùng
+    time.sleep(0.2)
+    with moi.khoa_node_khac:
+        moi.cac_node_khac.update(
+            (nid, tuple(dia_chi)) for nid, dia_chi in response["peers"].items() if nid != moi.node_id
+        )
+    cac_node.append(moi)
+    return {"tra_loi": tra_loi, "hoi_tu": hoi_tu, "toi_thieu": toi_thieu,
+            "so_tin": tong_tin_thanh_vien(cac_node) - so_tin_truoc}
+
+
+def main():
+    cac_kich_thuoc = [int(x) for x in sys.argv[1:]] or list(CAC_KICH_THUOC)
+
+    print("=" * 78)
+    print(" BENCHMARK JOIN: LAN TRUYỀN THÀNH VIÊN QUA CÂY FAN-OUT CÓ EPOCH")
+    print("=" * 78)
+    print(f"Mỗi kích thước: {SO_LAN_JOIN_MOI_KICH_THUOC} lần JOIN, fan-out = 4, "
+          f"các node trong cùng process trên 127.0.0.1\n")
+    print(f"{'Node':>6}{'Trả lời JOIN':>15}{'Hội tụ':>12}{'Tin/JOIN':>12}{'Tối thiểu':>12}"
+          f"{'Cũ: tin/vòng':>15}")
+    print("-" * 72)
+
+    cac_node = [khoi_dong_node()]
+    seed = cac_node[0]
+    try:
+        for kich_thuoc in cac_kich_thuoc:
+            # Dựng cluster đến kich_thuoc - 1 node, rồi đo các lần JOIN tiếp theo
+            while len(cac_node) < kich_thuoc - 1:
+                do_mot_lan_join(cac_node, seed)
+            ket_qua = [do_mot_lan_join(cac_node, seed) for _ in range(SO_LAN_JOIN_MOI_KICH_THUOC)]
+
+            def trung_binh(truong):
+                return sum(kq[truong] for kq in ket_qua) / len(ket_qua)
+
+            n = kich_thuoc
+            # Cách cũ: mỗi node nhận JOIN lại phát JOIN đến mọi peer (không có điểm dừng)
+            print(f"{n:>6}{trung_binh('tra_loi') * 1000:>13.1f}ms{trung_binh('hoi_tu') * 1000:>10.1f}ms"
+                  f"{trung_binh('so_tin'):>12.1f}{trung_binh('toi_thieu'):>12.1f}{(n - 1) * (n - 2):>15,}")
+    finally:
+        for node in cac_node:
+            node.dung_lai()
+
+    print("-" * 72)
+    print("Tối thiểu = số node cũ trừ seed. Cách cũ gửi JOIN đồng bộ")
+    print("đến mọi peer ở mỗi node nhận được, lặp lại không dừng: ~(n-1)(n-2) tin mỗi vòng")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Microbenchmark Các Đường Nóng Của Node
+Đo riêng từng đoạn code chạy trên mỗi request: băm key, tra vòng băm, phân tích và
+điều phối request, mã hóa/giải mã response, lọc key khi đồng bộ. Kết quả lưu thành
+baseline JSON; chế độ so sánh báo các phép đo chậm hơn baseline quá ngưỡng
+
+Cách dùng:
+    python bench_vi_mo.py                              # chạy tất cả, in bảng
+    python bench_vi_mo.py --luu baseline.json          # lưu baseline
+    python bench_vi_mo.py --so-sanh baseline.json      # so với baseline (mã thoát 1 nếu chậm hơn)
+    python bench_vi_mo.py --chon vong_bam,dieu_phoi --nguong 5
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import giao_thuc
+from node import Node
+
+# Mỗi vòng đo chạy ít nhất chừng này giây; số vòng mặc định
+THOI_GIAN_VONG_TOI_THIEU = 0.05
+SO_VONG = 7
+NGUONG_MAC_DINH = 10.0  # phần trăm
+
+SO_KEY = 1000
+VALUE = b"v" * 100
+
+
+def _tao_node(so_node: int) -> Node:
+    """Node không mở socket, vòng băm gồm so_node node (các peer chỉ được thêm vào danh sách)"""
+    node = Node("127.0.0.1:5001", "127.0.0.1", 5001)
+    for i in range(1, so_node):
+        node.cac_node_khac[f"127.0.0.1:{5001 + i}"] = ("127.0.0.1", 5001 + i)
+    return node
+
+
+def _cac_key() -> List[str]:
+    return [f"user:{i:06d}" for i in range(SO_KEY)]
+
+
+# ==================== CÁC PHÉP ĐO ====================
+# Mỗi hàm chuẩn bị dữ liệu rồi trả về chay(n): thực hiện n lần thao tác được đo
+
+def do_hash_key() -> Callable[[int], None]:
+    node = _tao_node(1)
+    cac_key = itertools.cycle(_cac_key())
+    hash_key = node.hash_key
+
+    def chay(n):
+        for _ in range(n):
+            hash_key(next(cac_key))
+    return chay
+
+
+def _do_vong_bam(so_node: int) -> Callable[[int], None]:
+    node = _tao_node(so_node)
+    cac_key = itertools.cycle(_cac_key())
+    tra_cuu = node.lay_cac_node_chiu_trach_nhiem
+
+    def chay(n):
+        for _ in range(n):
+            tra_cuu(next(cac_key))
+    return chay
+
+
+def do_vong_bam_3_node():
+    return _do_vong_bam(3)
+
+
+def do_vong_bam_10_node():
+    return _do_vong_bam(10)
+
+
+def _do_dieu_phoi(tao_request: Callable[[str], dict]) -> Callable[[int], None]:
+    # Node đơn: PUT không sinh thread nhân bản, mọi request được xử lý local
+    node = _tao_node(1)
+    for key in _cac_key():
+        node.du_lieu.dat(key, VALUE)
+    cac_request = itertools.cycle([tao_request(key) for key in _cac_key()])
+    xu_ly = node._xu_ly_request
+
+    def chay(n):
+        for _ in range(n):
+            xu_ly(dict(next(cac_request)))
+    return chay
+
+
+def do_dieu_phoi_get():
+    return _do_dieu_phoi(lambda key: {"command": "GET", "key": key})
+
+
+def do_dieu_phoi_put():
+    return _do_dieu_phoi(lambda key: {"command": "PUT", "key": key, "value": VALUE})
+
+
+def do_dieu_phoi_lenh_la():
+    return _do_dieu_phoi(lambda key: {"command": "KHONG_CO", "key": key})
+
+
+def do_phan_tich_khung_put() -> Callable[[int], None]:
+    khung = b"".join(bytes(b) for b in giao_thuc.ma_hoa_khung(
+        {"command": "PUT", "key": "user:000001", "value": VALUE, "vet": {"id": "a" * 16, "mau": False}}
+    ))
+    do_dai_dau = giao_thuc._DAU_KHUNG.size
+    _, do_dai_header, _ = giao_thuc._DAU_KHUNG.unpack_from(khung)
+    header = memoryview(khung)[do_dai_dau:do_dai_dau + do_dai_header]
+    payload = memoryview(khung)[do_dai_dau + do_dai_header:]
+    giai_ma = giao_thuc.giai_ma_khung
+
+    def chay(n):
+        for _ in range(n):
+            giai_ma(header, payload)
+    return chay
+
+
+def do_phan_tich_json_put() -> Callable[[int], None]:
+    dong = json.dumps({"command": "PUT", "key": "user:000001", "value": VALUE.decode()}).encode() + b"\n"
+    chuyen = Node._chuyen_request_json
+
+    def chay(n):
+        for _ in range(n):
+            chuyen(json.loads(dong.decode()))
+    return chay
+
+
+def do_ma_hoa_response_get() -> Callable[[int], None]:
+    response = {"status": "success", "value": VALUE, "trace_id": "a" * 16}
+    ma_hoa = giao_thuc.ma_hoa_khung
+
+    def chay(n):
+        for _ in range(n):
+            ma_hoa(response)
+    return chay
+
+
+def do_ma_hoa_response_get_json() -> Callable[[int], None]:
+    response = {"status": "success", "value": VALUE, "trace_id": "a" * 16}
+    tuong_thich = giao_thuc.json_tuong_thich
+
+    def chay(n):
+        for _ in range(n):
+            json.dumps(response, default=tuong_thich).encode()
+    return chay
+
+
+def _response_thong_ke() -> dict:
+    node = _tao_node(1)
+    xu_ly = node._xu_ly_request
+    for key in _cac_key():
+        xu_ly({"command": "GET", "key": key})
+    return node._xu_ly_request({"command": "GET_STATS"})
+
+
+def do_ma_hoa_response_stats() -> Callable[[int], None]:
+    response = _response_thong_ke()
+    ma_hoa = giao_thuc.ma_hoa_khung
+
+    def chay(n):
+        for _ in range(n):
+            ma_hoa(response)
+    return chay
+
+
+def do_giai_ma_response_stats() -> Callable[[int], None]:
+    khung = b"".join(bytes(b) for b in giao_thuc.ma_hoa_khung(_response_thong_ke()))
+    do_dai_dau = giao_thuc._DAU_KHUNG.size
+    _, do_dai_header, _ = giao_thuc._DAU_KHUNG.unpack_from(khung)
+    header = memoryview(khung)[do_dai_dau:do_dai_dau + do_dai_header]
+    payload = memoryview(khung)[do_dai_dau + do_dai_header:]
+    giai_ma = giao_thuc.giai_ma_khung
+
+    def chay(n):
+        for _ in range(n):
+            giai_ma(header, payload)
+    return chay
+
+
+def do_loc_dong_bo_1000_key() -> Callable[[int], None]:
+    node = _tao_node(3)
+    du_lieu_peer = {key: VALUE for key in _cac_key()}
+    loc = node._loc_key_chiu_trach_nhiem
+
+    def chay(n):
+        for _ in range(n):
+            loc(du_lieu_peer)
+    return chay
+
+
+# (tên, mô tả, hàm chuẩn bị)
+CAC_PHEP_DO: List[Tuple[str, str, Callable[[], Callable[[int], None]]]] = [
+    ("hash_key", "Node.hash_key (MD5 -> int)", do_hash_key),
+    ("vong_bam_3_node", "lay_cac_node_chiu_trach_nhiem, vòng 3 node", do_vong_bam_3_node),
+    ("vong_bam_10_node", "lay_cac_node_chiu_trach_nhiem, vòng 10 node", do_vong_bam_10_node),
+    ("dieu_phoi_get", "_xu_ly_request GET có key, node đơn", do_dieu_phoi_get),
+    ("dieu_phoi_put", "_xu_ly_request PUT 100 B, node đơn", do_dieu_phoi_put),
+    ("dieu_phoi_lenh_la", "_xu_ly_request lệnh không xác định (chi phí bao quanh)", do_dieu_phoi_lenh_la),
+    ("phan_tich_khung_put", "giai_ma_khung request PUT", do_phan_tich_khung_put),
+    ("phan_tich_json_put", "request JSON một dòng PUT: json.loads + đổi value", do_phan_tich_json_put),
+    ("ma_hoa_response_get", "ma_hoa_khung response GET 100 B", do_ma_hoa_response_get),
+    ("ma_hoa_response_get_json", "json.dumps response GET (client JSON kiểu cũ)", do_ma_hoa_response_get_json),
+    ("ma_hoa_response_stats", "ma_hoa_khung response GET_STATS", do_ma_hoa_response_stats),
+    ("giai_ma_response_stats", "giai_ma_khung response GET_STATS", do_giai_ma_response_stats),
+    ("loc_dong_bo_1000_key", "_loc_key_chiu_trach_nhiem 1000 key, vòng 3 node", do_loc_dong_bo_1000_key),
+]
+
+
+# ==================== ĐO VÀ SO SÁNH ====================
+
+def do_mot(chay: Callable[[int], None], so_vong: int = SO_VONG) -> dict:
+    """
+    Đo một phép đo: tăng số lần mỗi vòng đến khi một vòng >= THOI_GIAN_VONG_TOI_THIEU,
+    rồi chạy so_vong vòng (tắt GC như timeit)
+
+    Trả về:
+        {"ns_moi_lan": trung vị, "ns_min", "ns_max", "so_lan_moi_vong", "so_vong"}
+    """
+    n = 1
+    while True:
+        bat_dau = time.perf_counter()
+        chay(n)
+        if time.perf_counter() - bat_dau >= THOI_GIAN_VONG_TOI_THIEU or n >= 10_000_000:
+            break
+        n *= 2
+
+    cac_lan: List[float] = []
+    gc_dang_bat = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(so_vong):
+            bat_dau = time.perf_counter()
+            chay(n)
+            cac_lan.append((time.perf_counter() - bat_dau) / n * 1e9)
+    finally:
+        if gc_dang_bat:
+            gc.enable()
+    return {
+        "ns_moi_lan": round(statistics.median(cac_lan), 1),
+        "ns_min": round(min(cac_lan), 1),
+        "ns_max": round(max(cac_lan), 1),
+        "so_lan_moi_vong": n,
+        "so_vong": so_vong,
+    }
+
+
+def thong_tin_moi_truong() -> dict:
+    """Phiên bản Python, nền tảng và commit hiện tại, ghi kèm kết quả đo"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "nen_tang": platform.platform(),
+        "may": platform.machine(),
+        "commit": commit,
+    }
+
+
+def so_sanh(ket_qua: Dict[str, dict], baseline: Dict[str, dict], nguong: float) -> List[str]:
+    """
+    In bảng so sánh với baseline
+
+    Trả về:
+        Tên các phép đo chậm hơn baseline quá nguong phần trăm (theo trung vị)
+    """
+    print(f"\n{'Phép đo':<28}{'baseline ns':>14}{'hiện tại ns':>14}{'thay đổi':>11}")
+    print("-" * 80)
+    cac_cham_hon = []
+    for ten, muc in ket_qua.items():
+        cu = baseline.get(ten)
+        if cu is None:
+            print(f"{ten:<28}{'-':>14}{muc['ns_moi_lan']:>14,.1f}{'mới':>11}")
+            continue
+        thay_doi = (muc["ns_moi_lan"] / cu["ns_moi_lan"] - 1) * 100
+        if thay_doi > nguong:
+            danh_dau = "  ⚠ CHẬM HƠN"
+            cac_cham_hon.append(ten)
+        elif thay_doi < -nguong:
+            danh_dau = "  ✓ nhanh hơn"
+        else:
+            danh_dau = ""
+        print(f"{ten:<28}{cu['ns_moi_lan']:>14,.1f}{muc['ns_moi_lan']:>14,.1f}{thay_doi:>+10.1f}%{danh_dau}")
+    return cac_cham_hon
+
+
+def main(tham_so_dong_lenh: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmark các đường nóng của node")
+    parser.add_argument("--chon", default=None,
+                        help="chỉ chạy phép đo có tên chứa một trong các chuỗi (cách nhau bởi dấu phẩy)")
+    parser.add_argument("--so-vong", type=int, default=SO_VONG)
+    parser.add_argument("--luu", default=None, help="ghi kết quả thành baseline JSON")
+    parser.add_argument("--so-sanh", default=None, help="baseline JSON để so sánh")
+    parser.add_argument("--nguong", type=float, default=NGUONG_MAC_DINH,
+                        help="phần trăm chậm hơn baseline bị coi là hồi quy (mặc định: 10)")
+    parser.add_argument("--danh-sach", action="store_true", help="liệt kê các phép đo rồi thoát")
+    tham_so = parser.parse_args(tham_so_dong_lenh)
+
+    cac_phep_do = CAC_PHEP_DO
+    if tham_so.chon:
+        cac_chuoi = [chuoi.strip() for chuoi in tham_so.chon.split(",") if chuoi.strip()]
+        cac_phep_do = [muc for muc in CAC_PHEP_DO if any(chuoi in muc[0] for chuoi in cac_chuoi)]
+    if tham_so.danh_sach:
+        for ten, mo_ta, _ in cac_phep_do:
+            print(f"{ten:<28}{mo_ta}")
+        return 0
+
+    print("=" * 80)
+    print(" MICROBENCHMARK ĐƯỜNG NÓNG CỦA NODE")
+    print("=" * 80)
+    print(f"{'Phép đo':<28}{'ns/lần':>12}{'min':>12}{'max':>12}  Mô tả")
+    print("-" * 80)
+    ket_qua: Dict[str, dict] = {}
+    for ten, mo_ta, chuan_bi in cac_phep_do:
+        muc = do_mot(chuan_bi(), tham_so.so_vong)
+        ket_qua[ten] = muc
+        print(f"{ten:<28}{muc['ns_moi_lan']:>12,.1f}{muc['ns_min']:>12,.1f}{muc['ns_max']:>12,.1f}  {mo_ta}")
+
+    if tham_so.luu:
+        with open(tham_so.luu, "w", encoding="utf-8") as f:
+            json.dump({
+                "thoi_diem": datetime.now().isoformat(timespec="seconds"),
+                "moi_truong": thong_tin_moi_truong(),
+                "ket_qua": ket_qua,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ Đã lưu baseline vào {tham_so.luu}")
+
+    ma_thoat = 0
+    if tham_so.so_sanh:
+        with open(tham_so.so_sanh, encoding="utf-8") as f:
+            baseline = json.load(f)
+        moi_truong = baseline.get("moi_truong", {})
+        print(f"\nBaseline: {tham_so.so_sanh} ({baseline.get('thoi_diem')}, "
+              f"commit {moi_truong.get('commit')}, Python {moi_truong.get('python')})")
+        if moi_truong.get("python") != platform.python_version():
+            print("⚠ Baseline đo trên phiên bản Python khác, so sánh chỉ mang tính tham khảo")
+        cac_cham_hon = so_sanh(ket_qua, baseline.get("ket_qua", {}), tham_so.nguong)
+        if cac_cham_hon:
+            print(f"\n⚠ {len(cac_cham_hon)} phép đo chậm hơn baseline quá {tham_so.nguong:g}%: "
+                  + ", ".join(cac_cham_hon))
+            ma_thoat = 1
+        else:
+            print(f"\n✓ Không phép đo nào chậm hơn baseline quá {tham_so.nguong:g}%")
+    print("=" * 80)
+    return ma_thoat
+
+
+if __name__ == "__main__":
+    sys.exit(main())
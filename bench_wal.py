@@ -0,0 +1,113 @@
+"""
+Benchmark Write-Ahead Log
+Đo thông lượng ghi (PUT/giây) của node với từng chế độ fsync và thời gian khởi động lại
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from node import Node
+
+# Cấu hình mặc định
+SO_THREAD = 8
+SO_LAN_GHI_MOI_THREAD = 2000
+KICH_THUOC_VALUE = 100
+
+
+def do_thong_luong(thu_muc, che_do, so_thread, so_lan_ghi):
+    """
+    Chạy so_thread thread cùng PUT vào một node đơn (không qua mạng)
+
+    Trả về:
+        (số PUT mỗi giây, node đã dùng)
+    """
+    # che_do None = không bật WAL, dùng làm mốc so sánh
+    node = Node("bench", "127.0.0.1", 0,
+                thu_muc_du_lieu=thu_muc if che_do else None,
+                che_do_fsync=che_do or "batch")
+
+    value = b"x" * KICH_THUOC_VALUE
+
+    def worker(chi_so):
+        for i in range(so_lan_ghi):
+            node._xu_ly_put(f"key:{chi_so}:{i}", value)
+
+    cac_thread = [threading.Thread(target=worker, args=(t,)) for t in range(so_thread)]
+    bat_dau = time.perf_counter()
+    for t in cac_thread:
+        t.start()
+    for t in cac_thread:
+        t.join()
+    thoi_gian = time.perf_counter() - bat_dau
+
+    if node.nhat_ky is not None:
+        node.nhat_ky.dong()
+    return (so_thread * so_lan_ghi) / thoi_gian, node
+
+
+def do_phat_lai(thu_muc):
+    """
+    Đo thời gian khởi động lại node từ dữ liệu trên đĩa (ảnh chụp + WAL)
+
+    Trả về:
+        (thời gian khởi động tính bằng giây, số key khôi phục)
+    """
+    node = Node("bench-replay", "127.0.0.1", 0, thu_muc_du_lieu=thu_muc, che_do_fsync="off")
+    node.nhat_ky.dong()
+    return node.thong_ke['thoi_gian_khoi_dong'], len(node.du_lieu)
+
+
+def do_anh_chup(thu_muc):
+    """
+    Chụp ảnh dữ liệu trong thư mục (để lần khởi động sau không phải phát lại WAL)
+
+    Trả về:
+        Thông tin ảnh chụp của node
+    """
+    node = Node("bench-snapshot", "127.0.0.1", 0, thu_muc_du_lieu=thu_muc, che_do_fsync="off")
+    node.chup_anh()
+    node.nhat_ky.dong()
+    return node.thong_tin_anh_chup
+
+
+def main():
+    so_thread = int(sys.argv[1]) if len(sys.argv) > 1 else SO_THREAD
+    so_lan_ghi = int(sys.argv[2]) if len(sys.argv) > 2 else SO_LAN_GHI_MOI_THREAD
+
+    print("=" * 70)
+    print(" BENCHMARK WRITE-AHEAD LOG")
+    print("=" * 70)
+    print(f"Threads: {so_thread}, PUT/thread: {so_lan_ghi}, value: {KICH_THUOC_VALUE} bytes\n")
+    print(f"{'Chế độ':<12}{'PUT/giây':>14}{'fsync':>10}{'Bytes WAL':>14}")
+    print("-" * 50)
+
+    thu_muc_goc = tempfile.mkdtemp(prefix="bench_wal_")
+    try:
+        for che_do in (None, "off", "batch", "always"):
+            thu_muc = os.path.join(thu_muc_goc, che_do or "none")
+            thong_luong, node = do_thong_luong(thu_muc, che_do, so_thread, so_lan_ghi)
+            tk = node.nhat_ky.lay_thong_ke() if node.nhat_ky else {}
+            print(f"{che_do or 'no-wal':<12}{thong_luong:>14,.0f}"
+                  f"{tk.get('so_lan_fsync', 0):>10}{tk.get('so_byte_da_ghi', 0):>14,}")
+
+        thu_muc_batch = os.path.join(thu_muc_goc, "batch")
+        thoi_gian, so_key = do_phat_lai(thu_muc_batch)
+        print("-" * 50)
+        print(f"Khởi động (chỉ WAL):     {so_key:,} keys trong {thoi_gian:.3f}s")
+
+        anh_chup = do_anh_chup(thu_muc_batch)
+        thoi_gian, so_key = do_phat_lai(thu_muc_batch)
+        print(f"Ảnh chụp: {anh_chup['kich_thuoc_byte']:,} bytes, ghi trong {anh_chup['thoi_gian_chup']:.3f}s "
+              f"(giữ khóa {anh_chup['thoi_gian_khoa'] * 1000:.1f} ms)")
+        print(f"Khởi động (ảnh chụp):    {so_key:,} keys trong {thoi_gian:.3f}s")
+    finally:
+        shutil.rmtree(thu_muc_goc, ignore_errors=True)
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
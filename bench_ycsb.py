@@ -0,0 +1,345 @@
+"""
+Benchmark Kiểu YCSB cho Cluster
+Sinh tải qua KVStoreClient với các hỗn hợp thao tác chuẩn, phân bố key Zipf hoặc
+đều, nhiều thread đồng thời; báo cáo ops/giây, bảng phân vị độ trễ và kết quả JSON
+
+Cách dùng:
+    python bench_ycsb.py --cac-node 127.0.0.1:5001,127.0.0.1:5002 --tai doc_nhieu \\
+        --so-key 10000 --kich-thuoc-value 100 --phan-bo zipf --so-thread 8 \\
+        --thoi-gian 30 --json ket_qua.json
+    python bench_ycsb.py --cum 3 --che-do-cum bo_nho --tai a   # tự khởi động cụm 3 node
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bieu_do_do_tre import BieuDoDoTre
+from client import KVStoreClient
+from cum_thu_nghiem import CAC_CHE_DO, CumThuNghiem
+
+# Hỗn hợp thao tác (tỷ lệ), theo các workload chuẩn của YCSB
+CAC_TAI = {
+    "cap_nhat_nhieu": {"READ": 0.5, "UPDATE": 0.5},      # YCSB A
+    "doc_nhieu": {"READ": 0.95, "UPDATE": 0.05},         # YCSB B
+    "chi_doc": {"READ": 1.0},                            # YCSB C
+    "quet": {"SCAN": 0.95, "INSERT": 0.05},              # YCSB E
+}
+CAC_TEN_YCSB = {"a": "cap_nhat_nhieu", "b": "doc_nhieu", "c": "chi_doc", "e": "quet"}
+
+TIEN_TO_KEY = "user:"
+SO_CHU_SO_KEY = 10
+
+
+def ten_key(so: int) -> str:
+    """Key có độ dài cố định để thứ tự chuỗi trùng thứ tự số (SCAN theo khoảng)"""
+    return f"{TIEN_TO_KEY}{so:0{SO_CHU_SO_KEY}d}"
+
+
+def _fnv64(so: int) -> int:
+    """FNV-1a 64 bit của một số nguyên (xáo thứ hạng Zipf như YCSB)"""
+    h = 0xCBF29CE484222325
+    for _ in range(8):
+        h ^= so & 0xFF
+        h = (h * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+        so >>= 8
+    return h
+
+
+class BoSinhZipf:
+    """
+    Sinh thứ hạng 0..n-1 theo phân bố Zipf (thuật toán của Gray et al., như YCSB)
+
+    Giải thích:
+    - Thứ hạng 0 nóng nhất; xác suất thứ hạng i tỷ lệ với 1 / (i + 1)^he_so
+    - xao_tron=True: thứ hạng được băm FNV để key nóng nằm rải rác trên
+      không gian key (và trên các node), không dồn vào đầu khoảng
+    - Tính zeta(n) một lần O(n); mỗi lần sinh O(1)
+    """
+
+    def __init__(self, n: int, he_so: float = 0.99, xao_tron: bool = True):
+        self.n = n
+        self.he_so = he_so
+        self.xao_tron = xao_tron
+        zeta_n = sum(1.0 / (i + 1) ** he_so for i in range(n))
+        zeta_2 = 1.0 + 0.5 ** he_so
+        self._zeta_n = zeta_n
+        self._alpha = 1.0 / (1.0 - he_so)
+        self._eta = (1.0 - (2.0 / n) ** (1.0 - he_so)) / (1.0 - zeta_2 / zeta_n)
+        self._nguong_1 = 1.0 + 0.5 ** he_so
+
+    def sinh(self, ngau_nhien: random.Random) -> int:
+        u = ngau_nhien.random()
+        uz = u * self._zeta_n
+        if uz < 1.0:
+            hang = 0
+        elif uz < self._nguong_1:
+            hang = 1
+        else:
+            hang = min(int(self.n * (self._eta * u - self._eta + 1.0) ** self._alpha), self.n - 1)
+        return _fnv64(hang) % self.n if self.xao_tron else hang
+
+
+class KetQuaThread:
+    """Biểu đồ độ trễ và số lỗi theo loại thao tác của một thread"""
+
+    def __init__(self):
+        self.bieu_do: Dict[str, BieuDoDoTre] = {}
+        self.so_loi: Dict[str, int] = {}
+
+    def ghi(self, thao_tac: str, giay: float, thanh_cong: bool):
+        bieu_do = self.bieu_do.get(thao_tac)
+        if bieu_do is None:
+            bieu_do = self.bieu_do[thao_tac] = BieuDoDoTre()
+        bieu_do.ghi(giay)
+        if not thanh_cong:
+            self.so_loi[thao_tac] = self.so_loi.get(thao_tac, 0) + 1
+
+
+def nap_du_lieu(tao_client: Callable[[int], KVStoreClient], so_key: int, value: bytes, so_thread: int) -> float:
+    """Giai đoạn nạp: PUT mọi key một lần; trả về ops/giây"""
+    bo_dem = itertools.count()
+
+    def chay(chi_so: int):
+        client = tao_client(chi_so)
+        while True:
+            so = next(bo_dem)
+            if so >= so_key:
+                return
+            client.put(ten_key(so), value, hien_thi=False)
+
+    bat_dau = time.perf_counter()
+    cac_thread = [threading.Thread(target=chay, args=(i,)) for i in range(so_thread)]
+    for thread in cac_thread:
+        thread.start()
+    for thread in cac_thread:
+        thread.join()
+    return so_key / (time.perf_counter() - bat_dau)
+
+
+def chay_tai(tao_client: Callable[[int], KVStoreClient], tai: Dict[str, float], so_key: int, value: bytes,
+             phan_bo: str, he_so_zipf: float, so_thread: int, thoi_gian: float,
+             so_thao_tac: int, do_dai_quet_toi_da: int, hat_giong: int) -> Tuple[List[KetQuaThread], float, int]:
+    """
+    Giai đoạn chạy: so_thread thread, mỗi thread một KVStoreClient riêng
+
+    Trả về:
+        (kết quả từng thread, thời gian chạy thật (giây), tổng số thao tác)
+    """
+    bo_sinh_zipf = BoSinhZipf(so_key, he_so_zipf) if phan_bo == "zipf" else None
+    cac_thao_tac = list(tai)
+    cac_trong_so = list(itertools.accumulate(tai[thao_tac] for thao_tac in cac_thao_tac))
+    key_moi = itertools.count(so_key)
+    bo_dem = itertools.count()
+    dung = threading.Event()
+    rao_chan = threading.Barrier(so_thread + 1)
+    cac_ket_qua = [KetQuaThread() for _ in range(so_thread)]
+
+    def chay(chi_so: int):
+        ngau_nhien = random.Random(hat_giong + chi_so)
+        client = tao_client(chi_so)
+        ket_qua = cac_ket_qua[chi_so]
+        do_hien_tai = time.perf_counter
+        rao_chan.wait()
+        while not dung.is_set():
+            if so_thao_tac and next(bo_dem) >= so_thao_tac:
+                return
+            thao_tac = ngau_nhien.choices(cac_thao_tac, cum_weights=cac_trong_so)[0]
+            if bo_sinh_zipf is not None:
+                key = ten_key(bo_sinh_zipf.sinh(ngau_nhien))
+            else:
+                key = ten_key(ngau_nhien.randrange(so_key))
+
+            bat_dau = do_hien_tai()
+            if thao_tac == "READ":
+                thanh_cong = client.get(key, hien_thi=False, dang_bytes=True) is not None
+            elif thao_tac == "UPDATE":
+                thanh_cong = client.put(key, value, hien_thi=False)
+            elif thao_tac == "INSERT":
+                thanh_cong = client.put(ten_key(next(key_moi)), value, hien_thi=False)
+            else:
+                cac_cap, _ = client.scan(start=key, limit=ngau_nhien.randint(1, do_dai_quet_toi_da),
+                                         hien_thi=False, dang_bytes=True)
+                thanh_cong = bool(cac_cap)
+            ket_qua.ghi(thao_tac, do_hien_tai() - bat_dau, thanh_cong)
+
+    cac_thread = [threading.Thread(target=chay, args=(i,), daemon=True) for i in range(so_thread)]
+    for thread in cac_thread:
+        thread.start()
+    rao_chan.wait()
+    bat_dau = time.perf_counter()
+    if so_thao_tac:
+        for thread in cac_thread:
+            thread.join()
+    else:
+        time.sleep(thoi_gian)
+        dung.set()
+        for thread in cac_thread:
+            thread.join()
+    thoi_gian_that = time.perf_counter() - bat_dau
+    tong = sum(bd.lay_thong_ke()["so_mau"] for kq in cac_ket_qua for bd in kq.bieu_do.values())
+    return cac_ket_qua, thoi_gian_that, tong
+
+
+def gop_ket_qua(cac_ket_qua: List[KetQuaThread], thoi_gian: float) -> Dict[str, dict]:
+    """Gộp biểu đồ của các thread theo loại thao tác (và "TONG")"""
+    gop: Dict[str, BieuDoDoTre] = {}
+    so_loi: Dict[str, int] = {}
+    for ket_qua in cac_ket_qua:
+        for thao_tac, bieu_do in ket_qua.bieu_do.items():
+            for ten in (thao_tac, "TONG"):
+                gop.setdefault(ten, BieuDoDoTre()).gop(bieu_do)
+        for thao_tac, dem in ket_qua.so_loi.items():
+            so_loi[thao_tac] = so_loi.get(thao_tac, 0) + dem
+            so_loi["TONG"] = so_loi.get("TONG", 0) + dem
+
+    bang = {}
+    for thao_tac, bieu_do in gop.items():
+        thong_ke = bieu_do.lay_thong_ke()
+        bang[thao_tac] = {
+            **thong_ke,
+            "ops_moi_giay": round(thong_ke["so_mau"] / thoi_gian, 1) if thoi_gian else 0.0,
+            "so_loi": so_loi.get(thao_tac, 0),
+        }
+    return bang
+
+
+def phan_tich_cac_node(chuoi: str) -> List[Tuple[str, int]]:
+    cac_node = []
+    for phan in chuoi.split(","):
+        host, port = phan.strip().rsplit(":", 1)
+        cac_node.append((host, int(port)))
+    return cac_node
+
+
+def main(tham_so_dong_lenh: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Benchmark kiểu YCSB cho cluster KV")
+    parser.add_argument("--cac-node", default="127.0.0.1:5001,127.0.0.1:5002,127.0.0.1:5003",
+                        help="Danh sách host:port, cách nhau bởi dấu phẩy")
+    parser.add_argument("--tai", default="doc_nhieu",
+                        help="cap_nhat_nhieu (a) | doc_nhieu (b) | chi_doc (c) | quet (e)")
+    parser.add_argument("--so-key", type=int, default=10_000)
+    parser.add_argument("--kich-thuoc-value", type=int, default=100, help="bytes")
+    parser.add_argument("--phan-bo", default="zipf", choices=["zipf", "deu"])
+    parser.add_argument("--he-so-zipf", type=float, default=0.99)
+    parser.add_argument("--so-thread", type=int, default=8)
+    parser.add_argument("--thoi-gian", type=float, default=10.0, help="giây chạy (khi không đặt --so-thao-tac)")
+    parser.add_argument("--so-thao-tac", type=int, default=0, help="dừng sau N thao tác (0 = theo thời gian)")
+    parser.add_argument("--do-dai-quet", type=int, default=100, help="số key tối đa mỗi SCAN")
+    parser.add_argument("--bo-qua-nap", action="store_true", help="không nạp dữ liệu trước khi chạy")
+    parser.add_argument("--hat-giong", type=int, default=1)
+    parser.add_argument("--json", default=None, help="ghi kết quả JSON ra file ('-' = stdout)")
+    parser.add_argument("--cum", type=int, default=0,
+                        help="tự khởi động cụm N node cục bộ thay vì dùng --cac-node")
+    parser.add_argument("--che-do-cum", default="trong_process", choices=CAC_CHE_DO)
+    tham_so = parser.parse_args(tham_so_dong_lenh)
+
+    ten_tai = CAC_TEN_YCSB.get(tham_so.tai.lower(), tham_so.tai)
+    if ten_tai not in CAC_TAI:
+        parser.error(f"Tải không hợp lệ: {tham_so.tai}")
+    tai = CAC_TAI[ten_tai]
+    value = os.urandom(tham_so.kich_thuoc_value)
+    in_bang = tham_so.json != "-"
+
+    cum = None
+    mang = None
+    if tham_so.cum:
+        cum = CumThuNghiem(tham_so.cum, che_do=tham_so.che_do_cum).khoi_dong()
+        cac_node = cum.cac_dia_chi
+        mang = cum.mang
+    else:
+        cac_node = phan_tich_cac_node(tham_so.cac_node)
+
+    def tao_client(chi_so: int) -> KVStoreClient:
+        # Mỗi thread bắt đầu ở một node khác nhau
+        client = KVStoreClient(cac_node, mang=mang)
+        client.chi_so_node_hien_tai = chi_so % len(cac_node)
+        return client
+
+    try:
+        ket_qua = _chay(tham_so, ten_tai, tai, value, cac_node, tao_client, in_bang)
+    finally:
+        if cum is not None:
+            cum.dung()
+    return ket_qua
+
+
+def _chay(tham_so, ten_tai: str, tai: Dict[str, float], value: bytes, cac_node: List[Tuple[str, int]],
+          tao_client: Callable[[int], KVStoreClient], in_bang: bool) -> dict:
+    """Nạp dữ liệu, chạy tải, in bảng và ghi JSON"""
+
+    if in_bang:
+        print("=" * 72)
+        print(f" BENCHMARK YCSB: {ten_tai} ({', '.join(f'{k} {v:.0%}' for k, v in tai.items())})")
+        print("=" * 72)
+        print(f"Nodes: {len(cac_node)}"
+              + (f" (tự khởi động, {tham_so.che_do_cum})" if tham_so.cum else "")
+              + f", keys: {tham_so.so_key:,}, value: {tham_so.kich_thuoc_value} B, "
+              f"phân bố: {tham_so.phan_bo}"
+              + (f" (s={tham_so.he_so_zipf})" if tham_so.phan_bo == "zipf" else "")
+              + f", threads: {tham_so.so_thread}")
+
+    toc_do_nap = None
+    if not tham_so.bo_qua_nap:
+        toc_do_nap = nap_du_lieu(tao_client, tham_so.so_key, value, tham_so.so_thread)
+        if in_bang:
+            print(f"Nạp dữ liệu: {toc_do_nap:,.0f} PUT/s")
+
+    cac_ket_qua, thoi_gian, tong = chay_tai(
+        tao_client, tai, tham_so.so_key, value, tham_so.phan_bo, tham_so.he_so_zipf,
+        tham_so.so_thread, tham_so.thoi_gian, tham_so.so_thao_tac, tham_so.do_dai_quet,
+        tham_so.hat_giong
+    )
+    bang = gop_ket_qua(cac_ket_qua, thoi_gian)
+
+    ket_qua = {
+        "tai": ten_tai,
+        "ty_le": tai,
+        "cau_hinh": {
+            "so_node": len(cac_node),
+            "cum_tu_khoi_dong": tham_so.che_do_cum if tham_so.cum else None,
+            "so_key": tham_so.so_key,
+            "kich_thuoc_value": tham_so.kich_thuoc_value,
+            "phan_bo": tham_so.phan_bo,
+            "he_so_zipf": tham_so.he_so_zipf if tham_so.phan_bo == "zipf" else None,
+            "so_thread": tham_so.so_thread,
+        },
+        "nap_ops_moi_giay": round(toc_do_nap, 1) if toc_do_nap is not None else None,
+        "thoi_gian_giay": round(thoi_gian, 3),
+        "so_thao_tac": tong,
+        "ops_moi_giay": round(tong / thoi_gian, 1) if thoi_gian else 0.0,
+        "thao_tac": bang,
+    }
+
+    if in_bang:
+        print(f"\nChạy: {tong:,} thao tác trong {thoi_gian:.1f}s = {ket_qua['ops_moi_giay']:,.0f} ops/s\n")
+        print(f"{'Thao tác':<10}{'n':>10}{'ops/s':>10}{'lỗi':>7}"
+              f"{'tb':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'p999':>9}{'max':>9}  (ms)")
+        print("-" * 93)
+        for thao_tac in [*tai, "TONG"]:
+            muc = bang.get(thao_tac)
+            if muc is None:
+                continue
+            print(f"{thao_tac:<10}{muc['so_mau']:>10,}{muc['ops_moi_giay']:>10,.0f}{muc['so_loi']:>7}"
+                  f"{muc['tb_ms']:>9.2f}{muc['p50_ms']:>9.2f}{muc['p90_ms']:>9.2f}"
+                  f"{muc['p99_ms']:>9.2f}{muc['p999_ms']:>9.2f}{muc['max_ms']:>9.2f}")
+        print("=" * 72)
+
+    if tham_so.json == "-":
+        json.dump(ket_qua, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif tham_so.json:
+        with open(tham_so.json, "w", encoding="utf-8") as f:
+            json.dump(ket_qua, f, ensure_ascii=False, indent=2)
+        print(f"✓ Đã ghi kết quả JSON vào {tham_so.json}")
+    return ket_qua
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Biểu Đồ Độ Trễ Kiểu HDR cho Node
+Ghi độ trễ từng lệnh với chi phí cố định, bộ nhớ cố định và sai số tương đối ~1.6%
+"""
+
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# Mỗi bậc lũy thừa 2 được chia thành 2^BIT_CON ô con -> sai số tương đối <= 1/2^BIT_CON
+BIT_CON = 6
+SO_O_CON = 1 << BIT_CON
+# Giá trị nhỏ hơn 2 * SO_O_CON (micro giây) được ghi chính xác, mỗi giá trị một ô
+NGUONG_TUYEN_TINH = 2 * SO_O_CON
+# Giới hạn trên ~2^37 µs (~38 giờ); giá trị lớn hơn dồn vào ô cuối
+SO_BAC_TOI_DA = 30
+SO_O = NGUONG_TUYEN_TINH + SO_BAC_TOI_DA * SO_O_CON
+
+CAC_PHAN_VI = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+
+def _chi_so_o(micro_giay: int) -> int:
+    """Ô chứa một giá trị (micro giây, số nguyên không âm)"""
+    if micro_giay < NGUONG_TUYEN_TINH:
+        return micro_giay
+    bac = micro_giay.bit_length() - BIT_CON - 1
+    chi_so = NGUONG_TUYEN_TINH + (bac - 1) * SO_O_CON + ((micro_giay >> bac) - SO_O_CON)
+    return min(chi_so, SO_O - 1)
+
+
+def _gia_tri_o(chi_so: int) -> float:
+    """Giá trị đại diện (điểm giữa) của một ô, micro giây"""
+    if chi_so < NGUONG_TUYEN_TINH:
+        return float(chi_so)
+    bac = (chi_so - NGUONG_TUYEN_TINH) // SO_O_CON + 1
+    con = (chi_so - NGUONG_TUYEN_TINH) % SO_O_CON + SO_O_CON
+    return ((con << bac) + (1 << bac) / 2)
+
+
+class BieuDoDoTre:
+    """
+    Biểu đồ độ trễ log-tuyến tính (như HdrHistogram)
+
+    Giải thích:
+    - Dưới 128 µs: mỗi micro giây một ô (chính xác tuyệt đối)
+    - Từ 128 µs trở lên: mỗi khoảng [2^k, 2^(k+1)) chia thành 64 ô bằng nhau,
+      nên phân vị nào cũng sai lệch tối đa ~1.6% so với giá trị thật
+    - Ghi một mẫu = vài phép dịch bit + tăng một bộ đếm (O(1), không cấp phát);
+      đọc phân vị = một lượt qua ~2000 ô
+    """
+
+    __slots__ = ("_dem", "_so_mau", "_tong", "_lon_nhat", "_khoa")
+
+    def __init__(self):
+        self._dem = [0] * SO_O
+        self._so_mau = 0
+        self._tong = 0.0
+        self._lon_nhat = 0.0
+        self._khoa = threading.Lock()
+
+    def ghi(self, giay: float):
+        """Ghi một mẫu độ trễ (giây)"""
+        micro_giay = int(giay * 1_000_000) if giay > 0 else 0
+        chi_so = _chi_so_o(micro_giay)
+        with self._khoa:
+            self._dem[chi_so] += 1
+            self._so_mau += 1
+            self._tong += giay
+            if giay > self._lon_nhat:
+                self._lon_nhat = giay
+
+    def gop(self, khac: "BieuDoDoTre"):
+        """Cộng mọi mẫu của biểu đồ khac vào biểu đồ này (ví dụ gộp biểu đồ của nhiều thread)"""
+        with khac._khoa:
+            dem = list(khac._dem)
+            so_mau, tong, lon_nhat = khac._so_mau, khac._tong, khac._lon_nhat
+        with self._khoa:
+            for chi_so, gia_tri in enumerate(dem):
+                if gia_tri:
+                    self._dem[chi_so] += gia_tri
+            self._so_mau += so_mau
+            self._tong += tong
+            if lon_nhat > self._lon_nhat:
+                self._lon_nhat = lon_nhat
+
+    def lay_thong_ke(self) -> dict:
+        """
+        Trả về:
+            {"so_mau", "tb_ms", "max_ms", "p50_ms", "p90_ms", "p99_ms", "p999_ms"}
+        """
+        with self._khoa:
+            dem = list(self._dem)
+            so_mau, tong, lon_nhat = self._so_mau, self._tong, self._lon_nhat
+
+        ket_qua = {
+            "so_mau": so_mau,
+            "tb_ms": round(tong / so_mau * 1000, 3) if so_mau else 0.0,
+            "max_ms": round(lon_nhat * 1000, 3),
+        }
+        # Một lượt qua các ô, lấy mọi phân vị theo thứ tự tăng dần
+        da_dem = 0
+        chi_so = 0
+        for ten, phan_tram in CAC_PHAN_VI:
+            can_dat = max(1, -(-so_mau * phan_tram // 100))
+            while chi_so < SO_O and da_dem + dem[chi_so] < can_dat:
+                da_dem += dem[chi_so]
+                chi_so += 1
+            if so_mau == 0 or chi_so >= SO_O:
+                ket_qua[f"{ten}_ms"] = 0.0
+            else:
+                # Không báo vượt quá giá trị lớn nhất thật đã thấy
+                ket_qua[f"{ten}_ms"] = round(min(_gia_tri_o(chi_so) / 1000, lon_nhat * 1000), 3)
+        return ket_qua
+
+    def dem_tich_luy(self, cac_can_tren: Sequence[float]) -> Tuple[List[int], float, int]:
+        """
+        Số mẫu tích lũy <= từng cận trên (giây), cho histogram kiểu Prometheus
+
+        Tham số:
+            cac_can_tren: Các cận trên tăng dần (giây)
+
+        Trả về:
+            (số mẫu tích lũy theo từng cận, tổng độ trễ (giây), tổng số mẫu)
+        """
+        with self._khoa:
+            dem = list(self._dem)
+            so_mau, tong = self._so_mau, self._tong
+        cac_dem = []
+        tich_luy = 0
+        dau = 0
+        for can in cac_can_tren:
+            # Ô chứa cận trên được tính vào cận (sai số <= độ rộng một ô)
+            cuoi = _chi_so_o(int(can * 1_000_000)) + 1
+            tich_luy += sum(dem[dau:cuoi])
+            dau = max(dau, cuoi)
+            cac_dem.append(tich_luy)
+        return cac_dem, tong, so_mau
+
+
+class TapBieuDoDoTre:
+    """
+    Tập biểu đồ độ trễ theo (lệnh, đường đi)
+
+    Đường đi:
+    - "local": node này tự xử lý
+    - "chuyen_tiep": chuyển tiếp đến node chịu trách nhiệm (gồm cả RPC)
+    - "nhan_ban": gửi nhân bản đến một replica (gồm cả các lần thử lại)
+    - "dong_bo": một vòng đồng bộ với peer
+    """
+
+    def __init__(self):
+        self._cac_bieu_do: Dict[Tuple[str, str], BieuDoDoTre] = {}
+        self._khoa = threading.Lock()
+
+    def ghi(self, lenh: str, duong_di: str, giay: float):
+        """Ghi một mẫu độ trễ (giây) cho (lenh, duong_di)"""
+        bieu_do = self._cac_bieu_do.get((lenh, duong_di))
+        if bieu_do is None:
+            with self._khoa:
+                bieu_do = self._cac_bieu_do.setdefault((lenh, duong_di), BieuDoDoTre())
+        bieu_do.ghi(giay)
+
+    def cac_bieu_do(self) -> List[Tuple[Tuple[str, str], BieuDoDoTre]]:
+        """
+        Trả về:
+            [((lenh, duong_di), BieuDoDoTre)] theo thứ tự tên
+        """
+        with self._khoa:
+            return sorted(self._cac_bieu_do.items())
+
+    def lay_thong_ke(self) -> Dict[str, Dict[str, dict]]:
+        """
+        Trả về:
+            {lenh: {duong_di: thống kê của BieuDoDoTre}}
+        """
+        ket_qua: Dict[str, Dict[str, dict]] = {}
+        for (lenh, duong_di), bieu_do in self.cac_bieu_do():
+            ket_qua.setdefault(lenh, {})[duong_di] = bieu_do.lay_thong_ke()
+        return ket_qua
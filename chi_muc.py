@@ -0,0 +1,168 @@
+"""
+Chỉ Mục Có Thứ Tự (Ordered Key Index) cho Node
+Giữ các key theo thứ tự từ điển để SCAN theo tiền tố/khoảng mà không phải quét toàn bộ du_lieu
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Container, List, Optional
+
+# Số key mục tiêu trong một khối; khối dài gấp đôi thì bị tách
+_KICH_THUOC_KHOI = 512
+
+
+def can_tren_cua_tien_to(tien_to: str) -> Optional[str]:
+    """
+    Key nhỏ nhất lớn hơn mọi key bắt đầu bằng tien_to
+
+    Trả về:
+        Cận trên (không bao gồm), None nếu không có cận trên
+    """
+    while tien_to:
+        ky_tu_cuoi = ord(tien_to[-1])
+        if ky_tu_cuoi < 0x10FFFF:
+            return tien_to[:-1] + chr(ky_tu_cuoi + 1)
+        tien_to = tien_to[:-1]
+    return None
+
+
+class ChiMucCoThuTu:
+    """
+    Danh sách key đã sắp xếp dạng "danh sách các khối" (giống sortedcontainers)
+
+    Giải thích:
+    - Key nằm trong các khối nhỏ đã sắp xếp; _cac_max giữ key lớn nhất của mỗi khối
+    - Thêm/xóa: bisect trên _cac_max để tìm khối rồi bisect trong khối,
+      chỉ dịch chuyển tối đa ~2 * _KICH_THUOC_KHOI phần tử thay vì cả danh sách
+    - Quét khoảng: bisect tới vị trí bắt đầu rồi đọc tuần tự, O(log n + k)
+
+    Chỉ mục có khóa riêng và dùng chung cho mọi mảnh; kho dữ liệu gọi dong_bo
+    SAU khi nhả khóa mảnh (không bao giờ giữ cả hai khóa), quet chỉ giữ khóa chỉ mục.
+    """
+
+    def __init__(self):
+        self._cac_khoi: List[List[str]] = []
+        self._cac_max: List[str] = []
+        self._so_key = 0
+        self._khoa = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._so_key
+
+    def them(self, key: str):
+        """Thêm key (bỏ qua nếu đã có)"""
+        with self._khoa:
+            self._them(key)
+
+    def xoa(self, key: str):
+        """Xóa key (bỏ qua nếu không có)"""
+        with self._khoa:
+            self._xoa(key)
+
+    def dong_bo(self, key: str, du_lieu: Container[str]):
+        """
+        Thêm hoặc xóa key theo việc key có trong du_lieu ngay lúc này hay không
+
+        Giải thích: Kho gọi sau khi nhả khóa mảnh nên các lần gọi cho cùng một key
+        có thể đến không theo thứ tự ghi. Mỗi lần gọi đọc lại trạng thái hiện tại
+        trong khóa chỉ mục, nên lần gọi chạy sau cùng (luôn sau lần ghi cuối) để lại
+        chỉ mục khớp với du_lieu.
+        """
+        with self._khoa:
+            if key in du_lieu:
+                self._them(key)
+            else:
+                self._xoa(key)
+
+    def _them(self, key: str):
+        """Thêm key (gọi trong khóa)"""
+        if not self._cac_khoi:
+            self._cac_khoi.append([key])
+            self._cac_max.append(key)
+            self._so_key = 1
+            return
+
+        i = bisect_left(self._cac_max, key)
+        if i == len(self._cac_max):
+            # Lớn hơn mọi key: thêm vào cuối khối cuối cùng
+            i -= 1
+            self._cac_khoi[i].append(key)
+            self._cac_max[i] = key
+        else:
+            khoi = self._cac_khoi[i]
+            j = bisect_left(khoi, key)
+            if j < len(khoi) and khoi[j] == key:
+                return
+            khoi.insert(j, key)
+        self._so_key += 1
+
+        khoi = self._cac_khoi[i]
+        if len(khoi) > 2 * _KICH_THUOC_KHOI:
+            self._cac_khoi[i:i + 1] = [khoi[:_KICH_THUOC_KHOI], khoi[_KICH_THUOC_KHOI:]]
+            self._cac_max[i:i + 1] = [khoi[_KICH_THUOC_KHOI - 1], khoi[-1]]
+
+    def _xoa(self, key: str):
+        """Xóa key (gọi trong khóa)"""
+        i = bisect_left(self._cac_max, key)
+        if i == len(self._cac_max):
+            return
+        khoi = self._cac_khoi[i]
+        j = bisect_left(khoi, key)
+        if j == len(khoi) or khoi[j] != key:
+            return
+        del khoi[j]
+        self._so_key -= 1
+        if not khoi:
+            del self._cac_khoi[i]
+            del self._cac_max[i]
+        elif j == len(khoi):
+            self._cac_max[i] = khoi[-1]
+
+    def xoa_het(self):
+        with self._khoa:
+            self._cac_khoi = []
+            self._cac_max = []
+            self._so_key = 0
+
+    def quet(self, bat_dau: Optional[str] = None, ket_thuc: Optional[str] = None,
+             gioi_han: int = 100, sau: Optional[str] = None) -> List[str]:
+        """
+        Lấy tối đa gioi_han key theo thứ tự trong khoảng [bat_dau, ket_thuc)
+
+        Tham số:
+            bat_dau: Cận dưới (bao gồm), None = từ đầu
+            ket_thuc: Cận trên (không bao gồm), None = đến hết
+            gioi_han: Số key tối đa
+            sau: Chỉ lấy key lớn hơn hẳn key này (con trỏ tiếp tục)
+
+        Trả về:
+            Danh sách key đã sắp xếp
+        """
+        ket_qua: List[str] = []
+        with self._khoa:
+            if not self._cac_khoi or gioi_han <= 0:
+                return ket_qua
+
+            if sau is not None and (bat_dau is None or sau >= bat_dau):
+                i = bisect_right(self._cac_max, sau)
+                tim_vi_tri = bisect_right
+                moc = sau
+            else:
+                i = bisect_left(self._cac_max, bat_dau) if bat_dau is not None else 0
+                tim_vi_tri = bisect_left
+                moc = bat_dau
+
+            j = tim_vi_tri(self._cac_khoi[i], moc) if i < len(self._cac_khoi) and moc is not None else 0
+            while i < len(self._cac_khoi):
+                khoi = self._cac_khoi[i]
+                con_thieu = gioi_han - len(ket_qua)
+                phan = khoi[j:j + con_thieu]
+                if ket_thuc is not None and phan and phan[-1] >= ket_thuc:
+                    ket_qua.extend(phan[:bisect_left(phan, ket_thuc)])
+                    return ket_qua
+                ket_qua.extend(phan)
+                if len(ket_qua) >= gioi_han:
+                    return ket_qua
+                i += 1
+                j = 0
+        return ket_qua
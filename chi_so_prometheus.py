@@ -0,0 +1,222 @@
+"""
+Endpoint Chỉ Số Kiểu Prometheus cho Node
+HTTP GET /metrics trả về định dạng văn bản (text exposition format 0.0.4)
+"""
+
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import gossip
+import khoa_do_dac
+
+# Cận trên (giây) của các bucket histogram độ trễ
+CAC_CAN_DO_TRE = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                  0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+KIEU_NOI_DUNG = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _nhan(**cac_nhan) -> str:
+    """Định dạng nhãn {a="x",b="y"} (escape \\, " và xuống dòng)"""
+    if not cac_nhan:
+        return ""
+    cac_cap = []
+    for ten, gia_tri in cac_nhan.items():
+        gia_tri = str(gia_tri).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        cac_cap.append(f'{ten}="{gia_tri}"')
+    return "{" + ",".join(cac_cap) + "}"
+
+
+class _VanBan:
+    """Gom các dòng của một lần scrape; mỗi metric có HELP/TYPE đúng một lần"""
+
+    def __init__(self):
+        self.cac_dong: List[str] = []
+
+    def metric(self, ten: str, kieu: str, mo_ta: str):
+        self.cac_dong.append(f"# HELP {ten} {mo_ta}")
+        self.cac_dong.append(f"# TYPE {ten} {kieu}")
+
+    def mau(self, ten: str, gia_tri, **cac_nhan):
+        self.cac_dong.append(f"{ten}{_nhan(**cac_nhan)} {gia_tri}")
+
+    def ket_qua(self) -> str:
+        return "\n".join(self.cac_dong) + "\n"
+
+
+def tao_van_ban(node) -> str:
+    """
+    Tạo nội dung /metrics cho một node
+
+    Giải thích:
+    - Chỉ đọc bộ đếm và bản sao nhỏ (thống kê, danh sách peer, biểu đồ độ trễ);
+      không khóa mảnh dữ liệu nào nên scrape mỗi giây không ảnh hưởng request
+    - Bộ đếm thong_ke "so_*" -> counter kv_<tên>_total; thoi_gian_phuc_hoi ->
+      kv_thoi_gian_phuc_hoi_giay_total
+    - Biểu đồ độ trễ -> histogram kv_do_tre_giay{lenh, duong_di}
+    """
+    vb = _VanBan()
+    bay_gio = time.time()
+
+    with node.khoa_thong_ke:
+        thong_ke = dict(node.thong_ke)
+    for ten in sorted(thong_ke):
+        if ten.startswith("so_"):
+            vb.metric(f"kv_{ten}_total", "counter", f"Bộ đếm {ten} của node")
+            vb.mau(f"kv_{ten}_total", thong_ke[ten])
+    vb.metric("kv_thoi_gian_phuc_hoi_giay_total", "counter", "Tổng số giây khôi phục dữ liệu từ peer")
+    vb.mau("kv_thoi_gian_phuc_hoi_giay_total", round(thong_ke["thoi_gian_phuc_hoi"], 6))
+
+    vb.metric("kv_thoi_gian_hoat_dong_giay", "gauge", "Số giây từ khi node khởi động")
+    vb.mau("kv_thoi_gian_hoat_dong_giay", round(bay_gio - thong_ke["thoi_gian_bat_dau"], 3))
+
+    # Histogram độ trễ theo (lệnh, đường đi)
+    vb.metric("kv_do_tre_giay", "histogram", "Độ trễ xử lý theo lệnh và đường đi")
+    for (lenh, duong_di), bieu_do in node.do_tre.cac_bieu_do():
+        cac_dem, tong, so_mau = bieu_do.dem_tich_luy(CAC_CAN_DO_TRE)
+        for can, dem in zip(CAC_CAN_DO_TRE, cac_dem):
+            vb.mau("kv_do_tre_giay_bucket", dem, lenh=lenh, duong_di=duong_di, le=can)
+        vb.mau("kv_do_tre_giay_bucket", so_mau, lenh=lenh, duong_di=duong_di, le="+Inf")
+        vb.mau("kv_do_tre_giay_sum", round(tong, 6), lenh=lenh, duong_di=duong_di)
+        vb.mau("kv_do_tre_giay_count", so_mau, lenh=lenh, duong_di=duong_di)
+
+    # Kho dữ liệu (bộ đếm không khóa)
+    kho = node.du_lieu.lay_thong_ke()
+    vb.metric("kv_so_key", "gauge", "Số key đang lưu trên node")
+    vb.mau("kv_so_key", len(node.du_lieu))
+    vb.metric("kv_bo_nho_byte", "gauge", "Bộ nhớ ước lượng của dữ liệu")
+    vb.mau("kv_bo_nho_byte", kho["bo_nho_dang_dung"])
+    vb.metric("kv_gioi_han_bo_nho_byte", "gauge", "Giới hạn bộ nhớ (0 = không giới hạn)")
+    vb.mau("kv_gioi_han_bo_nho_byte", kho["gioi_han_bo_nho"])
+    vb.metric("kv_so_key_co_ttl", "gauge", "Số key có TTL")
+    vb.mau("kv_so_key_co_ttl", kho["so_key_co_ttl"])
+    vb.metric("kv_so_lan_thu_hoi_total", "counter", "Số key bị thu hồi do vượt giới hạn bộ nhớ")
+    vb.mau("kv_so_lan_thu_hoi_total", kho["so_lan_thu_hoi"])
+    vb.metric("kv_so_lan_het_han_total", "counter", "Số key đã hết hạn")
+    vb.mau("kv_so_lan_het_han_total", kho["so_lan_het_han"])
+
+    # Thread và hàng đợi
+    vb.metric("kv_so_thread", "gauge", "Số thread Python đang chạy trong process")
+    vb.mau("kv_so_thread", threading.active_count())
+    vb.metric("kv_so_thread_vai_tro", "gauge", "Số thread đang chạy theo vai trò")
+    for vai_tro, so_thread in sorted(khoa_do_dac.dieu_tra_thread()["theo_vai_tro"].items()):
+        vb.mau("kv_so_thread_vai_tro", so_thread, vai_tro=vai_tro)
+    vb.metric("kv_hang_doi", "gauge", "Độ dài các hàng đợi nội bộ")
+    if node.nhat_ky is not None:
+        wal = node.nhat_ky.lay_thong_ke()
+        vb.mau("kv_hang_doi", wal["so_ban_ghi_dang_cho"], hang_doi="wal")
+    if node.gossip is not None:
+        vb.mau("kv_hang_doi", node.gossip.lay_thong_ke()["so_cap_nhat_cho_lan_truyen"],
+               hang_doi="gossip_cap_nhat")
+
+    # Khóa đo đạc (chỉ khi node bật do_dac_khoa)
+    if node.do_dac_khoa:
+        cac_khoa = {ten: khoa.lay_thong_ke() for ten, khoa in node.cac_khoa_do_dac.items()}
+        cac_khoa["manh_du_lieu"] = node.du_lieu.lay_thong_ke_khoa()
+        vb.metric("kv_khoa_so_lan_total", "counter", "Số lần lấy khóa")
+        for ten, muc in sorted(cac_khoa.items()):
+            vb.mau("kv_khoa_so_lan_total", muc["so_lan"], khoa=ten)
+        vb.metric("kv_khoa_so_lan_phai_cho_total", "counter", "Số lần lấy khóa phải chờ")
+        for ten, muc in sorted(cac_khoa.items()):
+            vb.mau("kv_khoa_so_lan_phai_cho_total", muc["so_lan_phai_cho"], khoa=ten)
+        vb.metric("kv_khoa_cho_giay_total", "counter", "Tổng thời gian chờ khóa")
+        for ten, muc in sorted(cac_khoa.items()):
+            vb.mau("kv_khoa_cho_giay_total", round(muc["tong_cho_ms"] / 1000, 6), khoa=ten)
+        vb.metric("kv_khoa_giu_giay_total", "counter", "Tổng thời gian giữ khóa")
+        for ten, muc in sorted(cac_khoa.items()):
+            vb.mau("kv_khoa_giu_giay_total", round(muc["tong_giu_ms"] / 1000, 6), khoa=ten)
+
+    # Thành viên: peer sống/nghi ngờ, phi và RTT (chế độ heartbeat)
+    with node.khoa_node_khac:
+        cac_peer = sorted(node.cac_node_khac)
+        epoch = node.epoch_thanh_vien
+    vb.metric("kv_so_peer", "gauge", "Số peer trong vòng băm")
+    vb.mau("kv_so_peer", len(cac_peer))
+    vb.metric("kv_epoch_thanh_vien", "gauge", "Epoch thành viên mới nhất đã biết")
+    vb.mau("kv_epoch_thanh_vien", epoch)
+    vb.metric("kv_peer_song", "gauge", "1 nếu peer đang được coi là sống")
+    if node.gossip is not None:
+        cac_thanh_vien = sorted(node.gossip.cac_thanh_vien().items())
+        for peer, (_, trang_thai, _) in cac_thanh_vien:
+            vb.mau("kv_peer_song", int(trang_thai == gossip.SONG), peer=peer)
+        vb.metric("kv_peer_nghi_ngo", "gauge", "1 nếu peer đang bị nghi ngờ (SWIM)")
+        for peer, (_, trang_thai, _) in cac_thanh_vien:
+            vb.mau("kv_peer_nghi_ngo", int(trang_thai == gossip.NGHI_NGO), peer=peer)
+    else:
+        for peer in cac_peer:
+            vb.mau("kv_peer_song", 1, peer=peer)
+        cac_phi = node.bo_phat_hien_loi.lay_thong_ke()["phi"]
+        vb.metric("kv_peer_phi", "gauge", "Mức nghi ngờ phi-accrual của peer")
+        for peer, phi in sorted(cac_phi.items()):
+            vb.mau("kv_peer_phi", phi, peer=peer)
+        with node.khoa_rtt:
+            cac_rtt = {peer: muc["tb"] for peer, muc in node.rtt_heartbeat.items()}
+        vb.metric("kv_peer_rtt_giay", "gauge", "RTT heartbeat trung bình trượt của peer")
+        for peer, rtt in sorted(cac_rtt.items()):
+            vb.mau("kv_peer_rtt_giay", round(rtt, 6), peer=peer)
+
+    # Độ trễ đồng bộ: số giây từ lần đồng bộ thành công gần nhất với peer
+    if node.lan_dong_bo_cuoi is not None:
+        vb.metric("kv_dong_bo_do_tre_giay", "gauge", "Số giây từ lần đồng bộ thành công gần nhất")
+        vb.mau("kv_dong_bo_do_tre_giay", round(bay_gio - node.lan_dong_bo_cuoi, 3))
+
+    return vb.ket_qua()
+
+
+class MayChuChiSo:
+    """
+    HTTP server nhỏ phục vụ GET /metrics trong thread nền
+
+    Tham số:
+        node: Node cần xuất chỉ số
+        host: Địa chỉ bind
+        port: Cổng HTTP (0 = hệ điều hành chọn, xem thuộc tính port sau khi bat_dau)
+    """
+
+    def __init__(self, node, host: str, port: int):
+        self.node = node
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger(f"ChiSo-{node.node_id}")
+        self._may_chu: Optional[ThreadingHTTPServer] = None
+
+    def bat_dau(self):
+        """Bind cổng và phục vụ trong thread nền"""
+        node = self.node
+        logger = self.logger
+
+        class XuLy(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    noi_dung = tao_van_ban(node).encode()
+                except Exception as e:
+                    logger.error("✗ Lỗi tạo chỉ số: %s", e, exc_info=True)
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", KIEU_NOI_DUNG)
+                self.send_header("Content-Length", str(len(noi_dung)))
+                self.end_headers()
+                self.wfile.write(noi_dung)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self._may_chu = ThreadingHTTPServer((self.host, self.port), XuLy)
+        self._may_chu.daemon_threads = True
+        self.port = self._may_chu.server_address[1]
+        threading.Thread(target=self._may_chu.serve_forever, daemon=True, name="ChiSoHTTP").start()
+        self.logger.info(f"✓ Endpoint chỉ số: http://{self.host}:{self.port}/metrics")
+
+    def dung(self):
+        """Dừng server"""
+        if self._may_chu is not None:
+            self._may_chu.shutdown()
+            self._may_chu.server_close()
+            self._may_chu = None
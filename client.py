@@ -3,11 +3,32 @@ Client cho Hệ Thống Lưu Trữ Phân Tán Key-Value
 Cung cấp giao diện để tương tác với cluster
 """
 
+import random
 import socket
-import json
-from typing import Optional, List, Tuple
+from typing import Dict, Iterator, Optional, List, Tuple, Union
 import time
 
+import giao_thuc
+import theo_vet
+
+# Số lần hỏi lại một trang SCAN thiếu dữ liệu (có node không trả lời) trước khi báo lỗi
+SO_LAN_THU_LAI_QUET = 2
+
+def _sang_bytes(value: Union[str, bytes, None]) -> Optional[bytes]:
+    """Chuỗi -> bytes utf-8, bytes giữ nguyên"""
+    return value.encode() if isinstance(value, str) else value
+
+
+def _mo_ta_value(value: Union[str, bytes]) -> str:
+    """Mô tả ngắn gọn value để in ra màn hình"""
+    if not isinstance(value, str):
+        value = bytes(value)
+        try:
+            value = value.decode()
+        except UnicodeDecodeError:
+            return f"<{len(value)} bytes>"
+    return value if len(value) <= 80 else f"{value[:77]}... ({len(value)} ký tự)"
+
 
 class KVStoreClient:
     """
@@ -17,19 +38,30 @@ class KVStoreClient:
     - Tự động failover sang nodes khỏe mạnh
     - Retry logic có thể cấu hình
     - Theo dõi thống kê
+    - Value nhị phân: put nhận str hoặc bytes, gửi bằng khung nhị phân (giao_thuc.py);
+      value lớn được tự động chia thành các khung đoạn có checksum
+    - Truy vết: mỗi request mang một trace_id (theo_vet.py); request được lấy mẫu
+      để lại span trên mọi node nó đi qua (xem hien_thi_vet)
     """
     
-    def __init__(self, cac_node: List[Tuple[str, int]], timeout: float = 5.0):
+    def __init__(self, cac_node: List[Tuple[str, int]], timeout: float = 5.0,
+                 ty_le_lay_mau_vet: float = 0.0, mang=None):
         """
         Khởi tạo client với danh sách các cluster nodes
         
         Tham số:
             cac_node: Danh sách các tuples (host, port) cho cluster nodes
             timeout: Socket timeout tính bằng giây
+            ty_le_lay_mau_vet: Xác suất một request được truy vết đầy đủ (0.0 - 1.0)
+            mang: Mạng trong bộ nhớ của cụm thử nghiệm (cum_thu_nghiem.MangBoNho),
+                None = gửi qua socket
         """
         self.cac_node = cac_node
+        self.gui_nhan = mang.gui_nhan if mang is not None else giao_thuc.gui_nhan
         self.chi_so_node_hien_tai = 0
         self.timeout = timeout
+        self.ty_le_lay_mau_vet = ty_le_lay_mau_vet
+        self.vet_cuoi: Optional[str] = None  # trace_id của request dữ liệu gần nhất
         
         # Thống kê
         self.thong_ke = {
@@ -39,7 +71,8 @@ class KVStoreClient:
             'so_lan_thu_lai': 0
         }
     
-    def _gui_request(self, request: dict, thu_lai: bool = True) -> dict:
+    def _gui_request(self, request: dict, thu_lai: bool = True, truy_vet: bool = True,
+                     timeout: Optional[float] = None, an_toan_lap_lai: bool = True) -> dict:
         """
         Gửi request đến một cluster node
         
@@ -47,9 +80,21 @@ class KVStoreClient:
         1. Thử node hiện tại
         2. Nếu thất bại và retry được bật, thử các node khác
         3. Trả về response hoặc error
+        
+        Mỗi request (trừ khi truy_vet=False) mang trace_id mới, giữ nguyên qua các lần thử lại;
+        timeout (None = self.timeout) dùng cho lệnh chạy lâu như PROFILE
+        
+        an_toan_lap_lai=False (INCR/DECR/CAS/APPEND): chỉ thử node khác khi kết nối
+        bị từ chối (request chưa đến node nào); timeout hay lỗi giữa chừng thì trả lỗi
+        ngay vì node có thể đã áp dụng thay đổi, gửi lại sẽ áp dụng hai lần
         """
         self.thong_ke['so_request'] += 1
         
+        if truy_vet:
+            lay_mau = self.ty_le_lay_mau_vet > 0 and random.random() < self.ty_le_lay_mau_vet
+            request["vet"] = theo_vet.tao_ngu_canh(lay_mau)
+            self.vet_cuoi = request["vet"]["id"]
+        
         # Thử node hiện tại trước, sau đó thử các node khác nếu retry được bật
         so_lan_thu_toi_da = len(self.cac_node) if thu_lai else 1
         
@@ -58,36 +103,21 @@ class KVStoreClient:
             host, port = self.cac_node[chi_so_node]
             
             try:
-                # Tạo socket với timeout
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(self.timeout)
-                sock.connect((host, port))
-                
-                # Gửi request
-                sock.sendall(json.dumps(request).encode() + b"\n")
-                
-                # Nhận response
-                response_data = b""
-                while True:
-                    chunk = sock.recv(4096)
-                    if not chunk:
-                        break
-                    response_data += chunk
-                    if b"\n" in response_data:
-                        break
-                
-                sock.close()
+                # Gửi request và nhận response dạng khung nhị phân
+                response = self.gui_nhan((host, port), request, timeout=timeout or self.timeout)
                 
                 # Cập nhật node hiện tại khi thành công
                 self.chi_so_node_hien_tai = chi_so_node
                 self.thong_ke['thanh_cong'] += 1
                 
-                return json.loads(response_data.decode())
+                return response
                 
             except socket.timeout:
                 if lan_thu > 0:
                     self.thong_ke['so_lan_thu_lai'] += 1
                 print(f"⚠ Timeout kết nối tới {host}:{port}")
+                if not an_toan_lap_lai:
+                    return self._loi_khong_ro_ket_qua(host, port)
                 continue
                 
             except ConnectionRefusedError:
@@ -100,20 +130,30 @@ class KVStoreClient:
                 if lan_thu > 0:
                     self.thong_ke['so_lan_thu_lai'] += 1
                 print(f"⚠ Lỗi giao tiếp với {host}:{port}: {e}")
+                if not an_toan_lap_lai:
+                    return self._loi_khong_ro_ket_qua(host, port)
                 continue
         
         # Tất cả các lần thử đều thất bại
         self.thong_ke['that_bai'] += 1
         return {"status": "error", "message": "Tất cả nodes không khả dụng"}
     
-    def put(self, key: str, value: str, hien_thi: bool = True) -> bool:
+    def _loi_khong_ro_ket_qua(self, host: str, port: int) -> dict:
+        """Lỗi cho request không an toàn khi gửi lại: node có thể đã áp dụng nó"""
+        self.thong_ke['that_bai'] += 1
+        return {"status": "error", "khong_ro_ket_qua": True,
+                "message": f"Không nhận được phản hồi từ {host}:{port}, thao tác có thể đã được áp dụng"}
+    
+    def put(self, key: str, value: Union[str, bytes], hien_thi: bool = True,
+            ttl: Optional[float] = None) -> bool:
         """
         Lưu trữ một cặp key-value
         
         Tham số:
             key: Key cần lưu
-            value: Value cần lưu
+            value: Value cần lưu (str được mã hóa utf-8, bytes được gửi nguyên vẹn)
             hien_thi: Có hiển thị kết quả không
+            ttl: Thời gian sống tính bằng giây (None = không hết hạn)
             
         Trả về:
             True nếu thành công, False nếu thất bại
@@ -121,27 +161,31 @@ class KVStoreClient:
         request = {
             "command": "PUT",
             "key": key,
-            "value": value
+            "value": _sang_bytes(value)
         }
+        if ttl is not None:
+            request["ttl"] = ttl
         
         response = self._gui_request(request)
         
         if response.get("status") == "success":
             if hien_thi:
-                print(f"✓ PUT {key} = {value}")
+                print(f"✓ PUT {key} = {_mo_ta_value(value)}")
             return True
         else:
             if hien_thi:
                 print(f"✗ PUT thất bại: {response.get('message', 'Lỗi không xác định')}")
             return False
     
-    def get(self, key: str, hien_thi: bool = True) -> Optional[str]:
+    def get(self, key: str, hien_thi: bool = True,
+            dang_bytes: bool = False) -> Union[str, bytes, None]:
         """
         Lấy value cho một key
         
         Tham số:
             key: Key cần lấy
             hien_thi: Có hiển thị kết quả không
+            dang_bytes: True = trả về bytes thô, False = giải mã utf-8 thành str
             
         Trả về:
             Value nếu tìm thấy, None nếu không tìm thấy
@@ -156,13 +200,178 @@ class KVStoreClient:
         if response.get("status") == "success":
             value = response.get("value")
             if hien_thi:
-                print(f"✓ GET {key} = {value}")
-            return value
+                print(f"✓ GET {key} = {_mo_ta_value(value)}")
+            value = bytes(value)
+            return value if dang_bytes else value.decode("utf-8", errors="replace")
         else:
             if hien_thi:
                 print(f"✗ GET thất bại: {response.get('message', 'Lỗi không xác định')}")
             return None
     
+    def incr(self, key: str, delta: int = 1, hien_thi: bool = True) -> Optional[int]:
+        """
+        Tăng nguyên tử giá trị số nguyên của key (key chưa có coi như 0)
+        
+        Tham số:
+            key: Key cần tăng
+            delta: Lượng tăng (có thể âm)
+            hien_thi: Có hiển thị kết quả không
+            
+        Trả về:
+            Giá trị sau khi tăng, None nếu thất bại
+        """
+        response = self._gui_request({"command": "INCR", "key": key, "delta": delta},
+                                     an_toan_lap_lai=False)
+        
+        if response.get("status") == "success":
+            if hien_thi:
+                print(f"✓ INCR {key} = {response['value']}")
+            return response["value"]
+        else:
+            if hien_thi:
+                print(f"✗ INCR thất bại: {response.get('message', 'Lỗi không xác định')}")
+            return None
+    
+    def decr(self, key: str, delta: int = 1, hien_thi: bool = True) -> Optional[int]:
+        """
+        Giảm nguyên tử giá trị số nguyên của key
+        """
+        return self.incr(key, -delta, hien_thi)
+    
+    def cas(self, key: str, expected: Union[str, bytes, None], value: Union[str, bytes],
+            hien_thi: bool = True) -> bool:
+        """
+        Compare-and-set: chỉ ghi value nếu giá trị hiện tại bằng expected
+        
+        Tham số:
+            key: Key cần cập nhật
+            expected: Giá trị mong đợi (None = key phải chưa tồn tại)
+            value: Giá trị mới
+            hien_thi: Có hiển thị kết quả không
+            
+        Trả về:
+            True nếu đã ghi, False nếu giá trị hiện tại khác expected hoặc lỗi
+        """
+        response = self._gui_request({"command": "CAS", "key": key,
+                                      "expected": _sang_bytes(expected), "value": _sang_bytes(value)},
+                                     an_toan_lap_lai=False)
+        
+        if response.get("status") == "success":
+            if hien_thi:
+                if response["swapped"]:
+                    print(f"✓ CAS {key} = {_mo_ta_value(value)}")
+                else:
+                    hien_tai = response.get("value")
+                    print(f"✗ CAS {key}: giá trị hiện tại là "
+                          f"{_mo_ta_value(hien_tai) if hien_tai is not None else None}")
+            return response["swapped"]
+        else:
+            if hien_thi:
+                print(f"✗ CAS thất bại: {response.get('message', 'Lỗi không xác định')}")
+            return False
+    
+    def append(self, key: str, value: Union[str, bytes], hien_thi: bool = True) -> Optional[int]:
+        """
+        Nối value vào cuối giá trị hiện tại của key
+        
+        Trả về:
+            Độ dài value sau khi nối, None nếu thất bại
+        """
+        response = self._gui_request({"command": "APPEND", "key": key, "value": _sang_bytes(value)},
+                                     an_toan_lap_lai=False)
+        
+        if response.get("status") == "success":
+            if hien_thi:
+                print(f"✓ APPEND {key} (độ dài {response['length']})")
+            return response["length"]
+        else:
+            if hien_thi:
+                print(f"✗ APPEND thất bại: {response.get('message', 'Lỗi không xác định')}")
+            return None
+    
+    def scan(self, prefix: Optional[str] = None, start: Optional[str] = None,
+             end: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None,
+             hien_thi: bool = True, dang_bytes: bool = False
+             ) -> Tuple[List[Tuple[str, Union[str, bytes]]], Optional[str]]:
+        """
+        Quét một trang key theo thứ tự trên toàn cluster
+        
+        Tham số:
+            prefix: Chỉ lấy key bắt đầu bằng prefix (ưu tiên hơn start/end)
+            start: Cận dưới của khoảng key (bao gồm)
+            end: Cận trên của khoảng key (không bao gồm)
+            limit: Số key tối đa trong trang (node giới hạn tối đa 1000)
+            cursor: Con trỏ trả về từ trang trước (None = trang đầu)
+            hien_thi: Có hiển thị kết quả không
+            dang_bytes: True = value dạng bytes thô, False = giải mã utf-8
+            
+        Trả về:
+            (danh sách (key, value), cursor của trang sau hoặc None nếu đã hết);
+            ([], None) nếu thất bại, kể cả khi trang vẫn thiếu dữ liệu sau các lần thử lại
+        """
+        response = self._quet_mot_trang(prefix, start, end, limit, cursor)
+        
+        if response.get("status") == "success":
+            cac_cap = [
+                (key, bytes(value) if dang_bytes else bytes(value).decode("utf-8", errors="replace"))
+                for key, value in response.get("items", [])
+            ]
+            cursor_tiep = response.get("cursor")
+            if hien_thi:
+                print(f"✓ SCAN: {len(cac_cap)} key" + (" (còn tiếp)" if cursor_tiep else ""))
+                for key, value in cac_cap:
+                    print(f"  {key} = {_mo_ta_value(value)}")
+            return cac_cap, cursor_tiep
+        else:
+            if hien_thi:
+                print(f"✗ SCAN thất bại: {response.get('message', 'Lỗi không xác định')}")
+            return [], None
+    
+    def _quet_mot_trang(self, prefix: Optional[str], start: Optional[str], end: Optional[str],
+                        limit: int, cursor: Optional[str]) -> dict:
+        """
+        Gửi SCAN cho một trang; trang thiếu dữ liệu (node không trả lời SCAN_LOCAL)
+        được hỏi lại SO_LAN_THU_LAI_QUET lần, sau đó trả về lỗi thay vì trang thiếu
+        """
+        request = {
+            "command": "SCAN",
+            "prefix": prefix,
+            "start": start,
+            "end": end,
+            "limit": limit,
+            "cursor": cursor
+        }
+        for lan_thu in range(SO_LAN_THU_LAI_QUET + 1):
+            if lan_thu:
+                time.sleep(0.2 * lan_thu)
+            response = self._gui_request(dict(request))
+            if response.get("status") != "success" or not response.get("khong_day_du"):
+                return response
+        self.thong_ke['that_bai'] += 1
+        return {"status": "error", "khong_day_du": True,
+                "message": f"SCAN thiếu dữ liệu: {response.get('so_node_loi')} node không trả lời"}
+    
+    def scan_tat_ca(self, prefix: Optional[str] = None, start: Optional[str] = None,
+                    end: Optional[str] = None, kich_thuoc_trang: int = 100,
+                    dang_bytes: bool = False) -> Iterator[Tuple[str, Union[str, bytes]]]:
+        """
+        Duyệt toàn bộ key khớp điều kiện, tự lấy từng trang bằng cursor
+        
+        Raise ConnectionError nếu một trang thất bại hoặc vẫn thiếu dữ liệu sau các
+        lần thử lại (không dừng im lặng giữa chừng)
+        """
+        cursor = None
+        while True:
+            response = self._quet_mot_trang(prefix, start, end, kich_thuoc_trang, cursor)
+            if response.get("status") != "success":
+                raise ConnectionError(response.get("message", "SCAN thất bại"))
+            for key, value in response.get("items", []):
+                value = bytes(value)
+                yield key, value if dang_bytes else value.decode("utf-8", errors="replace")
+            cursor = response.get("cursor")
+            if not cursor:
+                return
+    
     def delete(self, key: str, hien_thi: bool = True) -> bool:
         """
         Xóa một key
@@ -205,7 +414,7 @@ class KVStoreClient:
             self.chi_so_node_hien_tai = chi_so_node
         
         request = {"command": "GET_STATS"}
-        response = self._gui_request(request, thu_lai=False)
+        response = self._gui_request(request, thu_lai=False, truy_vet=False)
         
         if chi_so_node is not None:
             self.chi_so_node_hien_tai = chi_so_cu
@@ -214,6 +423,215 @@ class KVStoreClient:
             return response.get("stats")
         return None
     
+    def lay_key_nong_node(self, chi_so_node: int = None, k: int = 10) -> Optional[dict]:
+        """
+        Lấy các key được đọc/ghi nhiều nhất tại một node cụ thể
+        
+        Tham số:
+            chi_so_node: Chỉ số của node (None = node hiện tại)
+            k: Số key tối đa mỗi loại (đọc / ghi)
+            
+        Trả về:
+            {"node_id", "cua_so", "doc", "ghi"} hoặc None
+        """
+        if chi_so_node is not None:
+            chi_so_cu = self.chi_so_node_hien_tai
+            self.chi_so_node_hien_tai = chi_so_node
+        
+        response = self._gui_request({"command": "HOT_KEYS", "k": k}, thu_lai=False, truy_vet=False)
+        
+        if chi_so_node is not None:
+            self.chi_so_node_hien_tai = chi_so_cu
+        
+        if response.get("status") == "success":
+            return response
+        return None
+    
+    def hien_thi_key_nong(self, k: int = 10):
+        """
+        Hiển thị key nóng (ước lượng lần/giây) của tất cả nodes trong cluster
+        """
+        print("\n" + "=" * 60)
+        print("KEY NÓNG")
+        print("=" * 60)
+        
+        for i, (host, port) in enumerate(self.cac_node):
+            ket_qua = self.lay_key_nong_node(i, k)
+            if not ket_qua:
+                print(f"\n[Node {i+1}] {host}:{port} ✗ OFFLINE")
+                continue
+            
+            print(f"\n[Node {i+1}] {host}:{port} (cửa sổ {ket_qua['cua_so']:.0f}s)")
+            for loai, nhan in (("doc", "Đọc"), ("ghi", "Ghi")):
+                muc = ket_qua[loai]
+                print(f"  {nhan}: {muc['tong_toc_do']:.1f} lần/s")
+                for key_nong in muc["cac_key"]:
+                    print(f"    {key_nong['key']:<30}{key_nong['toc_do']:>10.1f}/s"
+                          f"{key_nong['ty_le'] * 100:>8.1f}%")
+        
+        print("\n" + "=" * 60)
+    
+    def lay_vet(self, trace_id: Optional[str] = None, gioi_han: int = 200) -> List[dict]:
+        """
+        Gom span của một vết (hoặc mọi span gần nhất) từ tất cả nodes
+        
+        Tham số:
+            trace_id: Vết cần lấy (None = mọi span, dùng để dump)
+            gioi_han: Số span tối đa lấy từ mỗi node
+            
+        Trả về:
+            Danh sách span sắp xếp theo thời điểm bắt đầu
+        """
+        chi_so_cu = self.chi_so_node_hien_tai
+        cac_span = []
+        for i in range(len(self.cac_node)):
+            self.chi_so_node_hien_tai = i
+            request = {"command": "TRACES", "gioi_han": gioi_han}
+            if trace_id is not None:
+                request["trace_id"] = trace_id
+            response = self._gui_request(request, thu_lai=False, truy_vet=False)
+            if response.get("status") == "success":
+                cac_span.extend(response.get("spans", []))
+        self.chi_so_node_hien_tai = chi_so_cu
+        return sorted(cac_span, key=lambda span: span["bat_dau"])
+    
+    def hien_thi_vet(self, trace_id: Optional[str] = None):
+        """
+        Hiển thị cây span của một vết (mặc định: request dữ liệu gần nhất)
+        """
+        trace_id = trace_id or self.vet_cuoi
+        if trace_id is None:
+            print("⚠ Chưa có request nào để truy vết")
+            return
+        
+        cac_span = self.lay_vet(trace_id)
+        if not cac_span:
+            print(f"⚠ Không có span nào cho trace {trace_id} (request không được lấy mẫu?)")
+            return
+        
+        cac_id = {span["span_id"] for span in cac_span}
+        cac_con = {}
+        for span in cac_span:
+            cha = span["cha"] if span["cha"] in cac_id else None
+            cac_con.setdefault(cha, []).append(span)
+        goc = cac_span[0]["bat_dau"]
+        
+        print(f"\nTrace {trace_id}:")
+        
+        def in_span(span, muc):
+            chi_tiet = ", ".join(
+                f"{k}={v}" for k, v in span.items()
+                if k not in ("trace_id", "span_id", "cha", "node_id", "ten", "bat_dau", "thoi_gian_ms")
+                and v is not None
+            )
+            print(f"  {'  ' * muc}+{(span['bat_dau'] - goc) * 1000:7.2f}ms {span['ten']:<16}"
+                  f"{span['thoi_gian_ms']:>9.2f}ms  @{span['node_id']}  {chi_tiet}")
+            for con in cac_con.get(span["span_id"], []):
+                in_span(con, muc + 1)
+        
+        for span in cac_con.get(None, []):
+            in_span(span, 0)
+    
+    def lay_request_cham(self, gioi_han: int = 50, nguong_ms: Optional[float] = None) -> List[dict]:
+        """
+        Gom các request chậm gần nhất từ tất cả nodes
+        
+        Tham số:
+            gioi_han: Số request tối đa lấy từ mỗi node
+            nguong_ms: Nếu có, đặt ngưỡng request chậm mới cho mọi node (0 = tắt)
+            
+        Trả về:
+            Danh sách request chậm (thêm trường "node_id"), mới nhất trước
+        """
+        chi_so_cu = self.chi_so_node_hien_tai
+        cac_request = []
+        for i in range(len(self.cac_node)):
+            self.chi_so_node_hien_tai = i
+            request = {"command": "SLOW_LOG", "gioi_han": gioi_han}
+            if nguong_ms is not None:
+                request["nguong_ms"] = nguong_ms
+            response = self._gui_request(request, thu_lai=False, truy_vet=False)
+            if response.get("status") == "success":
+                for muc in response.get("cac_request", []):
+                    cac_request.append({**muc, "node_id": response["node_id"]})
+        self.chi_so_node_hien_tai = chi_so_cu
+        return sorted(cac_request, key=lambda muc: muc["thoi_diem"], reverse=True)
+    
+    def hien_thi_request_cham(self, gioi_han: int = 20):
+        """
+        Hiển thị các request chậm gần nhất của cluster cùng thời gian từng giai đoạn
+        """
+        cac_request = self.lay_request_cham(gioi_han)[:gioi_han]
+        print("\n" + "=" * 60)
+        print("REQUEST CHẬM")
+        print("=" * 60)
+        if not cac_request:
+            print("  (không có request nào vượt ngưỡng)")
+        for muc in cac_request:
+            thoi_diem = time.strftime("%H:%M:%S", time.localtime(muc["thoi_diem"]))
+            print(f"\n{thoi_diem} {muc['lenh']} {muc['key'] or ''} {muc['tong_ms']:.1f}ms "
+                  f"@{muc['node_id']} ({muc['duong_di']}, {muc['trang_thai']})")
+            giai_doan = ", ".join(f"{ten}={ms:.1f}" for ten, ms in muc["giai_doan_ms"].items() if ms >= 0.05)
+            print(f"  {giai_doan}")
+            if muc.get("trace_id"):
+                print(f"  trace {muc['trace_id']}")
+        print("\n" + "=" * 60)
+    
+    def phan_tich_cpu(self, chi_so_node: int = None, giay: float = 5.0, che_do: str = "cpu",
+                      tep: Optional[str] = None) -> Optional[dict]:
+        """
+        Lấy mẫu CPU của một node trong giay giây (lệnh PROFILE)
+        
+        Tham số:
+            chi_so_node: Chỉ số của node (None = node hiện tại)
+            giay: Thời gian lấy mẫu
+            che_do: "cpu" (chỉ thread đang dùng CPU) hoặc "tuong" (mọi thread)
+            tep: Nếu có, ghi ngăn xếp collapsed ra file (dùng với flamegraph.pl / speedscope)
+            
+        Trả về:
+            Response của node hoặc None
+        """
+        if chi_so_node is not None:
+            chi_so_cu = self.chi_so_node_hien_tai
+            self.chi_so_node_hien_tai = chi_so_node
+        
+        response = self._gui_request({"command": "PROFILE", "giay": giay, "che_do": che_do},
+                                     thu_lai=False, truy_vet=False, timeout=giay + self.timeout)
+        
+        if chi_so_node is not None:
+            self.chi_so_node_hien_tai = chi_so_cu
+        
+        if response.get("status") != "success":
+            print(f"✗ Phân tích CPU thất bại: {response.get('message')}")
+            return None
+        if tep:
+            with open(tep, "w", encoding="utf-8") as f:
+                f.write(response["stacks"])
+        return response
+    
+    def hien_thi_phan_tich_cpu(self, giay: float = 5.0, tep: Optional[str] = None, so_dong: int = 15):
+        """
+        Phân tích CPU node hiện tại và in các hàm tốn CPU nhất (tính cả hàm con)
+        """
+        ket_qua = self.phan_tich_cpu(giay=giay, tep=tep)
+        if not ket_qua:
+            return
+        tong = 0
+        theo_ham: Dict[str, int] = {}
+        for dong in ket_qua["stacks"].splitlines():
+            stack, gia_tri = dong.rsplit(" ", 1)
+            gia_tri = int(gia_tri)
+            tong += gia_tri
+            for ham in set(stack.split(";")[1:]):
+                theo_ham[ham] = theo_ham.get(ham, 0) + gia_tri
+        
+        print(f"\nPhân tích CPU {ket_qua['node_id']}: {ket_qua['giay']:.0f}s, "
+              f"{ket_qua['so_lan_lay_mau']} lần lấy mẫu ({ket_qua['don_vi']}, tổng {tong})")
+        for ham, gia_tri in sorted(theo_ham.items(), key=lambda muc: muc[1], reverse=True)[:so_dong]:
+            print(f"  {gia_tri / tong * 100 if tong else 0:6.1f}%  {ham}")
+        if tep:
+            print(f"✓ Đã ghi collapsed stacks vào {tep}")
+    
     def lay_thong_ke_client(self) -> dict:
         """
         Lấy thống kê phía client
@@ -238,11 +656,35 @@ class KVStoreClient:
                 print(f"\n[Node {i+1}] {host}:{port} ✓ ONLINE")
                 print(f"  Thời gian hoạt động: {thong_ke.get('thoi_gian_hoat_dong', 0):.1f}s")
                 print(f"  Dữ liệu: {thong_ke.get('so_key', 0)} keys")
+                bo_nho = thong_ke.get('bo_nho')
+                if bo_nho:
+                    print(f"  Bộ nhớ: {bo_nho['bo_nho_dang_dung'] / 1024:.1f} KB "
+                          f"(~{bo_nho['byte_moi_key']:.0f} bytes/key), "
+                          f"thu hồi: {bo_nho['so_lan_thu_hoi']}")
                 print(f"  Peers: {thong_ke.get('so_peer', 0)}")
                 print(f"  Thao tác: PUT={thong_ke.get('so_lan_put', 0)}, "
                       f"GET={thong_ke.get('so_lan_get', 0)}, "
                       f"DEL={thong_ke.get('so_lan_delete', 0)}")
                 print(f"  Nhân bản: {thong_ke.get('so_lan_nhan_ban', 0)}")
+                thread = thong_ke.get('thread')
+                if thread:
+                    print(f"  Thread: {thread['tong']} (" + ", ".join(
+                        f"{vai_tro}={so}" for vai_tro, so in sorted(thread['theo_vai_tro'].items())) + ")")
+                cac_khoa = thong_ke.get('khoa')
+                if cac_khoa:
+                    print(f"  Khóa:{'lần':>27}{'phải chờ':>10}{'chờ ms':>10}{'max chờ':>10}{'giữ ms':>10}{'max giữ':>10}")
+                    for ten, muc in cac_khoa.items():
+                        print(f"    {ten:<24}{muc['so_lan']:>8}{muc['so_lan_phai_cho']:>10}"
+                              f"{muc['tong_cho_ms']:>10.1f}{muc['max_cho_ms']:>10.2f}"
+                              f"{muc['tong_giu_ms']:>10.1f}{muc['max_giu_ms']:>10.2f}")
+                do_tre = thong_ke.get('do_tre')
+                if do_tre:
+                    print(f"  Độ trễ (ms):{'n':>24}{'p50':>9}{'p90':>9}{'p99':>9}{'p999':>9}{'max':>9}")
+                    for lenh, cac_duong_di in do_tre.items():
+                        for duong_di, bd in cac_duong_di.items():
+                            print(f"    {lenh + '/' + duong_di:<26}{bd['so_mau']:>8}"
+                                  f"{bd['p50_ms']:>9.2f}{bd['p90_ms']:>9.2f}{bd['p99_ms']:>9.2f}"
+                                  f"{bd['p999_ms']:>9.2f}{bd['max_ms']:>9.2f}")
             else:
                 print(f"\n[Node {i+1}] {host}:{port} ✗ OFFLINE")
         
@@ -290,6 +732,9 @@ def interactive_client():
     print("  PUT <key> <value>    - Lưu trữ cặp key-value")
     print("  GET <key>            - Lấy value cho key")
     print("  DELETE <key>         - Xóa một key")
+    print("  SCAN <prefix> [n]    - Liệt kê tối đa n key theo tiền tố")
+    print("  INCR <key> [n]       - Tăng nguyên tử (DECR để giảm)")
+    print("  APPEND <key> <value> - Nối chuỗi vào cuối value")
     print("  STATUS               - Hiển thị trạng thái cluster")
     print("  STATS                - Hiển thị thống kê client")
     print("  HELP                 - Hiển thị trợ giúp này")
@@ -315,7 +760,14 @@ def interactive_client():
                 print("  PUT <key> <value>    - Lưu trữ cặp key-value")
                 print("  GET <key>            - Lấy value cho key")
                 print("  DELETE <key>         - Xóa một key")
+                print("  SCAN <prefix> [n]    - Liệt kê tối đa n key theo tiền tố")
+                print("  INCR <key> [n]       - Tăng nguyên tử (DECR để giảm)")
+                print("  APPEND <key> <value> - Nối chuỗi vào cuối value")
                 print("  STATUS               - Hiển thị trạng thái cluster")
+                print("  HOT [n]              - Hiển thị n key nóng nhất của mỗi node")
+                print("  TRACE [trace_id]     - Cây span của một request (mặc định: request cuối)")
+                print("  SLOW [n]             - n request chậm gần nhất kèm thời gian từng giai đoạn")
+                print("  PROFILE [giây] [file] - Lấy mẫu CPU của node hiện tại (collapsed stacks)")
                 print("  STATS                - Hiển thị thống kê client")
                 print("  HELP                 - Hiển thị trợ giúp này")
                 print("  QUIT / EXIT          - Thoát client")
@@ -323,6 +775,19 @@ def interactive_client():
             elif cmd == "STATUS":
                 client.hien_thi_trang_thai_cluster()
             
+            elif cmd == "HOT":
+                client.hien_thi_key_nong(int(parts[1]) if len(parts) > 1 else 10)
+            
+            elif cmd == "TRACE":
+                client.hien_thi_vet(parts[1] if len(parts) > 1 else None)
+            
+            elif cmd == "SLOW":
+                client.hien_thi_request_cham(int(parts[1]) if len(parts) > 1 else 20)
+            
+            elif cmd == "PROFILE":
+                client.hien_thi_phan_tich_cpu(float(parts[1]) if len(parts) > 1 else 5.0,
+                                              parts[2] if len(parts) > 2 else None)
+            
             elif cmd == "STATS":
                 thong_ke = client.lay_thong_ke_client()
                 print("\nThống kê Client:")
@@ -359,6 +824,33 @@ def interactive_client():
                 key = parts[1]
                 client.delete(key)
             
+            elif cmd == "SCAN":
+                if len(parts) < 2:
+                    print("⚠ Cách dùng: SCAN <prefix> [n]")
+                    continue
+                
+                prefix = parts[1]
+                limit = int(parts[2]) if len(parts) > 2 else 100
+                client.scan(prefix=prefix, limit=limit)
+            
+            elif cmd in ("INCR", "DECR"):
+                if len(parts) < 2:
+                    print(f"⚠ Cách dùng: {cmd} <key> [n]")
+                    continue
+                
+                delta = int(parts[2]) if len(parts) > 2 else 1
+                if cmd == "INCR":
+                    client.incr(parts[1], delta)
+                else:
+                    client.decr(parts[1], delta)
+            
+            elif cmd == "APPEND":
+                if len(parts) < 3:
+                    print("⚠ Cách dùng: APPEND <key> <value>")
+                    continue
+                
+                client.append(parts[1], parts[2])
+            
             else:
                 print(f"⚠ Lệnh không xác định: {cmd}")
                 print("Gõ HELP để xem các lệnh có sẵn")
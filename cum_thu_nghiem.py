@@ -0,0 +1,367 @@
+"""
+Cụm Thử Nghiệm cho Benchmark và Test
+Khởi động N node trong cùng process, trong các tiến trình con hoặc trên mạng trong
+bộ nhớ; cổng tạm thời, chờ theo trạng thái sẵn sàng thay vì time.sleep, dừng sạch sẽ
+
+Cách dùng:
+    with CumThuNghiem(3) as cum:
+        client = cum.tao_client()
+        client.put("a", "1")
+        cum.dung_node(1)
+        cum.cho_hoi_tu()
+"""
+
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import giao_thuc
+from client import KVStoreClient
+from node import Node
+
+DiaChi = Tuple[str, int]
+
+# trong_process: Node thật (socket TCP/UDP) chạy trong thread của process này
+# tien_trinh: mỗi node là một "python node.py" riêng, như khi triển khai
+# bo_nho: Node trong process này, request và gói UDP đi qua MangBoNho (không socket)
+CAC_CHE_DO = ("trong_process", "tien_trinh", "bo_nho")
+
+THU_MUC_MA = os.path.dirname(os.path.abspath(__file__))
+THOI_GIAN_CHO_MAC_DINH = 20.0
+
+
+def cong_trong(host: str = "127.0.0.1", bo_qua=()) -> int:
+    """
+    Cổng tạm thời còn trống cho cả TCP và UDP (node dùng chung một số cổng cho hai kênh)
+
+    Tham số:
+        bo_qua: Các cổng đã cấp cho node khác của cụm
+    """
+    while True:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as tcp:
+            tcp.bind((host, 0))
+            cong = tcp.getsockname()[1]
+            if cong in bo_qua:
+                continue
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+                    udp.bind((host, cong))
+            except OSError:
+                continue
+        return cong
+
+
+class MangBoNho:
+    """
+    Mạng trong bộ nhớ thay cho socket giữa các node (và client) của cùng process
+
+    Giải thích:
+    - gui_nhan: gọi thẳng _xu_ly_request của node đích trong thread của bên gửi
+      (request được sao chép nông vì node có thể sửa nó); không mã hóa khung,
+      không kết nối TCP, timeout bị bỏ qua
+    - gói UDP (gossip, heartbeat) vào hộp thư của node đích và được thread NhanUDP
+      của nó đọc ra - giữ đúng tính bất đồng bộ, tránh gọi ngược vào chính bên gửi
+      khi bên gửi đang giữ khóa
+    - Node đã dừng (hoặc chưa đăng ký) trả lỗi ConnectionRefusedError như cổng đóng
+    """
+
+    def __init__(self):
+        self._cac_node = {}
+        self._hop_thu = {}
+        self._khoa = threading.Lock()
+
+    def dang_ky(self, node: Node):
+        dia_chi = (node.host, node.port)
+        with self._khoa:
+            self._cac_node[dia_chi] = node
+            self._hop_thu[dia_chi] = queue.Queue()
+
+    def huy_dang_ky(self, node: Node):
+        dia_chi = (node.host, node.port)
+        with self._khoa:
+            if self._cac_node.get(dia_chi) is node:
+                del self._cac_node[dia_chi]
+                del self._hop_thu[dia_chi]
+
+    def gui_nhan(self, dia_chi: DiaChi, thong_diep: dict, timeout: Optional[float] = 5.0,
+                 kich_thuoc_toi_da: int = giao_thuc.KICH_THUOC_KHUNG_TOI_DA,
+                 kich_thuoc_value_toi_da: int = giao_thuc.KICH_THUOC_VALUE_TOI_DA) -> dict:
+        """Cùng chữ ký với giao_thuc.gui_nhan"""
+        node = self._cac_node.get(tuple(dia_chi))
+        if node is None:
+            raise ConnectionRefusedError(f"Không có node tại {dia_chi[0]}:{dia_chi[1]}")
+        return node._xu_ly_request(dict(thong_diep))
+
+    def gui_udp(self, tu: DiaChi, den: DiaChi, du_lieu: bytes):
+        hop_thu = self._hop_thu.get(den)
+        if hop_thu is not None:
+            hop_thu.put((du_lieu, tu))
+
+    def nhan_udp(self, dia_chi: DiaChi, timeout: float) -> Tuple[bytes, DiaChi]:
+        """
+        Trả về:
+            (gói tin, địa chỉ gửi); raise socket.timeout nếu không có gói,
+            OSError nếu node đã hủy đăng ký (như socket đã đóng)
+        """
+        hop_thu = self._hop_thu.get(dia_chi)
+        if hop_thu is None:
+            raise OSError(f"{dia_chi[0]}:{dia_chi[1]} không còn trong mạng")
+        try:
+            return hop_thu.get(timeout=timeout)
+        except queue.Empty:
+            raise socket.timeout from None
+
+
+class CumThuNghiem:
+    """
+    N node chạy cục bộ cho benchmark và test tự động
+
+    Giải thích:
+    - Node đầu tiên tạo cluster, các node sau JOIN qua nó; khoi_dong() chỉ trả về
+      khi mọi node đã nhận request và thấy đủ n - 1 peer (GET_STATS -> so_peer)
+    - dung_node / khoi_dong_lai_node để thử failover; node khởi động lại giữ
+      nguyên địa chỉ (và thư mục dữ liệu nếu có) và JOIN lại qua một node còn sống
+    - Dùng được như context manager: thoát khối with là dừng mọi node
+
+    Tham số:
+        so_node: Số node
+        che_do: Một trong CAC_CHE_DO
+        host: Địa chỉ bind (chế độ tien_trinh luôn dùng 127.0.0.1 như node.py)
+        cong_bat_dau: Cổng node đầu, các node sau tăng dần (None = cổng tạm thời)
+        thoi_gian_cho: Thời gian chờ tối đa mặc định cho mỗi lần chờ (giây)
+        tham_so_dong_lenh: Tùy chọn thêm cho node.py (chế độ tien_trinh)
+        thu_muc_log: Thư mục chứa log node-<cổng>.log của chế độ tien_trinh
+            (None = thư mục tạm, bị xóa khi dừng cụm)
+        tham_so_node: Tham số thêm cho Node(...) (trong_process, bo_nho); giá trị
+            callable được gọi với chỉ số node, ví dụ thu_muc_du_lieu=lambda i: f"data/{i}"
+    """
+
+    def __init__(self, so_node: int = 3, che_do: str = "trong_process", host: str = "127.0.0.1",
+                 cong_bat_dau: Optional[int] = None, thoi_gian_cho: float = THOI_GIAN_CHO_MAC_DINH,
+                 tham_so_dong_lenh: Tuple[str, ...] = (), thu_muc_log: Optional[str] = None,
+                 **tham_so_node):
+        if che_do not in CAC_CHE_DO:
+            raise ValueError(f"Chế độ không hợp lệ: {che_do}")
+        if che_do == "tien_trinh" and tham_so_node:
+            raise ValueError("Chế độ tien_trinh nhận tùy chọn node qua tham_so_dong_lenh")
+        self.so_node = so_node
+        self.che_do = che_do
+        self.thoi_gian_cho = thoi_gian_cho
+        self.tham_so_dong_lenh = list(tham_so_dong_lenh)
+        self.tham_so_node = tham_so_node
+        self.mang = MangBoNho() if che_do == "bo_nho" else None
+
+        if che_do == "tien_trinh":
+            host = "127.0.0.1"
+        if cong_bat_dau is not None:
+            cac_cong = [cong_bat_dau + i for i in range(so_node)]
+        elif che_do == "bo_nho":
+            # Không bind cổng nào: số cổng chỉ là định danh
+            cac_cong = [5001 + i for i in range(so_node)]
+        else:
+            cac_cong = []
+            for _ in range(so_node):
+                cac_cong.append(cong_trong(host, cac_cong))
+        self.cac_dia_chi: List[DiaChi] = [(host, cong) for cong in cac_cong]
+
+        self.cac_node: List[Optional[Node]] = [None] * so_node
+        self.cac_tien_trinh: List[Optional[subprocess.Popen]] = [None] * so_node
+        self._xoa_thu_muc_log = che_do == "tien_trinh" and thu_muc_log is None
+        if che_do == "tien_trinh":
+            self.thu_muc_log = thu_muc_log or tempfile.mkdtemp(prefix="cum_thu_nghiem_")
+            os.makedirs(self.thu_muc_log, exist_ok=True)
+        else:
+            self.thu_muc_log = None
+        self.thoi_gian_khoi_dong: Optional[float] = None
+
+    # ==================== VÒNG ĐỜI ====================
+
+    def khoi_dong(self) -> "CumThuNghiem":
+        """
+        Khởi động mọi node và chờ cluster hội tụ
+
+        Trả về:
+            Chính cụm (để dùng dạng cum = CumThuNghiem(3).khoi_dong())
+        """
+        bat_dau = time.perf_counter()
+        try:
+            self._khoi_dong_node(0, None)
+            self._cho_san_sang(0)
+            # Tiến trình con khởi động song song; node trong process JOIN lần lượt
+            for i in range(1, self.so_node):
+                self._khoi_dong_node(i, self.cac_dia_chi[0])
+            for i in range(1, self.so_node):
+                self._cho_san_sang(i)
+            self.cho_hoi_tu()
+        except BaseException:
+            self.dung()
+            raise
+        self.thoi_gian_khoi_dong = time.perf_counter() - bat_dau
+        return self
+
+    def dung(self):
+        """Dừng mọi node còn chạy, xóa thư mục log tạm"""
+        for i in range(self.so_node):
+            if self.dang_song(i):
+                self.dung_node(i)
+        if self._xoa_thu_muc_log and self.thu_muc_log:
+            shutil.rmtree(self.thu_muc_log, ignore_errors=True)
+            self.thu_muc_log = None
+
+    def __enter__(self) -> "CumThuNghiem":
+        return self.khoi_dong()
+
+    def __exit__(self, *loi):
+        self.dung()
+
+    def dung_node(self, i: int, dot_ngot: bool = False):
+        """
+        Dừng node thứ i
+
+        Tham số:
+            dot_ngot: Chế độ tien_trinh: SIGKILL (như máy sập, WAL không được đóng)
+                thay vì SIGINT; chế độ trong process luôn gọi Node.dung_lai()
+        """
+        if self.che_do == "tien_trinh":
+            tien_trinh = self.cac_tien_trinh[i]
+            if tien_trinh is None:
+                return
+            if tien_trinh.poll() is None:
+                if dot_ngot:
+                    tien_trinh.kill()
+                else:
+                    tien_trinh.send_signal(signal.SIGINT)
+                try:
+                    tien_trinh.wait(5)
+                except subprocess.TimeoutExpired:
+                    tien_trinh.kill()
+                    tien_trinh.wait()
+            self.cac_tien_trinh[i] = None
+        else:
+            node = self.cac_node[i]
+            if node is None:
+                return
+            node.dung_lai()
+            self.cac_node[i] = None
+
+    def khoi_dong_lai_node(self, i: int, cho_hoi_tu: bool = True) -> float:
+        """
+        Khởi động lại node thứ i (cùng địa chỉ) và JOIN qua một node còn sống
+
+        Trả về:
+            Thời gian đến khi node sẵn sàng (và cluster hội tụ nếu cho_hoi_tu), giây
+        """
+        if self.dang_song(i):
+            raise RuntimeError(f"Node {i} vẫn đang chạy")
+        cac_seed = [self.cac_dia_chi[j] for j in range(self.so_node) if j != i and self.dang_song(j)]
+        bat_dau = time.perf_counter()
+        self._khoi_dong_node(i, cac_seed[0] if cac_seed else None)
+        self._cho_san_sang(i)
+        if cho_hoi_tu:
+            self.cho_hoi_tu()
+        return time.perf_counter() - bat_dau
+
+    def _khoi_dong_node(self, i: int, seed: Optional[DiaChi]):
+        host, cong = self.cac_dia_chi[i]
+        if self.che_do == "tien_trinh":
+            lenh = [sys.executable, os.path.join(THU_MUC_MA, "node.py"), str(cong)]
+            if seed is not None:
+                lenh += [seed[0], str(seed[1])]
+            lenh += ["--tep-log", os.path.join(self.thu_muc_log, f"node-{cong}.log"), *self.tham_so_dong_lenh]
+            self.cac_tien_trinh[i] = subprocess.Popen(
+                lenh, cwd=THU_MUC_MA, stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            return
+
+        tham_so = {ten: (gia_tri(i) if callable(gia_tri) else gia_tri)
+                   for ten, gia_tri in self.tham_so_node.items()}
+        node = Node(f"{host}:{cong}", host, cong, mang=self.mang, **tham_so)
+        threading.Thread(target=node.bat_dau, daemon=True, name=f"Node-{cong}").start()
+        if not node.da_san_sang.wait(self.thoi_gian_cho):
+            node.dung_lai()
+            raise TimeoutError(f"Node {node.node_id} không khởi động được")
+        if seed is not None and not node.tham_gia_cluster(*seed):
+            node.dung_lai()
+            raise RuntimeError(f"Node {node.node_id} không tham gia được cluster qua {seed[0]}:{seed[1]}")
+        self.cac_node[i] = node
+
+    def _cho_san_sang(self, i: int):
+        """Chờ node thứ i trả lời GET_STATS (node trong process đã sẵn sàng khi được tạo)"""
+        if self.che_do != "tien_trinh":
+            return
+        tien_trinh = self.cac_tien_trinh[i]
+        self.cho(lambda: tien_trinh.poll() is not None or self.lay_thong_ke(i) is not None,
+                 mo_ta=f"node {i} sẵn sàng")
+        if tien_trinh.poll() is not None:
+            raise RuntimeError(
+                f"Node {i} đã thoát (mã {tien_trinh.returncode}), xem log trong {self.thu_muc_log}"
+            )
+
+    # ==================== CHỜ VÀ TRUY VẤN ====================
+
+    def cho(self, dieu_kien: Callable[[], bool], timeout: Optional[float] = None,
+            khoang: float = 0.05, mo_ta: str = "điều kiện") -> float:
+        """
+        Chờ đến khi dieu_kien() đúng
+
+        Trả về:
+            Thời gian đã chờ (giây); raise TimeoutError nếu quá timeout
+        """
+        bat_dau = time.perf_counter()
+        han = bat_dau + (self.thoi_gian_cho if timeout is None else timeout)
+        while not dieu_kien():
+            if time.perf_counter() > han:
+                raise TimeoutError(f"Hết thời gian chờ: {mo_ta}")
+            time.sleep(khoang)
+        return time.perf_counter() - bat_dau
+
+    def cho_hoi_tu(self, timeout: Optional[float] = None) -> float:
+        """
+        Chờ mọi node còn sống thấy đúng các node còn sống khác (và chỉ chúng)
+
+        Trả về:
+            Thời gian đã chờ (giây)
+        """
+        cac_node_song = [i for i in range(self.so_node) if self.dang_song(i)]
+
+        def da_hoi_tu() -> bool:
+            for i in cac_node_song:
+                thong_ke = self.lay_thong_ke(i)
+                if thong_ke is None or thong_ke.get("so_peer") != len(cac_node_song) - 1:
+                    return False
+            return True
+
+        return self.cho(da_hoi_tu, timeout, mo_ta=f"{len(cac_node_song)} node hội tụ")
+
+    def dang_song(self, i: int) -> bool:
+        if self.che_do == "tien_trinh":
+            tien_trinh = self.cac_tien_trinh[i]
+            return tien_trinh is not None and tien_trinh.poll() is None
+        return self.cac_node[i] is not None
+
+    def gui(self, i: int, request: dict, timeout: float = 2.0) -> dict:
+        """Gửi một request đến node thứ i; lỗi kết nối trả về {"status": "error"}"""
+        try:
+            if self.mang is not None:
+                return self.mang.gui_nhan(self.cac_dia_chi[i], request, timeout=timeout)
+            return giao_thuc.gui_nhan(self.cac_dia_chi[i], request, timeout=timeout)
+        except (OSError, giao_thuc.LoiKhung) as e:
+            return {"status": "error", "message": str(e)}
+
+    def lay_thong_ke(self, i: int) -> Optional[dict]:
+        """GET_STATS của node thứ i (None nếu không trả lời)"""
+        response = self.gui(i, {"command": "GET_STATS"})
+        return response.get("stats") if response.get("status") == "success" else None
+
+    def tao_client(self, **tham_so) -> KVStoreClient:
+        """KVStoreClient trỏ đến mọi node của cụm (qua mạng trong bộ nhớ nếu có)"""
+        return KVStoreClient(list(self.cac_dia_chi), mang=self.mang, **tham_so)
@@ -0,0 +1,172 @@
+"""
+Ghi Log Bất Đồng Bộ cho Node
+Thread xử lý request chỉ đưa bản ghi vào hàng đợi; một thread nền định dạng
+và ghi ra file/console, nên I/O của log không nằm trên đường xử lý request
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+DINH_DANG = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Số loại log tối đa được theo dõi bởi bộ lọc tốc độ (chặn bộ nhớ khi thông điệp không theo mẫu)
+SO_LOAI_TOI_DA = 1024
+
+# Tham số có kiểu này không thể bị thay đổi sau khi log -> để thread nền định dạng
+_KIEU_BAT_BIEN = (str, int, float, bool, bytes, type(None))
+
+_bo_nghe: Optional[logging.handlers.QueueListener] = None
+_khoa_cau_hinh = threading.Lock()
+
+
+class BoLocTocDo(logging.Filter):
+    """
+    Giới hạn tốc độ log theo loại (token bucket)
+
+    Giải thích:
+    - Loại = (tên logger, chuỗi mẫu của thông điệp): "✗ Lỗi chuyển tiếp đến %s: %s"
+      với mọi node đích là cùng một loại, nên một peer chết không làm tràn log
+      bằng hàng nghìn dòng giống nhau (thông điệp phải dùng tham số %s, không f-string)
+    - Mỗi loại có tối đa cum token, hồi so_dong_moi_giay token mỗi giây;
+      hết token thì dòng bị bỏ
+    - Số dòng bị bỏ được ghi chú vào dòng tiếp theo của loại đó
+
+    Tham số:
+        so_dong_moi_giay: Tốc độ hồi token của mỗi loại (0 = không giới hạn)
+        cum: Số dòng tối đa được ghi liên tiếp của một loại
+        dong_ho: Nguồn thời gian
+    """
+
+    def __init__(self, so_dong_moi_giay: float = 20.0, cum: int = 50,
+                 dong_ho: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.so_dong_moi_giay = so_dong_moi_giay
+        self.cum = cum
+        self._dong_ho = dong_ho
+        # loai -> [số token, lần cập nhật, số dòng bị bỏ chưa báo]
+        self._cac_loai: Dict[Tuple[str, str], list] = {}
+        self._khoa = threading.Lock()
+        self.so_dong_bi_bo = 0
+
+    def _don_dep(self, bay_gio: float):
+        """Bỏ các loại đã hồi đầy token và không còn dòng bị bỏ chưa báo (gọi khi giữ khóa)"""
+        for loai, (token, lan_cuoi, bi_bo) in list(self._cac_loai.items()):
+            if bi_bo == 0 and token + (bay_gio - lan_cuoi) * self.so_dong_moi_giay >= self.cum:
+                del self._cac_loai[loai]
+        if len(self._cac_loai) >= SO_LOAI_TOI_DA:
+            self._cac_loai.clear()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.so_dong_moi_giay <= 0:
+            return True
+        loai = (record.name, record.msg if isinstance(record.msg, str) else repr(type(record.msg)))
+        bay_gio = self._dong_ho()
+        with self._khoa:
+            trang_thai = self._cac_loai.get(loai)
+            if trang_thai is None:
+                if len(self._cac_loai) >= SO_LOAI_TOI_DA:
+                    self._don_dep(bay_gio)
+                trang_thai = self._cac_loai[loai] = [float(self.cum), bay_gio, 0]
+            else:
+                trang_thai[0] = min(self.cum, trang_thai[0] + (bay_gio - trang_thai[1]) * self.so_dong_moi_giay)
+                trang_thai[1] = bay_gio
+            if trang_thai[0] < 1:
+                trang_thai[2] += 1
+                self.so_dong_bi_bo += 1
+                return False
+            trang_thai[0] -= 1
+            bi_bo, trang_thai[2] = trang_thai[2], 0
+
+        if bi_bo:
+            record.msg = f"{record.msg} (đã bỏ qua {bi_bo} dòng cùng loại)"
+        return True
+
+
+class _QueueHandlerTre(logging.handlers.QueueHandler):
+    """
+    QueueHandler trì hoãn việc định dạng sang thread nền
+
+    QueueHandler gốc định dạng thông điệp (msg % args, traceback) ngay trong
+    thread gọi log; ở đây chỉ định dạng sớm khi tham số có thể bị thay đổi
+    sau lời gọi (dict, list, object...), còn lại để thread ghi làm
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(a, _KIEU_BAT_BIEN) for a in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def cau_hinh_log(tep: Optional[str] = "node.log", muc: int = logging.INFO, console: bool = True,
+                 so_dong_moi_giay: float = 20.0, cum: int = 50) -> logging.handlers.QueueListener:
+    """
+    Cấu hình logging của process: root logger -> hàng đợi -> thread ghi nền
+
+    Tham số:
+        tep: File log (None = không ghi file)
+        muc: Mức log tối thiểu của root logger
+        console: Ghi thêm ra stderr
+        so_dong_moi_giay / cum: Giới hạn tốc độ mỗi loại log (xem BoLocTocDo)
+
+    Trả về:
+        QueueListener đang chạy (dừng bằng dung_log(), tự dừng khi thoát process)
+
+    Giải thích:
+    - Được gọi từ entry point (python node.py ...), KHÔNG gọi khi import node,
+      nên chương trình nhúng Node (test, benchmark) tự quyết định cấu hình log
+    - Gọi lại sẽ dừng cấu hình cũ (ghi hết hàng đợi) rồi thay bằng cấu hình mới
+    """
+    global _bo_nghe
+    with _khoa_cau_hinh:
+        _dung_log_khong_khoa()
+
+        dinh_dang = logging.Formatter(DINH_DANG)
+        cac_handler: List[logging.Handler] = []
+        if tep:
+            cac_handler.append(logging.FileHandler(tep))
+        if console:
+            cac_handler.append(logging.StreamHandler())
+        for handler in cac_handler:
+            handler.setFormatter(dinh_dang)
+
+        hang_doi = queue.SimpleQueue()
+        handler_hang_doi = _QueueHandlerTre(hang_doi)
+        handler_hang_doi.addFilter(BoLocTocDo(so_dong_moi_giay, cum))
+
+        _bo_nghe = logging.handlers.QueueListener(hang_doi, *cac_handler, respect_handler_level=True)
+        _bo_nghe.start()
+
+        goc = logging.getLogger()
+        goc.addHandler(handler_hang_doi)
+        goc.setLevel(muc)
+        return _bo_nghe
+
+
+def _dung_log_khong_khoa():
+    global _bo_nghe
+    goc = logging.getLogger()
+    for handler in list(goc.handlers):
+        if isinstance(handler, _QueueHandlerTre):
+            goc.removeHandler(handler)
+    if _bo_nghe is not None:
+        # stop() chờ thread nền ghi hết các bản ghi còn trong hàng đợi
+        _bo_nghe.stop()
+        for handler in _bo_nghe.handlers:
+            handler.close()
+        _bo_nghe = None
+
+
+def dung_log():
+    """Ghi hết các bản ghi đang chờ và dừng thread ghi nền"""
+    with _khoa_cau_hinh:
+        _dung_log_khong_khoa()
+
+
+atexit.register(dung_log)
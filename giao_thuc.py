@@ -0,0 +1,239 @@
+"""
+Giao Thức Khung Nhị Phân (Binary Frame Protocol) giữa client và node
+Value dạng bytes đi thẳng trên socket, không phải base64 hay nhúng trong JSON
+"""
+
+import json
+import socket
+import struct
+import zlib
+from typing import Any, List, Optional, Tuple
+
+from phan_doan import KICH_THUOC_DOAN, GiaTriPhanDoan, cac_doan
+
+# Khung: MAGIC (2 bytes) | độ dài header JSON | độ dài payload (<2sII)
+#        | header JSON (utf-8) | payload (các value bytes nối liền nhau)
+# Byte đầu của MAGIC không bao giờ là "{" nên node phân biệt được với
+# request JSON một dòng kiểu cũ.
+MAGIC = b"\xb7K"
+_DAU_KHUNG = struct.Struct("<2sII")
+
+# Trong header, mỗi value bytes được thay bằng {"$b": [offset, độ dài]} trỏ vào payload
+_KHOA_BYTES = "$b"
+
+# Trường "value" lớn không nằm trong khung chính mà theo sau nó thành các khung đoạn:
+# khung chính có "$doan": [tổng độ dài, số đoạn], mỗi khung đoạn {"i", "crc", "data"}
+_KHOA_DOAN = "$doan"
+
+# Số buffer tối đa trong một lần gọi sendmsg (IOV_MAX trên Linux)
+_IOV_TOI_DA = 1024
+
+# Giới hạn mặc định của một khung (header + payload), chống buffer vô hạn
+KICH_THUOC_KHUNG_TOI_DA = 64 * 1024 * 1024
+
+# Giới hạn mặc định của một value phân đoạn (tổng các khung đoạn), kiểm tra
+# từ "$doan" của khung chính trước khi đọc đoạn nào
+KICH_THUOC_VALUE_TOI_DA = 256 * 1024 * 1024
+
+
+class LoiKhung(ValueError):
+    """Khung không hợp lệ hoặc vượt giới hạn kích thước"""
+
+
+def _do_dai(obj) -> int:
+    return obj.nbytes if isinstance(obj, memoryview) else len(obj)
+
+
+def ma_hoa_khung(thong_diep: dict, kich_thuoc_doan: int = KICH_THUOC_DOAN) -> List[Any]:
+    """
+    Mã hóa thông điệp thành danh sách buffer để gửi bằng sendmsg
+
+    Giải thích: json.dumps gọi hook default cho mỗi giá trị bytes; hook ghi
+    lại (offset, độ dài) và giữ nguyên đối tượng bytes trong danh sách
+    payload - value KHÔNG bị sao chép, kernel đọc thẳng từ bộ nhớ của nó.
+    Trường "value" dài hơn kich_thuoc_doan được gửi thành các khung đoạn
+    riêng có crc32, để bên nhận không phải giữ một khung bằng cả value.
+    Bên nhận (nhan_khung) chỉ chấp nhận đoạn đúng KICH_THUOC_DOAN.
+
+    Trả về:
+        [đầu khung + header JSON, value 1, value 2, ...]
+    """
+    value = thong_diep.get("value")
+    cac_doan_gui = None
+    if isinstance(value, GiaTriPhanDoan) or (
+            isinstance(value, (bytes, bytearray, memoryview)) and _do_dai(value) > kich_thuoc_doan):
+        cac_doan_gui = list(cac_doan(value, kich_thuoc_doan))
+        thong_diep = {**thong_diep, "value": None, _KHOA_DOAN: [_do_dai(value), len(cac_doan_gui)]}
+
+    cac_phan: List[Any] = []
+    offset = 0
+
+    def thay_bytes(obj):
+        nonlocal offset
+        if isinstance(obj, (bytes, bytearray, memoryview, GiaTriPhanDoan)):
+            do_dai = _do_dai(obj)
+            cac_phan.extend(cac_doan(obj))
+            vi_tri = [offset, do_dai]
+            offset += do_dai
+            return {_KHOA_BYTES: vi_tri}
+        raise TypeError(f"Không mã hóa được kiểu {type(obj).__name__}")
+
+    header = json.dumps(thong_diep, default=thay_bytes, separators=(",", ":")).encode()
+    cac_buffer = [_DAU_KHUNG.pack(MAGIC, len(header), offset) + header] + cac_phan
+
+    if cac_doan_gui:
+        for i, doan in enumerate(cac_doan_gui):
+            cac_buffer.extend(ma_hoa_khung({"i": i, "crc": zlib.crc32(doan), "data": doan}))
+    return cac_buffer
+
+
+def giai_ma_khung(header: memoryview, payload: memoryview) -> dict:
+    """
+    Giải mã header JSON, thay các {"$b": [offset, độ dài]} bằng value bytes
+
+    Mỗi value được sao chép đúng một lần từ buffer nhận sang đối tượng bytes
+    mà kho dữ liệu giữ lâu dài.
+    """
+    def lay_bytes(d: dict):
+        if len(d) == 1 and _KHOA_BYTES in d:
+            offset, do_dai = d[_KHOA_BYTES]
+            return bytes(payload[offset:offset + do_dai])
+        return d
+
+    return json.loads(bytes(header), object_hook=lay_bytes)
+
+
+def _gui_het(sock: socket.socket, cac_buffer: List[Any]):
+    """Gửi toàn bộ danh sách buffer bằng sendmsg (scatter-gather), xử lý gửi thiếu"""
+    if not hasattr(sock, "sendmsg"):
+        # Nền tảng không có sendmsg (Windows)
+        for buffer in cac_buffer:
+            sock.sendall(buffer)
+        return
+
+    cac_buffer = [mv for mv in (memoryview(b).cast("B") for b in cac_buffer) if mv.nbytes]
+    i = 0
+    while i < len(cac_buffer):
+        da_gui = sock.sendmsg(cac_buffer[i:i + _IOV_TOI_DA])
+        while i < len(cac_buffer) and da_gui >= cac_buffer[i].nbytes:
+            da_gui -= cac_buffer[i].nbytes
+            i += 1
+        if da_gui:
+            cac_buffer[i] = cac_buffer[i][da_gui:]
+
+
+def gui_khung(sock: socket.socket, thong_diep: dict, kich_thuoc_doan: int = KICH_THUOC_DOAN):
+    """
+    Gửi một thông điệp dưới dạng khung nhị phân (value lớn: khung chính + các khung đoạn)
+    """
+    _gui_het(sock, ma_hoa_khung(thong_diep, kich_thuoc_doan))
+
+
+def _nhan_vao(sock: socket.socket, buf: memoryview):
+    """Đọc đầy buf bằng recv_into (không nối chuỗi bytes từng mảnh)"""
+    da_nhan = 0
+    tong = buf.nbytes
+    while da_nhan < tong:
+        n = sock.recv_into(buf[da_nhan:])
+        if n == 0:
+            raise ConnectionError("Kết nối bị đóng giữa khung")
+        da_nhan += n
+
+
+def _nhan_mot_khung(sock: socket.socket, kich_thuoc_toi_da: int, dau: bytes = b"") -> dict:
+    """Nhận và giải mã đúng một khung (không xử lý các khung đoạn theo sau)"""
+    dau_khung = bytearray(_DAU_KHUNG.size)
+    dau_khung[:len(dau)] = dau
+    _nhan_vao(sock, memoryview(dau_khung)[len(dau):])
+    magic, do_dai_header, do_dai_payload = _DAU_KHUNG.unpack(dau_khung)
+    if magic != MAGIC:
+        raise LoiKhung("Sai MAGIC của khung")
+    if do_dai_header + do_dai_payload > kich_thuoc_toi_da:
+        raise LoiKhung(f"Khung {do_dai_header + do_dai_payload} bytes vượt giới hạn {kich_thuoc_toi_da}")
+
+    buf = memoryview(bytearray(do_dai_header + do_dai_payload))
+    _nhan_vao(sock, buf)
+    return giai_ma_khung(buf[:do_dai_header], buf[do_dai_header:])
+
+
+def _kiem_tra_dau_doan(dau_doan, kich_thuoc_value_toi_da: int) -> Tuple[int, int]:
+    """
+    Kiểm tra "$doan": [tổng độ dài, số đoạn] của khung chính
+
+    Giải thích: Bên gửi luôn cắt value thành các đoạn đúng KICH_THUOC_DOAN (trừ
+    đoạn cuối), nên số đoạn phải bằng ceil(tổng / KICH_THUOC_DOAN); header sai
+    bị từ chối trước khi đọc đoạn nào.
+
+    Trả về:
+        (tổng độ dài, số đoạn)
+    """
+    if (not isinstance(dau_doan, list) or len(dau_doan) != 2
+            or not all(type(x) is int for x in dau_doan)):
+        raise LoiKhung(f"Đầu đoạn không hợp lệ: {dau_doan!r}")
+    tong, so_doan = dau_doan
+    if not 0 <= tong <= kich_thuoc_value_toi_da:
+        raise LoiKhung(f"Value {tong} bytes vượt giới hạn {kich_thuoc_value_toi_da}")
+    if so_doan != -(-tong // KICH_THUOC_DOAN):
+        raise LoiKhung(f"Value {tong} bytes không thể gồm {so_doan} đoạn")
+    return tong, so_doan
+
+
+def nhan_khung(sock: socket.socket, kich_thuoc_toi_da: int = KICH_THUOC_KHUNG_TOI_DA,
+               dau: bytes = b"", kich_thuoc_value_toi_da: int = KICH_THUOC_VALUE_TOI_DA) -> dict:
+    """
+    Nhận một khung nhị phân
+
+    Tham số:
+        kich_thuoc_toi_da: Từ chối khung lớn hơn (bytes) trước khi cấp phát buffer;
+            áp dụng cho từng khung, kể cả từng khung đoạn của value lớn
+        dau: Các byte đầu khung đã được đọc trước (để nhận diện giao thức)
+        kich_thuoc_value_toi_da: Từ chối value phân đoạn dài hơn (bytes) ngay từ khung chính
+
+    Giải thích: Value lớn được nhận từng đoạn, mỗi đoạn một buffer riêng và
+    được kiểm tra độ dài, crc32, rồi ghép thành GiaTriPhanDoan (không nối thành một khối).
+
+    Raise:
+        LoiKhung nếu sai MAGIC, khung/value quá lớn, đầu đoạn sai hoặc đoạn sai checksum
+    """
+    thong_diep = _nhan_mot_khung(sock, kich_thuoc_toi_da, dau)
+
+    if _KHOA_DOAN in thong_diep:
+        tong, so_doan = _kiem_tra_dau_doan(thong_diep.pop(_KHOA_DOAN), kich_thuoc_value_toi_da)
+        cac_doan_nhan = []
+        con_lai = tong
+        for i in range(so_doan):
+            khung = _nhan_mot_khung(sock, kich_thuoc_toi_da)
+            data = khung.get("data")
+            if (khung.get("i") != i or not isinstance(data, bytes)
+                    or len(data) != min(KICH_THUOC_DOAN, con_lai) or zlib.crc32(data) != khung.get("crc")):
+                raise LoiKhung(f"Đoạn {i}/{so_doan} sai thứ tự, độ dài hoặc checksum")
+            cac_doan_nhan.append(data)
+            con_lai -= len(data)
+        if so_doan == 0:
+            value = b""
+        else:
+            value = cac_doan_nhan[0] if so_doan == 1 else GiaTriPhanDoan(tuple(cac_doan_nhan))
+        if len(value) != tong:
+            raise LoiKhung(f"Value nhận được {len(value)} bytes, mong đợi {tong}")
+        thong_diep["value"] = value
+    return thong_diep
+
+
+def gui_nhan(dia_chi: Tuple[str, int], thong_diep: dict, timeout: Optional[float] = 5.0,
+             kich_thuoc_toi_da: int = KICH_THUOC_KHUNG_TOI_DA,
+             kich_thuoc_value_toi_da: int = KICH_THUOC_VALUE_TOI_DA) -> dict:
+    """
+    Mở kết nối, gửi một khung request và đợi khung response
+    """
+    with socket.create_connection(dia_chi, timeout=timeout) as sock:
+        gui_khung(sock, thong_diep)
+        return nhan_khung(sock, kich_thuoc_toi_da, kich_thuoc_value_toi_da=kich_thuoc_value_toi_da)
+
+
+def json_tuong_thich(obj):
+    """
+    Hook json.dumps cho response gửi về client JSON kiểu cũ: bytes -> chuỗi utf-8
+    """
+    if isinstance(obj, (bytes, bytearray, memoryview, GiaTriPhanDoan)):
+        return bytes(obj).decode("utf-8", errors="replace")
+    raise TypeError(f"Không mã hóa được kiểu {type(obj).__name__}")
@@ -0,0 +1,348 @@
+"""
+Thành Viên Cluster Kiểu SWIM (Gossip Membership) cho Node
+Thăm dò ngẫu nhiên, ping gián tiếp và lan truyền cập nhật thành viên đính kèm tin nhắn
+"""
+
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Trạng thái thành viên
+SONG = "song"
+NGHI_NGO = "nghi_ngo"
+CHET = "chet"
+
+# Cùng incarnation thì trạng thái "xấu hơn" được ưu tiên: chết > nghi ngờ > sống
+_UU_TIEN = {SONG: 0, NGHI_NGO: 1, CHET: 2}
+
+# Sự kiện báo cho node qua callback khi_thay_doi
+SU_KIEN_THEM = "them"
+SU_KIEN_CHET = "chet"
+
+DiaChi = Tuple[str, int]
+
+
+class _ThanhVien:
+    """Trạng thái một thành viên theo góc nhìn của node này"""
+    __slots__ = ("node_id", "dia_chi", "trang_thai", "incarnation", "thoi_diem_nghi_ngo")
+
+    def __init__(self, node_id: str, dia_chi: DiaChi, trang_thai: str, incarnation: int):
+        self.node_id = node_id
+        self.dia_chi = dia_chi
+        self.trang_thai = trang_thai
+        self.incarnation = incarnation
+        self.thoi_diem_nghi_ngo = 0.0
+
+
+class ThanhVienSwim:
+    """
+    Giao thức thành viên SWIM (Das, Gupta, Motivala 2002) kèm cơ chế nghi ngờ
+
+    Giải thích:
+    - Mỗi chu kỳ thăm dò, node ping MỘT thành viên (thứ tự ngẫu nhiên, xoay vòng
+      để mọi thành viên đều được thăm dò trong n chu kỳ)
+    - Không có ack sau thoi_gian_cho_ack: nhờ so_ping_gian_tiep thành viên khác
+      ping hộ (ping_req) - phân biệt node chết với đường mạng chậm
+    - Hết chu kỳ vẫn không có ack: đánh dấu NGHI NGỜ; quá thời gian nghi ngờ
+      mà node không tự bác bỏ (tăng incarnation) thì đánh dấu CHẾT
+    - Cập nhật thành viên (sống/nghi ngờ/chết) được đính kèm vào ping/ack,
+      mỗi cập nhật được gửi lại khoảng he_so_lan_truyen * log2(n) lần
+
+    Mỗi node gửi số tin nhắn cố định mỗi chu kỳ, không phụ thuộc kích thước cluster.
+    Lớp này không tự mở socket: node (hoặc mô phỏng) truyền hàm gui và gọi
+    nhan() khi có tin nhắn, tick() định kỳ.
+    """
+
+    def __init__(self, node_id: str, dia_chi: DiaChi,
+                 gui: Callable[[DiaChi, dict], None],
+                 khoang_tham_do: float = 1.0, thoi_gian_cho_ack: float = 0.3,
+                 so_ping_gian_tiep: int = 3, he_so_nghi_ngo: float = 3.0,
+                 he_so_lan_truyen: int = 3, so_cap_nhat_moi_tin: int = 8,
+                 khi_thay_doi: Optional[Callable[[str, DiaChi, str], None]] = None,
+                 dong_ho: Callable[[], float] = time.time,
+                 ngau_nhien: Optional[random.Random] = None):
+        """
+        Khởi tạo
+
+        Tham số:
+            node_id: ID của node này
+            dia_chi: Địa chỉ (host, port) UDP của node này
+            gui: Hàm gửi một tin nhắn (dict) đến một địa chỉ
+            khoang_tham_do: Độ dài một chu kỳ thăm dò (giây)
+            thoi_gian_cho_ack: Thời gian chờ ack trực tiếp trước khi ping gián tiếp
+            so_ping_gian_tiep: Số thành viên được nhờ ping hộ
+            he_so_nghi_ngo: Thời gian nghi ngờ = he_so * chu kỳ * max(1, log10(n + 1))
+            he_so_lan_truyen: Mỗi cập nhật được gửi he_so * ceil(log2(n + 2)) lần
+            so_cap_nhat_moi_tin: Số cập nhật tối đa đính kèm một tin nhắn
+            khi_thay_doi: Callback (node_id, địa chỉ, SU_KIEN_THEM | SU_KIEN_CHET)
+            dong_ho: Nguồn thời gian (mô phỏng truyền đồng hồ ảo)
+            ngau_nhien: Bộ sinh số ngẫu nhiên
+        """
+        self.node_id = node_id
+        self.dia_chi = tuple(dia_chi)
+        self._gui = gui
+        self.khoang_tham_do = khoang_tham_do
+        self.thoi_gian_cho_ack = thoi_gian_cho_ack
+        self.so_ping_gian_tiep = so_ping_gian_tiep
+        self.he_so_nghi_ngo = he_so_nghi_ngo
+        self.he_so_lan_truyen = he_so_lan_truyen
+        self.so_cap_nhat_moi_tin = so_cap_nhat_moi_tin
+        self._khi_thay_doi = khi_thay_doi
+        self._dong_ho = dong_ho
+        self._ngau_nhien = ngau_nhien or random.Random()
+
+        # Incarnation khởi tạo theo thời gian thực để node khởi động lại luôn
+        # có incarnation lớn hơn bản ghi "chết" cũ của chính nó
+        self.incarnation = int(dong_ho())
+
+        self._thanh_vien: Dict[str, _ThanhVien] = {}
+        # Cập nhật chờ lan truyền: node_id -> [bản ghi, số lần đã gửi, thứ tự thêm]
+        self._cap_nhat: Dict[str, list] = {}
+        self._so_cap_nhat = 0
+        self._thu_tu_tham_do: List[str] = []
+        self._seq = 0
+        self._dang_tham_do: Optional[dict] = None
+        # Ping hộ đang chờ ack: seq của mình -> (địa chỉ người nhờ, seq của họ, hạn)
+        self._chuyen_tiep: Dict[int, Tuple[DiaChi, int, float]] = {}
+        self._chu_ky_tiep = dong_ho()
+        self._khoa = threading.Lock()
+
+        self.thong_ke = {
+            'so_tin_gui': 0,
+            'so_tin_nhan': 0,
+            'so_ping_gian_tiep': 0,
+            'so_lan_nghi_ngo': 0,
+            'so_lan_bac_bo': 0,
+        }
+
+        # Tự quảng bá mình đang sống
+        self._them_cap_nhat(node_id, self.dia_chi, SONG, self.incarnation)
+
+    # ==================== API CHO NODE ====================
+
+    def them_thanh_vien(self, node_id: str, dia_chi: DiaChi):
+        """
+        Thêm thành viên biết được ngoài gossip (JOIN, seed node)
+
+        Thành viên được coi là sống với incarnation 0; gossip từ chính nó
+        (incarnation thật, lớn hơn) sẽ ghi đè.
+        """
+        self._thuc_thi(lambda ra, su_kien: self._ap_dung(node_id, tuple(dia_chi), SONG, 0, su_kien))
+
+    def cac_thanh_vien(self) -> Dict[str, Tuple[DiaChi, str, int]]:
+        """
+        Trả về:
+            node_id -> (địa chỉ, trạng thái, incarnation) của mọi thành viên đã biết
+        """
+        with self._khoa:
+            return {
+                tv.node_id: (tv.dia_chi, tv.trang_thai, tv.incarnation)
+                for tv in self._thanh_vien.values()
+            }
+
+    def lay_thong_ke(self) -> dict:
+        with self._khoa:
+            dem = {SONG: 0, NGHI_NGO: 0, CHET: 0}
+            for tv in self._thanh_vien.values():
+                dem[tv.trang_thai] += 1
+            return {
+                **self.thong_ke,
+                'incarnation': self.incarnation,
+                'so_thanh_vien_song': dem[SONG],
+                'so_thanh_vien_nghi_ngo': dem[NGHI_NGO],
+                'so_thanh_vien_chet': dem[CHET],
+                'so_cap_nhat_cho_lan_truyen': len(self._cap_nhat),
+            }
+
+    def tick(self):
+        """
+        Gọi định kỳ (nhiều lần mỗi chu kỳ): xử lý hết hạn và bắt đầu chu kỳ mới
+        """
+        self._thuc_thi(self._tick)
+
+    def nhan(self, thong_diep: dict, dia_chi_gui: DiaChi):
+        """
+        Xử lý một tin nhắn gossip nhận được
+        """
+        self._thuc_thi(lambda ra, su_kien: self._nhan(thong_diep, tuple(dia_chi_gui), ra, su_kien))
+
+    # ==================== NỘI BỘ ====================
+
+    def _thuc_thi(self, ham):
+        """
+        Chạy ham trong khóa, rồi gửi tin nhắn và gọi callback NGOÀI khóa
+        """
+        ra: List[Tuple[DiaChi, dict]] = []
+        su_kien: List[Tuple[str, DiaChi, str]] = []
+        with self._khoa:
+            ham(ra, su_kien)
+            self.thong_ke['so_tin_gui'] += len(ra)
+        for dia_chi, thong_diep in ra:
+            self._gui(dia_chi, thong_diep)
+        if self._khi_thay_doi is not None:
+            for node_id, dia_chi, loai in su_kien:
+                self._khi_thay_doi(node_id, dia_chi, loai)
+
+    def _so_thanh_vien(self) -> int:
+        return sum(1 for tv in self._thanh_vien.values() if tv.trang_thai != CHET) + 1
+
+    def _tin(self, loai: str, seq: int, den: Optional[str] = None, **them) -> dict:
+        """
+        Tạo tin nhắn kèm các cập nhật cần lan truyền
+
+        Tham số:
+            den: node_id người nhận (nếu biết); cập nhật về chính người nhận
+                được gửi trước để nó kịp bác bỏ nghi ngờ
+        """
+        thong_diep = {"loai": loai, "tu": self.node_id, "seq": seq, **them}
+        if self._cap_nhat:
+            so_lan_toi_da = self.he_so_lan_truyen * math.ceil(math.log2(self._so_thanh_vien() + 1))
+            # Ưu tiên cập nhật về người nhận, rồi cập nhật được gửi ít lần nhất,
+            # cùng số lần thì cập nhật mới hơn trước
+            chon = sorted(self._cap_nhat.items(),
+                          key=lambda muc: (muc[0] != den, muc[1][1], -muc[1][2]))[:self.so_cap_nhat_moi_tin]
+            thong_diep["cn"] = [muc[0] for _, muc in chon]
+            for node_id, muc in chon:
+                muc[1] += 1
+                if muc[1] >= so_lan_toi_da:
+                    del self._cap_nhat[node_id]
+        return thong_diep
+
+    def _them_cap_nhat(self, node_id: str, dia_chi: DiaChi, trang_thai: str, incarnation: int):
+        """Xếp một cập nhật vào hàng lan truyền (thay cập nhật cũ hơn của cùng node)"""
+        self._so_cap_nhat += 1
+        self._cap_nhat[node_id] = [[node_id, dia_chi[0], dia_chi[1], trang_thai, incarnation], 0,
+                                   self._so_cap_nhat]
+
+    def _ap_dung(self, node_id: str, dia_chi: DiaChi, trang_thai: str, incarnation: int,
+                 su_kien: list):
+        """
+        Áp dụng một cập nhật thành viên theo luật của SWIM
+        """
+        if node_id == self.node_id:
+            # Người khác nghi ngờ/khai tử mình: bác bỏ bằng incarnation mới
+            if trang_thai != SONG and incarnation >= self.incarnation:
+                self.incarnation = incarnation + 1
+                self.thong_ke['so_lan_bac_bo'] += 1
+                self._them_cap_nhat(self.node_id, self.dia_chi, SONG, self.incarnation)
+            return
+
+        tv = self._thanh_vien.get(node_id)
+        if tv is None:
+            tv = _ThanhVien(node_id, dia_chi, trang_thai, incarnation)
+            tv.thoi_diem_nghi_ngo = self._dong_ho()
+            self._thanh_vien[node_id] = tv
+            # Chèn vào vị trí ngẫu nhiên của vòng thăm dò hiện tại
+            self._thu_tu_tham_do.insert(
+                self._ngau_nhien.randint(0, len(self._thu_tu_tham_do)), node_id)
+            self._them_cap_nhat(node_id, dia_chi, trang_thai, incarnation)
+            if trang_thai != CHET:
+                su_kien.append((node_id, dia_chi, SU_KIEN_THEM))
+            return
+
+        if incarnation < tv.incarnation or (
+                incarnation == tv.incarnation and _UU_TIEN[trang_thai] <= _UU_TIEN[tv.trang_thai]):
+            return  # Cập nhật cũ hoặc trùng
+
+        cu = tv.trang_thai
+        tv.trang_thai = trang_thai
+        tv.incarnation = incarnation
+        tv.dia_chi = dia_chi
+        if trang_thai == NGHI_NGO:
+            tv.thoi_diem_nghi_ngo = self._dong_ho()
+        self._them_cap_nhat(node_id, dia_chi, trang_thai, incarnation)
+
+        if cu == CHET and trang_thai != CHET:
+            su_kien.append((node_id, dia_chi, SU_KIEN_THEM))
+        elif trang_thai == CHET and cu != CHET:
+            su_kien.append((node_id, dia_chi, SU_KIEN_CHET))
+
+    def _chon_dich(self) -> Optional[str]:
+        """Chọn thành viên kế tiếp để thăm dò: xoay vòng trên một hoán vị ngẫu nhiên"""
+        for _ in range(2):
+            while self._thu_tu_tham_do:
+                node_id = self._thu_tu_tham_do.pop()
+                tv = self._thanh_vien.get(node_id)
+                if tv is not None and tv.trang_thai != CHET:
+                    return node_id
+            # Hết một vòng: xáo trộn lại danh sách
+            self._thu_tu_tham_do = [
+                node_id for node_id, tv in self._thanh_vien.items() if tv.trang_thai != CHET
+            ]
+            self._ngau_nhien.shuffle(self._thu_tu_tham_do)
+        return None
+
+    def _tick(self, ra: list, su_kien: list):
+        bay_gio = self._dong_ho()
+
+        # 1. Lần thăm dò đang chờ ack
+        tham_do = self._dang_tham_do
+        if tham_do is not None:
+            if not tham_do["gian_tiep"] and bay_gio >= tham_do["han_ack"]:
+                tham_do["gian_tiep"] = True
+                cac_ung_vien = [
+                    tv for node_id, tv in self._thanh_vien.items()
+                    if node_id != tham_do["dich"] and tv.trang_thai == SONG
+                ]
+                dich = self._thanh_vien[tham_do["dich"]]
+                for tv in self._ngau_nhien.sample(cac_ung_vien, min(self.so_ping_gian_tiep, len(cac_ung_vien))):
+                    self.thong_ke['so_ping_gian_tiep'] += 1
+                    ra.append((tv.dia_chi, self._tin("ping_req", tham_do["seq"], den=tv.node_id,
+                                                     dich=dich.node_id, dia_chi_dich=list(dich.dia_chi))))
+            if bay_gio >= tham_do["han_chu_ky"]:
+                self._dang_tham_do = None
+                tv = self._thanh_vien.get(tham_do["dich"])
+                if tv is not None and tv.trang_thai == SONG:
+                    self.thong_ke['so_lan_nghi_ngo'] += 1
+                    self._ap_dung(tv.node_id, tv.dia_chi, NGHI_NGO, tv.incarnation, su_kien)
+
+        # 2. Nghi ngờ quá hạn -> chết
+        thoi_gian_nghi_ngo = (self.he_so_nghi_ngo * self.khoang_tham_do *
+                              max(1.0, math.log10(self._so_thanh_vien() + 1)))
+        for tv in list(self._thanh_vien.values()):
+            if tv.trang_thai == NGHI_NGO and bay_gio - tv.thoi_diem_nghi_ngo >= thoi_gian_nghi_ngo:
+                self._ap_dung(tv.node_id, tv.dia_chi, CHET, tv.incarnation, su_kien)
+
+        # 3. Dọn các ping hộ đã quá hạn
+        if self._chuyen_tiep:
+            for seq in [s for s, (_, _, han) in self._chuyen_tiep.items() if han <= bay_gio]:
+                del self._chuyen_tiep[seq]
+
+        # 4. Bắt đầu chu kỳ thăm dò mới
+        if bay_gio >= self._chu_ky_tiep and self._dang_tham_do is None:
+            self._chu_ky_tiep = bay_gio + self.khoang_tham_do
+            dich = self._chon_dich()
+            if dich is not None:
+                self._seq += 1
+                self._dang_tham_do = {
+                    "dich": dich,
+                    "seq": self._seq,
+                    "han_ack": bay_gio + self.thoi_gian_cho_ack,
+                    "han_chu_ky": bay_gio + self.khoang_tham_do,
+                    "gian_tiep": False,
+                }
+                ra.append((self._thanh_vien[dich].dia_chi, self._tin("ping", self._seq, den=dich)))
+
+    def _nhan(self, thong_diep: dict, dia_chi_gui: DiaChi, ra: list, su_kien: list):
+        self.thong_ke['so_tin_nhan'] += 1
+        for node_id, host, port, trang_thai, incarnation in thong_diep.get("cn", ()):
+            self._ap_dung(node_id, (host, port), trang_thai, incarnation, su_kien)
+
+        loai = thong_diep.get("loai")
+        seq = thong_diep.get("seq")
+        if loai == "ping":
+            ra.append((dia_chi_gui, self._tin("ack", seq, den=thong_diep.get("tu"))))
+        elif loai == "ping_req":
+            # Ping hộ: ack từ đích sẽ được chuyển về người nhờ với seq của họ
+            self._seq += 1
+            self._chuyen_tiep[self._seq] = (dia_chi_gui, seq, self._dong_ho() + self.khoang_tham_do)
+            ra.append((tuple(thong_diep["dia_chi_dich"]), self._tin("ping", self._seq, den=thong_diep.get("dich"))))
+        elif loai == "ack":
+            tham_do = self._dang_tham_do
+            if tham_do is not None and tham_do["seq"] == seq:
+                self._dang_tham_do = None
+            elif seq in self._chuyen_tiep:
+                nguoi_nho, seq_goc, _ = self._chuyen_tiep.pop(seq)
+                ra.append((nguoi_nho, self._tin("ack", seq_goc)))
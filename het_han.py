@@ -0,0 +1,116 @@
+"""
+Bánh Xe Hẹn Giờ Phân Cấp (Hierarchical Timer Wheel) cho TTL của key
+Tìm các key đến hạn mà không phải quét toàn bộ du_lieu
+"""
+
+import math
+import threading
+from typing import List, Set, Tuple
+
+
+class BanhXeHenGio:
+    """
+    Bánh xe hẹn giờ nhiều cấp kiểu Linux kernel timer
+
+    Giải thích:
+    - Cấp 0 có so_khe khe, mỗi khe rộng 1 tick (do_phan_giai giây)
+    - Cấp i có so_khe khe, mỗi khe rộng so_khe^i tick
+    - Key được đặt vào cấp thấp nhất đủ chứa thời điểm hết hạn của nó;
+      khi cấp dưới quay hết một vòng, khe tương ứng của cấp trên được
+      "đổ" xuống (cascade) các cấp thấp hơn
+    - Thêm key O(1), mỗi tick chỉ xử lý các key đến hạn + các key được đổ xuống
+
+    Bánh xe chỉ trả về key "có thể" đã hết hạn: nếu key bị ghi đè với TTL khác
+    hoặc bị xóa, kho dữ liệu phải kiểm tra lại thời điểm hết hạn thật.
+    """
+
+    def __init__(self, do_phan_giai: float = 0.1, bit_moi_cap: int = 8, so_cap: int = 3,
+                 bay_gio: float = 0.0):
+        """
+        Khởi tạo bánh xe
+
+        Tham số:
+            do_phan_giai: Độ rộng một tick (giây)
+            bit_moi_cap: Mỗi cấp có 2^bit_moi_cap khe
+            so_cap: Số cấp; thời hạn xa hơn so_khe^so_cap tick vào danh sách tràn
+            bay_gio: Thời điểm hiện tại (time.time())
+        """
+        self.do_phan_giai = do_phan_giai
+        self._bit = bit_moi_cap
+        self._so_khe = 1 << bit_moi_cap
+        self._mat_na = self._so_khe - 1
+        self._so_cap = so_cap
+        self._cac_cap: List[List[Set[Tuple[str, int]]]] = [
+            [set() for _ in range(self._so_khe)] for _ in range(so_cap)
+        ]
+        self._tran: Set[Tuple[str, int]] = set()
+        self._tick = int(bay_gio / do_phan_giai)
+        self._so_muc = 0
+        self._khoa = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._so_muc
+
+    def them(self, key: str, het_han: float):
+        """
+        Hẹn giờ cho key hết hạn tại thời điểm het_han (time.time())
+        """
+        tick_het_han = math.ceil(het_han / self.do_phan_giai)
+        with self._khoa:
+            # Khe của tick hiện tại đã được xử lý: mục đã quá hạn ra ở tick kế tiếp
+            self._dat_vao_khe(key, tick_het_han, self._tick + 1)
+            self._so_muc += 1
+
+    def _dat_vao_khe(self, key: str, tick_het_han: int, tick_som_nhat: int):
+        """Đặt một mục vào khe phù hợp, không sớm hơn tick_som_nhat (gọi trong khóa)"""
+        tick_het_han = max(tick_het_han, tick_som_nhat)
+        khoang_cach = tick_het_han - self._tick
+        for cap in range(self._so_cap):
+            if khoang_cach < (1 << (self._bit * (cap + 1))):
+                khe = (tick_het_han >> (self._bit * cap)) & self._mat_na
+                self._cac_cap[cap][khe].add((key, tick_het_han))
+                return
+        self._tran.add((key, tick_het_han))
+
+    def tien_toi(self, bay_gio: float) -> List[str]:
+        """
+        Quay bánh xe tới thời điểm bay_gio
+
+        Trả về:
+            Danh sách key đến hạn (cần kiểm tra lại với kho dữ liệu)
+        """
+        tick_dich = int(bay_gio / self.do_phan_giai)
+        den_han: List[str] = []
+        with self._khoa:
+            while self._tick < tick_dich:
+                self._tick += 1
+                tick = self._tick
+
+                # Đổ các cấp trên xuống khi cấp dưới vừa quay hết một vòng; mục đến hạn
+                # đúng tick này rơi vào khe cấp 0 của tick này, được xử lý ngay bên dưới
+                for cap in range(1, self._so_cap):
+                    if (tick >> (self._bit * (cap - 1))) & self._mat_na:
+                        break
+                    khe = (tick >> (self._bit * cap)) & self._mat_na
+                    cac_muc = self._cac_cap[cap][khe]
+                    self._cac_cap[cap][khe] = set()
+                    for key, tick_het_han in cac_muc:
+                        self._dat_vao_khe(key, tick_het_han, tick)
+                else:
+                    if self._tran and (tick >> (self._bit * (self._so_cap - 1))) & self._mat_na == 0:
+                        cac_muc = self._tran
+                        self._tran = set()
+                        for key, tick_het_han in cac_muc:
+                            self._dat_vao_khe(key, tick_het_han, tick)
+
+                khe = tick & self._mat_na
+                cac_muc = self._cac_cap[0][khe]
+                if cac_muc:
+                    self._cac_cap[0][khe] = set()
+                    for key, tick_het_han in cac_muc:
+                        if tick_het_han <= tick:
+                            den_han.append(key)
+                            self._so_muc -= 1
+                        else:
+                            self._cac_cap[0][khe].add((key, tick_het_han))
+        return den_han
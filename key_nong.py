@@ -0,0 +1,140 @@
+"""
+Phát Hiện Key Nóng cho Node
+Count-min sketch + top-K theo cửa sổ thời gian: bộ nhớ cố định, chi phí O(1) mỗi request
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+class BoDemKeyNong:
+    """
+    Theo dõi các key được truy cập nhiều nhất (heavy hitters)
+
+    Giải thích:
+    - Count-min sketch: do_sau hàng × do_rong bộ đếm; mỗi key tăng một bộ đếm
+      ở mỗi hàng, ước lượng = min các bộ đếm đó (chỉ có thể ước lượng DƯ,
+      sai số <= tổng số lần truy cập × e / do_rong với xác suất cao)
+    - Top-K: chỉ giữ so_key_theo_doi key có ước lượng lớn nhất; key mới
+      thay key nhỏ nhất khi ước lượng của nó vượt qua
+    - Cửa sổ: sketch được làm mới mỗi cua_so giây; tốc độ = số lần trong
+      cửa sổ trước + cửa sổ hiện tại chia cho thời gian của hai cửa sổ
+
+    Tham số:
+        so_key_theo_doi: Số key nóng tối đa được giữ (K)
+        do_rong: Số bộ đếm mỗi hàng (lũy thừa của 2)
+        do_sau: Số hàng (số hàm băm)
+        cua_so: Độ dài một cửa sổ đếm (giây)
+        dong_ho: Nguồn thời gian
+    """
+
+    def __init__(self, so_key_theo_doi: int = 32, do_rong: int = 2048, do_sau: int = 4,
+                 cua_so: float = 10.0, dong_ho: Callable[[], float] = time.monotonic):
+        if do_rong & (do_rong - 1):
+            raise ValueError("do_rong phải là lũy thừa của 2")
+        so_bit = do_rong.bit_length() - 1
+        if so_bit * do_sau > 64:
+            raise ValueError("do_sau × log2(do_rong) không được vượt 64 bit của hash")
+        self.so_key_theo_doi = so_key_theo_doi
+        self.do_rong = do_rong
+        self.do_sau = do_sau
+        self.cua_so = cua_so
+        self._dong_ho = dong_ho
+        self._mat_na = do_rong - 1
+        # Mỗi hàng: (vị trí bắt đầu trong list phẳng, số bit dịch của hash)
+        self._cac_hang = [(hang * do_rong, hang * so_bit) for hang in range(do_sau)]
+        self._khoa = threading.Lock()
+
+        self._bang = [0] * (do_sau * do_rong)
+        self._ung_vien: Dict[str, int] = {}
+        self._nguong = 0  # Chặn dưới của ước lượng nhỏ nhất trong top-K
+        self._tong = 0
+        self._bat_dau_cua_so = dong_ho()
+        self._cua_so_truoc: Dict[str, int] = {}
+        self._tong_truoc = 0
+        self._thoi_luong_truoc = 0.0
+
+    def _xoay_cua_so(self, bay_gio: float):
+        """Bắt đầu cửa sổ mới, giữ top-K của cửa sổ vừa kết thúc (gọi khi giữ khóa)"""
+        da_qua = bay_gio - self._bat_dau_cua_so
+        if da_qua < 2 * self.cua_so:
+            self._cua_so_truoc = self._ung_vien
+            self._tong_truoc = self._tong
+            self._thoi_luong_truoc = da_qua
+        else:
+            # Im lặng hơn một cửa sổ: dữ liệu cũ không còn phản ánh tốc độ hiện tại
+            self._cua_so_truoc = {}
+            self._tong_truoc = 0
+            self._thoi_luong_truoc = 0.0
+        self._bang = [0] * (self.do_sau * self.do_rong)
+        self._ung_vien = {}
+        self._nguong = 0
+        self._tong = 0
+        self._bat_dau_cua_so = bay_gio
+
+    def ghi_nhan(self, key: str):
+        """Ghi nhận một lần truy cập key"""
+        h = hash(key)
+        mat_na = self._mat_na
+        bay_gio = self._dong_ho()
+        with self._khoa:
+            if bay_gio - self._bat_dau_cua_so >= self.cua_so:
+                self._xoay_cua_so(bay_gio)
+            self._tong += 1
+
+            # Mỗi hàng dùng một đoạn bit riêng của hash 64 bit (độc lập giữa các hàng)
+            bang = self._bang
+            uoc_luong = self._tong
+            for dau_hang, dich in self._cac_hang:
+                chi_so = dau_hang + ((h >> dich) & mat_na)
+                dem = bang[chi_so] + 1
+                bang[chi_so] = dem
+                if dem < uoc_luong:
+                    uoc_luong = dem
+
+            ung_vien = self._ung_vien
+            if key in ung_vien:
+                ung_vien[key] = uoc_luong
+            elif len(ung_vien) < self.so_key_theo_doi:
+                ung_vien[key] = uoc_luong
+            elif uoc_luong > self._nguong:
+                # Chỉ quét top-K khi key mới có thể vượt key nhỏ nhất
+                key_nho_nhat = min(ung_vien, key=ung_vien.__getitem__)
+                if uoc_luong > ung_vien[key_nho_nhat]:
+                    del ung_vien[key_nho_nhat]
+                    ung_vien[key] = uoc_luong
+                    self._nguong = min(ung_vien.values())
+                else:
+                    self._nguong = ung_vien[key_nho_nhat]
+
+    def lay_key_nong(self, k: int = 10) -> dict:
+        """
+        Trả về:
+            {"tong_toc_do": số truy cập/giây,
+             "cac_key": [{"key", "so_lan", "toc_do" (lần/giây), "ty_le" (phần tổng)}]}
+            cac_key sắp xếp giảm dần, tối đa k phần tử; so_lan là ước lượng
+            (có thể dư) trên cửa sổ trước + cửa sổ hiện tại
+        """
+        bay_gio = self._dong_ho()
+        with self._khoa:
+            if bay_gio - self._bat_dau_cua_so >= self.cua_so:
+                self._xoay_cua_so(bay_gio)
+            hien_tai = dict(self._ung_vien)
+            truoc = dict(self._cua_so_truoc)
+            tong = self._tong + self._tong_truoc
+            thoi_gian = bay_gio - self._bat_dau_cua_so + self._thoi_luong_truoc
+
+        # Tránh tốc độ ảo khi vừa khởi động (thời gian quan sát quá ngắn)
+        thoi_gian = max(thoi_gian, 1.0)
+        cac_key: List[dict] = []
+        for key in set(hien_tai) | set(truoc):
+            so_lan = hien_tai.get(key, 0) + truoc.get(key, 0)
+            cac_key.append({
+                "key": key,
+                "so_lan": so_lan,
+                "toc_do": round(so_lan / thoi_gian, 2),
+                "ty_le": round(so_lan / tong, 4) if tong else 0.0,
+            })
+        cac_key.sort(key=lambda muc: muc["so_lan"], reverse=True)
+        return {"tong_toc_do": round(tong / thoi_gian, 2), "cac_key": cac_key[:k]}
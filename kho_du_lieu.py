@@ -0,0 +1,713 @@
+"""
+Kho Dữ Liệu Phân Mảnh (Lock-Striped Store) cho Node
+Chia du_lieu thành N mảnh, mỗi mảnh có khóa riêng, chọn mảnh theo hash của key
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from chi_muc import ChiMucCoThuTu
+from het_han import BanhXeHenGio
+from khoa_do_dac import gop_thong_ke, tao_khoa
+from phan_doan import GiaTri
+from wal import NhatKyGhiTruoc, LOAI_PUT, LOAI_DELETE
+
+# Chính sách thu hồi khi vượt giới hạn bộ nhớ
+CHINH_SACH_THU_HOI = ("lru", "lfu")
+
+# Chi phí ước lượng của một mục trong bảng băm dict (chỉ số + hash + 2 con trỏ,
+# tính cả hệ số tải) - cộng thêm vào kích thước thật của key và value
+_CHI_PHI_MUC = 48
+
+# Chi phí của một thời điểm hết hạn: float + một mục trong dict het_han
+_CHI_PHI_HET_HAN = sys.getsizeof(0.0) + _CHI_PHI_MUC
+
+# Chi phí của một phiên bản: số nguyên nano giây + một mục trong dict phien_ban
+_CHI_PHI_PHIEN_BAN = sys.getsizeof(time.time_ns()) + _CHI_PHI_MUC
+
+
+def kich_thuoc_muc(key: str, value: GiaTri) -> int:
+    """
+    Số byte một cặp key-value chiếm trong kho
+    """
+    return sys.getsizeof(key) + sys.getsizeof(value) + _CHI_PHI_MUC
+
+
+class _ChinhSachLRU:
+    """
+    Least Recently Used: thu hồi key lâu nhất chưa được truy cập
+    """
+    __slots__ = ("_thu_tu",)
+
+    def __init__(self):
+        self._thu_tu: "OrderedDict[str, None]" = OrderedDict()
+
+    def them(self, key: str):
+        self._thu_tu[key] = None
+
+    def truy_cap(self, key: str):
+        self._thu_tu.move_to_end(key)
+
+    def xoa(self, key: str):
+        self._thu_tu.pop(key, None)
+
+    def chon_nan_nhan(self, bo_qua: Optional[str] = None) -> str:
+        for key in self._thu_tu:
+            if key != bo_qua:
+                return key
+
+
+class _ChinhSachLFU:
+    """
+    Least Frequently Used: thu hồi key có tần suất truy cập thấp nhất
+    (cùng tần suất thì thu hồi key cũ nhất). Mọi thao tác O(1).
+    """
+    __slots__ = ("_tan_suat", "_nhom", "_tan_suat_min")
+
+    def __init__(self):
+        self._tan_suat: Dict[str, int] = {}
+        self._nhom: Dict[int, "OrderedDict[str, None]"] = {}
+        self._tan_suat_min = 0
+
+    def them(self, key: str):
+        self._tan_suat[key] = 1
+        self._nhom.setdefault(1, OrderedDict())[key] = None
+        self._tan_suat_min = 1
+
+    def truy_cap(self, key: str):
+        tan_suat = self._tan_suat[key]
+        nhom = self._nhom[tan_suat]
+        del nhom[key]
+        if not nhom:
+            del self._nhom[tan_suat]
+            if self._tan_suat_min == tan_suat:
+                self._tan_suat_min = tan_suat + 1
+        self._tan_suat[key] = tan_suat + 1
+        self._nhom.setdefault(tan_suat + 1, OrderedDict())[key] = None
+
+    def xoa(self, key: str):
+        tan_suat = self._tan_suat.pop(key, None)
+        if tan_suat is None:
+            return
+        nhom = self._nhom[tan_suat]
+        del nhom[key]
+        if not nhom:
+            del self._nhom[tan_suat]
+            if self._tan_suat_min == tan_suat:
+                self._tan_suat_min = min(self._nhom) if self._nhom else 0
+
+    def chon_nan_nhan(self, bo_qua: Optional[str] = None) -> str:
+        for key in self._nhom[self._tan_suat_min]:
+            if key != bo_qua:
+                return key
+        # bo_qua đứng một mình ở tần suất thấp nhất: lấy key cũ nhất của nhóm kế tiếp,
+        # không đổi tần suất của bo_qua
+        return next(iter(self._nhom[min(t for t in self._nhom if t != self._tan_suat_min)]))
+
+
+class _Manh:
+    """
+    Một mảnh của kho: dictionary + khóa riêng + kế toán bộ nhớ
+
+    Các phương thức của mảnh KHÔNG tự khóa; kho gọi chúng trong manh.khoa.
+    Thay đổi cần đưa vào chỉ mục và bánh xe hẹn giờ (dùng chung cho mọi mảnh)
+    được gom vào cho_chi_muc / cho_hen_gio, kho áp dụng sau khi nhả khóa.
+    """
+    __slots__ = ("du_lieu", "het_han", "phien_ban", "khoa", "so_byte", "gioi_han", "chinh_sach",
+                 "so_lan_thu_hoi", "so_lan_het_han", "chi_muc", "cho_chi_muc", "cho_hen_gio")
+
+    def __init__(self, gioi_han: int = 0, chinh_sach_thu_hoi: str = "lru",
+                 chi_muc: Optional[ChiMucCoThuTu] = None, khoa=None):
+        self.du_lieu: Dict[str, GiaTri] = {}
+        # Chỉ mục có thứ tự dùng chung giữa các mảnh (None = không dùng)
+        self.chi_muc = chi_muc
+        # Key vừa được thêm/xóa và (key, het_han) vừa hẹn giờ, chờ áp dụng ngoài khóa
+        self.cho_chi_muc: List[str] = []
+        self.cho_hen_gio: List[Tuple[str, float]] = []
+        # Thời điểm hết hạn tuyệt đối (time.time()) - chỉ cho key có TTL
+        self.het_han: Dict[str, float] = {}
+        # Phiên bản của lần ghi nguyên tử gần nhất - chỉ cho key từng được INCR/CAS/APPEND
+        self.phien_ban: Dict[str, int] = {}
+        self.khoa = khoa if khoa is not None else threading.Lock()
+        self.so_byte = 0
+        self.gioi_han = gioi_han
+        self.so_lan_thu_hoi = 0
+        self.so_lan_het_han = 0
+        self.chinh_sach = None
+        if gioi_han > 0:
+            self.chinh_sach = _ChinhSachLFU() if chinh_sach_thu_hoi == "lfu" else _ChinhSachLRU()
+
+    def da_het_han(self, key: str, bay_gio: float) -> bool:
+        han = self.het_han.get(key)
+        return han is not None and han <= bay_gio
+
+    def lay(self, key: str) -> Optional[GiaTri]:
+        value = self.du_lieu.get(key)
+        if value is not None and self.chinh_sach is not None:
+            self.chinh_sach.truy_cap(key)
+        return value
+
+    def dat(self, key: str, value: GiaTri, het_han: Optional[float] = None) -> List[str]:
+        """
+        Lưu key = value (het_han None = không hết hạn), thu hồi key khác nếu vượt giới hạn
+
+        Trả về:
+            Danh sách key bị thu hồi
+        """
+        if het_han is not None:
+            if key not in self.het_han:
+                self.so_byte += _CHI_PHI_HET_HAN
+            self.het_han[key] = het_han
+            self.cho_hen_gio.append((key, het_han))
+        elif self.het_han.pop(key, None) is not None:
+            self.so_byte -= _CHI_PHI_HET_HAN
+
+        cu = self.du_lieu.get(key)
+        if cu is not None:
+            self.so_byte -= kich_thuoc_muc(key, cu)
+            if self.chinh_sach is not None:
+                self.chinh_sach.truy_cap(key)
+        else:
+            if self.chinh_sach is not None:
+                self.chinh_sach.them(key)
+            if self.chi_muc is not None:
+                self.cho_chi_muc.append(key)
+        self.du_lieu[key] = value
+        self.so_byte += kich_thuoc_muc(key, value)
+
+        if self.chinh_sach is None or self.so_byte <= self.gioi_han:
+            return []
+
+        cac_key_thu_hoi = []
+        # Luôn giữ lại key vừa ghi, kể cả khi riêng nó đã vượt giới hạn
+        while self.so_byte > self.gioi_han and len(self.du_lieu) > 1:
+            nan_nhan = self.chinh_sach.chon_nan_nhan(bo_qua=key)
+            self.xoa(nan_nhan)
+            self.so_lan_thu_hoi += 1
+            cac_key_thu_hoi.append(nan_nhan)
+        return cac_key_thu_hoi
+
+    def ghi_phien_ban(self, key: str, phien_ban: int):
+        if key not in self.phien_ban:
+            self.so_byte += _CHI_PHI_PHIEN_BAN
+        self.phien_ban[key] = phien_ban
+
+    def xoa(self, key: str) -> Optional[GiaTri]:
+        cu = self.du_lieu.pop(key, None)
+        if cu is not None:
+            self.so_byte -= kich_thuoc_muc(key, cu)
+            if self.het_han.pop(key, None) is not None:
+                self.so_byte -= _CHI_PHI_HET_HAN
+            if self.phien_ban.pop(key, None) is not None:
+                self.so_byte -= _CHI_PHI_PHIEN_BAN
+            if self.chinh_sach is not None:
+                self.chinh_sach.xoa(key)
+            if self.chi_muc is not None:
+                self.cho_chi_muc.append(key)
+        return cu
+
+    def xoa_het(self):
+        if self.chi_muc is not None:
+            self.cho_chi_muc.extend(self.du_lieu)
+        self.du_lieu.clear()
+        self.het_han.clear()
+        self.phien_ban.clear()
+        self.so_byte = 0
+        if self.chinh_sach is not None:
+            self.chinh_sach = type(self.chinh_sach)()
+
+
+class KhoDuLieuPhanManh:
+    """
+    Kho key-value gồm N mảnh khóa độc lập
+
+    Tính năng:
+    - Thao tác trên các key khác mảnh không tranh chấp cùng một khóa
+    - Ghi WAL bên trong khóa mảnh để thứ tự nhật ký trùng thứ tự áp dụng
+    - Áp dụng hàng loạt: gom key theo mảnh, mỗi mảnh chỉ khóa một lần
+    - Không bao giờ tính toán vòng băm khi đang giữ khóa (việc lọc key
+      theo consistent hashing do Node làm trước khi gọi vào kho)
+    - Kế toán bộ nhớ theo byte, giới hạn bộ nhớ với thu hồi LRU hoặc LFU
+    - TTL theo từng key: hết hạn lười khi đọc + bánh xe hẹn giờ để dọn chủ động,
+      key hết hạn không bao giờ được trả về hay xuất ra khi đồng bộ
+    - Chỉ mục có thứ tự (tùy chọn) để quét theo tiền tố/khoảng key
+    """
+
+    def __init__(self, so_manh: int = 16, nhat_ky: Optional[NhatKyGhiTruoc] = None,
+                 gioi_han_bo_nho: int = 0, chinh_sach_thu_hoi: str = "lru",
+                 chi_muc_co_thu_tu: bool = False, do_dac_khoa: bool = False):
+        """
+        Khởi tạo kho
+
+        Tham số:
+            so_manh: Số mảnh (làm tròn lên lũy thừa của 2)
+            nhat_ky: WAL để ghi các thay đổi (None = không ghi)
+            gioi_han_bo_nho: Giới hạn bộ nhớ (bytes, 0 = không giới hạn),
+                chia đều cho các mảnh
+            chinh_sach_thu_hoi: "lru" hoặc "lfu"
+            chi_muc_co_thu_tu: Duy trì chỉ mục key có thứ tự cho quet() (tốn thêm một
+                khóa chung cho mỗi key được thêm/xóa, tắt thì quet() sắp xếp toàn bộ)
+            do_dac_khoa: Đo thời gian chờ/giữ khóa mảnh (xem khoa_do_dac.KhoaDoDac)
+        """
+        if chinh_sach_thu_hoi not in CHINH_SACH_THU_HOI:
+            raise ValueError(f"Chính sách thu hồi không hợp lệ: {chinh_sach_thu_hoi}")
+        so_manh_thuc = 1
+        while so_manh_thuc < max(1, so_manh):
+            so_manh_thuc <<= 1
+        self.so_manh = so_manh_thuc
+        self._mat_na = so_manh_thuc - 1
+        self.gioi_han_bo_nho = gioi_han_bo_nho
+        self.chinh_sach_thu_hoi = chinh_sach_thu_hoi
+        gioi_han_moi_manh = gioi_han_bo_nho // so_manh_thuc if gioi_han_bo_nho > 0 else 0
+        self.chi_muc = ChiMucCoThuTu() if chi_muc_co_thu_tu else None
+        self.do_dac_khoa = do_dac_khoa
+        self._cac_manh: List[_Manh] = [
+            _Manh(gioi_han_moi_manh, chinh_sach_thu_hoi, self.chi_muc, tao_khoa(f"manh_{i}", do_dac_khoa))
+            for i in range(so_manh_thuc)
+        ]
+        self.nhat_ky = nhat_ky
+        self.banh_xe = BanhXeHenGio(bay_gio=time.time())
+        # Được gọi với số giây đã chờ khi thao tác đơn phải chờ khóa mảnh (None = không báo)
+        self.khi_cho_khoa: Optional[Callable[[float], None]] = None
+
+    def _manh(self, key: str) -> _Manh:
+        """Chọn mảnh chứa key"""
+        return self._cac_manh[hash(key) & self._mat_na]
+
+    def _lay_khoa(self, manh: _Manh):
+        """
+        Lấy khóa mảnh cho thao tác đơn; chỉ đo thời gian chờ khi khóa đang bị giữ
+        (lần thử không chờ thành công thì không tốn thêm gì)
+        """
+        if not manh.khoa.acquire(False):
+            bat_dau = time.perf_counter()
+            manh.khoa.acquire()
+            if self.khi_cho_khoa is not None:
+                self.khi_cho_khoa(time.perf_counter() - bat_dau)
+
+    def _nha_khoa(self, manh: _Manh):
+        """
+        Nhả khóa mảnh rồi mới đưa các thay đổi vừa gom vào chỉ mục và bánh xe hẹn giờ
+
+        Giải thích: Chỉ mục và bánh xe dùng chung cho mọi mảnh; cập nhật chúng khi
+        còn giữ khóa mảnh sẽ tuần tự hóa lại mọi luồng ghi. Ngoài khóa, các luồng có
+        thể cập nhật lệch thứ tự: chỉ mục tự đối chiếu lại với du_lieu (dong_bo),
+        bánh xe chỉ là gợi ý nên thứ tự không quan trọng.
+        """
+        cac_key = cac_hen_gio = None
+        if manh.cho_chi_muc:
+            cac_key, manh.cho_chi_muc = manh.cho_chi_muc, []
+        if manh.cho_hen_gio:
+            cac_hen_gio, manh.cho_hen_gio = manh.cho_hen_gio, []
+        manh.khoa.release()
+        if cac_key:
+            for key in cac_key:
+                self.chi_muc.dong_bo(key, manh.du_lieu)
+        if cac_hen_gio:
+            for key, het_han in cac_hen_gio:
+                self.banh_xe.them(key, het_han)
+
+    def _ghi_nhat_ky(self, key: str, value: Optional[GiaTri], het_han: Optional[float] = None) -> int:
+        """Ghi một thay đổi vào WAL (gọi trong khóa mảnh)"""
+        if self.nhat_ky is None:
+            return 0
+        if value is None:
+            return self.nhat_ky.ghi(LOAI_DELETE, key)
+        return self.nhat_ky.ghi(LOAI_PUT, key, value, het_han)
+
+    def _dat_trong_khoa(self, manh: _Manh, key: str, value: GiaTri,
+                        het_han: Optional[float] = None) -> int:
+        """Ghi vào mảnh và WAL, ghi cả các key bị thu hồi (gọi trong khóa mảnh)"""
+        if het_han is not None and het_han <= time.time():
+            # Đã hết hạn trước khi tới nơi: tương đương xóa
+            if manh.xoa(key) is None:
+                return 0
+            return self._ghi_nhat_ky(key, None)
+
+        cac_key_thu_hoi = manh.dat(key, value, het_han)
+        seq = self._ghi_nhat_ky(key, value, het_han)
+        for nan_nhan in cac_key_thu_hoi:
+            seq = self._ghi_nhat_ky(nan_nhan, None)
+        return seq
+
+    def _lay_trong_khoa(self, manh: _Manh, key: str) -> Optional[GiaTri]:
+        """Đọc key, xóa lười nếu đã hết hạn (gọi trong khóa mảnh)"""
+        if manh.het_han and manh.da_het_han(key, time.time()):
+            manh.xoa(key)
+            manh.so_lan_het_han += 1
+            self._ghi_nhat_ky(key, None)
+            return None
+        return manh.lay(key)
+
+    # ==================== THAO TÁC ĐƠN ====================
+
+    def get(self, key: str) -> Optional[GiaTri]:
+        """
+        Lấy value của key (None nếu không có)
+        """
+        manh = self._manh(key)
+        self._lay_khoa(manh)
+        try:
+            return self._lay_trong_khoa(manh, key)
+        finally:
+            self._nha_khoa(manh)
+
+    def dat(self, key: str, value: GiaTri, het_han: Optional[float] = None) -> int:
+        """
+        Lưu key = value
+
+        Tham số:
+            het_han: Thời điểm hết hạn tuyệt đối (time.time()), None = không hết hạn
+
+        Trả về:
+            seq của bản ghi WAL (0 nếu không bật WAL)
+        """
+        manh = self._manh(key)
+        self._lay_khoa(manh)
+        try:
+            return self._dat_trong_khoa(manh, key, value, het_han)
+        finally:
+            self._nha_khoa(manh)
+
+    def xoa(self, key: str) -> Tuple[bool, int]:
+        """
+        Xóa key
+
+        Trả về:
+            (key có tồn tại không, seq của bản ghi WAL)
+        """
+        manh = self._manh(key)
+        self._lay_khoa(manh)
+        try:
+            if manh.xoa(key) is None:
+                return False, 0
+            return True, self._ghi_nhat_ky(key, None)
+        finally:
+            self._nha_khoa(manh)
+
+    def bien_doi(self, key: str, ham: Callable[[Optional[GiaTri]], Optional[GiaTri]]
+                 ) -> Tuple[Optional[GiaTri], Optional[GiaTri], Optional[float], int, int]:
+        """
+        Đọc - tính - ghi nguyên tử một key (dùng cho INCR/CAS/APPEND)
+
+        Tham số:
+            ham: Nhận value hiện tại (None nếu chưa có), trả về value mới
+                hoặc None để giữ nguyên; có thể raise ValueError để hủy
+
+        Giải thích: Toàn bộ đọc, tính và ghi (kể cả WAL) nằm trong khóa mảnh,
+        nên không có thao tác nào khác chen vào giữa. TTL hiện có được giữ nguyên.
+        Mỗi lần ghi nhận một phiên bản tăng dần theo key (nano giây, luôn lớn hơn
+        phiên bản trước) để replica bỏ qua kết quả cũ đến muộn (xem ap_dung).
+
+        Trả về:
+            (value trước, value mới hoặc None nếu không ghi, thời điểm hết hạn, seq WAL, phiên bản)
+        """
+        manh = self._manh(key)
+        self._lay_khoa(manh)
+        try:
+            cu = self._lay_trong_khoa(manh, key)
+            moi = ham(cu)
+            if moi is None:
+                return cu, None, None, 0, 0
+            het_han = manh.het_han.get(key) if cu is not None else None
+            seq = self._dat_trong_khoa(manh, key, moi, het_han)
+            phien_ban = max(time.time_ns(), manh.phien_ban.get(key, 0) + 1)
+            manh.ghi_phien_ban(key, phien_ban)
+            return cu, moi, het_han, seq, phien_ban
+        finally:
+            self._nha_khoa(manh)
+
+    def ap_dung(self, key: str, value: Optional[GiaTri], het_han: Optional[float] = None,
+                phien_ban: Optional[int] = None) -> int:
+        """
+        Áp dụng một thay đổi nhân bản (value None = xóa)
+
+        Tham số:
+            phien_ban: Phiên bản do bien_doi cấp ở node chính (None = ghi thường,
+                luôn áp dụng); thay đổi không mới hơn phiên bản đang giữ bị bỏ qua
+
+        Trả về:
+            seq của bản ghi WAL (0 nếu bị bỏ qua)
+        """
+        if phien_ban is None:
+            if value is None:
+                return self.xoa(key)[1]
+            return self.dat(key, value, het_han)
+
+        manh = self._manh(key)
+        self._lay_khoa(manh)
+        try:
+            if phien_ban <= manh.phien_ban.get(key, 0):
+                return 0
+            if value is None:
+                if manh.xoa(key) is None:
+                    return 0
+                return self._ghi_nhat_ky(key, None)
+            seq = self._dat_trong_khoa(manh, key, value, het_han)
+            if key in manh.du_lieu:
+                manh.ghi_phien_ban(key, phien_ban)
+            return seq
+        finally:
+            self._nha_khoa(manh)
+
+    def don_dep_het_han(self, bay_gio: Optional[float] = None) -> int:
+        """
+        Quay bánh xe hẹn giờ và xóa các key đã hết hạn
+
+        Giải thích: Chỉ các key mà bánh xe báo đến hạn mới được kiểm tra,
+        không quét toàn bộ kho.
+
+        Trả về:
+            Số key đã xóa
+        """
+        bay_gio = time.time() if bay_gio is None else bay_gio
+        so_key_xoa = 0
+        for key in self.banh_xe.tien_toi(bay_gio):
+            manh = self._manh(key)
+            manh.khoa.acquire()
+            try:
+                # Key có thể đã bị ghi đè với TTL mới hoặc bị xóa
+                if manh.da_het_han(key, bay_gio):
+                    manh.xoa(key)
+                    manh.so_lan_het_han += 1
+                    self._ghi_nhat_ky(key, None)
+                    so_key_xoa += 1
+            finally:
+                self._nha_khoa(manh)
+        return so_key_xoa
+
+    def quet(self, bat_dau: Optional[str] = None, ket_thuc: Optional[str] = None,
+             gioi_han: int = 100, sau: Optional[str] = None) -> Tuple[List[Tuple[str, GiaTri]], bool]:
+        """
+        Quét các key còn hạn theo thứ tự trong khoảng [bat_dau, ket_thuc)
+
+        Tham số:
+            bat_dau: Cận dưới (bao gồm), None = từ đầu
+            ket_thuc: Cận trên (không bao gồm), None = đến hết
+            gioi_han: Số cặp tối đa
+            sau: Chỉ lấy key lớn hơn hẳn key này (con trỏ tiếp tục)
+
+        Giải thích: Với chỉ mục, mỗi lần chỉ lấy gioi_han + 1 key kế tiếp rồi
+        đọc value từ mảnh tương ứng; key vừa bị xóa/hết hạn thì bỏ qua và lấy
+        tiếp. Đọc khi quét không tính là truy cập cho LRU/LFU.
+
+        Trả về:
+            (các cặp (key, value) đã sắp xếp, còn key phía sau hay không)
+        """
+        if self.chi_muc is None:
+            return self._quet_khong_chi_muc(bat_dau, ket_thuc, gioi_han, sau)
+
+        ket_qua: List[Tuple[str, GiaTri]] = []
+        bay_gio = time.time()
+        con_tro = sau
+        while True:
+            can_lay = gioi_han - len(ket_qua)
+            cac_key = self.chi_muc.quet(bat_dau, ket_thuc, can_lay + 1, con_tro)
+            for key in cac_key:
+                manh = self._manh(key)
+                with manh.khoa:
+                    if manh.het_han and manh.da_het_han(key, bay_gio):
+                        continue
+                    value = manh.du_lieu.get(key)
+                if value is None:
+                    continue
+                if len(ket_qua) == gioi_han:
+                    return ket_qua, True
+                ket_qua.append((key, value))
+            if len(cac_key) <= can_lay:
+                return ket_qua, False
+            con_tro = cac_key[-1]
+
+    def _quet_khong_chi_muc(self, bat_dau: Optional[str], ket_thuc: Optional[str],
+                            gioi_han: int, sau: Optional[str]) -> Tuple[List[Tuple[str, GiaTri]], bool]:
+        """Quét khi không bật chỉ mục: sao chép và sắp xếp toàn bộ (O(n log n))"""
+        ban_sao = self.ban_sao()
+        cac_key = sorted(
+            key for key in ban_sao
+            if (bat_dau is None or key >= bat_dau)
+            and (ket_thuc is None or key < ket_thuc)
+            and (sau is None or key > sau)
+        )
+        return [(key, ban_sao[key]) for key in cac_key[:gioi_han]], len(cac_key) > gioi_han
+
+    # ==================== THAO TÁC HÀNG LOẠT ====================
+
+    def ap_dung_hang_loat(self, cac_cap: Iterable[Tuple[str, GiaTri]],
+                          chi_khi_chua_co: bool = False,
+                          cac_het_han: Optional[Dict[str, float]] = None) -> int:
+        """
+        Lưu nhiều cặp key-value, mỗi mảnh chỉ khóa một lần
+
+        Tham số:
+            cac_cap: Các cặp (key, value) đã được lọc sẵn
+            chi_khi_chua_co: True = không ghi đè key đã có
+            cac_het_han: Thời điểm hết hạn của các key có TTL
+
+        Trả về:
+            Số key đã được ghi
+        """
+        theo_manh: Dict[int, List[Tuple[str, GiaTri]]] = {}
+        mat_na = self._mat_na
+        for key, value in cac_cap:
+            theo_manh.setdefault(hash(key) & mat_na, []).append((key, value))
+
+        cac_het_han = cac_het_han or {}
+        bay_gio = time.time()
+        so_key_ghi = 0
+        for chi_so, nhom in theo_manh.items():
+            manh = self._cac_manh[chi_so]
+            manh.khoa.acquire()
+            try:
+                du_lieu = manh.du_lieu
+                for key, value in nhom:
+                    if chi_khi_chua_co and key in du_lieu and not manh.da_het_han(key, bay_gio):
+                        continue
+                    het_han = cac_het_han.get(key)
+                    if het_han is not None and het_han <= bay_gio:
+                        continue
+                    self._dat_trong_khoa(manh, key, value, het_han)
+                    so_key_ghi += 1
+            finally:
+                self._nha_khoa(manh)
+        return so_key_ghi
+
+    def ban_sao(self) -> Dict[str, GiaTri]:
+        """
+        Sao chép toàn bộ dữ liệu còn hạn, khóa lần lượt từng mảnh trong thời gian ngắn
+        """
+        return self.ban_sao_day_du()[0]
+
+    def ban_sao_day_du(self) -> Tuple[Dict[str, GiaTri], Dict[str, float]]:
+        """
+        Sao chép dữ liệu kèm thời điểm hết hạn, bỏ qua key đã hết hạn
+
+        Trả về:
+            (dữ liệu, thời điểm hết hạn của các key có TTL)
+        """
+        du_lieu: Dict[str, GiaTri] = {}
+        het_han: Dict[str, float] = {}
+        bay_gio = time.time()
+        for manh in self._cac_manh:
+            with manh.khoa:
+                du_lieu.update(manh.du_lieu)
+                if manh.het_han:
+                    het_han.update(manh.het_han)
+        for key in [k for k, han in het_han.items() if han <= bay_gio]:
+            del het_han[key]
+            du_lieu.pop(key, None)
+        return du_lieu, het_han
+
+    def trang_day_du(self, sau: Optional[str] = None, kich_thuoc_trang: int = 4 * 1024 * 1024,
+                     kich_thuoc_rieng: Optional[int] = None
+                     ) -> Tuple[Dict[str, GiaTri], Dict[str, float], bool]:
+        """
+        Lấy một trang dữ liệu còn hạn (theo thứ tự key) kèm thời điểm hết hạn
+
+        Tham số:
+            sau: Chỉ lấy key lớn hơn hẳn key này (con trỏ tiếp tục)
+            kich_thuoc_trang: Ngân sách bytes (key + value) của một trang
+            kich_thuoc_rieng: Value lớn hơn ngưỡng này được trả một mình trong trang
+                riêng để bên gửi có thể phân đoạn nó (None = không tách)
+
+        Giải thích: Trang luôn có ít nhất một key nên con trỏ luôn tiến; dừng
+        ngay khi cộng thêm key kế tiếp sẽ vượt ngân sách.
+
+        Trả về:
+            (dữ liệu, thời điểm hết hạn của các key có TTL, còn key phía sau hay không)
+        """
+        du_lieu: Dict[str, GiaTri] = {}
+        het_han: Dict[str, float] = {}
+        da_dung = 0
+        con_tro = sau
+        while True:
+            cac_cap, con_nua = self.quet(None, None, 256, con_tro)
+            for key, value in cac_cap:
+                kich_thuoc = len(key.encode()) + len(value) + _CHI_PHI_MUC
+                qua_lon = kich_thuoc_rieng is not None and len(value) > kich_thuoc_rieng
+                if du_lieu and (qua_lon or da_dung + kich_thuoc > kich_thuoc_trang):
+                    return du_lieu, het_han, True
+                manh = self._manh(key)
+                with manh.khoa:
+                    han = manh.het_han.get(key)
+                if han is not None:
+                    het_han[key] = han
+                du_lieu[key] = value
+                da_dung += kich_thuoc
+                if qua_lon:
+                    return du_lieu, het_han, key != cac_cap[-1][0] or con_nua
+            if not con_nua:
+                return du_lieu, het_han, False
+            con_tro = cac_cap[-1][0]
+
+    def lay_thong_ke(self) -> dict:
+        """
+        Thống kê bộ nhớ của kho (đọc bộ đếm không cần khóa)
+        """
+        so_key = len(self)
+        bo_nho = sum(manh.so_byte for manh in self._cac_manh)
+        return {
+            'so_manh': self.so_manh,
+            'bo_nho_dang_dung': bo_nho,
+            'gioi_han_bo_nho': self.gioi_han_bo_nho,
+            'chinh_sach_thu_hoi': self.chinh_sach_thu_hoi if self.gioi_han_bo_nho > 0 else None,
+            'so_lan_thu_hoi': sum(manh.so_lan_thu_hoi for manh in self._cac_manh),
+            'so_key_co_ttl': sum(len(manh.het_han) for manh in self._cac_manh),
+            'so_lan_het_han': sum(manh.so_lan_het_han for manh in self._cac_manh),
+            'byte_moi_key': bo_nho / so_key if so_key else 0.0,
+            'chi_muc_co_thu_tu': self.chi_muc is not None,
+        }
+
+    def lay_thong_ke_khoa(self) -> Optional[dict]:
+        """
+        Thống kê chờ/giữ gộp của mọi khóa mảnh (None nếu không bật đo đạc)
+        """
+        if not self.do_dac_khoa:
+            return None
+        return gop_thong_ke(manh.khoa for manh in self._cac_manh)
+
+    # ==================== GIAO DIỆN KIỂU DICT ====================
+    # Dùng khi khôi phục từ ảnh chụp/WAL: KHÔNG ghi WAL
+
+    def __len__(self) -> int:
+        return sum(len(manh.du_lieu) for manh in self._cac_manh)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._manh(key).du_lieu
+
+    def __getitem__(self, key: str) -> str:
+        return self._manh(key).du_lieu[key]
+
+    def __setitem__(self, key: str, value: GiaTri):
+        self.nap(key, value)
+
+    def nap(self, key: str, value: GiaTri, het_han: Optional[float] = None):
+        """Nạp một key khi khôi phục (không ghi WAL, bỏ qua nếu đã hết hạn)"""
+        manh = self._manh(key)
+        manh.khoa.acquire()
+        try:
+            if het_han is not None and het_han <= time.time():
+                manh.xoa(key)
+                return
+            manh.dat(key, value, het_han)
+        finally:
+            self._nha_khoa(manh)
+
+    def pop(self, key: str, mac_dinh=None):
+        manh = self._manh(key)
+        manh.khoa.acquire()
+        try:
+            cu = manh.xoa(key)
+        finally:
+            self._nha_khoa(manh)
+        return mac_dinh if cu is None else cu
+
+    def clear(self):
+        for manh in self._cac_manh:
+            manh.khoa.acquire()
+            try:
+                manh.xoa_het()
+            finally:
+                self._nha_khoa(manh)
@@ -0,0 +1,144 @@
+"""
+Khóa Đo Đạc và Điều Tra Thread cho Node
+Bọc threading.Lock để đo thời gian chờ / giữ khóa; đếm thread đang chạy theo vai trò
+"""
+
+import threading
+from time import perf_counter
+from typing import Dict, Iterable, Union
+
+# Vai trò thread theo tiền tố tên (tên được đặt khi node tạo thread)
+CAC_VAI_TRO = (
+    ("xu_ly_client", ("XuLyClient-", "Quet-")),
+    ("nhan_ban", ("NhanBan-", "Xoa-")),
+    ("thanh_vien", ("PhatTanThanhVien", "NhanUDP", "Gossip", "GuiHeartbeat", "PhatHienLoi")),
+    ("nen", ("BaoCaoThongKe", "DongBoDinhKy", "DonDepHetHan", "ChupAnh", "GhiWAL", "ChiSoHTTP")),
+    ("chinh", ("MainThread",)),
+)
+
+
+class KhoaDoDac:
+    """
+    threading.Lock có đo thời gian chờ (acquire) và thời gian giữ (acquire -> release)
+
+    Giải thích:
+    - Thử lấy khóa không chờ trước: khóa rảnh thì không tốn thêm lần đọc đồng hồ
+      nào cho phần chờ, chỉ lần lấy phải chờ mới được đo
+    - Bộ đếm được cập nhật khi đang giữ chính khóa này nên không cần khóa phụ;
+      đọc thống kê không khóa (giá trị xấp xỉ tại thời điểm đọc)
+    - Dùng thay trực tiếp threading.Lock: with, acquire(blocking, timeout), release, locked
+
+    Tham số:
+        ten: Tên khóa trong thống kê
+    """
+
+    __slots__ = ("ten", "_khoa", "_bat_dau_giu", "_so_lan", "_so_lan_cho",
+                 "_tong_cho", "_max_cho", "_tong_giu", "_max_giu")
+
+    def __init__(self, ten: str):
+        self.ten = ten
+        self._khoa = threading.Lock()
+        self._bat_dau_giu = 0.0
+        self._so_lan = 0
+        self._so_lan_cho = 0
+        self._tong_cho = 0.0
+        self._max_cho = 0.0
+        self._tong_giu = 0.0
+        self._max_giu = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        khoa = self._khoa
+        if khoa.acquire(False):
+            bay_gio = perf_counter()
+        else:
+            if not blocking:
+                return False
+            bat_dau = perf_counter()
+            if not khoa.acquire(True, timeout):
+                return False
+            bay_gio = perf_counter()
+            cho = bay_gio - bat_dau
+            self._so_lan_cho += 1
+            self._tong_cho += cho
+            if cho > self._max_cho:
+                self._max_cho = cho
+        self._so_lan += 1
+        self._bat_dau_giu = bay_gio
+        return True
+
+    def release(self):
+        giu = perf_counter() - self._bat_dau_giu
+        self._tong_giu += giu
+        if giu > self._max_giu:
+            self._max_giu = giu
+        self._khoa.release()
+
+    def locked(self) -> bool:
+        return self._khoa.locked()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *loi):
+        self.release()
+
+    def lay_thong_ke(self) -> dict:
+        """
+        Trả về:
+            {"so_lan", "so_lan_phai_cho", "tong_cho_ms", "max_cho_ms", "tong_giu_ms", "max_giu_ms"}
+        """
+        return {
+            "so_lan": self._so_lan,
+            "so_lan_phai_cho": self._so_lan_cho,
+            "tong_cho_ms": round(self._tong_cho * 1000, 3),
+            "max_cho_ms": round(self._max_cho * 1000, 3),
+            "tong_giu_ms": round(self._tong_giu * 1000, 3),
+            "max_giu_ms": round(self._max_giu * 1000, 3),
+        }
+
+
+def tao_khoa(ten: str, do_dac: bool) -> Union[KhoaDoDac, "threading.Lock"]:
+    """
+    Khóa cho node: KhoaDoDac khi bật đo đạc, threading.Lock thường khi tắt
+    (tắt = đúng đối tượng như trước, không tốn gì thêm)
+    """
+    return KhoaDoDac(ten) if do_dac else threading.Lock()
+
+
+def gop_thong_ke(cac_khoa: Iterable[KhoaDoDac]) -> dict:
+    """Gộp thống kê của một nhóm khóa (ví dụ các mảnh của kho dữ liệu)"""
+    ket_qua = {"so_lan": 0, "so_lan_phai_cho": 0, "tong_cho_ms": 0.0, "max_cho_ms": 0.0,
+               "tong_giu_ms": 0.0, "max_giu_ms": 0.0}
+    for khoa in cac_khoa:
+        thong_ke = khoa.lay_thong_ke()
+        for ten in ("so_lan", "so_lan_phai_cho", "tong_cho_ms", "tong_giu_ms"):
+            ket_qua[ten] += thong_ke[ten]
+        for ten in ("max_cho_ms", "max_giu_ms"):
+            ket_qua[ten] = max(ket_qua[ten], thong_ke[ten])
+    ket_qua["tong_cho_ms"] = round(ket_qua["tong_cho_ms"], 3)
+    ket_qua["tong_giu_ms"] = round(ket_qua["tong_giu_ms"], 3)
+    return ket_qua
+
+
+def vai_tro_thread(ten: str) -> str:
+    """Vai trò của thread theo tên ("khac" nếu không nhận ra)"""
+    for vai_tro, cac_tien_to in CAC_VAI_TRO:
+        if ten.startswith(cac_tien_to):
+            return vai_tro
+    return "khac"
+
+
+def dieu_tra_thread() -> dict:
+    """
+    Đếm thread đang chạy trong process theo vai trò
+
+    Trả về:
+        {"tong": số thread, "theo_vai_tro": {vai trò: số thread}}
+        (tính cho cả process: nhiều node chạy chung process được đếm chung)
+    """
+    theo_vai_tro: Dict[str, int] = {}
+    cac_thread = threading.enumerate()
+    for thread in cac_thread:
+        vai_tro = vai_tro_thread(thread.name)
+        theo_vai_tro[vai_tro] = theo_vai_tro.get(vai_tro, 0) + 1
+    return {"tong": len(cac_thread), "theo_vai_tro": theo_vai_tro}
@@ -2,25 +2,54 @@
 Hệ Thống Lưu Trữ Phân Tán Key-Value - Node
 """
 
+import os
 import socket
 import json
 import threading
 import time
 import hashlib
+import heapq
+import math
 from typing import Dict, Tuple, List, Optional
 import logging
 from datetime import datetime
 
-# Cấu hình logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('node.log'),
-        logging.StreamHandler()
-    ]
+from wal import NhatKyGhiTruoc
+from kho_du_lieu import KhoDuLieuPhanManh
+from chi_muc import can_tren_cua_tien_to
+import giao_thuc
+import gossip
+from phi_accrual import BoPhatHienPhiAccrual
+from bieu_do_do_tre import TapBieuDoDoTre
+from chi_so_prometheus import MayChuChiSo
+from key_nong import BoDemKeyNong
+import request_cham
+import khoa_do_dac
+import phan_tich_cpu
+import theo_vet
+import ghi_log
+from phan_doan import GiaTri, KICH_THUOC_DOAN
+import snapshot
+
+# Số key mặc định và tối đa trong một trang SCAN
+GIOI_HAN_QUET_MAC_DINH = 100
+GIOI_HAN_QUET_TOI_DA = 1000
+
+# Ngân sách bytes của một trang GET_ALL_DATA khi khôi phục/đồng bộ
+# (còn bị chặn bởi 1/4 giới hạn khung của node)
+KICH_THUOC_TRANG_DONG_BO = 4 * 1024 * 1024
+
+# Các lệnh có biểu đồ độ trễ riêng; lệnh lạ được gộp vào "KHAC"
+CAC_LENH = (
+    "PUT", "GET", "DELETE", "JOIN", "MEMBERSHIP_UPDATE", "HEARTBEAT", "REPLICATE",
+    "GET_ALL_DATA", "SYNC_DATA", "GET_STATS", "SNAPSHOT", "INCR", "DECR", "CAS",
+    "APPEND", "SCAN", "SCAN_LOCAL", "HOT_KEYS", "TRACES", "SLOW_LOG",
+    "PROFILE",
 )
 
+# Các lệnh ghi được đếm vào bộ theo dõi key nóng (GET được đếm riêng là đọc)
+CAC_LENH_GHI = ("PUT", "DELETE", "INCR", "DECR", "CAS", "APPEND")
+
 
 class Node:
     """
@@ -29,12 +58,23 @@ class Node:
     Tính năng:
     - Consistent hashing để phân phối dữ liệu
     - Nhân bản (replication) để chịu lỗi
-    - Cơ chế heartbeat để phát hiện lỗi
+    - Thành viên kiểu SWIM (gossip) hoặc heartbeat để phát hiện lỗi
     - Tự động khôi phục và đồng bộ dữ liệu
     - Thread-safe operations
     """
     
-    def __init__(self, node_id: str, host: str, port: int, he_so_nhan_ban: int = 2):
+    def __init__(self, node_id: str, host: str, port: int, he_so_nhan_ban: int = 2,
+                 thu_muc_du_lieu: Optional[str] = None, che_do_fsync: str = "batch",
+                 khoang_fsync_ms: int = 10, khoang_anh_chup: float = 300,
+                 so_manh: int = 16, gioi_han_bo_nho: int = 0,
+                 chinh_sach_thu_hoi: str = "lru", chi_muc_co_thu_tu: bool = False,
+                 kich_thuoc_khung_toi_da: int = giao_thuc.KICH_THUOC_KHUNG_TOI_DA,
+                 kich_thuoc_value_toi_da: int = giao_thuc.KICH_THUOC_VALUE_TOI_DA,
+                 che_do_thanh_vien: str = "gossip", khoang_tham_do: float = 1.0,
+                 nguong_phi: float = 8.0, cong_chi_so: Optional[int] = None,
+                 theo_doi_key_nong: bool = True, ty_le_lay_mau_vet: float = 0.0,
+                 dung_luong_vet: int = 2048, nguong_request_cham_ms: float = 200.0,
+                 do_dac_khoa: bool = False, mang=None):
         """
         Khởi tạo node mới
         
@@ -43,28 +83,92 @@ class Node:
             host: Địa chỉ host để bind
             port: Cổng để lắng nghe
             he_so_nhan_ban: Số lượng bản sao cho mỗi key (mặc định = 2)
+            thu_muc_du_lieu: Thư mục chứa write-ahead log (None = chỉ lưu trong bộ nhớ)
+            che_do_fsync: Chế độ fsync của WAL: "always", "batch" hoặc "off"
+            khoang_fsync_ms: Chu kỳ fsync theo lô (ms) khi che_do_fsync = "batch"
+            khoang_anh_chup: Chu kỳ chụp ảnh du_lieu xuống đĩa (giây, 0 = tắt)
+            so_manh: Số mảnh khóa độc lập của kho dữ liệu local
+            gioi_han_bo_nho: Giới hạn bộ nhớ cho dữ liệu (bytes, 0 = không giới hạn)
+            chinh_sach_thu_hoi: Chính sách thu hồi khi vượt giới hạn: "lru" hoặc "lfu"
+            chi_muc_co_thu_tu: Duy trì chỉ mục key có thứ tự cho SCAN (mặc định tắt:
+                mỗi key thêm/xóa tốn thêm một khóa dùng chung cho mọi mảnh)
+            kich_thuoc_khung_toi_da: Kích thước tối đa của một khung/request nhận vào (bytes);
+                value lớn hơn phải được gửi thành nhiều khung đoạn
+            kich_thuoc_value_toi_da: Kích thước tối đa của một value gửi thành nhiều khung
+                đoạn (bytes); đầu đoạn khai báo lớn hơn bị từ chối trước khi đọc đoạn nào
+            che_do_thanh_vien: "gossip" (SWIM qua UDP, cùng số cổng) hoặc
+                "heartbeat" (heartbeat TCP tới mọi peer như cũ)
+            khoang_tham_do: Chu kỳ thăm dò của gossip (giây)
+            nguong_phi: Ngưỡng nghi ngờ phi của chế độ heartbeat (cao hơn = ít báo nhầm,
+                phát hiện chậm hơn)
+            cong_chi_so: Cổng HTTP phục vụ /metrics kiểu Prometheus (None = tắt)
+            theo_doi_key_nong: Đếm key được đọc/ghi nhiều nhất (lệnh HOT_KEYS)
+            ty_le_lay_mau_vet: Xác suất truy vết request đến không kèm vết
+                (request có vết tuân theo quyết định lấy mẫu của client)
+            dung_luong_vet: Số span gần nhất được giữ cho lệnh TRACES
+            nguong_request_cham_ms: Request lâu hơn ngưỡng này (ms) được ghi vào nhật ký
+                request chậm kèm thời gian từng giai đoạn (0 = tắt đo giai đoạn)
+            do_dac_khoa: Đo thời gian chờ/giữ của các khóa node và khóa mảnh dữ liệu
+                (False = khóa threading.Lock thường, không tốn thêm gì)
+            mang: Mạng trong bộ nhớ (cum_thu_nghiem.MangBoNho) thay cho socket TCP/UDP,
+                để đo logic của node không qua ngăn xếp mạng (None = socket thật)
         """
         self.node_id = node_id
         self.host = host
         self.port = port
         self.he_so_nhan_ban = he_so_nhan_ban
+        self.kich_thuoc_khung_toi_da = kich_thuoc_khung_toi_da
+        self.kich_thuoc_value_toi_da = kich_thuoc_value_toi_da
+        
+        # Khóa đo đạc (tùy chọn): tên khóa -> KhoaDoDac, xuất qua GET_STATS
+        self.do_dac_khoa = do_dac_khoa
+        self.cac_khoa_do_dac: Dict[str, khoa_do_dac.KhoaDoDac] = {}
         
-        # Lưu trữ dữ liệu với thread-safe
-        self.du_lieu: Dict[str, str] = {}
-        self.khoa_du_lieu = threading.Lock()
+        # Lưu trữ dữ liệu với thread-safe: N mảnh, mỗi mảnh một khóa
+        self.du_lieu = KhoDuLieuPhanManh(so_manh, gioi_han_bo_nho=gioi_han_bo_nho,
+                                         chinh_sach_thu_hoi=chinh_sach_thu_hoi,
+                                         chi_muc_co_thu_tu=chi_muc_co_thu_tu,
+                                         do_dac_khoa=do_dac_khoa)
         
         # Thông tin về các node khác (peers)
         self.cac_node_khac: Dict[str, Tuple[str, int]] = {}
-        self.khoa_node_khac = threading.Lock()
+        self.khoa_node_khac = self._tao_khoa("node_khac")
         
-        # Theo dõi heartbeat
-        self.heartbeat_cuoi: Dict[str, float] = {}
-        self.khoa_heartbeat = threading.Lock()
-        self.thoi_gian_timeout_heartbeat = 10  # giây
-        self.khoang_thoi_gian_heartbeat = 3  # giây
+        # Phiên bản thành viên (cùng khóa khoa_node_khac): mỗi JOIN nhận một epoch
+        # tăng dần; epoch_node nhớ epoch mới nhất đã áp dụng cho từng node (kể cả
+        # node đã bị loại) để mỗi thay đổi chỉ được áp dụng một lần
+        self.epoch_thanh_vien = 0
+        self.epoch_node: Dict[str, int] = {}
+        self.he_so_phat_tan = 4
         
-        # Trạng thái node
+        # Theo dõi heartbeat: phi-accrual học phân bố khoảng cách heartbeat của từng peer
+        self.khoang_thoi_gian_heartbeat = 3  # giây
+        self.khoang_kiem_tra_loi = 0.5  # giây
+        self.rtt_heartbeat: Dict[str, Dict[str, float]] = {}  # node_id -> {"cuoi", "tb"} (giây)
+        self.khoa_rtt = self._tao_khoa("rtt")
+        self.bo_phat_hien_loi = BoPhatHienPhiAccrual(
+            nguong_phi=nguong_phi,
+            khoang_du_kien=self.khoang_thoi_gian_heartbeat,
+            khoang_nghi_chap_nhan=self.khoang_thoi_gian_heartbeat
+        )
+        
+        # Thành viên kiểu SWIM: mỗi chu kỳ chỉ ping một peer qua UDP
+        if che_do_thanh_vien not in ("gossip", "heartbeat"):
+            raise ValueError(f"Chế độ thành viên không hợp lệ: {che_do_thanh_vien}")
+        self.che_do_thanh_vien = che_do_thanh_vien
+        self.udp_socket: Optional[socket.socket] = None
+        self.gossip: Optional[gossip.ThanhVienSwim] = None
+        if che_do_thanh_vien == "gossip":
+            self.gossip = gossip.ThanhVienSwim(
+                node_id, (host, port), self._gui_udp,
+                khoang_tham_do=khoang_tham_do,
+                khi_thay_doi=self._khi_thanh_vien_thay_doi
+            )
+        
+        # Trạng thái node; da_san_sang được bật khi node bắt đầu nhận request
         self.dang_chay = False
+        self.da_san_sang = threading.Event()
+        self.mang = mang
         self.server_socket: Optional[socket.socket] = None
         self.dang_phuc_hoi = False
         
@@ -75,14 +179,68 @@ class Node:
             'so_lan_delete': 0,
             'so_lan_nhan_ban': 0,
             'so_lan_chuyen_tiep': 0,
+            'so_lan_nguyen_tu': 0,
+            'so_tin_thanh_vien': 0,
+            'so_lan_phuc_hoi': 0,
+            'so_key_phuc_hoi': 0,
+            'so_byte_phuc_hoi': 0,
+            'thoi_gian_phuc_hoi': 0.0,
             'thoi_gian_bat_dau': time.time()
         }
-        self.khoa_thong_ke = threading.Lock()
+        self.khoa_thong_ke = self._tao_khoa("thong_ke")
+        
+        # Biểu đồ độ trễ theo (lệnh, đường đi); ngữ cảnh thread-local của request
+        # đang xử lý: đã bị chuyển tiếp chưa, vết và span hiện tại
+        self.do_tre = TapBieuDoDoTre()
+        self._ngu_canh_request = threading.local()
+        self.bo_ghi_vet = theo_vet.BoGhiVet(node_id, ty_le_lay_mau_vet, dung_luong_vet)
+        
+        # Request chậm: thời gian chờ khóa mảnh được cộng vào request đang xử lý
+        self.request_cham = request_cham.NhatKyRequestCham(nguong_request_cham_ms)
+        self.du_lieu.khi_cho_khoa = self._cong_cho_khoa
+        
+        # Phân tích CPU theo yêu cầu (lệnh PROFILE): mỗi lúc chỉ một lần
+        self.khoa_phan_tich = threading.Lock()
+        
+        # Endpoint chỉ số Prometheus (tùy chọn) và thời điểm đồng bộ thành công gần nhất
+        self.may_chu_chi_so = MayChuChiSo(self, host, cong_chi_so) if cong_chi_so is not None else None
+        self.lan_dong_bo_cuoi: Optional[float] = None
+        
+        # Key nóng: đếm riêng đọc và ghi được xử lý tại node này
+        self.key_nong_doc: Optional[BoDemKeyNong] = None
+        self.key_nong_ghi: Optional[BoDemKeyNong] = None
+        if theo_doi_key_nong:
+            self.key_nong_doc = BoDemKeyNong()
+            self.key_nong_ghi = BoDemKeyNong()
         
         # Logger
         self.logger = logging.getLogger(f"Node-{node_id}")
+        
+        # Write-ahead log + ảnh chụp (tùy chọn): nạp vào du_lieu trước khi phục vụ request
+        self.thu_muc_du_lieu = thu_muc_du_lieu
+        self.khoang_anh_chup = khoang_anh_chup
+        self.khoa_anh_chup = self._tao_khoa("anh_chup")
+        self.thong_tin_anh_chup = {
+            'so_lan_chup': 0,
+            'kich_thuoc_byte': 0,
+            'so_key': 0,
+            'thoi_gian_chup': 0.0,
+            'thoi_gian_khoa': 0.0,
+            'lan_chup_cuoi': None
+        }
+        self.nhat_ky: Optional[NhatKyGhiTruoc] = None
+        if thu_muc_du_lieu:
+            self._khoi_phuc_tu_dia(che_do_fsync, khoang_fsync_ms)
+        
         self.logger.info(f"✓ Node đã khởi tạo: {node_id} tại {host}:{port}")
     
+    def _tao_khoa(self, ten: str):
+        """Tạo khóa của node (có đo đạc nếu bật do_dac_khoa)"""
+        khoa = khoa_do_dac.tao_khoa(ten, self.do_dac_khoa)
+        if self.do_dac_khoa:
+            self.cac_khoa_do_dac[ten] = khoa
+        return khoa
+    
     def hash_key(self, key: str) -> int:
         """
         Hash một key để xác định vị trí trên vòng hash
@@ -100,6 +258,107 @@ class Node:
         """
         return int(hashlib.md5(node_id.encode()).hexdigest(), 16)
     
+    # ==================== LƯU TRỮ BỀN VỮNG ====================
+    
+    def _khoi_phuc_tu_dia(self, che_do_fsync: str, khoang_fsync_ms: int):
+        """
+        Khôi phục du_lieu từ đĩa khi khởi động
+        
+        Quy trình:
+        1. Nạp ảnh chụp gần nhất (memory-map) nếu có
+        2. Mở WAL tiếp nối từ đoạn mà ảnh chụp trỏ tới
+        3. Chỉ phát lại phần đuôi WAL sau ảnh chụp
+        """
+        os.makedirs(self.thu_muc_du_lieu, exist_ok=True)
+        bat_dau = time.time()
+        
+        doan_wal = 0
+        duong_dan_anh = os.path.join(self.thu_muc_du_lieu, snapshot.TEN_FILE)
+        if os.path.exists(duong_dan_anh):
+            try:
+                doan_wal = snapshot.doc_anh_chup(duong_dan_anh, self.du_lieu)
+                self.thong_tin_anh_chup['kich_thuoc_byte'] = os.path.getsize(duong_dan_anh)
+                self.thong_tin_anh_chup['so_key'] = len(self.du_lieu)
+            except (ValueError, OSError) as e:
+                self.logger.error(f"✗ Ảnh chụp hỏng, bỏ qua: {e}")
+                self.du_lieu.clear()
+                doan_wal = 0
+        thoi_gian_tai_anh = time.time() - bat_dau
+        
+        self.nhat_ky = NhatKyGhiTruoc(self.thu_muc_du_lieu, che_do_fsync, khoang_fsync_ms,
+                                      doan_toi_thieu=max(doan_wal, 1))
+        so_ban_ghi = self.nhat_ky.phat_lai(self.du_lieu, tu_doan=doan_wal)
+        self.du_lieu.nhat_ky = self.nhat_ky
+        
+        self.thong_ke['thoi_gian_tai_anh_chup'] = thoi_gian_tai_anh
+        self.thong_ke['thoi_gian_khoi_dong'] = time.time() - bat_dau
+        self.logger.info(
+            f"✓ Khôi phục {len(self.du_lieu)} keys trong {self.thong_ke['thoi_gian_khoi_dong']:.3f}s "
+            f"(ảnh chụp: {thoi_gian_tai_anh:.3f}s, phát lại {so_ban_ghi} bản ghi WAL)"
+        )
+    
+    def chup_anh(self) -> bool:
+        """
+        Chụp ảnh du_lieu xuống đĩa rồi xóa các đoạn WAL cũ
+        
+        Giải thích: WAL được xoay vòng trước, sau đó từng mảnh được sao chép
+        nông trong khóa riêng của nó (mỗi lần khóa rất ngắn). Thay đổi nào xảy
+        ra sau điểm xoay vòng đều nằm trong đoạn WAL mới và được phát lại sau
+        ảnh chụp. Việc mã hóa và ghi file chạy ngoài mọi khóa.
+        
+        Trả về:
+            True nếu chụp thành công
+        """
+        if self.nhat_ky is None:
+            return False
+        
+        # Chỉ một lần chụp tại một thời điểm
+        if not self.khoa_anh_chup.acquire(blocking=False):
+            return False
+        
+        try:
+            bat_dau = time.time()
+            doan_moi = self.nhat_ky.xoay_vong()
+            ban_sao, het_han = self.du_lieu.ban_sao_day_du()
+            thoi_gian_khoa = time.time() - bat_dau
+            
+            duong_dan = os.path.join(self.thu_muc_du_lieu, snapshot.TEN_FILE)
+            kich_thuoc = snapshot.ghi_anh_chup(duong_dan, ban_sao.items(), len(ban_sao), doan_moi,
+                                               cac_het_han=het_han)
+            self.nhat_ky.xoa_doan_cu(doan_moi)
+            thoi_gian_chup = time.time() - bat_dau
+            
+            self.thong_tin_anh_chup.update({
+                'so_lan_chup': self.thong_tin_anh_chup['so_lan_chup'] + 1,
+                'kich_thuoc_byte': kich_thuoc,
+                'so_key': len(ban_sao),
+                'thoi_gian_chup': thoi_gian_chup,
+                'thoi_gian_khoa': thoi_gian_khoa,
+                'lan_chup_cuoi': time.time()
+            })
+            self.logger.info(
+                f"📸 Đã chụp ảnh {len(ban_sao)} keys ({kich_thuoc} bytes) trong {thoi_gian_chup:.3f}s"
+            )
+            return True
+        except Exception as e:
+            self.logger.error(f"✗ Lỗi chụp ảnh dữ liệu: {e}")
+            return False
+        finally:
+            self.khoa_anh_chup.release()
+    
+    def _cho_nhat_ky(self, seq: int):
+        """
+        Đợi WAL bền vững (chế độ "always") - gọi NGOÀI khóa của kho dữ liệu
+        """
+        if self.nhat_ky is not None:
+            giai_doan = getattr(self._ngu_canh_request, "giai_doan", None)
+            if giai_doan is None:
+                self.nhat_ky.cho_ben_vung(seq)
+                return
+            bat_dau = time.perf_counter()
+            self.nhat_ky.cho_ben_vung(seq)
+            giai_doan["cho_wal"] += time.perf_counter() - bat_dau
+    
     # def lay_cac_node_chiu_trach_nhiem(self, key: str) -> List[str]:
     #     """
     #     Sử dụng consistent hashing để tìm các node chịu trách nhiệm cho một key
@@ -151,6 +410,21 @@ class Node:
         #     return ket_qua
 
     def lay_cac_node_chiu_trach_nhiem(self, key: str) -> List[str]:
+        """
+        Các node chịu trách nhiệm cho key (node chính trước)
+        
+        Giải thích: Thời gian tra cứu được cộng vào giai đoạn "tra_vong"
+        của request đang xử lý (nếu đang đo request chậm)
+        """
+        giai_doan = getattr(self._ngu_canh_request, "giai_doan", None)
+        if giai_doan is None:
+            return self._tra_vong_bam(key)
+        bat_dau = time.perf_counter()
+        ket_qua = self._tra_vong_bam(key)
+        giai_doan["tra_vong"] += time.perf_counter() - bat_dau
+        return ket_qua
+
+    def _tra_vong_bam(self, key: str) -> List[str]:
             with self.khoa_node_khac:
                 # FIX: Sắp xếp ID để đảm bảo mọi Node có cùng một Vòng Băm (Hash Ring)
                 tat_ca_cac_node = sorted([self.node_id] + list(self.cac_node_khac.keys()))
@@ -180,17 +454,38 @@ class Node:
                         
                 return cac_node_chiu_trach_nhiem
     
+    def _loc_key_chiu_trach_nhiem(self, data: dict) -> List[Tuple[str, GiaTri]]:
+        """
+        Lọc các cặp key-value mà node này chịu trách nhiệm
+        
+        Giải thích: Chạy hoàn toàn ngoài khóa của kho dữ liệu, kết quả
+        được đưa vào du_lieu.ap_dung_hang_loat()
+        """
+        return [
+            (key, value) for key, value in data.items()
+            if self.node_id in self.lay_cac_node_chiu_trach_nhiem(key)
+        ]
+    
     def bat_dau(self):
         """
         Khởi động node server
         
         Quy trình:
-        1. Tạo và bind server socket
+        1. Tạo và bind server socket (hoặc đăng ký vào mạng trong bộ nhớ)
         2. Khởi động các background threads (heartbeat, failure detector)
-        3. Vào vòng lặp chính để nhận client connections
+        3. Bật da_san_sang, vào vòng lặp chính để nhận client connections
         """
         self.dang_chay = True
         
+        if self.mang is not None:
+            # Mạng trong bộ nhớ: request được mạng gọi thẳng vào _xu_ly_request
+            self.mang.dang_ky(self)
+            self._khoi_dong_thread_nen()
+            self.da_san_sang.set()
+            while self.dang_chay:
+                time.sleep(1.0)
+            return
+        
         # Tạo server socket
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -203,27 +498,27 @@ class Node:
             self.logger.error(f"✗ Lỗi bind tới {self.host}:{self.port}: {e}")
             raise
         
-        # Khởi động các background threads
-        threading.Thread(target=self._thread_gui_heartbeat, daemon=True, name="GuiHeartbeat").start()
-        threading.Thread(target=self._thread_phat_hien_loi, daemon=True, name="PhatHienLoi").start()
-        threading.Thread(target=self._thread_bao_cao_thong_ke, daemon=True, name="BaoCaoThongKe").start()
-        
-        # FIX QUAN TRỌNG: Thêm thread đồng bộ định kỳ
-        threading.Thread(target=self._thread_dong_bo_dinh_ky, daemon=True, name="DongBoDinhKy").start()
+        # Kênh UDP riêng cho gossip / heartbeat, không xếp hàng sau request dữ liệu.
+        # UDP và TCP là hai không gian cổng riêng: dùng chung số cổng với server
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.bind((self.host, self.port))
+        self.udp_socket.settimeout(1.0)
         
-        self.logger.info("✓ Tất cả background threads đã khởi động")
+        self._khoi_dong_thread_nen()
+        self.da_san_sang.set()
         
         # Vòng lặp chính accept connections
         while self.dang_chay:
             try:
                 self.server_socket.settimeout(1.0)
                 client_socket, client_addr = self.server_socket.accept()
-                self.logger.debug(f"Nhận kết nối từ {client_addr}")
+                thoi_diem_nhan = time.perf_counter()
+                self.logger.debug("Nhận kết nối từ %s", client_addr)
                 
                 # Xử lý mỗi client trong thread riêng
                 threading.Thread(
                     target=self._xu_ly_client,
-                    args=(client_socket,),
+                    args=(client_socket, thoi_diem_nhan),
                     daemon=True,
                     name=f"XuLyClient-{client_addr}"
                 ).start()
@@ -232,54 +527,126 @@ class Node:
                 continue
             except Exception as e:
                 if self.dang_chay:
-                    self.logger.error(f"✗ Lỗi accept connection: {e}")
+                    self.logger.error("✗ Lỗi accept connection: %s", e)
     
-    def _xu_ly_client(self, client_socket: socket.socket):
+    def _khoi_dong_thread_nen(self):
+        """
+        Khởi động endpoint chỉ số và các background threads
+        """
+        if self.may_chu_chi_so is not None:
+            self.may_chu_chi_so.bat_dau()
+        
+        threading.Thread(target=self._thread_nhan_udp, daemon=True, name="NhanUDP").start()
+        if self.gossip is not None:
+            threading.Thread(target=self._thread_gossip, daemon=True, name="Gossip").start()
+        else:
+            threading.Thread(target=self._thread_gui_heartbeat, daemon=True, name="GuiHeartbeat").start()
+            threading.Thread(target=self._thread_phat_hien_loi, daemon=True, name="PhatHienLoi").start()
+        threading.Thread(target=self._thread_bao_cao_thong_ke, daemon=True, name="BaoCaoThongKe").start()
+        
+        # FIX QUAN TRỌNG: Thêm thread đồng bộ định kỳ
+        threading.Thread(target=self._thread_dong_bo_dinh_ky, daemon=True, name="DongBoDinhKy").start()
+        
+        threading.Thread(target=self._thread_don_dep_het_han, daemon=True, name="DonDepHetHan").start()
+        
+        if self.nhat_ky is not None and self.khoang_anh_chup > 0:
+            threading.Thread(target=self._thread_chup_anh_dinh_ky, daemon=True, name="ChupAnh").start()
+        
+        self.logger.info("✓ Tất cả background threads đã khởi động")
+    
+    def _xu_ly_client(self, client_socket: socket.socket, thoi_diem_nhan: Optional[float] = None):
         """
         Xử lý một client connection
         
+        Tham số:
+            client_socket: Socket đã accept
+            thoi_diem_nhan: time.perf_counter() lúc accept (đo thời gian chờ xử lý)
+        
         Quy trình:
-        1. Nhận dữ liệu từ client
-        2. Parse JSON request
-        3. Xử lý request
-        4. Gửi response
+        1. Đọc byte đầu để nhận diện giao thức:
+           - MAGIC của khung nhị phân (giao_thuc.py): value là bytes thô
+           - "{": request JSON một dòng kiểu cũ, value là chuỗi utf-8
+        2. Parse request, xử lý request
+        3. Gửi response theo cùng giao thức với request
         """
         try:
-            # Nhận dữ liệu request
-            data = b""
-            while True:
-                chunk = client_socket.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if b"\n" in data:
-                    break
+            dau = client_socket.recv(1)
+            if not dau:
+                return
             
-            if not data:
+            if dau == giao_thuc.MAGIC[:1]:
+                request = giao_thuc.nhan_khung(
+                    client_socket, self.kich_thuoc_khung_toi_da, dau=dau,
+                    kich_thuoc_value_toi_da=self.kich_thuoc_value_toi_da
+                )
+                self.logger.debug("Nhận request: %s", request.get('command'))
+                giao_thuc.gui_khung(client_socket, self._xu_ly_request(request, thoi_diem_nhan))
                 return
             
+            # Nhận dữ liệu request JSON kiểu cũ (cũng bị giới hạn kích thước)
+            cac_manh = [dau]
+            da_nhan = len(dau)
+            while b"\n" not in cac_manh[-1]:
+                chunk = client_socket.recv(65536)
+                if not chunk:
+                    break
+                cac_manh.append(chunk)
+                da_nhan += len(chunk)
+                if da_nhan > self.kich_thuoc_khung_toi_da:
+                    raise giao_thuc.LoiKhung(
+                        f"Request JSON vượt giới hạn {self.kich_thuoc_khung_toi_da} bytes"
+                    )
+            data = b"".join(cac_manh)
+            
             # Parse và xử lý request
-            request = json.loads(data.decode())
-            self.logger.debug(f"Nhận request: {request.get('command')}")
+            request = self._chuyen_request_json(json.loads(data.decode()))
+            self.logger.debug("Nhận request: %s", request.get('command'))
             
-            response = self._xu_ly_request(request)
+            response = self._xu_ly_request(request, thoi_diem_nhan)
             
             # Gửi response
-            client_socket.sendall(json.dumps(response).encode() + b"\n")
+            client_socket.sendall(
+                json.dumps(response, default=giao_thuc.json_tuong_thich).encode() + b"\n"
+            )
             
+        except giao_thuc.LoiKhung as e:
+            self.logger.error("✗ Khung không hợp lệ: %s", e)
+            try:
+                error_response = {"status": "error", "message": str(e)}
+                if dau == giao_thuc.MAGIC[:1]:
+                    giao_thuc.gui_khung(client_socket, error_response)
+                else:
+                    client_socket.sendall(json.dumps(error_response).encode() + b"\n")
+            except OSError:
+                pass
         except json.JSONDecodeError as e:
-            self.logger.error(f"✗ JSON không hợp lệ: {e}")
+            self.logger.error("✗ JSON không hợp lệ: %s", e)
             error_response = {"status": "error", "message": "JSON không hợp lệ"}
             client_socket.sendall(json.dumps(error_response).encode() + b"\n")
         except Exception as e:
-            self.logger.error(f"✗ Lỗi xử lý client: {e}", exc_info=True)
+            self.logger.error("✗ Lỗi xử lý client: %s", e, exc_info=True)
         finally:
             try:
                 client_socket.close()
             except:
                 pass
     
-    def _xu_ly_request(self, request: dict) -> dict:
+    @staticmethod
+    def _chuyen_request_json(request: dict) -> dict:
+        """
+        Đổi các value dạng chuỗi của request JSON kiểu cũ sang bytes (utf-8)
+        """
+        for truong in ("value", "expected"):
+            if isinstance(request.get(truong), str):
+                request[truong] = request[truong].encode()
+        if isinstance(request.get("data"), dict):
+            request["data"] = {
+                key: value.encode() if isinstance(value, str) else value
+                for key, value in request["data"].items()
+            }
+        return request
+    
+    def _xu_ly_request(self, request: dict, thoi_diem_nhan: Optional[float] = None) -> dict:
         """
         Xử lý một client request
         
@@ -288,32 +655,120 @@ class Node:
         - GET: Lấy value
         - DELETE: Xóa key
         - JOIN: Node mới tham gia cluster
+        - MEMBERSHIP_UPDATE: Thay đổi thành viên (có epoch) lan truyền từ node khác
         - HEARTBEAT: Kiểm tra node còn sống
         - REPLICATE: Nhân bản dữ liệu
         - GET_ALL_DATA: Lấy tất cả dữ liệu
         - SYNC_DATA: Đồng bộ dữ liệu
         - GET_STATS: Lấy thống kê
+        - SNAPSHOT: Chụp ảnh dữ liệu xuống đĩa ngay
+        - SCAN: Quét key theo tiền tố/khoảng trên toàn cluster (có phân trang)
+        - SCAN_LOCAL: Quét key theo tiền tố/khoảng trên node này
+        - INCR / DECR: Tăng/giảm nguyên tử một số nguyên
+        - CAS: Compare-and-set
+        - APPEND: Nối chuỗi vào cuối value
+        - HOT_KEYS: Các key được đọc/ghi nhiều nhất tại node này
+        - TRACES: Các span truy vết gần nhất của node này
+        - SLOW_LOG: Các request chậm gần nhất (và đổi ngưỡng) của node này
+        - PROFILE: Lấy mẫu ngăn xếp mọi thread trong N giây (collapsed stacks)
+        
+        Độ trễ của mỗi request được ghi vào biểu đồ (lệnh, "local" hoặc "chuyen_tiep");
+        đọc/ghi được xử lý tại node này được đếm vào bộ theo dõi key nóng.
+        Request kèm vết ("vet") được lấy mẫu sẽ ghi một span; response mang trace_id.
+        Request vượt ngưỡng chậm được ghi kèm thời gian từng giai đoạn
+        (thoi_diem_nhan: lúc accept kết nối, None nếu gọi trực tiếp)
         """
         cmd = request.get("command")
-        
+        ngu_canh = self._ngu_canh_request
+        ngu_canh.da_chuyen_tiep = False
+        giai_doan = request_cham.tao_giai_doan() if self.request_cham.dang_bat else None
+        ngu_canh.giai_doan = giai_doan
+        
+        vet = request.get("vet")
+        if vet is None and self.bo_ghi_vet.nen_lay_mau():
+            vet = theo_vet.tao_ngu_canh(True)
+        span_id = theo_vet.tao_id() if vet is not None and vet.get("mau") else None
+        ngu_canh.vet = vet
+        ngu_canh.span = span_id
+        
+        bat_dau = time.perf_counter()
+        response = None
+        try:
+            response = self._thuc_thi_lenh(cmd, request)
+            if vet is not None:
+                response["trace_id"] = vet["id"]
+            return response
+        finally:
+            thoi_gian = time.perf_counter() - bat_dau
+            duong_di = "chuyen_tiep" if ngu_canh.da_chuyen_tiep else "local"
+            self.do_tre.ghi(cmd if cmd in CAC_LENH else "KHAC", duong_di, thoi_gian)
+            if giai_doan is not None:
+                ngu_canh.giai_doan = None
+                if thoi_diem_nhan is not None:
+                    giai_doan["cho_xu_ly"] = bat_dau - thoi_diem_nhan
+                self._ghi_neu_cham(cmd, request, thoi_gian, giai_doan, duong_di, response, vet)
+            if span_id is not None:
+                self.bo_ghi_vet.ghi(
+                    vet["id"], span_id, vet.get("cha"), str(cmd),
+                    time.time() - thoi_gian, thoi_gian,
+                    key=request.get("key"), duong_di=duong_di,
+                    trang_thai=response.get("status") if response else "loi"
+                )
+            if self.key_nong_doc is not None and not ngu_canh.da_chuyen_tiep:
+                key = request.get("key")
+                if isinstance(key, str):
+                    if cmd == "GET":
+                        self.key_nong_doc.ghi_nhan(key)
+                    elif cmd in CAC_LENH_GHI:
+                        self.key_nong_ghi.ghi_nhan(key)
+    
+    def _thuc_thi_lenh(self, cmd: Optional[str], request: dict) -> dict:
+        """
+        Gọi hàm xử lý tương ứng với lệnh (xem _xu_ly_request)
+        """
         if cmd == "PUT":
-            return self._xu_ly_put(request["key"], request["value"])
+            return self._xu_ly_put(request["key"], request["value"], request.get("ttl"))
         elif cmd == "GET":
             return self._xu_ly_get(request["key"])
         elif cmd == "DELETE":
             return self._xu_ly_delete(request["key"])
         elif cmd == "JOIN":
             return self._xu_ly_join(request["node_id"], request["host"], request["port"])
+        elif cmd == "MEMBERSHIP_UPDATE":
+            return self._xu_ly_cap_nhat_thanh_vien(request)
         elif cmd == "HEARTBEAT":
             return self._xu_ly_heartbeat(request["node_id"])
         elif cmd == "REPLICATE":
-            return self._xu_ly_nhan_ban(request["key"], request.get("value"))
+            return self._xu_ly_nhan_ban(request["key"], request.get("value"), request.get("het_han"),
+                                        request.get("phien_ban"))
         elif cmd == "GET_ALL_DATA":
-            return self._xu_ly_lay_tat_ca_du_lieu()
+            return self._xu_ly_lay_tat_ca_du_lieu(request)
         elif cmd == "SYNC_DATA":
-            return self._xu_ly_dong_bo_du_lieu(request["data"])
+            return self._xu_ly_dong_bo_du_lieu(request["data"], request.get("het_han"))
         elif cmd == "GET_STATS":
             return self._xu_ly_lay_thong_ke()
+        elif cmd == "SNAPSHOT":
+            if self.chup_anh():
+                return {"status": "success", "snapshot": dict(self.thong_tin_anh_chup)}
+            return {"status": "error", "message": "Không thể chụp ảnh (chưa bật WAL hoặc đang chụp)"}
+        elif cmd in ("INCR", "DECR", "CAS", "APPEND"):
+            return self._xu_ly_nguyen_tu(request)
+        elif cmd == "SCAN":
+            return self._xu_ly_quet(request)
+        elif cmd == "SCAN_LOCAL":
+            return self._xu_ly_quet_local(request)
+        elif cmd == "HOT_KEYS":
+            return self._xu_ly_key_nong(request)
+        elif cmd == "TRACES":
+            return {
+                "status": "success",
+                "node_id": self.node_id,
+                "spans": self.bo_ghi_vet.lay(request.get("trace_id"), int(request.get("gioi_han", 200)))
+            }
+        elif cmd == "SLOW_LOG":
+            return self._xu_ly_request_cham(request)
+        elif cmd == "PROFILE":
+            return self._xu_ly_phan_tich_cpu(request)
         else:
             return {"status": "error", "message": f"Lệnh không xác định: {cmd}"}
     
@@ -367,36 +822,129 @@ class Node:
     #     self.logger.info(f"✓ PUT {key}={value}, đã nhân bản đến {cac_node_chiu_trach_nhiem}")
     #     return {"status": "success"}
     
-    def _xu_ly_put(self, key: str, value: str) -> dict:
+    def _xu_ly_put(self, key: str, value: GiaTri, ttl: Optional[float] = None) -> dict:
+        if ttl is not None:
+            try:
+                ttl = float(ttl)
+            except (TypeError, ValueError):
+                return {"status": "error", "message": "ttl phải là số giây"}
+            if not (math.isfinite(ttl) and ttl > 0):
+                return {"status": "error", "message": "ttl phải là số giây dương, hữu hạn"}
+
         responsible_nodes = self.lay_cac_node_chiu_trach_nhiem(key)
         if self.node_id not in responsible_nodes:
             node_chinh = responsible_nodes[0]
             if node_chinh in self.cac_node_khac:
                 with self.khoa_thong_ke:
                     self.thong_ke['so_lan_chuyen_tiep'] += 1
-                return self._chuyen_tiep_request(node_chinh, {
+                request = {
                     "command": "PUT",
                     "key": key,
                     "value": value
-                })
+                }
+                if ttl is not None:
+                    request["ttl"] = ttl
+                return self._chuyen_tiep_request(node_chinh, request)
             return {"status": "error", "message": "Node chính không khả dụng"}
 
+        # Node chính tính thời điểm hết hạn tuyệt đối, các replica dùng chung giá trị này
+        het_han = time.time() + ttl if ttl is not None else None
+
         # Ghi local
-        with self.khoa_du_lieu:
-            self.du_lieu[key] = value
+        seq = self.du_lieu.dat(key, value, het_han)
+        self._cho_nhat_ky(seq)
         with self.khoa_thong_ke:
             self.thong_ke['so_lan_put'] += 1
 
-        # Nhân bản đến replica
-        for nid in responsible_nodes:
+        self._nhan_ban_den_replica(responsible_nodes, key, value, het_han)
+        return {"status": "success"}
+
+    def _nhan_ban_den_replica(self, cac_node_chiu_trach_nhiem: List[str], key: str,
+                              value: GiaTri, het_han: Optional[float] = None,
+                              phien_ban: Optional[int] = None):
+        """
+        Nhân bản bất đồng bộ một giá trị đã ghi local đến các replica còn sống
+        (phien_ban: phiên bản của thao tác nguyên tử, None = ghi thường)
+        """
+        vet = self._ngu_canh_vet_con()
+        for nid in cac_node_chiu_trach_nhiem:
             if nid != self.node_id and nid in self.cac_node_khac:
                 threading.Thread(
                     target=self._nhan_ban_den_node,
-                    args=(nid, key, value),
-                    daemon=True
+                    args=(nid, key, value, het_han, vet, phien_ban),
+                    daemon=True,
+                    name=f"NhanBan-{nid}"
                 ).start()
 
-        return {"status": "success"}
+    def _xu_ly_nguyen_tu(self, request: dict) -> dict:
+        """
+        Xử lý INCR / DECR / CAS / APPEND nguyên tử tại node chính
+
+        Quy trình:
+        1. Chỉ node chính (node đầu tiên trên vòng băm) thực thi, node khác chuyển tiếp
+           -> mọi thao tác trên một key được tuần tự hóa tại một chỗ
+        2. Đọc - tính - ghi trong khóa mảnh (du_lieu.bien_doi)
+        3. Nhân bản GIÁ TRỊ KẾT QUẢ kèm phiên bản đến replica; các thread nhân bản
+           không có thứ tự, replica bỏ qua kết quả cũ hơn kết quả đã áp dụng
+
+        Request:
+        - INCR / DECR: {"key", "delta" (mặc định 1)}, key chưa có coi như 0
+        - CAS: {"key", "expected" (None = key phải chưa tồn tại), "value"}
+        - APPEND: {"key", "value"}, key chưa có coi như chuỗi rỗng
+
+        Ví dụ: INCR views:home -> 1 hop mạng thay vì GET + PUT (2-4 hop, có tranh chấp)
+        """
+        cmd = request["command"]
+        key = request["key"]
+        cac_node_chiu_trach_nhiem = self.lay_cac_node_chiu_trach_nhiem(key)
+        node_chinh = cac_node_chiu_trach_nhiem[0]
+
+        if node_chinh != self.node_id:
+            if node_chinh in self.cac_node_khac:
+                with self.khoa_thong_ke:
+                    self.thong_ke['so_lan_chuyen_tiep'] += 1
+                return self._chuyen_tiep_request(node_chinh, request)
+            return {"status": "error", "message": "Node chính không khả dụng"}
+
+        if cmd in ("INCR", "DECR"):
+            try:
+                delta = int(request.get("delta", 1))
+            except (TypeError, ValueError):
+                return {"status": "error", "message": "delta phải là số nguyên"}
+            if cmd == "DECR":
+                delta = -delta
+
+            def ham(cu: Optional[GiaTri]) -> GiaTri:
+                return str((int(cu) if cu is not None else 0) + delta).encode()
+        elif cmd == "CAS":
+            mong_doi = request.get("expected")
+            value_moi = request["value"]
+
+            def ham(cu: Optional[GiaTri]) -> Optional[GiaTri]:
+                return value_moi if cu == mong_doi else None
+        else:
+            phan_them = request["value"]
+
+            def ham(cu: Optional[GiaTri]) -> GiaTri:
+                return (cu or b"") + phan_them
+
+        try:
+            cu, moi, het_han, seq, phien_ban = self.du_lieu.bien_doi(key, ham)
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "Value hiện tại không phải số nguyên"}
+
+        if moi is not None:
+            self._cho_nhat_ky(seq)
+            with self.khoa_thong_ke:
+                self.thong_ke['so_lan_nguyen_tu'] += 1
+            self._nhan_ban_den_replica(cac_node_chiu_trach_nhiem, key, moi, het_han, phien_ban)
+
+        if cmd == "CAS":
+            return {"status": "success", "swapped": moi is not None,
+                    "value": moi if moi is not None else cu}
+        if cmd == "APPEND":
+            return {"status": "success", "length": len(moi)}
+        return {"status": "success", "value": int(moi)}
 
     def _xu_ly_get(self, key: str) -> dict:
         """
@@ -416,14 +964,13 @@ class Node:
         
         # Kiểm tra xem node này có phải chịu trách nhiệm không
         if self.node_id in cac_node_chiu_trach_nhiem:
-            with self.khoa_du_lieu:
-                value = self.du_lieu.get(key)
+            value = self.du_lieu.get(key)
             
             with self.khoa_thong_ke:
                 self.thong_ke['so_lan_get'] += 1
             
             if value is not None:
-                self.logger.debug(f"✓ GET {key} = {value}")
+                self.logger.debug("✓ GET %s (%d bytes)", key, len(value))
                 return {"status": "success", "value": value}
             else:
                 return {"status": "error", "message": "Không tìm thấy key"}
@@ -431,7 +978,7 @@ class Node:
         # Chuyển tiếp đến node chính
         node_chinh = cac_node_chiu_trach_nhiem[0]
         if node_chinh in self.cac_node_khac:
-            self.logger.debug(f"→ Chuyển tiếp GET {key} đến {node_chinh}")
+            self.logger.debug("→ Chuyển tiếp GET %s đến %s", key, node_chinh)
             with self.khoa_thong_ke:
                 self.thong_ke['so_lan_chuyen_tiep'] += 1
             return self._chuyen_tiep_request(node_chinh, {"command": "GET", "key": key})
@@ -453,36 +1000,38 @@ class Node:
         if self.node_id not in cac_node_chiu_trach_nhiem:
             node_chinh = cac_node_chiu_trach_nhiem[0]
             if node_chinh in self.cac_node_khac:
-                self.logger.info(f"→ Chuyển tiếp DELETE {key} đến {node_chinh}")
+                self.logger.debug("→ Chuyển tiếp DELETE %s đến %s", key, node_chinh)
                 with self.khoa_thong_ke:
                     self.thong_ke['so_lan_chuyen_tiep'] += 1
                 return self._chuyen_tiep_request(node_chinh, {"command": "DELETE", "key": key})
             return {"status": "error", "message": "Node chịu trách nhiệm không khả dụng"}
         
         # Xóa tại local
-        with self.khoa_du_lieu:
-            da_xoa = self.du_lieu.pop(key, None) is not None
+        da_xoa, seq = self.du_lieu.xoa(key)
+        self._cho_nhat_ky(seq)
         
         with self.khoa_thong_ke:
             self.thong_ke['so_lan_delete'] += 1
         
         # Lan truyền xóa đến replicas
+        vet = self._ngu_canh_vet_con()
         for node_id in cac_node_chiu_trach_nhiem:
             if node_id != self.node_id and node_id in self.cac_node_khac:
                 threading.Thread(
                     target=self._xoa_tu_node,
-                    args=(node_id, key),
+                    args=(node_id, key, vet),
                     daemon=True,
                     name=f"Xoa-{node_id}"
                 ).start()
         
-        self.logger.info(f"✓ DELETE {key}")
+        self.logger.debug("✓ DELETE %s", key)
         return {
             "status": "success" if da_xoa else "error",
             "message": "Đã xóa key" if da_xoa else "Không tìm thấy key"
         }
     
-    def _xu_ly_nhan_ban(self, key: str, value: Optional[str]) -> dict:
+    def _xu_ly_nhan_ban(self, key: str, value: Optional[GiaTri], het_han: Optional[float] = None,
+                        phien_ban: Optional[int] = None) -> dict:
         """
         Xử lý request nhân bản từ node khác
         
@@ -491,6 +1040,9 @@ class Node:
         Tham số:
             key: Key cần nhân bản
             value: Value cần lưu (None = xóa)
+            het_han: Thời điểm hết hạn tuyệt đối do node chính tính (None = không hết hạn)
+            phien_ban: Phiên bản của thao tác nguyên tử (None = ghi thường); kết quả
+                đến muộn không mới hơn phiên bản đang giữ bị bỏ qua
         """
         # with self.khoa_du_lieu:
         #     if value is None:
@@ -509,11 +1061,8 @@ class Node:
         
     # Bỏ qua việc kiểm tra lay_cac_node_chiu_trach_nhiem tại đây để tránh sai số vòng băm
         
-        with self.khoa_du_lieu:
-            if value is None:
-                self.du_lieu.pop(key, None)
-            else:
-                self.du_lieu[key] = value
+        seq = self.du_lieu.ap_dung(key, value, het_han, phien_ban)
+        self._cho_nhat_ky(seq)
         
         with self.khoa_thong_ke:
             # Tăng thống kê để dễ theo dõi trong log
@@ -548,47 +1097,214 @@ class Node:
     #     with self.khoa_node_khac:
     #         return {"status": "success", "peers": dict(self.cac_node_khac)}
     def _xu_ly_join(self, node_id: str, host: str, port: int) -> dict:
-        if node_id == self.node_id:
-            return {"status": "success", "peers": dict(self.cac_node_khac)}
-
-        with self.khoa_node_khac:
-            # Nếu node mới chưa có trong danh sách
-            if node_id not in self.cac_node_khac:
-                self.cac_node_khac[node_id] = (host, port)
-
-        # Thông báo cho tất cả peers về node mới
-        self._phat_thong_tin_node_moi(node_id, host, port)
-
-        # Trả về danh sách peers đầy đủ (bao gồm cả node mới)
+        """
+        Xử lý JOIN từ node mới (node này là seed)
+        
+        Quy trình:
+        1. Gán cho thay đổi một epoch mới, thêm node vào danh sách peers
+        2. Trả lời ngay danh sách peers + epoch cho node mới
+        3. Lan truyền thay đổi đến các peer khác ở thread nền (cây fan-out giới hạn)
+        """
         with self.khoa_node_khac:
-            peers = dict(self.cac_node_khac)
+            if node_id == self.node_id:
+                return {"status": "success", "peers": dict(self.cac_node_khac), "epoch": self.epoch_thanh_vien}
+            self.epoch_thanh_vien += 1
+            epoch = self.epoch_thanh_vien
+            self.epoch_node[node_id] = epoch
+            self.cac_node_khac[node_id] = (host, port)
+            peers = {nid: dia_chi for nid, dia_chi in self.cac_node_khac.items() if nid != node_id}
+        if self.gossip is not None:
+            self.gossip.them_thanh_vien(node_id, (host, port))
+        self._theo_doi_peer_moi([node_id])
+        
+        self.logger.info("✓ Node %s tham gia cluster (epoch %d)", node_id, epoch)
+        threading.Thread(
+            target=self._phat_thong_tin_node_moi,
+            args=(node_id, host, port, epoch, [(nid, dia_chi) for nid, dia_chi in peers.items()]),
+            daemon=True,
+            name="PhatTanThanhVien"
+        ).start()
+        
         peers[self.node_id] = (self.host, self.port)  # thêm chính node
-        return {"status": "success", "peers": peers}
+        return {"status": "success", "peers": peers, "epoch": epoch}
+    
+    def _xu_ly_cap_nhat_thanh_vien(self, request: dict) -> dict:
+        """
+        Xử lý MEMBERSHIP_UPDATE: áp dụng nếu epoch mới hơn epoch đã biết của node đó,
+        rồi chuyển tiếp cho phần cây con được giao (trường "chuyen_tiep")
+        """
+        node_id = request["node_id"]
+        dia_chi = (request["host"], request["port"])
+        epoch = request["epoch"]
+        
+        with self.khoa_node_khac:
+            self.epoch_thanh_vien = max(self.epoch_thanh_vien, epoch)
+            moi = node_id != self.node_id and epoch > self.epoch_node.get(node_id, 0)
+            if moi:
+                self.epoch_node[node_id] = epoch
+                self.cac_node_khac[node_id] = dia_chi
+        if moi and self.gossip is not None:
+            self.gossip.them_thanh_vien(node_id, dia_chi)
+        if moi:
+            self._theo_doi_peer_moi([node_id])
+        
+        # Cây con được giao là riêng của node này: vẫn chuyển tiếp kể cả khi
+        # cập nhật đã biết (đến theo đường khác), nếu không cây con sẽ bị bỏ sót
+        cac_dich = [(nid, (host, port)) for nid, host, port in request.get("chuyen_tiep", ())]
+        if cac_dich:
+            threading.Thread(
+                target=self._phat_thong_tin_node_moi,
+                args=(node_id, dia_chi[0], dia_chi[1], epoch, cac_dich),
+                daemon=True,
+                name="PhatTanThanhVien"
+            ).start()
+        return {"status": "success", "moi": moi}
 
 
 
+    def _theo_doi_peer_moi(self, cac_node_id: List[str]):
+        """
+        Chế độ heartbeat: ghi nhận peer vừa được thêm vào cac_node_khac như một heartbeat
+        
+        Giải thích: Bộ phát hiện lỗi chỉ loại các peer đã có lịch sử heartbeat;
+        peer biết qua JOIN/danh sách peers mà chết trước heartbeat đầu tiên sẽ
+        nằm trên vòng băm mãi mãi nếu không được ghi nhận ngay khi thêm
+        (chế độ gossip tự theo dõi qua them_thanh_vien)
+        """
+        if self.gossip is None:
+            for node_id in cac_node_id:
+                self.bo_phat_hien_loi.ghi_nhan(node_id)
+    
     def _xu_ly_heartbeat(self, node_id: str) -> dict:
         """
-        Xử lý heartbeat từ node khác
+        Xử lý heartbeat từ node khác (gói UDP "hb" hoặc lệnh HEARTBEAT qua TCP)
         
         Giải thích: Cập nhật thời gian heartbeat cuối cùng
         Dùng để phát hiện node bị lỗi
         """
-        with self.khoa_heartbeat:
-            self.heartbeat_cuoi[node_id] = time.time()
+        self.bo_phat_hien_loi.ghi_nhan(node_id)
         
-        self.logger.debug(f"♥ Nhận heartbeat từ {node_id}")
+        self.logger.debug("♥ Nhận heartbeat từ %s", node_id)
         return {"status": "success"}
     
-    def _xu_ly_lay_tat_ca_du_lieu(self) -> dict:
+    def _xu_ly_lay_tat_ca_du_lieu(self, request: dict) -> dict:
         """
-        Trả về tất cả dữ liệu được lưu trong node này
+        Trả về dữ liệu được lưu trong node này, toàn bộ hoặc theo trang
         
         Dùng cho: Đồng bộ dữ liệu khi node mới join
+        Key đã hết hạn không được gửi đi; key có TTL kèm thời điểm hết hạn
+        
+        Giải thích: Có "kich_thuoc_trang" thì chỉ trả một trang theo thứ tự
+        key kèm "cursor" (None = hết) để mỗi response nằm trong giới hạn
+        khung. Value lớn hơn một đoạn được trả một mình qua "key"/"value"
+        để được gửi thành các khung đoạn. Không có "kich_thuoc_trang" thì
+        trả toàn bộ như cũ.
         """
-        with self.khoa_du_lieu:
-            return {"status": "success", "data": dict(self.du_lieu)}
+        kich_thuoc_trang = request.get("kich_thuoc_trang")
+        if not kich_thuoc_trang:
+            du_lieu, het_han = self.du_lieu.ban_sao_day_du()
+            return {"status": "success", "data": du_lieu, "het_han": het_han}
+        
+        kich_thuoc_trang = max(1, min(int(kich_thuoc_trang), self.kich_thuoc_khung_toi_da // 2))
+        du_lieu, het_han, con_nua = self.du_lieu.trang_day_du(
+            request.get("cursor"), kich_thuoc_trang, kich_thuoc_rieng=KICH_THUOC_DOAN
+        )
+        response = {"status": "success", "data": du_lieu, "het_han": het_han,
+                    "cursor": max(du_lieu) if con_nua else None}
+        if len(du_lieu) == 1:
+            key, value = next(iter(du_lieu.items()))
+            if len(value) > KICH_THUOC_DOAN:
+                response.update(data={}, key=key, value=value)
+        return response
     
+    def _tham_so_quet(self, request: dict) -> Tuple[Optional[str], Optional[str], int, Optional[str]]:
+        """
+        Đọc tham số SCAN: prefix hoặc start/end, limit, cursor
+
+        Trả về:
+            (cận dưới, cận trên không bao gồm, số key tối đa, con trỏ tiếp tục)
+        """
+        tien_to = request.get("prefix")
+        if tien_to:
+            bat_dau, ket_thuc = tien_to, can_tren_cua_tien_to(tien_to)
+        else:
+            bat_dau, ket_thuc = request.get("start"), request.get("end")
+        gioi_han = int(request.get("limit") or GIOI_HAN_QUET_MAC_DINH)
+        gioi_han = max(1, min(gioi_han, GIOI_HAN_QUET_TOI_DA))
+        return bat_dau, ket_thuc, gioi_han, request.get("cursor")
+
+    def _xu_ly_quet_local(self, request: dict) -> dict:
+        """
+        Quét key còn hạn theo thứ tự trên node này (gồm cả các bản sao)
+        """
+        bat_dau, ket_thuc, gioi_han, con_tro = self._tham_so_quet(request)
+        cac_cap, con_nua = self.du_lieu.quet(bat_dau, ket_thuc, gioi_han, con_tro)
+        return {"status": "success", "items": cac_cap, "more": con_nua}
+
+    def _xu_ly_quet(self, request: dict) -> dict:
+        """
+        Quét key theo tiền tố/khoảng trên toàn cluster
+
+        Quy trình:
+        1. Gửi SCAN_LOCAL song song đến mọi node (kể cả chính mình),
+           mỗi node trả về tối đa limit key đầu tiên sau cursor
+        2. Trộn các danh sách đã sắp xếp (heapq.merge), bỏ key trùng do nhân bản
+        3. Lấy limit key đầu tiên; cursor = key cuối cùng nếu còn dữ liệu
+
+        Giải thích: limit key nhỏ nhất của cả cluster chắc chắn nằm trong
+        limit key nhỏ nhất của từng node, nên mỗi trang chỉ tốn một vòng
+        hỏi song song thay vì lấy toàn bộ dữ liệu (GET_ALL_DATA).
+        Node nào không trả lời thì trang có thể thiếu key: response mang
+        "khong_day_du": True và số node lỗi để client thử lại hoặc báo lỗi.
+        """
+        _, _, gioi_han, _ = self._tham_so_quet(request)
+        request_local = {**request, "command": "SCAN_LOCAL"}
+
+        with self.khoa_node_khac:
+            cac_peer = list(self.cac_node_khac.keys())
+
+        ket_qua_peer: Dict[str, dict] = {}
+
+        def hoi_peer(nid: str):
+            ket_qua_peer[nid] = self._chuyen_tiep_request(nid, request_local)
+
+        cac_thread = [threading.Thread(target=hoi_peer, args=(nid,), daemon=True, name=f"Quet-{nid}")
+                      for nid in cac_peer]
+        for t in cac_thread:
+            t.start()
+        ket_qua_peer[self.node_id] = self._xu_ly_quet_local(request_local)
+        for t in cac_thread:
+            t.join()
+
+        cac_danh_sach = []
+        con_nua = False
+        so_node_loi = 0
+        for response in ket_qua_peer.values():
+            if response.get("status") != "success":
+                so_node_loi += 1
+                continue
+            cac_danh_sach.append(response["items"])
+            con_nua = con_nua or response.get("more", False)
+
+        cac_cap: List[Tuple[str, GiaTri]] = []
+        for key, value in heapq.merge(*cac_danh_sach, key=lambda cap: cap[0]):
+            if cac_cap and cac_cap[-1][0] == key:
+                continue
+            if len(cac_cap) == gioi_han:
+                con_nua = True
+                break
+            cac_cap.append((key, value))
+
+        if so_node_loi:
+            self.logger.warning("⚠ SCAN thiếu dữ liệu: %d node không trả lời SCAN_LOCAL", so_node_loi)
+        return {
+            "status": "success",
+            "items": cac_cap,
+            "cursor": cac_cap[-1][0] if con_nua and cac_cap else None,
+            "so_node_loi": so_node_loi,
+            "khong_day_du": so_node_loi > 0
+        }
+
     # def _xu_ly_dong_bo_du_lieu(self, data: dict) -> dict:
     #     """
     #     Đồng bộ dữ liệu từ node khác
@@ -605,15 +1321,12 @@ class Node:
         
     #     self.logger.info(f"✓ Đã đồng bộ {so_key_dong_bo} keys từ peer")
     #     return {"status": "success"}
-    def _xu_ly_dong_bo_du_lieu(self, data: dict) -> dict:
-        so_key_dong_bo = 0
-        with self.khoa_du_lieu:
-            for key, value in data.items():
-                cac_node_chiu_trach_nhiem = self.lay_cac_node_chiu_trach_nhiem(key)
-                if self.node_id in cac_node_chiu_trach_nhiem:
-                    self.du_lieu[key] = value
-                    so_key_dong_bo += 1
-        self.logger.info(f"🔄 Đồng bộ {so_key_dong_bo} keys từ peer")
+    def _xu_ly_dong_bo_du_lieu(self, data: dict, het_han: Optional[dict] = None) -> dict:
+        # Lọc theo vòng băm TRƯỚC, rồi mới khóa từng mảnh để ghi hàng loạt
+        so_key_dong_bo = self.du_lieu.ap_dung_hang_loat(
+            self._loc_key_chiu_trach_nhiem(data), cac_het_han=het_han
+        )
+        self.logger.info("🔄 Đồng bộ %d keys từ peer", so_key_dong_bo)
         return {"status": "success"}
 
     
@@ -623,15 +1336,143 @@ class Node:
         """
         with self.khoa_thong_ke:
             thoi_gian_hoat_dong = time.time() - self.thong_ke['thoi_gian_bat_dau']
-            return {
-                "status": "success",
-                "stats": {
-                    **self.thong_ke,
-                    "thoi_gian_hoat_dong": thoi_gian_hoat_dong,
-                    "so_key": len(self.du_lieu),
-                    "so_peer": len(self.cac_node_khac)
-                }
+            stats = {
+                **self.thong_ke,
+                "thoi_gian_hoat_dong": thoi_gian_hoat_dong,
+                "so_key": len(self.du_lieu),
+                "so_peer": len(self.cac_node_khac),
+                "bo_nho": self.du_lieu.lay_thong_ke()
             }
+        stats["do_tre"] = self.do_tre.lay_thong_ke()
+        stats["vet"] = self.bo_ghi_vet.lay_thong_ke()
+        stats["request_cham"] = self.request_cham.lay_thong_ke()
+        stats["thread"] = khoa_do_dac.dieu_tra_thread()
+        if self.do_dac_khoa:
+            stats["khoa"] = {ten: khoa.lay_thong_ke() for ten, khoa in self.cac_khoa_do_dac.items()}
+            stats["khoa"]["manh_du_lieu"] = self.du_lieu.lay_thong_ke_khoa()
+        stats["thanh_vien"] = {"che_do": self.che_do_thanh_vien}
+        if self.gossip is not None:
+            stats["thanh_vien"].update(self.gossip.lay_thong_ke())
+            # Phi-accrual chỉ chạy ở chế độ heartbeat; gossip dùng trạng thái nghi ngờ của SWIM
+            stats["thanh_vien"]["phi"] = None
+        else:
+            stats["thanh_vien"].update(self.bo_phat_hien_loi.lay_thong_ke())
+            with self.khoa_rtt:
+                stats["thanh_vien"]["rtt_ms"] = {
+                    node_id: {"cuoi": round(muc["cuoi"] * 1000, 3), "tb": round(muc["tb"] * 1000, 3)}
+                    for node_id, muc in self.rtt_heartbeat.items()
+                }
+        if self.nhat_ky is not None:
+            stats["wal"] = self.nhat_ky.lay_thong_ke()
+            stats["anh_chup"] = dict(self.thong_tin_anh_chup)
+        return {"status": "success", "stats": stats}
+    
+    def _xu_ly_key_nong(self, request: dict) -> dict:
+        """
+        Trả về các key nóng của node này
+
+        Request: {"k": số key mỗi loại (mặc định 10)}
+        Response: {"node_id", "cua_so" (giây), "doc": {...}, "ghi": {...}}
+            mỗi loại gồm "tong_toc_do" và "cac_key" (xem BoDemKeyNong.lay_key_nong)
+        """
+        if self.key_nong_doc is None:
+            return {"status": "error", "message": "Node không bật theo dõi key nóng"}
+        try:
+            k = max(1, min(int(request.get("k", 10)), self.key_nong_doc.so_key_theo_doi))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "k phải là số nguyên"}
+        return {
+            "status": "success",
+            "node_id": self.node_id,
+            "cua_so": self.key_nong_doc.cua_so,
+            "doc": self.key_nong_doc.lay_key_nong(k),
+            "ghi": self.key_nong_ghi.lay_key_nong(k),
+        }
+    
+    def _xu_ly_request_cham(self, request: dict) -> dict:
+        """
+        Trả về các request chậm gần nhất của node này
+
+        Request: {"gioi_han": số mục (mặc định 50), "nguong_ms": ngưỡng mới (tùy chọn, 0 = tắt)}
+        Response: {"node_id", "nguong_ms", "cac_request": [{"thoi_diem", "lenh", "key",
+            "tong_ms", "giai_doan_ms": {giai đoạn: ms}, "duong_di", "trang_thai", "trace_id"}]}
+            mới nhất trước
+        """
+        try:
+            gioi_han = int(request.get("gioi_han", 50))
+            if request.get("nguong_ms") is not None:
+                self.request_cham.nguong_ms = max(0.0, float(request["nguong_ms"]))
+                self.logger.info("✓ Ngưỡng request chậm: %.1f ms", self.request_cham.nguong_ms)
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "gioi_han / nguong_ms phải là số"}
+        return {
+            "status": "success",
+            "node_id": self.node_id,
+            "nguong_ms": self.request_cham.nguong_ms,
+            "cac_request": self.request_cham.lay(gioi_han),
+        }
+    
+    def _xu_ly_phan_tich_cpu(self, request: dict) -> dict:
+        """
+        Lấy mẫu CPU của node trong N giây rồi trả về ngăn xếp gộp
+
+        Request: {"giay": thời gian (mặc định 5, tối đa 60), "khoang_ms": chu kỳ (mặc định 10),
+                  "che_do": "cpu" (chỉ thread đang dùng CPU) | "tuong" (mọi thread)}
+        Response: {"node_id", "che_do", "don_vi", "giay", "so_lan_lay_mau", "stacks"}
+            stacks ở định dạng collapsed ("vai_tro;hàm;...;hàm giá_trị" mỗi dòng)
+
+        Giải thích: Việc lấy mẫu chạy trong chính thread xử lý lệnh và tự dừng sau
+        N giây (hoặc khi node dừng); lúc không phân tích không có chi phí nào
+        """
+        try:
+            giay = float(request.get("giay", 5))
+            khoang = float(request.get("khoang_ms", 10)) / 1000
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "giay / khoang_ms phải là số"}
+        if not self.khoa_phan_tich.acquire(blocking=False):
+            return {"status": "error", "message": "Đang có một lần phân tích CPU khác"}
+        try:
+            self.logger.info("🔬 Bắt đầu phân tích CPU %.1fs", giay)
+            ket_qua = phan_tich_cpu.lay_mau(giay, khoang, request.get("che_do", "cpu"),
+                                            dang_chay=lambda: self.dang_chay)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        finally:
+            self.khoa_phan_tich.release()
+        self.logger.info("✓ Phân tích CPU xong: %d lần lấy mẫu", ket_qua["so_lan_lay_mau"])
+        return {"status": "success", "node_id": self.node_id, **ket_qua}
+    
+    def _cong_cho_khoa(self, giay: float):
+        """Cộng thời gian chờ khóa mảnh vào request đang xử lý trên thread này"""
+        giai_doan = getattr(self._ngu_canh_request, "giai_doan", None)
+        if giai_doan is not None:
+            giai_doan["cho_khoa"] += giay
+    
+    def _ghi_neu_cham(self, cmd: Optional[str], request: dict, thoi_gian: float,
+                      giai_doan: Dict[str, float], duong_di: str,
+                      response: Optional[dict], vet: Optional[dict]):
+        """
+        Ghi request vào nhật ký request chậm nếu vượt ngưỡng
+
+        Giải thích: ap_dung_local = thời gian xử lý trừ các giai đoạn đã đo riêng;
+        tổng = cho_xu_ly + thời gian xử lý
+        """
+        tong = giai_doan["cho_xu_ly"] + thoi_gian
+        if tong * 1000 < self.request_cham.nguong_ms:
+            return
+        da_do = giai_doan["tra_vong"] + giai_doan["cho_khoa"] + giai_doan["chuyen_tiep"] + giai_doan["cho_wal"]
+        giai_doan["ap_dung_local"] = max(0.0, thoi_gian - da_do)
+        key = request.get("key")
+        self.request_cham.ghi(
+            str(cmd), key if isinstance(key, str) else None, tong, giai_doan,
+            duong_di=duong_di,
+            trang_thai=response.get("status") if response else "loi",
+            trace_id=vet["id"] if vet is not None else None
+        )
+        cham_nhat = max(giai_doan, key=giai_doan.__getitem__)
+        self.logger.warning("🐢 Request chậm: %s %s %.1f ms (lâu nhất: %s %.1f ms)%s",
+                            cmd, key, tong * 1000, cham_nhat, giai_doan[cham_nhat] * 1000,
+                            theo_vet.nhan_log(vet))
     
     # ==================== GIAO TIẾP MẠNG ====================
     
@@ -674,6 +1515,19 @@ class Node:
     #     except Exception as e:
     #         self.logger.error(f"✗ Lỗi chuyển tiếp đến {node_id}: {e}")
     #         return {"status": "error", "message": str(e)}
+    def _ngu_canh_vet_con(self) -> Optional[dict]:
+        """
+        Ngữ cảnh vết để truyền sang hop con (node khác hoặc thread nhân bản)
+
+        Trả về:
+            {"id", "cha": span hiện tại, "mau"} hoặc None nếu request không có vết
+        """
+        ngu_canh = self._ngu_canh_request
+        vet = getattr(ngu_canh, "vet", None)
+        if vet is None:
+            return None
+        return {"id": vet["id"], "cha": getattr(ngu_canh, "span", None), "mau": vet.get("mau", False)}
+
     def _chuyen_tiep_request(self, node_id: str, request: dict) -> dict:
         if node_id == self.node_id:
             return {"status": "error", "message": "Không forward về chính mình"}
@@ -682,30 +1536,41 @@ class Node:
             return {"status": "error", "message": "Không tìm thấy node"}
 
         host, port = self.cac_node_khac[node_id]
+        self._ngu_canh_request.da_chuyen_tiep = True
 
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(5.0)
-                sock.connect((host, port))
-                sock.sendall(json.dumps(request).encode() + b"\n")
-
-                data = b""
-                while True:
-                    chunk = sock.recv(4096)
-                    if not chunk:
-                        break
-                    data += chunk
-                    if b"\n" in data:
-                        break
+        # Truyền vết sang node đích; nếu được lấy mẫu, RPC này là một span riêng
+        vet = self._ngu_canh_vet_con()
+        span_id = None
+        if vet is not None:
+            if vet["mau"]:
+                span_id = theo_vet.tao_id()
+                bat_dau = time.perf_counter()
+                request = {**request, "vet": {**vet, "cha": span_id}}
+            else:
+                request = {**request, "vet": vet}
 
-            return json.loads(data.decode().strip())
+        bat_dau_rpc = time.perf_counter()
+        try:
+            response = self._gui_nhan((host, port), request, timeout=5.0)
 
         except socket.timeout:
-            self.logger.error(f"✗ Timeout khi chuyển tiếp đến {node_id}")
-            return {"status": "error", "message": "Request timeout"}
+            self.logger.error("✗ Timeout khi chuyển tiếp đến %s%s", node_id, theo_vet.nhan_log(vet))
+            response = {"status": "error", "message": "Request timeout"}
         except Exception as e:
-            self.logger.error(f"✗ Lỗi chuyển tiếp đến {node_id}: {e}")
-            return {"status": "error", "message": str(e)}
+            self.logger.error("✗ Lỗi chuyển tiếp đến %s: %s%s", node_id, e, theo_vet.nhan_log(vet))
+            response = {"status": "error", "message": str(e)}
+
+        giai_doan = getattr(self._ngu_canh_request, "giai_doan", None)
+        if giai_doan is not None:
+            giai_doan["chuyen_tiep"] += time.perf_counter() - bat_dau_rpc
+        if span_id is not None:
+            thoi_gian = time.perf_counter() - bat_dau
+            self.bo_ghi_vet.ghi(
+                vet["id"], span_id, vet["cha"], f"rpc {request.get('command')}",
+                time.time() - thoi_gian, thoi_gian,
+                den=node_id, trang_thai=response.get("status")
+            )
+        return response
 
     
     # def _nhan_ban_den_node(self, node_id: str, key: str, value: str):
@@ -724,27 +1589,51 @@ class Node:
     #         self.logger.warning(f"⚠ Lỗi nhân bản {key} đến {node_id}")
     #     else:
     #         self.logger.debug(f"✓ Đã nhân bản {key} đến {node_id}")
-    def _nhan_ban_den_node(self, node_id: str, key: str, value: str):
+    def _nhan_ban_den_node(self, node_id: str, key: str, value: GiaTri, het_han: Optional[float] = None,
+                           vet: Optional[dict] = None, phien_ban: Optional[int] = None):
+        # Chạy trong thread riêng: nhận ngữ cảnh vết từ request gốc, các lần thử
+        # lại là span con của span "nhan_ban"
+        ngu_canh = self._ngu_canh_request
+        ngu_canh.vet = vet
+        ngu_canh.span = theo_vet.tao_id() if vet is not None and vet.get("mau") else None
+        bat_dau_thuc = time.time()
         max_retries = 3
+        request = {
+            "command": "REPLICATE",
+            "key": key,
+            "value": value
+        }
+        if het_han is not None:
+            request["het_han"] = het_han
+        if phien_ban is not None:
+            request["phien_ban"] = phien_ban
+        bat_dau = time.perf_counter()
         for attempt in range(max_retries):
-            response = self._chuyen_tiep_request(node_id, {
-                "command": "REPLICATE",
-                "key": key,
-                "value": value
-            })
+            response = self._chuyen_tiep_request(node_id, request)
             
             if response.get("status") == "success":
-                self.logger.debug(f"✓ Nhân bản thành công {key} đến {node_id}")
-                return
+                break
             
             time.sleep(0.5 * (attempt + 1)) # Backoff cơ bản
         
-        self.logger.error(f"✗ Thất bại vĩnh viễn khi nhân bản {key} đến {node_id}")
+        thoi_gian = time.perf_counter() - bat_dau
+        self.do_tre.ghi("REPLICATE", "nhan_ban", thoi_gian)
+        if ngu_canh.span is not None:
+            self.bo_ghi_vet.ghi(
+                vet["id"], ngu_canh.span, vet.get("cha"), "nhan_ban", bat_dau_thuc, thoi_gian,
+                key=key, den=node_id, so_lan_thu=attempt + 1, trang_thai=response.get("status")
+            )
+        if response.get("status") == "success":
+            self.logger.debug("✓ Nhân bản thành công %s đến %s%s", key, node_id, theo_vet.nhan_log(vet))
+        else:
+            self.logger.error("✗ Thất bại vĩnh viễn khi nhân bản %s đến %s%s", key, node_id, theo_vet.nhan_log(vet))
     
-    def _xoa_tu_node(self, node_id: str, key: str):
+    def _xoa_tu_node(self, node_id: str, key: str, vet: Optional[dict] = None):
         """
         Xóa một key từ node khác
         """
+        self._ngu_canh_request.vet = vet
+        self._ngu_canh_request.span = vet.get("cha") if vet is not None else None
         self._chuyen_tiep_request(node_id, {
             "command": "REPLICATE",
             "key": key,
@@ -772,76 +1661,203 @@ class Node:
     #                 self.logger.debug(f"→ Đã thông báo {peer_id} về node mới {node_id}")
     #             except:
     #                 pass
-    def _phat_thong_tin_node_moi(self, node_id: str, host: str, port: int):
-        with self.khoa_node_khac:
-            peers = list(self.cac_node_khac.keys())
+    def _phat_thong_tin_node_moi(self, node_id: str, host: str, port: int, epoch: int,
+                                 cac_dich: List[Tuple[str, Tuple[str, int]]]):
+        """
+        Lan truyền một thay đổi thành viên qua cây fan-out giới hạn
         
-        for peer_id in peers:
-            if peer_id != node_id:
+        Giải thích: cac_dich được chia thành tối đa he_so_phat_tan nhóm; node đầu
+        mỗi nhóm nhận MEMBERSHIP_UPDATE kèm phần còn lại của nhóm và tự chuyển
+        tiếp theo cùng cách. Mỗi node nhận đúng một tin: n - 1 tin cho cả cluster,
+        độ sâu log_k(n), mỗi node gửi tối đa k tin. Node đầu nhóm không trả lời
+        thì node kế tiếp trong nhóm nhận thay phần việc của nó.
+        """
+        if not cac_dich:
+            return
+        k = self.he_so_phat_tan
+        kich_thuoc_nhom = -(-len(cac_dich) // k)
+        cac_nhom = [cac_dich[i:i + kich_thuoc_nhom] for i in range(0, len(cac_dich), kich_thuoc_nhom)]
+        
+        def gui_nhom(nhom):
+            while nhom:
+                (dich_id, dia_chi), con_lai = nhom[0], nhom[1:]
+                with self.khoa_thong_ke:
+                    self.thong_ke['so_tin_thanh_vien'] += 1
                 try:
-                    self._chuyen_tiep_request(peer_id, {
-                        "command": "JOIN",
+                    self._gui_nhan(tuple(dia_chi), {
+                        "command": "MEMBERSHIP_UPDATE",
                         "node_id": node_id,
                         "host": host,
-                        "port": port
-                    })
+                        "port": port,
+                        "epoch": epoch,
+                        "chuyen_tiep": [[nid, d[0], d[1]] for nid, d in con_lai]
+                    }, timeout=2.0)
+                    return
                 except Exception as e:
-                    self.logger.debug(f"⚠ Lỗi thông báo node mới {node_id} đến {peer_id}: {e}")
+                    self.logger.debug("⚠ Lỗi thông báo node mới %s đến %s: %s", node_id, dich_id, e)
+                    nhom = con_lai
+        
+        cac_thread = [threading.Thread(target=gui_nhom, args=(nhom,), daemon=True, name="PhatTanThanhVien")
+                      for nhom in cac_nhom[1:]]
+        for t in cac_thread:
+            t.start()
+        gui_nhom(cac_nhom[0])
+        for t in cac_thread:
+            t.join()
 
 
+    def _gui_nhan(self, dia_chi: Tuple[str, int], request: dict, timeout: Optional[float] = 5.0) -> dict:
+        """
+        Gửi một request đến node khác và đợi response (TCP hoặc mạng trong bộ nhớ)
+        """
+        if self.mang is not None:
+            return self.mang.gui_nhan(dia_chi, request, timeout=timeout)
+        return giao_thuc.gui_nhan(dia_chi, request, timeout=timeout,
+                                  kich_thuoc_toi_da=self.kich_thuoc_khung_toi_da,
+                                  kich_thuoc_value_toi_da=self.kich_thuoc_value_toi_da)
+    
+    def _gui_udp(self, dia_chi: Tuple[str, int], thong_diep: dict):
+        """
+        Gửi một tin nhắn qua kênh UDP (mất gói là bình thường: SWIM và
+        phi-accrual đều chịu được vài gói bị mất)
+        """
+        if self.mang is not None:
+            self.mang.gui_udp((self.host, self.port), tuple(dia_chi),
+                              json.dumps(thong_diep, separators=(",", ":")).encode())
+            return
+        if self.udp_socket is None:
+            return
+        try:
+            self.udp_socket.sendto(json.dumps(thong_diep, separators=(",", ":")).encode(), tuple(dia_chi))
+        except OSError as e:
+            self.logger.debug("⚠ Gửi UDP đến %s thất bại: %s", dia_chi, e)
+    
+    def _ghi_rtt(self, node_id: str, rtt: float):
+        """
+        Ghi RTT heartbeat của một peer: giá trị cuối và trung bình trượt (EWMA, alpha = 0.2)
+        """
+        with self.khoa_rtt:
+            muc = self.rtt_heartbeat.get(node_id)
+            if muc is None:
+                self.rtt_heartbeat[node_id] = {"cuoi": rtt, "tb": rtt}
+            else:
+                muc["cuoi"] = rtt
+                muc["tb"] += 0.2 * (rtt - muc["tb"])
+    
+    def _khi_thanh_vien_thay_doi(self, node_id: str, dia_chi: Tuple[str, int], su_kien: str):
+        """
+        Callback của gossip: đồng bộ cac_node_khac với danh sách thành viên
+        """
+        if su_kien == gossip.SU_KIEN_CHET:
+            self.logger.warning("✗ Phát hiện node %s bị lỗi (gossip)", node_id)
+            with self.khoa_node_khac:
+                self.cac_node_khac.pop(node_id, None)
+        elif node_id != self.node_id:
+            with self.khoa_node_khac:
+                moi = node_id not in self.cac_node_khac
+                self.cac_node_khac[node_id] = tuple(dia_chi)
+            if moi:
+                self.logger.info("✓ Biết thêm node %s qua gossip", node_id)
+    
     # ==================== CÁC BACKGROUND THREADS ====================
     
+    def _thread_nhan_udp(self):
+        """
+        Background thread: Nhận tin nhắn trên kênh UDP
+        
+        Giải thích: "hb" (heartbeat) được ghi nhận và phản hồi "hb_ack" mang
+        lại thời điểm gửi để bên gửi đo RTT; các loại khác là gossip SWIM
+        (ping / ping_req / ack)
+        """
+        self.logger.info("✓ Thread nhận UDP đã khởi động")
+        
+        while self.dang_chay:
+            try:
+                if self.mang is not None:
+                    du_lieu, dia_chi = self.mang.nhan_udp((self.host, self.port), timeout=1.0)
+                else:
+                    du_lieu, dia_chi = self.udp_socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                thong_diep = json.loads(du_lieu)
+                loai = thong_diep.get("loai")
+                if loai == "hb":
+                    self._xu_ly_heartbeat(thong_diep["tu"])
+                    self._gui_udp(dia_chi, {"loai": "hb_ack", "tu": self.node_id, "t": thong_diep["t"]})
+                elif loai == "hb_ack":
+                    self._ghi_rtt(thong_diep["tu"], time.perf_counter() - thong_diep["t"])
+                elif self.gossip is not None:
+                    self.gossip.nhan(thong_diep, dia_chi)
+            except Exception as e:
+                self.logger.debug("⚠ Tin nhắn UDP không hợp lệ từ %s: %s", dia_chi, e)
+    
+    def _thread_gossip(self):
+        """
+        Background thread: Chạy các chu kỳ thăm dò SWIM
+        
+        Giải thích: Mỗi chu kỳ chỉ ping một peer (thêm vài ping_req khi
+        không có ack), nên lưu lượng mỗi node không tăng theo kích thước cluster
+        """
+        self.logger.info("✓ Thread gossip đã khởi động")
+        
+        while self.dang_chay:
+            time.sleep(self.gossip.khoang_tham_do / 10)
+            try:
+                self.gossip.tick()
+            except Exception as e:
+                self.logger.error("✗ Lỗi chu kỳ gossip: %s", e)
+    
+    
     def _thread_gui_heartbeat(self):
         """
         Background thread: Gửi heartbeat định kỳ đến tất cả peers
         
-        Giải thích: Mỗi 3 giây, gửi heartbeat đến tất cả nodes
-        để cho biết node này vẫn còn sống
+        Giải thích: Mỗi 3 giây, gửi một gói UDP "hb" đến tất cả nodes để cho
+        biết node này vẫn còn sống. sendto không đợi phản hồi nên mọi peer nhận
+        heartbeat gần như cùng lúc - một peer chết không làm trễ heartbeat đến
+        các peer khỏe. Nhịp gửi bám theo lịch cố định (không trôi theo thời
+        gian gửi) để khoảng cách heartbeat mà phi-accrual học được ổn định.
         """
         self.logger.info("✓ Thread gửi heartbeat đã khởi động")
         
+        lan_gui_ke_tiep = time.monotonic()
         while self.dang_chay:
-            time.sleep(self.khoang_thoi_gian_heartbeat)
+            lan_gui_ke_tiep += self.khoang_thoi_gian_heartbeat
+            time.sleep(max(0.0, lan_gui_ke_tiep - time.monotonic()))
             
             with self.khoa_node_khac:
-                peers = list(self.cac_node_khac.keys())
+                peers = [(nid, dia_chi) for nid, dia_chi in self.cac_node_khac.items() if nid != self.node_id]
             
-            for node_id in peers:
-                try:
-                    self._chuyen_tiep_request(node_id, {
-                        "command": "HEARTBEAT",
-                        "node_id": self.node_id
-                    })
-                except Exception as e:
-                    self.logger.debug(f"⚠ Heartbeat đến {node_id} thất bại: {e}")
+            heartbeat = {"loai": "hb", "tu": self.node_id, "t": time.perf_counter()}
+            for _, dia_chi in peers:
+                self._gui_udp(dia_chi, heartbeat)
     
     def _thread_phat_hien_loi(self):
         """
         Background thread: Phát hiện các node bị lỗi
         
-        Giải thích: Mỗi 5 giây, kiểm tra xem node nào quá 10 giây
-        không gửi heartbeat thì coi như bị lỗi
+        Giải thích: Mỗi 0.5 giây tính phi của từng peer; peer có phi vượt
+        ngưỡng (im lặng bất thường so với nhịp heartbeat đã học) bị coi là lỗi
         """
         self.logger.info("✓ Thread phát hiện lỗi đã khởi động")
         
         while self.dang_chay:
-            time.sleep(5)
-            thoi_gian_hien_tai = time.time()
-            
-            with self.khoa_heartbeat:
-                cac_node_loi = [
-                    node_id for node_id, thoi_gian_cuoi in self.heartbeat_cuoi.items()
-                    if thoi_gian_hien_tai - thoi_gian_cuoi > self.thoi_gian_timeout_heartbeat
-                ]
+            time.sleep(self.khoang_kiem_tra_loi)
             
-            for node_id in cac_node_loi:
-                self.logger.warning(f"✗ Phát hiện node {node_id} bị lỗi")
+            for node_id in self.bo_phat_hien_loi.cac_node_loi():
+                self.logger.warning(
+                    "✗ Phát hiện node %s bị lỗi (phi = %.1f)", node_id, self.bo_phat_hien_loi.phi(node_id)
+                )
                 
                 with self.khoa_node_khac:
                     self.cac_node_khac.pop(node_id, None)
                 
-                with self.khoa_heartbeat:
-                    self.heartbeat_cuoi.pop(node_id, None)
+                self.bo_phat_hien_loi.xoa(node_id)
+                with self.khoa_rtt:
+                    self.rtt_heartbeat.pop(node_id, None)
     
     def _thread_bao_cao_thong_ke(self):
         """
@@ -860,10 +1876,42 @@ class Node:
                     f"GET: {self.thong_ke['so_lan_get']}, "
                     f"DEL: {self.thong_ke['so_lan_delete']}, "
                     f"Nhân bản: {self.thong_ke['so_lan_nhan_ban']}, "
-                    f"Dữ liệu: {len(self.du_lieu)} keys, "
+                    f"Dữ liệu: {len(self.du_lieu)} keys "
+                    f"({self.du_lieu.lay_thong_ke()['bo_nho_dang_dung']} bytes), "
                     f"Peers: {len(self.cac_node_khac)}"
                 )
     
+    def _tai_du_lieu_peer(self, peer_id: str):
+        """
+        Tải toàn bộ dữ liệu của một peer theo từng trang GET_ALL_DATA
+        
+        Giải thích: Mỗi trang nhỏ hơn nhiều so với giới hạn khung nên dữ liệu
+        lớn không bị bên nhận từ chối; value lớn đi riêng thành các khung đoạn.
+        
+        Trả về:
+            Generator các (dữ liệu, thời điểm hết hạn) của từng trang
+        
+        Raise:
+            ConnectionError nếu một trang thất bại
+        """
+        kich_thuoc_trang = max(1, min(KICH_THUOC_TRANG_DONG_BO, self.kich_thuoc_khung_toi_da // 4))
+        con_tro = None
+        while True:
+            response = self._chuyen_tiep_request(peer_id, {
+                "command": "GET_ALL_DATA",
+                "kich_thuoc_trang": kich_thuoc_trang,
+                "cursor": con_tro
+            })
+            if response.get("status") != "success":
+                raise ConnectionError(response.get("message", "GET_ALL_DATA thất bại"))
+            du_lieu = response.get("data", {})
+            if response.get("key") is not None:
+                du_lieu[response["key"]] = response["value"]
+            yield du_lieu, response.get("het_han")
+            con_tro = response.get("cursor")
+            if con_tro is None:
+                return
+    
     def _thread_dong_bo_dinh_ky(self):
         """
         FIX QUAN TRỌNG: Background thread đồng bộ dữ liệu định kỳ
@@ -888,35 +1936,61 @@ class Node:
                 # Lấy dữ liệu từ một peer ngẫu nhiên
                 for peer_id in peers:
                     try:
-                        response = self._chuyen_tiep_request(peer_id, {"command": "GET_ALL_DATA"})
-                        
-                        if response.get("status") == "success":
-                            peer_data = response.get("data", {})
-                            
+                        bat_dau = time.perf_counter()
+                        so_key_dong_bo = 0
+                        for peer_data, het_han in self._tai_du_lieu_peer(peer_id):
                             # Chỉ đồng bộ keys mà node này chịu trách nhiệm
-                            so_key_dong_bo = 0
-                            with self.khoa_du_lieu:
-                                for key, value in peer_data.items():
-                                    cac_node_chiu_trach_nhiem = self.lay_cac_node_chiu_trach_nhiem(key)
-                                    if self.node_id in cac_node_chiu_trach_nhiem:
-                                        if key not in self.du_lieu:
-                                            self.du_lieu[key] = value
-                                            so_key_dong_bo += 1
-                            
-                            if so_key_dong_bo > 0:
-                                self.logger.info(f"🔄 Đã đồng bộ {so_key_dong_bo} keys mới từ {peer_id}")
-                            
-                            break  # Chỉ cần đồng bộ từ 1 peer
+                            so_key_dong_bo += self.du_lieu.ap_dung_hang_loat(
+                                self._loc_key_chiu_trach_nhiem(peer_data),
+                                chi_khi_chua_co=True,
+                                cac_het_han=het_han
+                            )
+                        self.do_tre.ghi("SYNC", "dong_bo", time.perf_counter() - bat_dau)
+                        self.lan_dong_bo_cuoi = time.time()
+                        
+                        if so_key_dong_bo > 0:
+                            self.logger.info("🔄 Đã đồng bộ %d keys mới từ %s", so_key_dong_bo, peer_id)
+                        
+                        break  # Chỉ cần đồng bộ từ 1 peer
                             
                     except Exception as e:
-                        self.logger.debug(f"⚠ Lỗi đồng bộ từ {peer_id}: {e}")
+                        self.logger.debug("⚠ Lỗi đồng bộ từ %s: %s", peer_id, e)
                         continue
                 
             except Exception as e:
-                self.logger.error(f"✗ Lỗi trong thread đồng bộ: {e}")
+                self.logger.error("✗ Lỗi trong thread đồng bộ: %s", e)
             
             time.sleep(30)  # Đồng bộ mỗi 30 giây
     
+    def _thread_don_dep_het_han(self):
+        """
+        Background thread: Xóa chủ động các key hết hạn
+        
+        Giải thích: Mỗi tick của bánh xe hẹn giờ, chỉ kiểm tra các key
+        đến hạn trong tick đó (không quét toàn bộ du_lieu). Key chưa kịp
+        dọn vẫn không bao giờ được trả về nhờ kiểm tra lười khi đọc.
+        """
+        while self.dang_chay:
+            time.sleep(self.du_lieu.banh_xe.do_phan_giai)
+            try:
+                self.du_lieu.don_dep_het_han()
+            except Exception as e:
+                self.logger.error("✗ Lỗi dọn dẹp key hết hạn: %s", e)
+    
+    def _thread_chup_anh_dinh_ky(self):
+        """
+        Background thread: Chụp ảnh dữ liệu định kỳ
+        
+        Giải thích: Mỗi khoang_anh_chup giây, ghi ảnh chụp mới để
+        lần khởi động sau chỉ phải phát lại phần đuôi ngắn của WAL
+        """
+        self.logger.info("✓ Thread chụp ảnh định kỳ đã khởi động")
+        
+        while self.dang_chay:
+            time.sleep(self.khoang_anh_chup)
+            if self.dang_chay:
+                self.chup_anh()
+    
     # ==================== KHÔI PHỤC ====================
     
     def tham_gia_cluster(self, seed_host: str, seed_port: int) -> bool:
@@ -934,10 +2008,6 @@ class Node:
         try:
             self.logger.info(f"→ Đang thử tham gia cluster qua {seed_host}:{seed_port}")
             
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10.0)
-            sock.connect((seed_host, seed_port))
-            
             # Gửi request JOIN
             request = {
                 "command": "JOIN",
@@ -945,39 +2015,34 @@ class Node:
                 "host": self.host,
                 "port": self.port
             }
-            sock.sendall(json.dumps(request).encode() + b"\n")
-            
-            # Nhận response
-            data = b""
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if b"\n" in data:
-                    break
-            
-            sock.close()
-            
-            response = json.loads(data.decode())
+            response = self._gui_nhan((seed_host, seed_port), request, timeout=10.0)
             
             if response.get("status") == "success":
-                # Cập nhật danh sách peers
+                # Cập nhật danh sách peers (bỏ chính node này nếu seed gửi kèm)
                 with self.khoa_node_khac:
                     peers_moi = response.get("peers", {})
-                    self.cac_node_khac.update(peers_moi)
+                    da_biet = set(self.cac_node_khac)
+                    self.cac_node_khac.update(
+                        (nid, tuple(dia_chi)) for nid, dia_chi in peers_moi.items() if nid != self.node_id
+                    )
+                    self.epoch_thanh_vien = max(self.epoch_thanh_vien, response.get("epoch", 0))
                     
                     # Thêm seed node vào peers nếu chưa có
                     seed_id = f"{seed_host}:{seed_port}"
                     if seed_id not in self.cac_node_khac:
                         self.cac_node_khac[seed_id] = (seed_host, seed_port)
+                    peers = list(self.cac_node_khac.items())
                 
-                self.logger.info(f"✓ Đã tham gia cluster thành công. Peers: {len(self.cac_node_khac)}")
+                if self.gossip is not None:
+                    for peer_id, dia_chi in peers:
+                        if peer_id != self.node_id:
+                            self.gossip.them_thanh_vien(peer_id, tuple(dia_chi))
+                self._theo_doi_peer_moi([peer_id for peer_id, _ in peers if peer_id not in da_biet])
                 
-                # Khôi phục dữ liệu
-                self._phuc_hoi_du_lieu()
+                self.logger.info(f"✓ Đã tham gia cluster thành công. Peers: {len(self.cac_node_khac)}")
                 
-                return True
+                # Khôi phục dữ liệu; thất bại nếu không peer nào trả đủ dữ liệu
+                return self._phuc_hoi_du_lieu()
             else:
                 self.logger.error(f"✗ JOIN bị từ chối: {response.get('message')}")
                 return False
@@ -986,19 +2051,28 @@ class Node:
             self.logger.error(f"✗ Lỗi tham gia cluster: {e}")
             return False
     
-    def _phuc_hoi_du_lieu(self):
+    def _phuc_hoi_du_lieu(self) -> bool:
         """
         Khôi phục dữ liệu từ peers sau khi join hoặc restart
         
         FIX: Quy trình được cải thiện
         
         Quy trình:
-        1. Lấy tất cả dữ liệu từ một peer
+        1. Lấy tất cả dữ liệu từ MỌI peer, từng trang một (replica còn lại của
+           mỗi key có thể nằm ở bất kỳ peer nào, không chỉ peer đầu tiên)
         2. Chỉ lưu các keys mà node này chịu trách nhiệm
-        3. Đảm bảo dữ liệu nhất quán
+        3. Peer thành công đầu tiên được ghi đè, các peer sau chỉ bổ sung key còn thiếu
+        4. Peer lỗi giữa chừng thì bỏ qua (trang đã áp dụng được giữ lại)
+        
+        thong_ke cộng dồn số lần khôi phục, số key và số byte key + value nhận
+        được, tổng thời gian khôi phục (kể cả các peer thất bại)
+        
+        Trả về:
+            False nếu có peers nhưng không khôi phục được từ peer nào
         """
         self.dang_phuc_hoi = True
         self.logger.info("🔄 Bắt đầu khôi phục dữ liệu...")
+        bat_dau_phuc_hoi = time.perf_counter()
         
         with self.khoa_node_khac:
             peers = list(self.cac_node_khac.keys())
@@ -1006,34 +2080,46 @@ class Node:
         if not peers:
             self.logger.warning("⚠ Không có peers để khôi phục dữ liệu")
             self.dang_phuc_hoi = False
-            return
+            return True
         
+        so_peer_thanh_cong = 0
         for peer_id in peers:
+            so_key_nhan = so_byte = so_key_phuc_hoi = 0
             try:
-                # Yêu cầu tất cả dữ liệu từ peer
-                response = self._chuyen_tiep_request(peer_id, {"command": "GET_ALL_DATA"})
-                
-                if response.get("status") == "success":
-                    peer_data = response.get("data", {})
-                    so_key_phuc_hoi = 0
-                    
+                for peer_data, het_han in self._tai_du_lieu_peer(peer_id):
                     # Chỉ lưu các keys mà node này chịu trách nhiệm
-                    with self.khoa_du_lieu:
-                        for key, value in peer_data.items():
-                            cac_node_chiu_trach_nhiem = self.lay_cac_node_chiu_trach_nhiem(key)
-                            if self.node_id in cac_node_chiu_trach_nhiem:
-                                self.du_lieu[key] = value
-                                so_key_phuc_hoi += 1
-                    
-                    self.logger.info(f"✓ Đã khôi phục {so_key_phuc_hoi} keys từ {peer_id}")
-                    break
-                    
+                    so_key_phuc_hoi += self.du_lieu.ap_dung_hang_loat(
+                        self._loc_key_chiu_trach_nhiem(peer_data),
+                        chi_khi_chua_co=so_peer_thanh_cong > 0,
+                        cac_het_han=het_han
+                    )
+                    so_key_nhan += len(peer_data)
+                    so_byte += sum(len(key.encode()) + len(value) for key, value in peer_data.items())
+                so_peer_thanh_cong += 1
+                self.logger.info("✓ Đã khôi phục %d keys từ %s", so_key_phuc_hoi, peer_id)
             except Exception as e:
-                self.logger.error(f"✗ Khôi phục từ {peer_id} thất bại: {e}")
-                continue
+                self.logger.error("✗ Khôi phục từ %s thất bại: %s", peer_id, e)
+            
+            with self.khoa_thong_ke:
+                self.thong_ke['so_key_phuc_hoi'] += so_key_nhan
+                self.thong_ke['so_byte_phuc_hoi'] += so_byte
         
+        thoi_gian = time.perf_counter() - bat_dau_phuc_hoi
+        with self.khoa_thong_ke:
+            self.thong_ke['thoi_gian_phuc_hoi'] += thoi_gian
+            if so_peer_thanh_cong:
+                self.thong_ke['so_lan_phuc_hoi'] += 1
         self.dang_phuc_hoi = False
+        if not so_peer_thanh_cong:
+            self.logger.error("✗ Khôi phục dữ liệu thất bại: không peer nào trong %d peers trả đủ dữ liệu", len(peers))
+            return False
+        
+        self.do_tre.ghi("PHUC_HOI", "dong_bo", thoi_gian)
+        self.lan_dong_bo_cuoi = time.time()
+        if so_peer_thanh_cong < len(peers):
+            self.logger.warning("⚠ Khôi phục thiếu: %d/%d peers lỗi", len(peers) - so_peer_thanh_cong, len(peers))
         self.logger.info("✓ Hoàn tất khôi phục dữ liệu")
+        return True
     
     def dung_lai(self):
         """
@@ -1041,6 +2127,10 @@ class Node:
         """
         self.logger.info("→ Đang dừng node...")
         self.dang_chay = False
+        self.da_san_sang.clear()
+        
+        if self.mang is not None:
+            self.mang.huy_dang_ky(self)
         
         if self.server_socket:
             try:
@@ -1048,6 +2138,18 @@ class Node:
             except:
                 pass
         
+        if self.udp_socket:
+            try:
+                self.udp_socket.close()
+            except OSError:
+                pass
+        
+        if self.may_chu_chi_so is not None:
+            self.may_chu_chi_so.dung()
+        
+        if self.nhat_ky is not None:
+            self.nhat_ky.dong()
+        
         self.logger.info("✓ Node đã dừng")
 
 
@@ -1055,17 +2157,40 @@ class Node:
 
 if __name__ == "__main__":
     import sys
+    import argparse
     
     if len(sys.argv) < 2:
         print("=" * 70)
         print("HỆ THỐNG LƯU TRỮ PHÂN TÁN KEY-VALUE")
         print("=" * 70)
         print("\nCách sử dụng:")
-        print("  python node.py <port> [seed_host seed_port]")
+        print("  python node.py <port> [seed_host seed_port] [tùy chọn]")
         print("\nVí dụ:")
         print("  python node.py 5001                    # Khởi động node đầu tiên")
         print("  python node.py 5002 127.0.0.1 5001     # Tham gia cluster hiện có")
         print("  python node.py 5003 127.0.0.1 5001     # Tham gia cluster hiện có")
+        print("  python node.py 5001 --thu-muc-du-lieu data/5001 --fsync always")
+        print("\nTùy chọn:")
+        print("  --thu-muc-du-lieu DIR   Bật write-ahead log trong thư mục DIR")
+        print("  --fsync MODE            Chế độ fsync: always | batch | off (mặc định: batch)")
+        print("  --fsync-ms N            Chu kỳ fsync theo lô, ms (mặc định: 10)")
+        print("  --anh-chup N            Chu kỳ chụp ảnh dữ liệu, giây (mặc định: 300, 0 = tắt)")
+        print("  --so-manh N             Số mảnh khóa của kho dữ liệu (mặc định: 16)")
+        print("  --gioi-han-bo-nho-mb N  Giới hạn bộ nhớ cho dữ liệu, MB (mặc định: 0 = không giới hạn)")
+        print("  --thu-hoi POLICY        Chính sách thu hồi khi vượt giới hạn: lru | lfu")
+        print("  --chi-muc               Bật chỉ mục key có thứ tự cho SCAN (mặc định: tắt, SCAN sắp xếp toàn bộ)")
+        print("  --khung-toi-da-mb N     Kích thước tối đa một khung nhận vào, MB (mặc định: 64)")
+        print("  --value-toi-da-mb N     Kích thước tối đa một value gửi thành nhiều khung đoạn, MB (mặc định: 256)")
+        print("  --thanh-vien MODE       Phát hiện lỗi: gossip (SWIM qua UDP) | heartbeat (mặc định: gossip)")
+        print("  --tham-do-s N           Chu kỳ thăm dò của gossip, giây (mặc định: 1)")
+        print("  --nguong-phi N          Ngưỡng phi của chế độ heartbeat (mặc định: 8)")
+        print("  --cong-chi-so N         Phục vụ /metrics kiểu Prometheus qua HTTP trên cổng N")
+        print("  --lay-mau-vet P         Tỷ lệ truy vết request đến không kèm vết (mặc định: 0)")
+        print("  --nguong-cham-ms N      Ngưỡng ghi nhật ký request chậm, ms (mặc định: 200, 0 = tắt)")
+        print("  --do-khoa               Đo thời gian chờ/giữ khóa (xem GET_STATS -> khoa)")
+        print("  --muc-log MUC           Mức log: DEBUG | INFO | WARNING | ERROR (mặc định: INFO)")
+        print("  --tep-log FILE          File log (mặc định: node.log)")
+        print("  --gioi-han-log N        Số dòng log tối đa mỗi giây cho mỗi loại (mặc định: 20, 0 = không giới hạn)")
         print("\nGhi chú:")
         print("  - Node đầu tiên sẽ tạo cluster mới")
         print("  - Các node sau sẽ tham gia cluster thông qua seed node")
@@ -1073,17 +2198,64 @@ if __name__ == "__main__":
         print("=" * 70)
         sys.exit(1)
     
+    parser = argparse.ArgumentParser(description="Node của hệ thống KV phân tán")
+    parser.add_argument("port", type=int)
+    parser.add_argument("seed_host", nargs="?")
+    parser.add_argument("seed_port", nargs="?", type=int)
+    parser.add_argument("--thu-muc-du-lieu", default=None)
+    parser.add_argument("--fsync", default="batch", choices=["always", "batch", "off"])
+    parser.add_argument("--fsync-ms", type=int, default=10)
+    parser.add_argument("--anh-chup", type=float, default=300)
+    parser.add_argument("--so-manh", type=int, default=16)
+    parser.add_argument("--gioi-han-bo-nho-mb", type=int, default=0)
+    parser.add_argument("--thu-hoi", default="lru", choices=["lru", "lfu"])
+    parser.add_argument("--chi-muc", action="store_true")
+    parser.add_argument("--khung-toi-da-mb", type=int, default=64)
+    parser.add_argument("--value-toi-da-mb", type=int, default=256)
+    parser.add_argument("--thanh-vien", default="gossip", choices=["gossip", "heartbeat"])
+    parser.add_argument("--tham-do-s", type=float, default=1.0)
+    parser.add_argument("--nguong-phi", type=float, default=8.0)
+    parser.add_argument("--cong-chi-so", type=int, default=None)
+    parser.add_argument("--lay-mau-vet", type=float, default=0.0)
+    parser.add_argument("--nguong-cham-ms", type=float, default=200.0)
+    parser.add_argument("--do-khoa", action="store_true")
+    parser.add_argument("--muc-log", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--tep-log", default="node.log")
+    parser.add_argument("--gioi-han-log", type=float, default=20.0)
+    tham_so = parser.parse_args()
+    
+    # Cấu hình logging: ghi file/console trong thread nền, giới hạn tốc độ mỗi loại log
+    ghi_log.cau_hinh_log(tep=tham_so.tep_log, muc=getattr(logging, tham_so.muc_log),
+                         so_dong_moi_giay=tham_so.gioi_han_log)
+    
     host = "127.0.0.1"
-    port = int(sys.argv[1])
+    port = tham_so.port
     node_id = f"{host}:{port}"
     
     # Tạo node với hệ số nhân bản = 2
-    node = Node(node_id, host, port, he_so_nhan_ban=2)
+    node = Node(node_id, host, port, he_so_nhan_ban=2,
+                thu_muc_du_lieu=tham_so.thu_muc_du_lieu,
+                che_do_fsync=tham_so.fsync,
+                khoang_fsync_ms=tham_so.fsync_ms,
+                khoang_anh_chup=tham_so.anh_chup,
+                so_manh=tham_so.so_manh,
+                gioi_han_bo_nho=tham_so.gioi_han_bo_nho_mb * 1024 * 1024,
+                chinh_sach_thu_hoi=tham_so.thu_hoi,
+                chi_muc_co_thu_tu=tham_so.chi_muc,
+                kich_thuoc_khung_toi_da=tham_so.khung_toi_da_mb * 1024 * 1024,
+                kich_thuoc_value_toi_da=tham_so.value_toi_da_mb * 1024 * 1024,
+                che_do_thanh_vien=tham_so.thanh_vien,
+                khoang_tham_do=tham_so.tham_do_s,
+                nguong_phi=tham_so.nguong_phi,
+                cong_chi_so=tham_so.cong_chi_so,
+                ty_le_lay_mau_vet=tham_so.lay_mau_vet,
+                nguong_request_cham_ms=tham_so.nguong_cham_ms,
+                do_dac_khoa=tham_so.do_khoa)
     
     # Tham gia cluster nếu có seed node
-    if len(sys.argv) == 4:
-        seed_host = sys.argv[2]
-        seed_port = int(sys.argv[3])
+    if tham_so.seed_host and tham_so.seed_port:
+        seed_host = tham_so.seed_host
+        seed_port = tham_so.seed_port
         
         print(f"\n✓ Đang khởi động node {node_id}...")
         print(f"→ Sẽ tham gia cluster qua seed node {seed_host}:{seed_port}\n")
@@ -1093,7 +2265,7 @@ if __name__ == "__main__":
         server_thread.start()
         
         # Đợi server khởi động
-        time.sleep(1)
+        node.da_san_sang.wait(10)
         
         # Tham gia cluster
         if not node.tham_gia_cluster(seed_host, seed_port):
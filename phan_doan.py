@@ -0,0 +1,123 @@
+"""
+Value Lớn Chia Đoạn (Chunked Value) cho Node
+Value lớn được giữ thành các đoạn kích thước cố định thay vì một khối bytes liền
+"""
+
+import sys
+from typing import Iterator, Tuple, Union
+
+# Kích thước mặc định của một đoạn
+KICH_THUOC_DOAN = 1024 * 1024
+
+
+class GiaTriPhanDoan:
+    """
+    Value bất biến gồm nhiều đoạn bytes
+
+    Giải thích:
+    - Nhận từ mạng: mỗi đoạn là một khung riêng, không bao giờ phải cấp phát
+      hay nối một buffer bằng cả value
+    - Gửi đi / ghi đĩa: duyệt cac_doan, đưa thẳng từng đoạn cho sendmsg/write
+    - APPEND chỉ thêm đoạn mới, không sao chép các đoạn cũ
+    - sys.getsizeof() trả về tổng kích thước thật để kế toán bộ nhớ đúng
+    """
+    __slots__ = ("cac_doan", "_do_dai")
+
+    def __init__(self, cac_doan: Tuple[bytes, ...]):
+        self.cac_doan = tuple(cac_doan)
+        self._do_dai = sum(len(doan) for doan in self.cac_doan)
+
+    def __len__(self) -> int:
+        return self._do_dai
+
+    def __bytes__(self) -> bytes:
+        return b"".join(self.cac_doan)
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self.cac_doan) + sum(
+            sys.getsizeof(doan) for doan in self.cac_doan
+        )
+
+    def __eq__(self, khac) -> bool:
+        if isinstance(khac, GiaTriPhanDoan):
+            return len(self) == len(khac) and bytes(self) == bytes(khac)
+        if isinstance(khac, (bytes, bytearray)):
+            return len(self) == len(khac) and bytes(self) == khac
+        return NotImplemented
+
+    __hash__ = None
+
+    def __add__(self, khac) -> "GiaTriPhanDoan":
+        phan_them = tuple(cac_doan(khac))
+        if (phan_them and self.cac_doan and
+                len(self.cac_doan[-1]) + sum(len(doan) for doan in phan_them) <= KICH_THUOC_DOAN):
+            # Gộp phần nối nhỏ vào đoạn cuối để không sinh ra quá nhiều đoạn vụn
+            return GiaTriPhanDoan(self.cac_doan[:-1] + (b"".join((self.cac_doan[-1],) + phan_them),))
+        return GiaTriPhanDoan(self.cac_doan + phan_them)
+
+    def __radd__(self, khac) -> "GiaTriPhanDoan":
+        return GiaTriPhanDoan(tuple(cac_doan(khac)) + self.cac_doan)
+
+    def __repr__(self) -> str:
+        return f"GiaTriPhanDoan({len(self)} bytes, {len(self.cac_doan)} đoạn)"
+
+
+GiaTri = Union[bytes, GiaTriPhanDoan]
+
+
+def cac_doan(value, kich_thuoc_doan: int = 0) -> Iterator:
+    """
+    Duyệt các đoạn của một value
+
+    Tham số:
+        kich_thuoc_doan: > 0 thì bytes liền được cắt thành các memoryview
+            (không sao chép) dài tối đa kich_thuoc_doan; GiaTriPhanDoan có đoạn
+            không đều (sau APPEND) được cắt lại thành các đoạn đúng kich_thuoc_doan
+
+    Trả về:
+        Iterator các đoạn (bytes hoặc memoryview), value rỗng không có đoạn nào
+    """
+    if isinstance(value, GiaTriPhanDoan):
+        doan = value.cac_doan
+        if kich_thuoc_doan <= 0 or (doan and all(len(d) == kich_thuoc_doan for d in doan[:-1])
+                                    and 0 < len(doan[-1]) <= kich_thuoc_doan):
+            yield from doan
+            return
+        # Chỉ sao chép khi các đoạn không đều
+        buf = bytearray()
+        for d in doan:
+            mv = memoryview(d)
+            while mv.nbytes:
+                lay = kich_thuoc_doan - len(buf)
+                buf += mv[:lay]
+                mv = mv[lay:]
+                if len(buf) == kich_thuoc_doan:
+                    yield bytes(buf)
+                    buf = bytearray()
+        if buf:
+            yield bytes(buf)
+        return
+    do_dai = len(value)
+    if kich_thuoc_doan <= 0 or do_dai <= kich_thuoc_doan:
+        if do_dai:
+            yield value
+        return
+    mv = memoryview(value)
+    for bat_dau in range(0, do_dai, kich_thuoc_doan):
+        yield mv[bat_dau:bat_dau + kich_thuoc_doan]
+
+
+def tu_buffer(buf, kich_thuoc_doan: int = KICH_THUOC_DOAN) -> GiaTri:
+    """
+    Tạo value từ một vùng buffer (memoryview của WAL/ảnh chụp/khung nhận)
+
+    Vùng lớn hơn kich_thuoc_doan được sao chép thẳng thành các đoạn,
+    không qua một bytes trung gian bằng cả value.
+    """
+    mv = memoryview(buf)
+    if mv.nbytes <= kich_thuoc_doan:
+        return bytes(mv)
+    return GiaTriPhanDoan(tuple(
+        bytes(mv[bat_dau:bat_dau + kich_thuoc_doan])
+        for bat_dau in range(0, mv.nbytes, kich_thuoc_doan)
+    ))
@@ -0,0 +1,128 @@
+"""
+Bộ Phân Tích CPU Lấy Mẫu cho Node
+Chụp ngăn xếp của mọi thread theo chu kỳ trong N giây, gộp thành định dạng
+collapsed stacks ("a;b;c số_lượng") dùng được trực tiếp với flamegraph.pl / speedscope
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+from khoa_do_dac import vai_tro_thread
+
+# Giới hạn để một lệnh PROFILE không giữ node quá lâu hay lấy mẫu quá dày
+THOI_GIAN_TOI_DA = 60.0
+KHOANG_TOI_THIEU = 0.001
+
+# Đồng hồ CPU theo thread (Linux/Unix); không có thì chỉ lấy mẫu theo thời gian thực
+_CO_DONG_HO_CPU = hasattr(time, "pthread_getcpuclockid")
+
+
+def _nhan_khung(khung) -> str:
+    """Tên một khung: hàm (file:dòng định nghĩa) - gộp mọi dòng của cùng một hàm"""
+    code = khung.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _ngan_xep(khung, goc: str) -> str:
+    """Ngăn xếp collapsed từ gốc đến khung hiện tại, gốc là vai trò thread"""
+    cac_khung = []
+    while khung is not None:
+        cac_khung.append(_nhan_khung(khung))
+        khung = khung.f_back
+    cac_khung.append(goc)
+    cac_khung.reverse()
+    return ";".join(cac_khung)
+
+
+def _dong_ho_cpu(ident: int) -> Optional[int]:
+    """clock id CPU của một thread (None nếu không lấy được)"""
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (OSError, ValueError, OverflowError):
+        return None
+
+
+def lay_mau(giay: float, khoang: float = 0.01, che_do: str = "cpu",
+            dang_chay: Callable[[], bool] = lambda: True) -> dict:
+    """
+    Lấy mẫu ngăn xếp mọi thread (trừ thread gọi) trong giay giây rồi tự dừng
+
+    Tham số:
+        giay: Thời gian lấy mẫu (tối đa THOI_GIAN_TOI_DA)
+        khoang: Chu kỳ lấy mẫu (giây)
+        che_do: "cpu" - chỉ tính thread có dùng CPU từ lần lấy mẫu trước, trọng số
+                        là số micro giây CPU đã dùng (thread đang ngủ/chờ I/O bị bỏ qua)
+                "tuong" - mọi thread, mỗi lần lấy mẫu tính 1 (thời gian thực, thấy cả chờ)
+        dang_chay: Trả về False để dừng sớm (ví dụ khi node tắt)
+
+    Trả về:
+        {"che_do", "don_vi", "giay", "so_lan_lay_mau", "stacks": "ngăn_xếp giá_trị\\n..."}
+        stacks sắp xếp giảm dần theo giá trị
+
+    Giải thích:
+    - Chạy ngay trong thread gọi (thread xử lý lệnh PROFILE): không có thread nào
+      tồn tại khi không phân tích, nên không ảnh hưởng thông lượng lúc bình thường
+    - Mỗi lần lấy mẫu: sys._current_frames() + đi ngược các khung; với ~20 thread
+      mất vài chục micro giây, tức < 1% một lõi ở chu kỳ 10 ms
+    """
+    if che_do not in ("cpu", "tuong"):
+        raise ValueError(f"Chế độ không hợp lệ: {che_do}")
+    if che_do == "cpu" and not _CO_DONG_HO_CPU:
+        che_do = "tuong"
+    giay = min(max(giay, 0.0), THOI_GIAN_TOI_DA)
+    khoang = max(khoang, KHOANG_TOI_THIEU)
+
+    ban_than = threading.get_ident()
+    cac_stack: Counter = Counter()
+    cpu_truoc: Dict[int, int] = {}
+    dong_ho: Dict[int, Optional[int]] = {}
+    so_lan = 0
+
+    ket_thuc = time.monotonic() + giay
+    lan_toi = time.monotonic()
+    while time.monotonic() < ket_thuc and dang_chay():
+        cac_ten = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, khung in sys._current_frames().items():
+            if ident == ban_than:
+                continue
+            trong_so = 1
+            if che_do == "cpu":
+                if ident not in dong_ho:
+                    dong_ho[ident] = _dong_ho_cpu(ident)
+                if dong_ho[ident] is None:
+                    continue
+                try:
+                    cpu = time.clock_gettime_ns(dong_ho[ident])
+                except OSError:
+                    # Thread đã kết thúc giữa chừng
+                    continue
+                truoc = cpu_truoc.get(ident)
+                cpu_truoc[ident] = cpu
+                if truoc is None:
+                    continue
+                trong_so = (cpu - truoc) // 1000
+                if trong_so <= 0:
+                    continue
+            cac_stack[_ngan_xep(khung, vai_tro_thread(cac_ten.get(ident, "")))] += trong_so
+        # Không giữ tham chiếu khung (và biến cục bộ của thread khác) giữa hai lần lấy mẫu
+        khung = None
+        so_lan += 1
+
+        lan_toi += khoang
+        con_lai = lan_toi - time.monotonic()
+        if con_lai > 0:
+            time.sleep(con_lai)
+        else:
+            lan_toi = time.monotonic()
+
+    return {
+        "che_do": che_do,
+        "don_vi": "micro_giay_cpu" if che_do == "cpu" else "so_mau",
+        "giay": giay,
+        "so_lan_lay_mau": so_lan,
+        "stacks": "".join(f"{stack} {gia_tri}\n" for stack, gia_tri in cac_stack.most_common()),
+    }
@@ -0,0 +1,154 @@
+"""
+Bộ Phát Hiện Lỗi Phi-Accrual (Hayashibara et al. 2004) cho Node
+Thay timeout cố định bằng mức nghi ngờ phi học từ phân bố khoảng cách giữa các heartbeat
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class _LichSuHeartbeat:
+    """Cửa sổ trượt các khoảng cách giữa heartbeat của một peer (tổng và tổng bình phương chạy)"""
+    __slots__ = ("cac_khoang", "tong", "tong_binh_phuong", "lan_cuoi")
+
+    def __init__(self, kich_thuoc_cua_so: int, khoang_ban_dau: float, lan_cuoi: float):
+        self.cac_khoang = deque(maxlen=kich_thuoc_cua_so)
+        self.tong = 0.0
+        self.tong_binh_phuong = 0.0
+        self.lan_cuoi = lan_cuoi
+        # Khởi động với hai mẫu quanh khoảng dự kiến (độ lệch = 1/4 khoảng) như Akka
+        do_lech = khoang_ban_dau / 4
+        self.them(khoang_ban_dau - do_lech)
+        self.them(khoang_ban_dau + do_lech)
+
+    def them(self, khoang: float):
+        if len(self.cac_khoang) == self.cac_khoang.maxlen:
+            cu = self.cac_khoang[0]
+            self.tong -= cu
+            self.tong_binh_phuong -= cu * cu
+        self.cac_khoang.append(khoang)
+        self.tong += khoang
+        self.tong_binh_phuong += khoang * khoang
+
+    def trung_binh(self) -> float:
+        return self.tong / len(self.cac_khoang)
+
+    def do_lech_chuan(self) -> float:
+        trung_binh = self.trung_binh()
+        return math.sqrt(max(0.0, self.tong_binh_phuong / len(self.cac_khoang) - trung_binh * trung_binh))
+
+
+class BoPhatHienPhiAccrual:
+    """
+    Bộ phát hiện lỗi phi-accrual cho nhiều peer
+
+    Giải thích:
+    - Mỗi peer có cửa sổ các khoảng cách giữa hai heartbeat liên tiếp;
+      giả định các khoảng này phân bố chuẩn (trung bình, độ lệch chuẩn học được)
+    - phi = -log10(P(heartbeat kế tiếp đến muộn hơn thời gian đã im lặng))
+      phi = 1 nghĩa là xác suất nhầm ~10%, phi = 8 nghĩa là ~1e-8
+    - Peer đều đặn bị phát hiện ngay sau khi lỡ nhịp; peer có heartbeat
+      dao động (GC, tải cao) được cho nhiều thời gian hơn thay vì bị loại nhầm
+
+    Tham số:
+        nguong_phi: Peer có phi >= ngưỡng bị coi là lỗi
+        khoang_du_kien: Chu kỳ heartbeat dự kiến (giây), dùng khi chưa có mẫu
+        kich_thuoc_cua_so: Số khoảng cách gần nhất được giữ cho mỗi peer
+        do_lech_chuan_toi_thieu: Chặn dưới độ lệch chuẩn (giây), tránh phi tăng vọt
+            khi heartbeat quá đều
+        khoang_nghi_chap_nhan: Thời gian im lặng thêm được chấp nhận (giây),
+            mặc định một chu kỳ heartbeat (lỡ một nhịp chưa bị nghi ngờ)
+        dong_ho: Nguồn thời gian
+    """
+
+    def __init__(self, nguong_phi: float = 8.0, khoang_du_kien: float = 3.0,
+                 kich_thuoc_cua_so: int = 100, do_lech_chuan_toi_thieu: float = 0.5,
+                 khoang_nghi_chap_nhan: float = 3.0,
+                 dong_ho: Callable[[], float] = time.time):
+        self.nguong_phi = nguong_phi
+        self.khoang_du_kien = khoang_du_kien
+        self.kich_thuoc_cua_so = kich_thuoc_cua_so
+        self.do_lech_chuan_toi_thieu = do_lech_chuan_toi_thieu
+        self.khoang_nghi_chap_nhan = khoang_nghi_chap_nhan
+        self._dong_ho = dong_ho
+        self._lich_su: Dict[str, _LichSuHeartbeat] = {}
+        self._khoa = threading.Lock()
+
+    def ghi_nhan(self, node_id: str, bay_gio: Optional[float] = None):
+        """
+        Ghi nhận một heartbeat từ node_id
+        """
+        bay_gio = self._dong_ho() if bay_gio is None else bay_gio
+        with self._khoa:
+            lich_su = self._lich_su.get(node_id)
+            if lich_su is None:
+                self._lich_su[node_id] = _LichSuHeartbeat(
+                    self.kich_thuoc_cua_so, self.khoang_du_kien, bay_gio)
+                return
+            khoang = bay_gio - lich_su.lan_cuoi
+            lich_su.lan_cuoi = bay_gio
+            if khoang > 0:
+                lich_su.them(khoang)
+
+    def _phi(self, lich_su: _LichSuHeartbeat, bay_gio: float) -> float:
+        da_im_lang = bay_gio - lich_su.lan_cuoi
+        trung_binh = lich_su.trung_binh() + self.khoang_nghi_chap_nhan
+        do_lech = max(lich_su.do_lech_chuan(), self.do_lech_chuan_toi_thieu)
+        # Xấp xỉ logistic của hàm phân phối chuẩn (như Akka / Cassandra)
+        y = (da_im_lang - trung_binh) / do_lech
+        try:
+            e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        except OverflowError:
+            return 0.0  # Heartbeat vừa mới đến, còn rất xa mốc trung bình
+        if da_im_lang > trung_binh:
+            return -math.log10(max(e / (1.0 + e), 1e-300))
+        return max(0.0, -math.log10(1.0 - 1.0 / (1.0 + e)))
+
+    def phi(self, node_id: str, bay_gio: Optional[float] = None) -> float:
+        """
+        Trả về:
+            Mức nghi ngờ phi hiện tại của node_id (0.0 nếu chưa từng nhận heartbeat)
+        """
+        bay_gio = self._dong_ho() if bay_gio is None else bay_gio
+        with self._khoa:
+            lich_su = self._lich_su.get(node_id)
+            return self._phi(lich_su, bay_gio) if lich_su is not None else 0.0
+
+    def cac_node_loi(self, bay_gio: Optional[float] = None) -> List[str]:
+        """
+        Trả về:
+            Danh sách peer có phi >= nguong_phi
+        """
+        bay_gio = self._dong_ho() if bay_gio is None else bay_gio
+        with self._khoa:
+            return [
+                node_id for node_id, lich_su in self._lich_su.items()
+                if self._phi(lich_su, bay_gio) >= self.nguong_phi
+            ]
+
+    def xoa(self, node_id: str):
+        """Quên lịch sử của một peer (peer đã bị loại)"""
+        with self._khoa:
+            self._lich_su.pop(node_id, None)
+
+    def lay_thong_ke(self) -> dict:
+        """
+        Trả về:
+            {"nguong_phi", "phi": {node_id: phi}, "khoang_trung_binh": {node_id: giây}}
+        """
+        bay_gio = self._dong_ho()
+        with self._khoa:
+            return {
+                "nguong_phi": self.nguong_phi,
+                "phi": {
+                    node_id: round(self._phi(lich_su, bay_gio), 3)
+                    for node_id, lich_su in self._lich_su.items()
+                },
+                "khoang_trung_binh": {
+                    node_id: round(lich_su.trung_binh(), 3)
+                    for node_id, lich_su in self._lich_su.items()
+                },
+            }
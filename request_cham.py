@@ -0,0 +1,91 @@
+"""
+Nhật Ký Request Chậm cho Node
+Request vượt ngưỡng được giữ lại (bộ nhớ cố định) cùng thời gian của từng giai đoạn
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Các giai đoạn được đo trong một request (giây, cộng dồn nếu xảy ra nhiều lần)
+# - cho_xu_ly: từ lúc accept kết nối đến khi bắt đầu xử lý (tạo thread + đọc request)
+# - tra_vong: tìm các node chịu trách nhiệm trên vòng băm
+# - cho_khoa: chờ khóa mảnh của kho dữ liệu (chỉ tính khi có tranh chấp)
+# - chuyen_tiep: RPC chuyển tiếp đến node khác (gồm cả timeout)
+# - cho_wal: chờ WAL bền vững (chế độ fsync "always")
+# - ap_dung_local: phần còn lại của thời gian xử lý tại node này
+CAC_GIAI_DOAN = ("cho_xu_ly", "tra_vong", "cho_khoa", "chuyen_tiep", "cho_wal", "ap_dung_local")
+
+
+def tao_giai_doan() -> Dict[str, float]:
+    """Bộ đếm giai đoạn rỗng cho một request mới"""
+    return dict.fromkeys(CAC_GIAI_DOAN, 0.0)
+
+
+class NhatKyRequestCham:
+    """
+    Ring buffer các request chậm gần nhất
+
+    Giải thích:
+    - Node luôn đo các giai đoạn khi ngưỡng > 0 (vài lần đọc đồng hồ mỗi request);
+      chỉ request có tổng thời gian >= ngưỡng mới được ghi lại
+    - Bộ nhớ cố định: mục cũ nhất bị ghi đè khi đầy
+    - Ngưỡng đổi được khi node đang chạy (lệnh SLOW_LOG), không cần khởi động lại
+
+    Tham số:
+        nguong_ms: Ngưỡng request chậm (ms, 0 = tắt)
+        dung_luong: Số request chậm tối đa được giữ
+    """
+
+    def __init__(self, nguong_ms: float = 200.0, dung_luong: int = 256):
+        self.nguong_ms = nguong_ms
+        self._cac_muc = deque(maxlen=dung_luong)
+        self._so_muc = 0
+        self._khoa = threading.Lock()
+
+    @property
+    def dang_bat(self) -> bool:
+        return self.nguong_ms > 0
+
+    def ghi(self, lenh: str, key: Optional[str], tong: float, giai_doan: Dict[str, float], **thuoc_tinh):
+        """
+        Ghi request nếu chậm hơn ngưỡng
+
+        Tham số:
+            lenh / key: Lệnh và key của request
+            tong: Tổng thời gian tại node (giây, gồm cả cho_xu_ly)
+            giai_doan: Thời gian từng giai đoạn (giây), xem CAC_GIAI_DOAN
+            thuoc_tinh: Thông tin thêm (duong_di, trang_thai, trace_id...)
+        """
+        if not self.dang_bat or tong * 1000 < self.nguong_ms:
+            return
+        muc = {
+            "thoi_diem": time.time(),
+            "lenh": lenh,
+            "key": key,
+            "tong_ms": round(tong * 1000, 3),
+            "giai_doan_ms": {ten: round(giay * 1000, 3) for ten, giay in giai_doan.items()},
+            **thuoc_tinh,
+        }
+        with self._khoa:
+            self._cac_muc.append(muc)
+            self._so_muc += 1
+
+    def lay(self, gioi_han: int = 50) -> List[dict]:
+        """
+        Trả về:
+            Tối đa gioi_han request chậm, mới nhất trước
+        """
+        with self._khoa:
+            cac_muc = list(self._cac_muc)
+        cac_muc.reverse()
+        return cac_muc[:max(0, gioi_han)]
+
+    def lay_thong_ke(self) -> dict:
+        with self._khoa:
+            return {
+                "nguong_ms": self.nguong_ms,
+                "so_request_dang_giu": len(self._cac_muc),
+                "so_request_da_ghi": self._so_muc,
+            }
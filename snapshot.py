@@ -0,0 +1,110 @@
+"""
+Ảnh Chụp (Snapshot) Dữ Liệu cho Node
+Ghi toàn bộ du_lieu ra file nhị phân gọn và nạp lại nhanh bằng memory-map
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+from phan_doan import GiaTri, cac_doan, tu_buffer
+
+# Định dạng file:
+#   MAGIC (8 bytes) | header: đoạn WAL bắt đầu phát lại, số key (<QQ)
+#   các bản ghi: độ dài key, độ dài value, thời điểm hết hạn (<IId, 0 = không) | key | value
+#   trailer: crc32 của toàn bộ phần trước nó (<I)
+MAGIC = b"KVSNAP02"
+_HEADER = struct.Struct("<QQ")
+_BAN_GHI = struct.Struct("<IId")
+_TRAILER = struct.Struct("<I")
+
+TEN_FILE = "snapshot.bin"
+
+# Kích thước buffer khi ghi file
+_KICH_THUOC_BUFFER = 1 << 20
+
+
+def ghi_anh_chup(duong_dan: str, cac_cap: Iterable[Tuple[str, GiaTri]], so_key: int,
+                 doan_wal: int, cac_het_han: Optional[Dict[str, float]] = None) -> int:
+    """
+    Ghi ảnh chụp ra file (ghi vào file tạm rồi đổi tên nguyên tử)
+
+    Tham số:
+        duong_dan: Đường dẫn file ảnh chụp
+        cac_cap: Các cặp (key, value) cần ghi
+        so_key: Số cặp trong cac_cap
+        doan_wal: Đoạn WAL đầu tiên cần phát lại sau khi nạp ảnh chụp
+        cac_het_han: Thời điểm hết hạn của các key có TTL
+
+    Trả về:
+        Kích thước file (bytes)
+    """
+    duong_dan_tam = duong_dan + ".tmp"
+    with open(duong_dan_tam, "wb", buffering=_KICH_THUOC_BUFFER) as f:
+        dau = MAGIC + _HEADER.pack(doan_wal, so_key)
+        crc = zlib.crc32(dau)
+        f.write(dau)
+
+        pack = _BAN_GHI.pack
+        lay_het_han = (cac_het_han or {}).get
+        for key, value in cac_cap:
+            key_bytes = key.encode()
+            dau_ban_ghi = pack(len(key_bytes), len(value), lay_het_han(key, 0.0)) + key_bytes
+            crc = zlib.crc32(dau_ban_ghi, crc)
+            f.write(dau_ban_ghi)
+            for doan in cac_doan(value):
+                crc = zlib.crc32(doan, crc)
+                f.write(doan)
+
+        f.write(_TRAILER.pack(crc))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(duong_dan_tam, duong_dan)
+    return os.path.getsize(duong_dan)
+
+
+def doc_anh_chup(duong_dan: str, dich) -> int:
+    """
+    Nạp ảnh chụp vào kho dữ liệu (có nap(key, value, het_han)) bằng memory-map
+
+    Giải thích: File được map thẳng vào bộ nhớ nên không phải đọc
+    toàn bộ vào buffer; mỗi bản ghi được giải mã tại chỗ bằng struct.
+
+    Trả về:
+        Đoạn WAL cần phát lại tiếp theo
+
+    Raise:
+        ValueError nếu file hỏng
+    """
+    with open(duong_dan, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            tong = len(mm)
+            do_dai_dau = len(MAGIC) + _HEADER.size
+            if tong < do_dai_dau + _TRAILER.size or mm[:len(MAGIC)] != MAGIC:
+                raise ValueError("File ảnh chụp không hợp lệ")
+
+            (crc_luu,) = _TRAILER.unpack_from(mm, tong - _TRAILER.size)
+            mv = memoryview(mm)
+            try:
+                if zlib.crc32(mv[:tong - _TRAILER.size]) != crc_luu:
+                    raise ValueError("Checksum ảnh chụp không khớp")
+
+                doan_wal, so_key = _HEADER.unpack_from(mm, len(MAGIC))
+                offset = do_dai_dau
+                unpack_from = _BAN_GHI.unpack_from
+                kich_thuoc = _BAN_GHI.size
+                nap = dich.nap
+                for _ in range(so_key):
+                    do_dai_key, do_dai_value, het_han = unpack_from(mm, offset)
+                    bat_dau_key = offset + kich_thuoc
+                    bat_dau_value = bat_dau_key + do_dai_key
+                    offset = bat_dau_value + do_dai_value
+                    nap(str(mv[bat_dau_key:bat_dau_value], "utf-8"),
+                        tu_buffer(mv[bat_dau_value:offset]),
+                        het_han or None)
+            finally:
+                mv.release()
+    return doan_wal
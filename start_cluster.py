@@ -0,0 +1,54 @@
+"""
+Khởi Động Cluster Cục Bộ
+Chạy N node trên các cổng liên tiếp (mặc định 3 node từ cổng 5001) cho tới khi Ctrl+C
+
+Cách dùng:
+    python start_cluster.py                  # 3 node, cổng 5001-5003, cùng một process
+    python start_cluster.py 5                # 5 node
+    python start_cluster.py 3 6000           # 3 node từ cổng 6000
+    python start_cluster.py 3 --tien-trinh   # mỗi node một process "python node.py"
+"""
+
+import argparse
+import logging
+import time
+
+import ghi_log
+from cum_thu_nghiem import CumThuNghiem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Khởi động cluster KV cục bộ")
+    parser.add_argument("so_node", nargs="?", type=int, default=3)
+    parser.add_argument("cong_bat_dau", nargs="?", type=int, default=5001)
+    parser.add_argument("--tien-trinh", action="store_true",
+                        help="mỗi node một process riêng (log: node-<cổng>.log)")
+    parser.add_argument("--muc-log", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    tham_so = parser.parse_args()
+
+    if tham_so.tien_trinh:
+        cum = CumThuNghiem(tham_so.so_node, che_do="tien_trinh", cong_bat_dau=tham_so.cong_bat_dau,
+                           tham_so_dong_lenh=("--muc-log", tham_so.muc_log), thu_muc_log=".")
+    else:
+        ghi_log.cau_hinh_log(muc=getattr(logging, tham_so.muc_log))
+        cum = CumThuNghiem(tham_so.so_node, cong_bat_dau=tham_so.cong_bat_dau)
+
+    print(f"→ Đang khởi động {tham_so.so_node} node...")
+    cum.khoi_dong()
+    print(f"✓ Cluster sẵn sàng sau {cum.thoi_gian_khoi_dong:.2f}s:")
+    for host, cong in cum.cac_dia_chi:
+        print(f"  - {host}:{cong}")
+    print("\nNhấn Ctrl+C để dừng cluster")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n→ Đang dừng cluster...")
+    finally:
+        cum.dung()
+    print("✓ Đã dừng tất cả node")
+
+
+if __name__ == "__main__":
+    main()
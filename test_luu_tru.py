@@ -0,0 +1,440 @@
+"""
+Test Tính Đúng Đắn Của Tầng Lưu Trữ Và Giao Thức
+
+Chạy trong một process, không cần cụm: mỗi test dùng thư mục tạm riêng.
+Chạy trực tiếp (python test_luu_tru.py) hoặc qua pytest (python -m pytest -q test_luu_tru.py).
+"""
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+
+import giao_thuc
+import snapshot
+import test_system
+from het_han import BanhXeHenGio
+from kho_du_lieu import _CHI_PHI_PHIEN_BAN, KhoDuLieuPhanManh, kich_thuoc_muc
+from node import Node
+from phan_doan import KICH_THUOC_DOAN, GiaTriPhanDoan
+from wal import NhatKyGhiTruoc, liet_ke_doan
+
+
+class KiemTra(test_system.TestRunner):
+    """
+    Bộ đếm kiểm tra cho một test chạy trong process
+
+    Dùng với with: in tiêu đề, tự xóa thư mục tạm khi ra khỏi khối,
+    raise AssertionError nếu có kiểm tra thất bại (pytest báo đúng test lỗi)
+    """
+
+    def __init__(self, tieu_de):
+        self.tieu_de = tieu_de
+        self.test_passed = 0
+        self.test_failed = 0
+        self.test_total = 0
+        self.cac_thu_muc = []
+
+    def __enter__(self):
+        self.print_header(self.tieu_de)
+        return self
+
+    def __exit__(self, loai_loi, loi, vet):
+        for thu_muc in self.cac_thu_muc:
+            shutil.rmtree(thu_muc, ignore_errors=True)
+        if loai_loi is None:
+            assert self.test_failed == 0, f"{self.tieu_de}: {self.test_failed}/{self.test_total} kiểm tra thất bại"
+        return False
+
+    def thu_muc_tam(self):
+        """Thư mục tạm, tự xóa khi ra khỏi khối with"""
+        thu_muc = tempfile.mkdtemp(prefix="test_luu_tru_")
+        self.cac_thu_muc.append(thu_muc)
+        return thu_muc
+
+
+def so_byte_mong_doi(kho):
+    """Tổng kích thước các mục và phiên bản tính lại từ đầu (để đối chiếu kế toán bộ nhớ)"""
+    so_phien_ban = sum(len(manh.phien_ban) for manh in kho._cac_manh)
+    return (sum(kich_thuoc_muc(key, value) for key, value in kho.ban_sao().items())
+            + so_phien_ban * _CHI_PHI_PHIEN_BAN)
+
+
+# ==================== CÁC BÀI TEST ====================
+
+def test_wal():
+    """Test phát lại WAL và cắt bản ghi ghi dở"""
+    with KiemTra("TEST 1: PHÁT LẠI WAL") as kt:
+        thu_muc = kt.thu_muc_tam()
+        het_han = time.time() + 3600
+
+        nhat_ky = NhatKyGhiTruoc(thu_muc, "always")
+        kho = KhoDuLieuPhanManh(nhat_ky=nhat_ky)
+        nhat_ky.cho_ben_vung(kho.dat("a", b"1"))
+        nhat_ky.cho_ben_vung(kho.dat("b", b"\x00\xff nhi phan"))
+        nhat_ky.cho_ben_vung(kho.dat("a", b"2"))
+        nhat_ky.cho_ben_vung(kho.dat("ttl", b"t", het_han))
+        nhat_ky.cho_ben_vung(kho.dat("da_het_han", b"x", time.time() + 0.05))
+        nhat_ky.cho_ben_vung(kho.xoa("b")[1])
+        nhat_ky.dong()
+
+        time.sleep(0.1)
+        kho_moi = KhoDuLieuPhanManh()
+        so_ban_ghi = NhatKyGhiTruoc(thu_muc, "off").phat_lai(kho_moi)
+        kt.assert_equal(so_ban_ghi, 6, "Phát lại đủ 6 bản ghi")
+        du_lieu, cac_het_han = kho_moi.ban_sao_day_du()
+        kt.assert_equal(du_lieu, {"a": b"2", "ttl": b"t"}, "Ghi đè/xóa/hết hạn được áp dụng đúng thứ tự")
+        kt.assert_equal(cac_het_han, {"ttl": het_han}, "Thời điểm hết hạn được khôi phục")
+
+        # Bản ghi ghi dở ở cuối đoạn (crash giữa lúc ghi) bị cắt bỏ
+        duong_dan = os.path.join(thu_muc, os.listdir(thu_muc)[0])
+        kich_thuoc = os.path.getsize(duong_dan)
+        with open(duong_dan, "ab") as f:
+            f.write(b"\x01\x02\x03\x04\x01\x05\x00")
+        kho_moi = KhoDuLieuPhanManh()
+        kt.assert_equal(NhatKyGhiTruoc(thu_muc, "off").phat_lai(kho_moi), 6,
+                        "Bỏ qua bản ghi ghi dở")
+        kt.assert_equal(os.path.getsize(duong_dan), kich_thuoc, "Đuôi hỏng bị cắt khỏi file")
+
+
+def test_anh_chup():
+    """Test ảnh chụp memory-map: ghi/đọc lại, checksum, cắt WAL sau khi chụp"""
+    with KiemTra("TEST 2: ẢNH CHỤP") as kt:
+        thu_muc = kt.thu_muc_tam()
+        duong_dan = os.path.join(thu_muc, snapshot.TEN_FILE)
+        het_han = time.time() + 3600
+        lon = GiaTriPhanDoan((b"a" * KICH_THUOC_DOAN, b"b" * 1000))
+        du_lieu = {"rong": b"", "khóa_utf8": "giá trị".encode(), "nhi_phan": bytes(range(256)),
+                   "lon": lon, "ttl": b"t"}
+
+        snapshot.ghi_anh_chup(duong_dan, du_lieu.items(), len(du_lieu), 7, cac_het_han={"ttl": het_han})
+        kho = KhoDuLieuPhanManh()
+        kt.assert_equal(snapshot.doc_anh_chup(duong_dan, kho), 7, "Đọc lại đoạn WAL tiếp theo")
+        ban_sao, cac_het_han = kho.ban_sao_day_du()
+        kt.assert_equal(ban_sao, du_lieu, "Mọi value (rỗng, utf-8, nhị phân, phân đoạn) khớp")
+        kt.assert_true(isinstance(ban_sao["lon"], GiaTriPhanDoan), "Value lớn được nạp thành các đoạn")
+        kt.assert_equal(cac_het_han, {"ttl": het_han}, "TTL được giữ qua ảnh chụp")
+
+        with open(duong_dan, "r+b") as f:
+            f.seek(40)
+            byte_cu = f.read(1)
+            f.seek(40)
+            f.write(bytes([byte_cu[0] ^ 0xFF]))
+        try:
+            snapshot.doc_anh_chup(duong_dan, KhoDuLieuPhanManh())
+            kt.assert_true(False, "Ảnh chụp hỏng bị từ chối")
+        except ValueError:
+            kt.assert_true(True, "Ảnh chụp hỏng bị từ chối")
+
+        # Node: chụp ảnh xoay vòng WAL và xóa các đoạn cũ, khởi động lại = ảnh chụp + đuôi WAL
+        thu_muc = kt.thu_muc_tam()
+        node = Node("127.0.0.1:0", "127.0.0.1", 0, thu_muc_du_lieu=thu_muc, che_do_fsync="always")
+        for i in range(100):
+            node.du_lieu.dat(f"k{i}", f"v{i}".encode())
+        kt.assert_true(node.chup_anh(), "Chụp ảnh thành công")
+        node.du_lieu.dat("sau_anh", b"1")
+        node.du_lieu.xoa("k0")
+        node.nhat_ky.dong()
+        time.sleep(0.05)
+        kt.assert_equal(liet_ke_doan(thu_muc), [2], "Chỉ còn đoạn WAL sau ảnh chụp")
+
+        node_moi = Node("127.0.0.1:0", "127.0.0.1", 0, thu_muc_du_lieu=thu_muc)
+        mong_doi = {f"k{i}": f"v{i}".encode() for i in range(1, 100)}
+        mong_doi["sau_anh"] = b"1"
+        kt.assert_equal(node_moi.du_lieu.ban_sao(), mong_doi, "Khôi phục = ảnh chụp + phần đuôi WAL")
+        node_moi.nhat_ky.dong()
+
+
+def test_thu_hoi():
+    """Test thu hồi LRU/LFU và kế toán bộ nhớ theo byte"""
+    with KiemTra("TEST 3: THU HỒI BỘ NHỚ") as kt:
+        value = b"x" * 100
+        kich_thuoc = kich_thuoc_muc("k0", value)
+
+        kho = KhoDuLieuPhanManh(so_manh=1, gioi_han_bo_nho=3 * kich_thuoc, chinh_sach_thu_hoi="lru")
+        for key in ("k0", "k1", "k2"):
+            kho.dat(key, value)
+        kho.get("k0")
+        kho.dat("k3", value)
+        kt.assert_equal(sorted(kho.ban_sao()), ["k0", "k2", "k3"], "LRU thu hồi key lâu nhất chưa đọc")
+
+        kho = KhoDuLieuPhanManh(so_manh=1, gioi_han_bo_nho=3 * kich_thuoc, chinh_sach_thu_hoi="lfu")
+        for key in ("k0", "k1", "k2"):
+            kho.dat(key, value)
+        for _ in range(3):
+            kho.get("k0")
+            kho.get("k2")
+        kho.get("k1")
+        kho.dat("k3", value)
+        kt.assert_equal(sorted(kho.ban_sao()), ["k0", "k2", "k3"], "LFU thu hồi key ít được đọc nhất")
+        kho.dat("k4", value)
+        kt.assert_equal(sorted(kho.ban_sao()), ["k0", "k2", "k4"], "LFU: key mới thay key mới khác")
+        kt.assert_equal(kho.lay_thong_ke()["so_lan_thu_hoi"], 2, "Đếm số lần thu hồi")
+
+        # Key vừa ghi đứng một mình ở tần suất thấp nhất: vẫn được giữ, thu hồi key khác
+        kho = KhoDuLieuPhanManh(so_manh=1, gioi_han_bo_nho=2 * kich_thuoc, chinh_sach_thu_hoi="lfu")
+        for key in ("k0", "k1"):
+            kho.dat(key, value)
+            for _ in range(4):
+                kho.get(key)
+        kho.dat("k2", value)
+        kt.assert_equal(kho.get("k2"), value, "LFU không thu hồi key vừa ghi")
+        kt.assert_equal(sorted(kho.ban_sao()), ["k1", "k2"], "LFU thu hồi key cũ nhất của tần suất kế tiếp")
+
+        kho = KhoDuLieuPhanManh(so_manh=4)
+        kho.dat("a", b"1" * 10)
+        kho.dat("b", b"2" * 5000)
+        kho.dat("a", b"3" * 300)
+        kho.bien_doi("b", lambda cu: cu + b"!")
+        kho.dat("lon", GiaTriPhanDoan((b"5" * 4096, b"6" * 10)))
+        bo_nho = kho.lay_thong_ke()["bo_nho_dang_dung"]
+        kt.assert_equal(bo_nho, so_byte_mong_doi(kho), "Bộ nhớ = tổng kích thước các mục sau ghi đè/APPEND")
+        kho.dat("a", b"3" * 300, time.time() + 3600)
+        kt.assert_true(kho.lay_thong_ke()["bo_nho_dang_dung"] > bo_nho, "Key có TTL tính thêm chi phí hết hạn")
+        kho.dat("a", b"3" * 300)
+        kt.assert_equal(kho.lay_thong_ke()["bo_nho_dang_dung"], bo_nho, "Bỏ TTL thì trả lại chi phí hết hạn")
+        for key in ("a", "b", "lon"):
+            kho.xoa(key)
+        kt.assert_equal(kho.lay_thong_ke()["bo_nho_dang_dung"], 0, "Xóa hết thì bộ nhớ về 0")
+
+
+def test_banh_xe_hen_gio():
+    """Test bánh xe hẹn giờ: đúng tick, đổ xuống từ cấp trên, danh sách tràn"""
+    with KiemTra("TEST 4: BÁNH XE HẸN GIỜ") as kt:
+        # Tick 1/8 giây (biểu diễn chính xác bằng float), 16 khe mỗi cấp:
+        # cấp 0 < 2s, cấp 1 < 32s, cấp 2 < 512s, xa hơn vào danh sách tràn
+        banh_xe = BanhXeHenGio(do_phan_giai=0.125, bit_moi_cap=4, so_cap=3, bay_gio=0.0)
+        cac_han = {"gan": 0.5, "cap_1": 10.0, "cap_2": 100.0, "tran": 1000.0}
+        for key, han in cac_han.items():
+            banh_xe.them(key, han)
+        banh_xe.them("qua_han", -5.0)
+        kt.assert_equal(len(banh_xe), 5, "Đếm số mục đang hẹn giờ")
+        kt.assert_equal(banh_xe.tien_toi(0.125), ["qua_han"], "Mục đã quá hạn ra ở tick kế tiếp")
+
+        for key, han in cac_han.items():
+            kt.assert_equal(banh_xe.tien_toi(han - 0.125), [], f"{key}: chưa ra trước hạn")
+            kt.assert_equal(banh_xe.tien_toi(han), [key], f"{key}: ra đúng tick hết hạn")
+        kt.assert_equal(len(banh_xe), 0, "Không còn mục nào")
+
+        # Kho: TTL hết hạn lười khi đọc và được dọn chủ động qua bánh xe
+        kho = KhoDuLieuPhanManh()
+        bay_gio = time.time()
+        kho.dat("ngan", b"1", bay_gio + 0.2)
+        kho.dat("dai", b"2", bay_gio + 3600)
+        kho.dat("ghi_de", b"3", bay_gio + 0.2)
+        kho.dat("ghi_de", b"4")
+        kt.assert_equal(kho.don_dep_het_han(bay_gio + 0.1), 0, "Chưa tới hạn thì không xóa gì")
+        time.sleep(0.3)
+        kt.assert_equal(kho.get("ngan"), None, "Key hết hạn không bao giờ được trả về")
+        kho.dat("ngan_2", b"5", time.time() + 0.05)
+        time.sleep(0.05 + 2 * kho.banh_xe.do_phan_giai)
+        kt.assert_equal(kho.don_dep_het_han(), 1, "Dọn chủ động đúng key đến hạn")
+        kt.assert_equal(sorted(kho.ban_sao()), ["dai", "ghi_de"], "Key bị ghi đè bỏ TTL được giữ lại")
+
+        # Node: ttl từ client được kiểm tra trước khi ghi
+        node = Node("127.0.0.1:0", "127.0.0.1", 0)
+        kt.assert_equal(node._xu_ly_put("ttl_hop_le", b"1", "1.5"), {"status": "success"}, "ttl dạng chuỗi số được nhận")
+        for ttl in ("abc", [1], -1, 0, float("nan"), float("inf")):
+            kt.assert_equal(node._xu_ly_put("ttl_sai", b"1", ttl).get("status"), "error", f"ttl {ttl!r} bị từ chối")
+        kt.assert_equal(node.du_lieu.get("ttl_sai"), None, "ttl sai thì không ghi gì")
+
+
+def test_chi_muc():
+    """Test quét theo chỉ mục có thứ tự: khớp với khi không có chỉ mục, kể cả khi ghi song song"""
+    with KiemTra("TEST 5: CHỈ MỤC CÓ THỨ TỰ") as kt:
+        kho = KhoDuLieuPhanManh(so_manh=8, chi_muc_co_thu_tu=True)
+        kho_khong_chi_muc = KhoDuLieuPhanManh(so_manh=8)
+        for i in range(300):
+            for k in (kho, kho_khong_chi_muc):
+                k.dat(f"u:{i:03d}", b"v")
+        for i in range(0, 300, 3):
+            for k in (kho, kho_khong_chi_muc):
+                k.xoa(f"u:{i:03d}")
+        for sau in (None, "u:050", "u:298"):
+            kt.assert_equal(kho.quet("u:", "u;", 40, sau), kho_khong_chi_muc.quet("u:", "u;", 40, sau),
+                            f"Quét sau {sau} giống hệt khi không có chỉ mục")
+
+        # Nhiều luồng thêm/xóa/ghi TTL cùng các key: chỉ mục cập nhật ngoài khóa mảnh
+        # vẫn phải khớp đúng tập key còn lại
+        def ghi(so):
+            for vong in range(300):
+                key = f"s:{(so * 7 + vong) % 50:02d}"
+                if vong % 3 == 0:
+                    kho.xoa(key)
+                elif vong % 3 == 1:
+                    kho.dat(key, b"x", time.time() + 3600)
+                else:
+                    kho.dat(key, b"y")
+        cac_luong = [threading.Thread(target=ghi, args=(so,)) for so in range(6)]
+        for luong in cac_luong:
+            luong.start()
+        for luong in cac_luong:
+            luong.join()
+        con_lai = sorted(key for key in kho.ban_sao() if key.startswith("s:"))
+        kt.assert_equal(kho.chi_muc.quet("s:", "s;", 1000), con_lai, "Chỉ mục khớp với dữ liệu sau khi ghi song song")
+        kt.assert_equal(len(kho.chi_muc), len(kho), "Không còn key thừa trong chỉ mục")
+
+
+def test_phien_ban_nguyen_tu():
+    """Test phiên bản của thao tác nguyên tử: replica bỏ qua kết quả cũ đến muộn"""
+    with KiemTra("TEST 6: PHIÊN BẢN THAO TÁC NGUYÊN TỬ") as kt:
+        chinh = KhoDuLieuPhanManh()
+        replica = KhoDuLieuPhanManh()
+        cac_ket_qua = [chinh.bien_doi("dem", lambda cu: str(int(cu or b"0") + 1).encode()) for _ in range(3)]
+        cac_phien_ban = [phien_ban for *_, phien_ban in cac_ket_qua]
+        kt.assert_true(cac_phien_ban == sorted(set(cac_phien_ban)), "Phiên bản tăng ngặt theo thứ tự ghi")
+
+        # Thread nhân bản không có thứ tự: kết quả thứ 3 tới trước hai kết quả đầu
+        for i in (2, 0, 1):
+            _, moi, het_han, _, phien_ban = cac_ket_qua[i]
+            replica.ap_dung("dem", moi, het_han, phien_ban)
+        kt.assert_equal(replica.get("dem"), b"3", "Replica giữ kết quả mới nhất")
+        replica.ap_dung("dem", b"0")
+        kt.assert_equal(replica.get("dem"), b"0", "Ghi thường (không phiên bản) luôn được áp dụng")
+        kt.assert_equal(chinh.bien_doi("dem", lambda cu: None)[4], 0, "Không ghi thì không cấp phiên bản")
+
+
+def gui_va_nhan(cac_buffer, kich_thuoc_toi_da=giao_thuc.KICH_THUOC_KHUNG_TOI_DA,
+                kich_thuoc_value_toi_da=giao_thuc.KICH_THUOC_VALUE_TOI_DA):
+    """Gửi các buffer qua một cặp socket rồi nhận lại bằng giao_thuc.nhan_khung"""
+    a, b = socket.socketpair()
+    try:
+        gui = threading.Thread(target=lambda: (a.sendall(b"".join(bytes(x) for x in cac_buffer)),
+                                               a.shutdown(socket.SHUT_WR)))
+        gui.start()
+        try:
+            return giao_thuc.nhan_khung(b, kich_thuoc_toi_da,
+                                        kich_thuoc_value_toi_da=kich_thuoc_value_toi_da)
+        finally:
+            b.close()
+            gui.join()
+    finally:
+        a.close()
+
+
+def test_khung_nhi_phan():
+    """Test khung nhị phân: value nhị phân đi nguyên vẹn, khung quá lớn bị từ chối"""
+    with KiemTra("TEST 7: KHUNG NHỊ PHÂN") as kt:
+        nhi_phan = bytes(range(256)) * 4
+        thong_diep = gui_va_nhan(giao_thuc.ma_hoa_khung(
+            {"command": "PUT", "key": "k", "value": nhi_phan, "phu": [b"", "x".encode()]}))
+        kt.assert_equal(thong_diep["value"], nhi_phan, "Value nhị phân (không phải utf-8) giữ nguyên")
+        kt.assert_equal(thong_diep["phu"], [b"", b"x"], "Bytes lồng trong danh sách, kể cả bytes rỗng")
+
+        try:
+            gui_va_nhan(giao_thuc.ma_hoa_khung({"command": "PUT", "key": "k", "value": b"x" * 5000}),
+                        kich_thuoc_toi_da=1024)
+            kt.assert_true(False, "Khung vượt giới hạn bị từ chối")
+        except giao_thuc.LoiKhung:
+            kt.assert_true(True, "Khung vượt giới hạn bị từ chối")
+
+
+def test_khung_phan_doan():
+    """Test value lớn đi thành các khung đoạn: ghép lại đúng, đoạn sai checksum bị từ chối"""
+    with KiemTra("TEST 8: KHUNG ĐOẠN") as kt:
+        lon = os.urandom(2 * KICH_THUOC_DOAN + 123)
+        cac_buffer = giao_thuc.ma_hoa_khung({"command": "PUT", "key": "k", "value": lon})
+        thong_diep = gui_va_nhan(cac_buffer, kich_thuoc_toi_da=KICH_THUOC_DOAN + 1024)
+        kt.assert_true(isinstance(thong_diep["value"], GiaTriPhanDoan)
+                       and len(thong_diep["value"].cac_doan) == 3, "Value lớn được nhận thành 3 đoạn")
+        kt.assert_equal(thong_diep["value"], lon, "Value phân đoạn ghép lại đúng")
+
+        # Đổi một byte của đoạn cuối: crc32 không khớp
+        hong = bytearray(bytes(cac_buffer[-1]))
+        hong[0] ^= 0xFF
+        try:
+            gui_va_nhan(cac_buffer[:-1] + [bytes(hong)])
+            kt.assert_true(False, "Đoạn sai checksum bị từ chối")
+        except giao_thuc.LoiKhung:
+            kt.assert_true(True, "Đoạn sai checksum bị từ chối")
+
+        # Value ghép sau APPEND có đoạn không đều: được cắt lại thành đoạn chuẩn
+        khong_deu = GiaTriPhanDoan((lon[:KICH_THUOC_DOAN],)) + lon[KICH_THUOC_DOAN:KICH_THUOC_DOAN + 5] \
+            + lon[KICH_THUOC_DOAN + 5:]
+        thong_diep = gui_va_nhan(giao_thuc.ma_hoa_khung({"command": "PUT", "key": "k", "value": khong_deu}))
+        kt.assert_equal(thong_diep["value"], lon, "Value có đoạn không đều đi nguyên vẹn")
+        thong_diep = gui_va_nhan(giao_thuc.ma_hoa_khung(
+            {"command": "PUT", "key": "k", "value": GiaTriPhanDoan(())}))
+        kt.assert_equal(thong_diep["value"], b"", "GiaTriPhanDoan rỗng nhận về b\"\"")
+
+        # Đầu đoạn sai bị từ chối chỉ từ khung chính: không gửi khung đoạn nào
+        def chi_khung_chinh(dau_doan):
+            return giao_thuc.ma_hoa_khung({"command": "PUT", "key": "k", "value": None, "$doan": dau_doan})
+
+        for dau_doan, mo_ta in [
+            ([len(lon), 3], "value vượt kich_thuoc_value_toi_da"),
+            ([len(lon), 5], "số đoạn khác ceil(tổng / KICH_THUOC_DOAN)"),
+            ([len(lon), 2], "thiếu đoạn so với tổng"),
+            ([-1, 0], "tổng âm"),
+            ({"tong": 1}, "đầu đoạn không phải [tổng, số đoạn]"),
+        ]:
+            try:
+                gui_va_nhan(chi_khung_chinh(dau_doan), kich_thuoc_value_toi_da=2 * KICH_THUOC_DOAN)
+                kt.assert_true(False, f"Từ chối trước khi đọc đoạn: {mo_ta}")
+            except giao_thuc.LoiKhung:
+                kt.assert_true(True, f"Từ chối trước khi đọc đoạn: {mo_ta}")
+
+        # Đoạn có crc đúng nhưng độ dài sai so với đầu đoạn
+        for do_dai, mo_ta in [(KICH_THUOC_DOAN - 1, "đoạn ngắn hơn KICH_THUOC_DOAN"),
+                              (KICH_THUOC_DOAN + 1, "đoạn dài hơn KICH_THUOC_DOAN")]:
+            doan = lon[:do_dai]
+            cac_buffer = chi_khung_chinh([2 * KICH_THUOC_DOAN, 2]) + giao_thuc.ma_hoa_khung(
+                {"i": 0, "crc": zlib.crc32(doan), "data": doan})
+            try:
+                gui_va_nhan(cac_buffer)
+                kt.assert_true(False, f"Từ chối {mo_ta}")
+            except giao_thuc.LoiKhung:
+                kt.assert_true(True, f"Từ chối {mo_ta}")
+
+
+CAC_TEST = [
+    ("Phát lại WAL", test_wal),
+    ("Ảnh chụp", test_anh_chup),
+    ("Thu hồi bộ nhớ", test_thu_hoi),
+    ("Bánh xe hẹn giờ", test_banh_xe_hen_gio),
+    ("Chỉ mục có thứ tự", test_chi_muc),
+    ("Phiên bản thao tác nguyên tử", test_phien_ban_nguyen_tu),
+    ("Khung nhị phân", test_khung_nhi_phan),
+    ("Khung đoạn", test_khung_phan_doan),
+]
+
+
+def main():
+    """Chạy tất cả các test, trả về True nếu không có test nào thất bại"""
+    print("\n" + "=" * 70)
+    print(" BẮT ĐẦU TEST TẦNG LƯU TRỮ VÀ GIAO THỨC")
+    print("=" * 70)
+
+    bat_dau = time.perf_counter()
+    ket_qua = []
+    for ten_test, ham_test in CAC_TEST:
+        try:
+            ham_test()
+            ket_qua.append((ten_test, True))
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Test bị gián đoạn bởi người dùng")
+            break
+        except Exception as e:
+            print(f"\n✗ {ten_test}: {e}")
+            if not isinstance(e, AssertionError):
+                traceback.print_exc()
+            ket_qua.append((ten_test, False))
+
+    print("\n" + "=" * 70)
+    print(" TỔNG KẾT KẾT QUẢ TEST")
+    print("=" * 70)
+    for ten_test, thanh_cong in ket_qua:
+        print(f"{'✓ PASS' if thanh_cong else '✗ FAIL'} - {ten_test}")
+    so_thanh_cong = sum(1 for _, thanh_cong in ket_qua if thanh_cong)
+    print(f"\nTổng kết: {so_thanh_cong}/{len(CAC_TEST)} tests passed")
+    print(f"Thời gian chạy: {time.perf_counter() - bat_dau:.1f}s")
+    return so_thanh_cong == len(CAC_TEST)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
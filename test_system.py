@@ -1,23 +1,51 @@
 """
 Test Tự Động Cho Hệ Thống KV Phân Tán
 Kiểm tra tính nhất quán, replication, và fault tolerance
+
+Mặc định tự khởi động một cụm 3 node (cum_thu_nghiem.py) trên cổng tạm thời,
+chạy hết các test không cần thao tác thủ công rồi dừng cụm.
 """
 
-import time
+import argparse
+import logging
+import os
+import socket
 import sys
+import tempfile
+import threading
+import time
+
+import ghi_log
+import giao_thuc
 from client import KVStoreClient
+from cum_thu_nghiem import CAC_CHE_DO, CumThuNghiem
 
-# Cấu hình nodes
+# Cấu hình nodes khi test một cluster chạy sẵn (--cac-node)
 NODES = [
     ("127.0.0.1", 5001),
     ("127.0.0.1", 5002),
     ("127.0.0.1", 5003)
 ]
 
+# Hệ số nhân bản mặc định của node
+HE_SO_NHAN_BAN = 2
+
+# Thời gian tối đa chờ dữ liệu chuyển sang replica mới sau khi một node lỗi:
+# lần đồng bộ định kỳ đầu tiên chạy 10s sau khi node khởi động, sau đó mỗi 30s
+THOI_GIAN_CHO_DONG_BO_LAI = 45.0
+
 
 class TestRunner:
-    def __init__(self):
-        self.client = KVStoreClient(NODES, timeout=3.0)
+    def __init__(self, cac_node, cum: CumThuNghiem = None):
+        """
+        Tham số:
+            cac_node: Danh sách (host, port) của cluster
+            cum: Cụm tự khởi động (None = cluster chạy sẵn, bỏ qua test failover)
+        """
+        self.cac_node = cac_node
+        self.cum = cum
+        self.mang = cum.mang if cum is not None else None
+        self.client = KVStoreClient(cac_node, timeout=3.0, mang=self.mang)
         self.test_passed = 0
         self.test_failed = 0
         self.test_total = 0
@@ -66,10 +94,36 @@ class TestRunner:
             print(f"Tỷ lệ thành công: {success_rate:.1f}%")
         print("=" * 70)
     
-    def wait_for_sync(self, seconds=2):
-        """Đợi để dữ liệu được đồng bộ"""
-        print(f"  ⏳ Đợi {seconds}s để đồng bộ dữ liệu...")
-        time.sleep(seconds)
+    def wait_for_sync(self, dieu_kien, mo_ta, timeout=10.0):
+        """
+        Đợi đến khi dieu_kien() đúng (dữ liệu đã đồng bộ) thay vì ngủ cố định
+
+        Trả về:
+            True nếu điều kiện đúng trước timeout
+        """
+        bat_dau = time.perf_counter()
+        while not dieu_kien():
+            if time.perf_counter() - bat_dau > timeout:
+                print(f"  ⏳ Hết {timeout:.0f}s chờ {mo_ta}")
+                return False
+            time.sleep(0.05)
+        print(f"  ⏳ {mo_ta}: {time.perf_counter() - bat_dau:.2f}s")
+        return True
+
+    def client_node(self, i):
+        """Client chỉ nói chuyện với node thứ i (không failover sang node khác)"""
+        return KVStoreClient([self.cac_node[i]], timeout=2.0, mang=self.mang)
+
+    def du_lieu_node(self, i):
+        """Toàn bộ dữ liệu local của node thứ i (None nếu node không trả lời)"""
+        response = self.client_node(i)._gui_request({"command": "GET_ALL_DATA"}, thu_lai=False)
+        return response.get("data") if response.get("status") == "success" else None
+
+    def so_ban_sao(self, key, value):
+        """Số node đang giữ key với đúng value (str hoặc bytes)"""
+        mong_doi = value if isinstance(value, bytes) else value.encode()
+        return sum(1 for i in range(len(self.cac_node))
+                   if (self.du_lieu_node(i) or {}).get(key) == mong_doi)
     
     # ==================== CÁC BÀI TEST ====================
     
@@ -107,21 +161,24 @@ class TestRunner:
         print("  → PUT data vào node...")
         self.client.put("replicated_key", "replicated_value", hien_thi=False)
         
-        # Đợi nhân bản
-        self.wait_for_sync(3)
+        # Đợi nhân bản (bất đồng bộ) đến replica
+        so_ban_sao_mong_doi = min(HE_SO_NHAN_BAN, len(self.cac_node))
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("replicated_key", "replicated_value") >= so_ban_sao_mong_doi,
+            "nhân bản đến replica"
+        )
         
         # Kiểm tra từng node
         print("  → Kiểm tra dữ liệu trên từng node...")
-        for i in range(len(NODES)):
-            client_node = KVStoreClient([NODES[i]], timeout=2.0)
-            stats = client_node.lay_thong_ke_node(0)
-            
-            if stats:
-                so_key = stats.get('so_key', 0)
-                print(f"    Node {i+1}: {so_key} keys")
-                self.assert_true(so_key > 0, f"Node {i+1} có dữ liệu")
+        for i in range(len(self.cac_node)):
+            du_lieu = self.du_lieu_node(i)
+            if du_lieu is not None:
+                print(f"    Node {i+1}: {len(du_lieu)} keys, "
+                      f"{'có' if 'replicated_key' in du_lieu else 'không có'} replicated_key")
             else:
                 print(f"    Node {i+1}: OFFLINE")
+        self.assert_equal(self.so_ban_sao("replicated_key", "replicated_value"), so_ban_sao_mong_doi,
+                          f"Key có đúng {so_ban_sao_mong_doi} bản sao")
     
     def test_consistent_hashing(self):
         """Test consistent hashing - dữ liệu được phân phối đúng"""
@@ -141,111 +198,86 @@ class TestRunner:
         for key, value in test_data.items():
             self.client.put(key, value, hien_thi=False)
         
-        self.wait_for_sync(3)
-        
-        # Kiểm tra tất cả keys đều có thể GET được
-        print("  → Kiểm tra tất cả keys có thể GET...")
+        # Kiểm tra tất cả keys đều có thể GET được, từ mọi node
+        print("  → Kiểm tra tất cả keys có thể GET từ mọi node...")
         for key, expected_value in test_data.items():
-            value = self.client.get(key, hien_thi=False)
-            self.assert_equal(value, expected_value, f"GET {key}")
+            cac_value = [self.client_node(i).get(key, hien_thi=False) for i in range(len(self.cac_node))]
+            self.assert_true(all(v == expected_value for v in cac_value), f"GET {key}")
     
     def test_data_consistency(self):
         """Test tính nhất quán dữ liệu"""
         self.print_header("TEST 4: TÍNH NHẤT QUÁN DỮ LIỆU")
         
-        # PUT dữ liệu
-        print("  → PUT key='consistency_test'")
-        self.client.put("consistency_test", "version_1", hien_thi=False)
-        self.wait_for_sync(2)
-        
-        # GET từ các nodes khác nhau
-        print("  → GET từ các nodes khác nhau...")
-        values = []
-        for i in range(len(NODES)):
-            client_node = KVStoreClient([NODES[i]], timeout=2.0)
-            value = client_node.get("consistency_test", hien_thi=False)
-            values.append(value)
-            print(f"    Node {i+1}: {value}")
-        
-        # Kiểm tra tất cả nodes trả về cùng giá trị (hoặc None nếu không chịu trách nhiệm)
-        non_none_values = [v for v in values if v is not None]
-        if len(non_none_values) > 0:
-            all_same = all(v == non_none_values[0] for v in non_none_values)
-            self.assert_true(all_same, "Tất cả nodes có cùng giá trị")
-        
-        # UPDATE và kiểm tra lại
-        print("  → UPDATE key='consistency_test'")
-        self.client.put("consistency_test", "version_2", hien_thi=False)
-        self.wait_for_sync(2)
-        
-        print("  → GET lại từ các nodes...")
-        updated_values = []
-        for i in range(len(NODES)):
-            client_node = KVStoreClient([NODES[i]], timeout=2.0)
-            value = client_node.get("consistency_test", hien_thi=False)
-            updated_values.append(value)
-            print(f"    Node {i+1}: {value}")
-        
-        non_none_updated = [v for v in updated_values if v is not None]
-        if len(non_none_updated) > 0:
-            all_updated = all(v == "version_2" for v in non_none_updated)
-            self.assert_true(all_updated, "Tất cả nodes đã cập nhật giá trị mới")
+        so_ban_sao_mong_doi = min(HE_SO_NHAN_BAN, len(self.cac_node))
+        for phien_ban in ("version_1", "version_2"):
+            print(f"  → PUT key='consistency_test' = {phien_ban}")
+            self.client.put("consistency_test", phien_ban, hien_thi=False)
+            self.wait_for_sync(
+                lambda: self.so_ban_sao("consistency_test", phien_ban) >= so_ban_sao_mong_doi,
+                "mọi replica nhận giá trị mới"
+            )
+        
+            # GET từ các nodes khác nhau
+            print("  → GET từ các nodes khác nhau...")
+            values = []
+            for i in range(len(self.cac_node)):
+                value = self.client_node(i).get("consistency_test", hien_thi=False)
+                values.append(value)
+                print(f"    Node {i+1}: {value}")
+            self.assert_true(all(v == phien_ban for v in values),
+                             f"Tất cả nodes trả về {phien_ban}")
     
     def test_failover(self):
-        """Test failover - yêu cầu tắt thủ công một node"""
-        self.print_header("TEST 5: FAILOVER (YÊU CẦU THAO TÁC THỦ CÔNG)")
+        """Test failover: tắt một node, đọc/ghi tiếp, khởi động lại và kiểm tra khôi phục"""
+        self.print_header("TEST 5: FAILOVER")
         
-        print("\n  📝 HƯỚNG DẪN:")
-        print("  1. Test này sẽ kiểm tra khả năng chuyển đổi dự phòng")
-        print("  2. Trước khi bắt đầu, hãy đảm bảo tất cả 3 nodes đang chạy")
-        print("  3. Khi được yêu cầu, hãy TẮT Node 2 (Ctrl+C trên terminal của Node 2)")
-        print("  4. Sau khi test xong, hãy KHỞI ĐỘNG LẠI Node 2")
+        if self.cum is None or len(self.cac_node) < 3:
+            print("  ⏭  Bỏ qua: cần cụm tự khởi động (không dùng --cac-node) với ít nhất 3 node")
+            return
         
-        input("\n  ⏸  Nhấn Enter khi đã sẵn sàng để bắt đầu test...")
-        
-        # PUT dữ liệu trước khi tắt node
+        # PUT dữ liệu trước khi tắt node; thêm key nền để Node 2 gần như chắc chắn
+        # chịu trách nhiệm cho ít nhất một key (vòng băm chỉ có 1 điểm mỗi node)
         print("\n  → PUT dữ liệu vào cluster...")
         self.client.put("failover_test", "data_before_failure", hien_thi=False)
-        self.wait_for_sync(2)
-        
-        # Kiểm tra tất cả nodes
-        print("  → Kiểm tra trạng thái tất cả nodes...")
-        self.client.hien_thi_trang_thai_cluster()
+        for i in range(20):
+            self.client.put(f"failover_nen:{i}", "v", hien_thi=False)
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("failover_test", "data_before_failure") >= HE_SO_NHAN_BAN,
+            "nhân bản đến replica"
+        )
         
-        print("\n  🔴 NGAY BÂY GIỜ: Hãy TẮT Node 2 (port 5002)")
-        input("  ⏸  Nhấn Enter sau khi đã TẮT Node 2...")
+        print("  🔴 Tắt Node 2...")
+        self.cum.dung_node(1, dot_ngot=True)
         
-        # Đợi để hệ thống phát hiện node bị lỗi
-        print("  ⏳ Đợi 12s để hệ thống phát hiện node lỗi...")
-        time.sleep(12)
+        # Đợi để các node còn lại phát hiện node bị lỗi
+        try:
+            thoi_gian = self.cum.cho_hoi_tu()
+            print(f"  ⏳ Các node còn lại loại Node 2 sau {thoi_gian:.2f}s")
+            self.assert_true(True, "Phát hiện node lỗi")
+        except TimeoutError:
+            self.assert_true(False, "Phát hiện node lỗi")
         
         # Thử PUT dữ liệu mới
         print("  → PUT dữ liệu mới sau khi node lỗi...")
         result = self.client.put("failover_test_2", "data_after_failure", hien_thi=False)
         self.assert_true(result, "PUT thành công khi có node lỗi")
         
-        # Thử GET dữ liệu cũ
+        # Thử GET dữ liệu cũ: key có thể vừa chuyển sang replica mới, chờ đồng bộ định kỳ
         print("  → GET dữ liệu cũ...")
+        self.wait_for_sync(
+            lambda: self.client.get("failover_test", hien_thi=False) == "data_before_failure",
+            "dữ liệu cũ đọc được", THOI_GIAN_CHO_DONG_BO_LAI
+        )
         value = self.client.get("failover_test", hien_thi=False)
         self.assert_equal(value, "data_before_failure", "GET dữ liệu cũ thành công")
         
-        # Kiểm tra cluster status
-        print("\n  → Kiểm tra trạng thái cluster sau khi có node lỗi...")
-        self.client.hien_thi_trang_thai_cluster()
-        
-        print("\n  🟢 NGAY BÂY GIỜ: Hãy KHỞI ĐỘNG LẠI Node 2")
-        print("     Chạy: python node.py 5002 127.0.0.1 5001")
-        input("  ⏸  Nhấn Enter sau khi đã KHỞI ĐỘNG Node 2...")
-        
-        # Đợi node khôi phục
-        print("  ⏳ Đợi 15s để node khôi phục và đồng bộ...")
-        time.sleep(15)
+        print("  🟢 Khởi động lại Node 2...")
+        thoi_gian = self.cum.khoi_dong_lai_node(1)
+        print(f"  ⏳ Node 2 tham gia lại và cluster hội tụ sau {thoi_gian:.2f}s")
         
         # Kiểm tra dữ liệu đã được đồng bộ
         print("  → Kiểm tra dữ liệu trên Node 2 sau khi khôi phục...")
-        client_node2 = KVStoreClient([NODES[1]], timeout=2.0)
-        stats = client_node2.lay_thong_ke_node(0)
-        
+        stats = self.client_node(1).lay_thong_ke_node(0)
         if stats:
             so_key = stats.get('so_key', 0)
             print(f"    Node 2 có {so_key} keys")
@@ -253,9 +285,8 @@ class TestRunner:
         else:
             self.assert_true(False, "Node 2 vẫn offline")
         
-        # Kiểm tra cluster status cuối cùng
-        print("\n  → Kiểm tra trạng thái cluster cuối cùng...")
-        self.client.hien_thi_trang_thai_cluster()
+        value = self.client.get("failover_test_2", hien_thi=False)
+        self.assert_equal(value, "data_after_failure", "GET dữ liệu ghi lúc node lỗi")
     
     def test_load_distribution(self):
         """Test phân phối tải"""
@@ -269,18 +300,26 @@ class TestRunner:
             value = f"value_{i}"
             self.client.put(key, value, hien_thi=False)
         
-        self.wait_for_sync(3)
+        def dem_key_load_test():
+            tong = 0
+            for i in range(len(self.cac_node)):
+                du_lieu = self.du_lieu_node(i) or {}
+                tong += sum(1 for key in du_lieu if key.startswith("load_test_"))
+            return tong
+
+        so_ban_sao_mong_doi = num_keys * min(HE_SO_NHAN_BAN, len(self.cac_node))
+        self.wait_for_sync(lambda: dem_key_load_test() >= so_ban_sao_mong_doi, "nhân bản tất cả keys")
         
         # Kiểm tra phân phối
         print("  → Kiểm tra phân phối dữ liệu trên các nodes...")
         key_counts = []
-        for i in range(len(NODES)):
-            client_node = KVStoreClient([NODES[i]], timeout=2.0)
-            stats = client_node.lay_thong_ke_node(0)
-            if stats:
-                count = stats.get('so_key', 0)
+        for i in range(len(self.cac_node)):
+            du_lieu = self.du_lieu_node(i)
+            if du_lieu is not None:
+                count = sum(1 for key in du_lieu if key.startswith("load_test_"))
                 key_counts.append(count)
                 print(f"    Node {i+1}: {count} keys")
+        self.assert_equal(sum(key_counts), so_ban_sao_mong_doi, "Mỗi key có đủ bản sao")
         
         # Kiểm tra không có node nào có quá nhiều hoặc quá ít dữ liệu
         if len(key_counts) > 0:
@@ -292,76 +331,221 @@ class TestRunner:
                 deviation = abs(count - avg) / avg if avg > 0 else 0
                 print(f"    Node {i+1} độ lệch: {deviation*100:.1f}%")
     
+    def test_scan(self):
+        """Test SCAN theo tiền tố/khoảng key, lấy từng trang bằng cursor"""
+        self.print_header("TEST 7: SCAN THEO CURSOR")
+        cac_key = [f"scan:{i:02d}" for i in range(25)]
+        for key in cac_key + ["scan", "scan;ngoai", "sca:ngoai"]:
+            self.client.put(key, f"v_{key}", hien_thi=False)
+        
+        cac_trang = []
+        cursor = None
+        while True:
+            trang, cursor = self.client.scan(prefix="scan:", limit=10, cursor=cursor, hien_thi=False)
+            cac_trang.append(trang)
+            if not cursor or len(cac_trang) > 10:
+                break
+        self.assert_equal([len(trang) for trang in cac_trang], [10, 10, 5], "Ba trang 10 + 10 + 5 key")
+        da_quet = [key for trang in cac_trang for key, _ in trang]
+        self.assert_equal(da_quet, cac_key, "Các trang nối lại đúng thứ tự, không trùng, không thiếu")
+        self.assert_true(all(value == f"v_{key}" for trang in cac_trang for key, value in trang),
+                         "Value đi kèm đúng key")
+        
+        trang, cursor = self.client.scan(start="scan:05", end="scan:10", hien_thi=False)
+        self.assert_equal([key for key, _ in trang], cac_key[5:10], "SCAN khoảng [start, end)")
+        self.assert_equal(cursor, None, "Trang cuối không có cursor")
+        
+        self.assert_equal([key for key, _ in self.client.scan_tat_ca(prefix="scan:", kich_thuoc_trang=7)],
+                          cac_key, "scan_tat_ca tự lấy hết các trang")
+    
+    def test_atomic_operations(self):
+        """Test INCR/DECR/CAS/APPEND: ngữ nghĩa, tranh chấp và nhân bản kết quả"""
+        self.print_header("TEST 8: THAO TÁC NGUYÊN TỬ")
+        so_ban_sao_mong_doi = min(HE_SO_NHAN_BAN, len(self.cac_node))
+        
+        self.assert_equal(self.client.incr("atomic:counter", hien_thi=False), 1, "INCR key chưa có = 1")
+        self.assert_equal(self.client.incr("atomic:counter", 5, hien_thi=False), 6, "INCR delta 5")
+        self.assert_equal(self.client.decr("atomic:counter", 2, hien_thi=False), 4, "DECR delta 2")
+        
+        # Nhiều client INCR cùng lúc qua các node khác nhau: không mất lần tăng nào
+        print("  → 4 client x 25 lần INCR song song...")
+        cac_ket_qua = []
+        def tang(i):
+            client = self.client_node(i % len(self.cac_node))
+            for _ in range(25):
+                cac_ket_qua.append(client.incr("atomic:counter", hien_thi=False))
+        cac_thread = [threading.Thread(target=tang, args=(i,)) for i in range(4)]
+        for thread in cac_thread:
+            thread.start()
+        for thread in cac_thread:
+            thread.join()
+        # Mỗi INCR nhận một giá trị riêng 5..104 từ node chính: không mất, không trùng lần nào
+        self.assert_equal(sorted(x for x in cac_ket_qua if x is not None), list(range(5, 105)),
+                          "Không mất lần INCR nào")
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("atomic:counter", "104") >= so_ban_sao_mong_doi,
+            "nhân bản kết quả INCR"
+        )
+        self.assert_equal(self.so_ban_sao("atomic:counter", "104"), so_ban_sao_mong_doi,
+                          "Replica nhận giá trị sau INCR")
+        
+        self.client.put("atomic:text", "abc", hien_thi=False)
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("atomic:text", "abc") >= so_ban_sao_mong_doi,
+            "nhân bản PUT"
+        )
+        self.assert_equal(self.client.incr("atomic:text", hien_thi=False), None, "INCR value không phải số bị từ chối")
+        self.assert_equal(self.so_ban_sao("atomic:text", "abc"), so_ban_sao_mong_doi, "Value giữ nguyên sau INCR lỗi")
+        
+        self.assert_true(self.client.cas("atomic:cas", None, "v1", hien_thi=False), "CAS key chưa có (expected None)")
+        self.assert_true(not self.client.cas("atomic:cas", None, "v2", hien_thi=False), "CAS sai expected không ghi")
+        self.assert_true(self.client.cas("atomic:cas", "v1", "v2", hien_thi=False), "CAS đúng expected")
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("atomic:cas", "v2") >= so_ban_sao_mong_doi,
+            "nhân bản kết quả CAS"
+        )
+        self.assert_equal(self.so_ban_sao("atomic:cas", "v2"), so_ban_sao_mong_doi, "Replica nhận giá trị sau CAS")
+        
+        self.assert_equal(self.client.append("atomic:log", "ab", hien_thi=False), 2, "APPEND key chưa có")
+        self.assert_equal(self.client.append("atomic:log", "cd", hien_thi=False), 4, "APPEND trả độ dài mới")
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("atomic:log", "abcd") >= so_ban_sao_mong_doi,
+            "nhân bản kết quả APPEND"
+        )
+        self.assert_equal(self.so_ban_sao("atomic:log", "abcd"), so_ban_sao_mong_doi,
+                          "Replica nhận giá trị sau APPEND")
+    
+    def test_binary_values(self):
+        """Test value nhị phân đi nguyên vẹn qua client, node và replica"""
+        self.print_header("TEST 9: VALUE NHỊ PHÂN")
+        so_ban_sao_mong_doi = min(HE_SO_NHAN_BAN, len(self.cac_node))
+        
+        nhi_phan = bytes(range(256)) * 3
+        self.client.put("bin:nho", nhi_phan, hien_thi=False)
+        self.assert_equal(self.client.get("bin:nho", hien_thi=False, dang_bytes=True), nhi_phan,
+                          "Value nhị phân (không phải utf-8) giữ nguyên")
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("bin:nho", nhi_phan) >= so_ban_sao_mong_doi,
+            "nhân bản value nhị phân"
+        )
+        self.assert_equal(self.so_ban_sao("bin:nho", nhi_phan), so_ban_sao_mong_doi, "Replica nhận value nhị phân")
+    
+    def test_large_values(self):
+        """Test value lớn được phân đoạn và GET_ALL_DATA theo trang"""
+        self.print_header("TEST 10: VALUE LỚN PHÂN ĐOẠN")
+        so_ban_sao_mong_doi = min(HE_SO_NHAN_BAN, len(self.cac_node))
+        
+        # Lớn hơn một đoạn (1 MB): đi trên mạng thành các khung đoạn có crc32
+        lon = os.urandom(2 * 1024 * 1024 + 12345)
+        self.assert_true(self.client.put("bin:lon", lon, hien_thi=False), "PUT value 2 MB")
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("bin:lon", lon) >= so_ban_sao_mong_doi,
+            "nhân bản PUT value lớn"
+        )
+        self.assert_true(all(self.client_node(i).get("bin:lon", hien_thi=False, dang_bytes=True) == lon
+                             for i in range(len(self.cac_node))), "GET value lớn từ mọi node")
+        self.assert_equal(self.client.append("bin:lon", b"\x00!", hien_thi=False), len(lon) + 2,
+                          "APPEND vào value lớn")
+        lon += b"\x00!"
+        self.wait_for_sync(
+            lambda: self.so_ban_sao("bin:lon", lon) >= so_ban_sao_mong_doi,
+            "nhân bản value lớn"
+        )
+        self.assert_equal(self.so_ban_sao("bin:lon", lon), so_ban_sao_mong_doi, "Replica nhận value lớn")
+        
+        # GET_ALL_DATA theo trang nhỏ phải ghép lại đúng bằng bản đầy đủ
+        for i in range(len(self.cac_node)):
+            day_du = self.du_lieu_node(i)
+            if day_du is None:
+                continue
+            ghep = {}
+            cursor = None
+            for _ in range(len(day_du) + 1):
+                response = self.client_node(i)._gui_request(
+                    {"command": "GET_ALL_DATA", "kich_thuoc_trang": 64 * 1024, "cursor": cursor}, thu_lai=False
+                )
+                ghep.update(response.get("data") or {})
+                if response.get("key") is not None:
+                    ghep[response["key"]] = response["value"]
+                cursor = response.get("cursor")
+                if not cursor:
+                    break
+            self.assert_true(ghep == day_du, f"Node {i+1}: GET_ALL_DATA theo trang = bản đầy đủ")
+        
+        # Đoạn sai checksum: node trả lỗi, không lưu value hỏng
+        if self.mang is None:
+            cac_buffer = giao_thuc.ma_hoa_khung({"command": "PUT", "key": "bin:hong", "value": lon})
+            hong = bytearray(bytes(cac_buffer[-1]))
+            hong[0] ^= 0xFF
+            with socket.create_connection(self.cac_node[0], timeout=3.0) as sock:
+                sock.sendall(b"".join(bytes(buffer) for buffer in cac_buffer[:-1]) + bytes(hong))
+                response = giao_thuc.nhan_khung(sock)
+            self.assert_equal(response.get("status"), "error", "Đoạn sai checksum bị từ chối")
+            self.assert_equal(self.client.get("bin:hong", hien_thi=False), None, "Value hỏng không được lưu")
+    
     def run_all_tests(self):
         """Chạy tất cả các test"""
         print("\n" + "=" * 70)
         print(" BẮT ĐẦU TEST TỰ ĐỘNG HỆ THỐNG KV PHÂN TÁN")
         print("=" * 70)
-        print("\n⚠️  LƯU Ý:")
-        print("  - Đảm bảo tất cả 3 nodes đang chạy trước khi bắt đầu")
-        print("  - Test 5 (Failover) yêu cầu thao tác thủ công")
-        print()
-        
-        input("Nhấn Enter để bắt đầu...")
         
+        bat_dau = time.perf_counter()
         try:
             # Chạy từng test
             self.test_basic_operations()
             self.test_replication()
             self.test_consistent_hashing()
             self.test_data_consistency()
-            
-            # Test failover (yêu cầu thủ công)
-            print("\n" + "=" * 70)
-            chay_failover = input("Bạn có muốn chạy Test Failover (yêu cầu thao tác thủ công)? (y/n): ")
-            if chay_failover.lower() == 'y':
-                self.test_failover()
-            else:
-                print("  ⏭  Bỏ qua Test Failover")
-            
+            self.test_failover()
             self.test_load_distribution()
-            
-            # In tổng kết
-            self.print_summary()
+            self.test_scan()
+            self.test_atomic_operations()
+            self.test_binary_values()
+            self.test_large_values()
             
         except KeyboardInterrupt:
             print("\n\n⚠️  Test bị gián đoạn bởi người dùng")
-            self.print_summary()
         except Exception as e:
+            self.test_failed += 1
             print(f"\n\n✗ Lỗi trong quá trình test: {e}")
             import traceback
             traceback.print_exc()
-            self.print_summary()
+
+        # In tổng kết
+        self.print_summary()
+        print(f"Thời gian chạy: {time.perf_counter() - bat_dau:.1f}s")
+        return self.test_failed == 0
 
 
 if __name__ == "__main__":
-    print("""
-╔══════════════════════════════════════════════════════════════════════╗
-║                   TEST TỰ ĐỘNG HỆ THỐNG KV PHÂN TÁN                 ║
-╚══════════════════════════════════════════════════════════════════════╝
+    parser = argparse.ArgumentParser(description="Test tự động hệ thống KV phân tán")
+    parser.add_argument("--cac-node", default=None,
+                        help="Test cluster chạy sẵn, ví dụ 127.0.0.1:5001,127.0.0.1:5002 "
+                             "(mặc định: tự khởi động cụm, bỏ qua test failover nếu dùng tùy chọn này)")
+    parser.add_argument("--so-node", type=int, default=3)
+    parser.add_argument("--che-do", default="trong_process", choices=CAC_CHE_DO,
+                        help="Cách chạy cụm tự khởi động")
+    tham_so = parser.parse_args()
 
-HƯỚNG DẪN CHUẨN BỊ:
--------------------
-1. Khởi động 3 nodes trong các terminal riêng biệt:
+    if tham_so.cac_node:
+        cac_node = []
+        for phan in tham_so.cac_node.split(","):
+            host, port = phan.strip().rsplit(":", 1)
+            cac_node.append((host, int(port)))
+        thanh_cong = TestRunner(cac_node).run_all_tests()
+    else:
+        # Log của các node trong process ghi ra file tạm, không lẫn vào kết quả test
+        ghi_log.cau_hinh_log(tep=os.path.join(tempfile.gettempdir(), "test_system.log"),
+                             muc=logging.WARNING, console=False)
+        if tham_so.che_do == "tien_trinh":
+            cum = CumThuNghiem(tham_so.so_node, che_do="tien_trinh",
+                               tham_so_dong_lenh=("--tham-do-s", "0.5"))
+        else:
+            cum = CumThuNghiem(tham_so.so_node, che_do=tham_so.che_do, khoang_tham_do=0.5)
+        print(f"→ Khởi động cụm {tham_so.so_node} node ({tham_so.che_do})...")
+        with cum:
+            print(f"✓ Cụm sẵn sàng sau {cum.thoi_gian_khoi_dong:.2f}s: "
+                  + ", ".join(f"{host}:{port}" for host, port in cum.cac_dia_chi))
+            thanh_cong = TestRunner(cum.cac_dia_chi, cum).run_all_tests()
    
-   Terminal 1:  python node.py 5001
-   Terminal 2:  python node.py 5002 127.0.0.1 5001
-   Terminal 3:  python node.py 5003 127.0.0.1 5001
-
-2. Đợi tất cả nodes kết nối với nhau (khoảng 5 giây)
-
-3. Chạy test này: python test_auto.py
-
-CÁC TEST SẼ CHẠY:
------------------
-✓ Test 1: Các thao tác cơ bản (PUT, GET, DELETE)
-✓ Test 2: Nhân bản dữ liệu
-✓ Test 3: Consistent hashing
-✓ Test 4: Tính nhất quán dữ liệu
-⚠ Test 5: Failover (yêu cầu tắt/bật node thủ công)
-✓ Test 6: Phân phối tải
-
-    """)
-    
-    runner = TestRunner()
-    runner.run_all_tests()
\ No newline at end of file
+    sys.exit(0 if thanh_cong else 1)
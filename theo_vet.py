@@ -0,0 +1,106 @@
+"""
+Truy Vết Request Phân Tán
+trace_id đi theo request qua client -> node -> chuyển tiếp -> nhân bản;
+mỗi hop được lấy mẫu ghi một span có thời gian vào ring buffer của node
+"""
+
+import random
+import threading
+from collections import deque
+from typing import List, Optional
+
+_ngau_nhien = random.Random()
+
+
+def tao_id() -> str:
+    """ID ngẫu nhiên 64 bit dạng hex (trace_id / span_id)"""
+    return f"{_ngau_nhien.getrandbits(64):016x}"
+
+
+def tao_ngu_canh(lay_mau: bool, cha: Optional[str] = None, trace_id: Optional[str] = None) -> dict:
+    """
+    Ngữ cảnh vết gửi kèm request (trường "vet")
+
+    Trả về:
+        {"id": trace_id, "cha": span_id cha (None = gốc), "mau": có ghi span không}
+    """
+    return {"id": trace_id or tao_id(), "cha": cha, "mau": lay_mau}
+
+
+def nhan_log(vet: Optional[dict]) -> str:
+    """Hậu tố " [trace ...]" cho dòng log, rỗng nếu không có vết"""
+    return f" [trace {vet['id']}]" if vet else ""
+
+
+class BoGhiVet:
+    """
+    Ring buffer các span gần nhất của một node
+
+    Giải thích:
+    - Lấy mẫu ở đầu vết: client (hoặc node nhận request không có vết) quyết định
+      "mau"; mọi hop sau đó theo cùng quyết định nên một vết luôn đầy đủ
+    - Request không được lấy mẫu chỉ mang trace_id (để nối các dòng log),
+      không tạo span nào
+    - Bộ nhớ cố định: span cũ nhất bị ghi đè khi đầy
+
+    Tham số:
+        node_id: ID node ghi span
+        ty_le_lay_mau: Xác suất bắt đầu vết cho request đến KHÔNG kèm vết (0 = không bao giờ)
+        dung_luong: Số span tối đa được giữ
+    """
+
+    def __init__(self, node_id: str, ty_le_lay_mau: float = 0.0, dung_luong: int = 2048):
+        self.node_id = node_id
+        self.ty_le_lay_mau = ty_le_lay_mau
+        self._cac_span = deque(maxlen=dung_luong)
+        self._so_span = 0
+        self._khoa = threading.Lock()
+
+    def nen_lay_mau(self) -> bool:
+        """Quyết định lấy mẫu cho một vết mới bắt đầu tại node này"""
+        return self.ty_le_lay_mau > 0 and _ngau_nhien.random() < self.ty_le_lay_mau
+
+    def ghi(self, trace_id: str, span_id: str, cha: Optional[str], ten: str,
+            bat_dau: float, thoi_gian: float, **thuoc_tinh):
+        """
+        Ghi một span đã kết thúc
+
+        Tham số:
+            trace_id / span_id / cha: Định danh vết, span và span cha
+            ten: Tên thao tác (ví dụ "PUT", "rpc REPLICATE", "nhan_ban")
+            bat_dau: Thời điểm bắt đầu (time.time(), để ghép span giữa các node)
+            thoi_gian: Độ dài span (giây)
+            thuoc_tinh: Thông tin thêm (key, duong_di, den, trang_thai...)
+        """
+        span = {
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "cha": cha,
+            "node_id": self.node_id,
+            "ten": ten,
+            "bat_dau": bat_dau,
+            "thoi_gian_ms": round(thoi_gian * 1000, 3),
+            **thuoc_tinh,
+        }
+        with self._khoa:
+            self._cac_span.append(span)
+            self._so_span += 1
+
+    def lay(self, trace_id: Optional[str] = None, gioi_han: int = 200) -> List[dict]:
+        """
+        Trả về:
+            Các span của trace_id (hoặc mọi span nếu None), tối đa gioi_han span mới nhất
+        """
+        with self._khoa:
+            cac_span = list(self._cac_span)
+        if trace_id is not None:
+            cac_span = [span for span in cac_span if span["trace_id"] == trace_id]
+        return cac_span[-gioi_han:] if gioi_han > 0 else []
+
+    def lay_thong_ke(self) -> dict:
+        with self._khoa:
+            return {
+                "ty_le_lay_mau": self.ty_le_lay_mau,
+                "so_span_dang_giu": len(self._cac_span),
+                "so_span_da_ghi": self._so_span,
+            }
@@ -0,0 +1,361 @@
+"""
+Nhật Ký Ghi Trước (Write-Ahead Log) cho Node
+Ghi append-only các thao tác PUT/DELETE xuống đĩa để khôi phục khi khởi động lại
+"""
+
+import os
+import struct
+import threading
+import zlib
+from typing import List, Optional, Tuple, Union
+
+from phan_doan import GiaTri, cac_doan, tu_buffer
+
+# Loại bản ghi
+LOAI_PUT = 1
+LOAI_DELETE = 2
+LOAI_PUT_HET_HAN = 3  # PUT có TTL: value mang trước 8 byte thời điểm hết hạn
+
+# Các chế độ fsync được hỗ trợ
+CHE_DO_FSYNC = ("always", "batch", "off")
+
+# Header mỗi bản ghi: crc32 | loại | độ dài key | độ dài value
+# crc32 được tính trên toàn bộ phần sau nó (loại + độ dài + key + value)
+_HEADER = struct.Struct("<IBII")
+_HET_HAN = struct.Struct("<d")
+
+_TIEN_TO_DOAN = "wal-"
+_HAU_TO_DOAN = ".log"
+
+
+def _ten_doan(so_doan: int) -> str:
+    """Tên file của một đoạn (segment) nhật ký"""
+    return f"{_TIEN_TO_DOAN}{so_doan:08d}{_HAU_TO_DOAN}"
+
+
+def liet_ke_doan(thu_muc: str) -> List[int]:
+    """
+    Liệt kê số thứ tự các đoạn nhật ký trong thư mục, theo thứ tự tăng dần
+    """
+    cac_doan = []
+    for ten in os.listdir(thu_muc):
+        if ten.startswith(_TIEN_TO_DOAN) and ten.endswith(_HAU_TO_DOAN):
+            try:
+                cac_doan.append(int(ten[len(_TIEN_TO_DOAN):-len(_HAU_TO_DOAN)]))
+            except ValueError:
+                continue
+    return sorted(cac_doan)
+
+
+def ma_hoa_ban_ghi(loai: int, key: str, value: Optional[GiaTri],
+                   het_han: Optional[float] = None) -> bytes:
+    """
+    Mã hóa một bản ghi thành bytes để ghi vào nhật ký
+    """
+    key_bytes = key.encode()
+    cac_phan = tuple(cac_doan(value)) if value is not None else ()
+    tien_to = b""
+    if het_han is not None and loai == LOAI_PUT:
+        loai = LOAI_PUT_HET_HAN
+        tien_to = _HET_HAN.pack(het_han)
+    # crc tính nối tiếp qua từng đoạn để value (có thể rất lớn) chỉ bị sao chép một lần khi join
+    do_dai_value = len(tien_to) + sum(len(phan) for phan in cac_phan)
+    dau = struct.pack("<BII", loai, len(key_bytes), do_dai_value) + key_bytes + tien_to
+    crc = zlib.crc32(dau)
+    for phan in cac_phan:
+        crc = zlib.crc32(phan, crc)
+    return b"".join((struct.pack("<I", crc), dau) + cac_phan)
+
+
+def doc_ban_ghi(buf) -> Tuple[List[Tuple[int, str, Optional[GiaTri], Optional[float]]], int]:
+    """
+    Giải mã tuần tự các bản ghi trong một buffer
+
+    Dừng lại ở bản ghi đầu tiên bị cắt cụt hoặc sai checksum
+    (thường là bản ghi đang ghi dở khi node bị crash).
+
+    Trả về:
+        (danh sách (loại, key, value, hết hạn), offset hợp lệ cuối cùng)
+    """
+    ket_qua = []
+    mv = memoryview(buf)
+    tong = len(buf)
+    offset = 0
+    kich_thuoc_header = _HEADER.size
+
+    while offset + kich_thuoc_header <= tong:
+        crc, loai, do_dai_key, do_dai_value = _HEADER.unpack_from(buf, offset)
+        ket_thuc = offset + kich_thuoc_header + do_dai_key + do_dai_value
+        if ket_thuc > tong or zlib.crc32(mv[offset + 4:ket_thuc]) != crc:
+            break
+
+        bat_dau_key = offset + kich_thuoc_header
+        key = str(mv[bat_dau_key:bat_dau_key + do_dai_key], "utf-8")
+        bat_dau_value = bat_dau_key + do_dai_key
+        het_han = None
+        if loai == LOAI_PUT_HET_HAN:
+            (het_han,) = _HET_HAN.unpack_from(buf, bat_dau_value)
+            bat_dau_value += _HET_HAN.size
+            loai = LOAI_PUT
+        if loai == LOAI_PUT:
+            value = tu_buffer(mv[bat_dau_value:ket_thuc])
+        else:
+            value = None
+        ket_qua.append((loai, key, value, het_han))
+        offset = ket_thuc
+
+    return ket_qua, offset
+
+
+class NhatKyGhiTruoc:
+    """
+    Write-Ahead Log append-only với group commit
+
+    Tính năng:
+    - Các thread ghi chỉ nối bản ghi vào buffer trong bộ nhớ (rất nhanh)
+    - Một thread nền gom nhiều bản ghi lại và ghi + fsync một lần (group commit)
+    - Chế độ fsync cấu hình được:
+        * always: mỗi lần ghi đợi đến khi dữ liệu đã được fsync
+        * batch:  fsync theo lô mỗi N ms, lần ghi không phải đợi
+        * off:    chỉ ghi vào OS page cache, không fsync
+    - Phát lại nhanh khi khởi động (đọc cả file một lần, giải mã bằng struct)
+    """
+
+    def __init__(self, thu_muc: str, che_do_fsync: str = "batch", khoang_fsync_ms: int = 10,
+                 doan_toi_thieu: int = 1):
+        """
+        Khởi tạo nhật ký
+
+        Tham số:
+            thu_muc: Thư mục chứa các file nhật ký
+            che_do_fsync: "always", "batch" hoặc "off"
+            khoang_fsync_ms: Chu kỳ ghi theo lô (ms) cho chế độ batch/off
+            doan_toi_thieu: Số đoạn nhỏ nhất được phép ghi tiếp (đoạn mà ảnh chụp trỏ tới)
+        """
+        if che_do_fsync not in CHE_DO_FSYNC:
+            raise ValueError(f"Chế độ fsync không hợp lệ: {che_do_fsync}")
+
+        self.thu_muc = thu_muc
+        self.che_do_fsync = che_do_fsync
+        self.khoang_fsync = khoang_fsync_ms / 1000.0
+        os.makedirs(thu_muc, exist_ok=True)
+
+        # Buffer chờ ghi và số thứ tự bản ghi
+        # Phần tử int trong buffer là điểm xoay vòng sang đoạn mới
+        self._buffer: List[Union[bytes, int]] = []
+        self._seq = 0
+        self._seq_da_ghi = 0
+        self._khoa = threading.Lock()
+        self._co_du_lieu = threading.Condition(self._khoa)
+        self._da_ghi = threading.Condition(self._khoa)
+
+        # Thống kê
+        self.thong_ke = {
+            'so_ban_ghi': 0,
+            'so_lan_fsync': 0,
+            'so_byte_da_ghi': 0,
+        }
+
+        cac_doan = liet_ke_doan(thu_muc)
+        self.doan_hien_tai = max(cac_doan[-1] if cac_doan else 1, doan_toi_thieu)
+        self._doan_dang_ghi = self.doan_hien_tai
+        self._file = open(os.path.join(thu_muc, _ten_doan(self.doan_hien_tai)), "ab")
+
+        self._dang_chay = True
+        self._thread_ghi = threading.Thread(target=self._thread_ghi_dia, daemon=True, name="GhiWAL")
+        self._thread_ghi.start()
+
+    # ==================== GHI ====================
+
+    def ghi(self, loai: int, key: str, value: Optional[GiaTri] = None,
+            het_han: Optional[float] = None) -> int:
+        """
+        Nối một bản ghi vào nhật ký
+
+        Gọi hàm này trong cùng khóa với thao tác cập nhật dữ liệu để thứ tự
+        trong nhật ký trùng với thứ tự áp dụng. Hàm không chờ I/O.
+
+        Trả về:
+            Số thứ tự (seq) của bản ghi, dùng cho cho_ben_vung()
+        """
+        ban_ghi = ma_hoa_ban_ghi(loai, key, value, het_han)
+        with self._khoa:
+            self._buffer.append(ban_ghi)
+            self._seq += 1
+            seq = self._seq
+            if self.che_do_fsync == "always":
+                self._co_du_lieu.notify()
+        return seq
+
+    def xoay_vong(self) -> int:
+        """
+        Chuyển các bản ghi tiếp theo sang một đoạn nhật ký mới
+
+        Gọi trong cùng khóa dữ liệu khi chụp ảnh: mọi bản ghi trước điểm này
+        đã nằm trong ảnh chụp, mọi bản ghi sau nằm trong đoạn mới.
+
+        Trả về:
+            Số thứ tự của đoạn mới
+        """
+        with self._khoa:
+            self.doan_hien_tai += 1
+            self._buffer.append(self.doan_hien_tai)
+            self._co_du_lieu.notify()
+            return self.doan_hien_tai
+
+    def xoa_doan_cu(self, truoc_doan: int) -> int:
+        """
+        Xóa các đoạn có số thứ tự < truoc_doan (đã nằm trọn trong ảnh chụp)
+
+        Giải thích: Đợi thread ghi chuyển hẳn sang đoạn truoc_doan (điểm xoay
+        vòng được xử lý bất đồng bộ), nếu không đoạn cũ vẫn đang mở và bị bỏ sót.
+
+        Trả về:
+            Số đoạn đã xóa
+        """
+        with self._khoa:
+            while self._doan_dang_ghi < truoc_doan and self._dang_chay:
+                self._da_ghi.wait()
+        so_doan_xoa = 0
+        for so_doan in liet_ke_doan(self.thu_muc):
+            if so_doan >= truoc_doan or so_doan >= self._doan_dang_ghi:
+                continue
+            try:
+                os.remove(os.path.join(self.thu_muc, _ten_doan(so_doan)))
+                so_doan_xoa += 1
+            except OSError:
+                pass
+        return so_doan_xoa
+
+    def cho_ben_vung(self, seq: int):
+        """
+        Đợi đến khi bản ghi seq đã được ghi xuống đĩa
+
+        Chỉ đợi ở chế độ "always"; các chế độ khác trả về ngay.
+        Nên gọi NGOÀI khóa dữ liệu để nhiều thread cùng chia sẻ một lần fsync.
+        """
+        if self.che_do_fsync != "always" or seq <= 0:
+            return
+        with self._khoa:
+            while self._seq_da_ghi < seq and self._dang_chay:
+                self._da_ghi.wait()
+
+    def _thread_ghi_dia(self):
+        """
+        Background thread: gom buffer và ghi xuống đĩa (group commit)
+        """
+        while True:
+            with self._khoa:
+                if self.che_do_fsync == "always":
+                    while not self._buffer and self._dang_chay:
+                        self._co_du_lieu.wait()
+                else:
+                    self._co_du_lieu.wait(self.khoang_fsync)
+
+                lo_ghi = self._buffer
+                self._buffer = []
+                seq_cuoi = self._seq
+                dang_chay = self._dang_chay
+
+            if lo_ghi:
+                # Tách lô theo các điểm xoay vòng đoạn
+                phan_lo: List[bytes] = []
+                for phan_tu in lo_ghi:
+                    if isinstance(phan_tu, int):
+                        self._ghi_phan_lo(phan_lo)
+                        phan_lo = []
+                        self._file.close()
+                        self._doan_dang_ghi = phan_tu
+                        self._file = open(os.path.join(self.thu_muc, _ten_doan(phan_tu)), "ab")
+                    else:
+                        phan_lo.append(phan_tu)
+                self._ghi_phan_lo(phan_lo)
+
+            with self._khoa:
+                self._seq_da_ghi = seq_cuoi
+                self._da_ghi.notify_all()
+
+            if not dang_chay:
+                return
+
+    def _ghi_phan_lo(self, phan_lo: List[bytes]):
+        """
+        Ghi một lô bản ghi vào đoạn hiện tại (chỉ gọi từ thread ghi)
+        """
+        if not phan_lo:
+            return
+        du_lieu = b"".join(phan_lo)
+        self._file.write(du_lieu)
+        self._file.flush()
+        if self.che_do_fsync != "off":
+            os.fsync(self._file.fileno())
+            self.thong_ke['so_lan_fsync'] += 1
+        self.thong_ke['so_ban_ghi'] += len(phan_lo)
+        self.thong_ke['so_byte_da_ghi'] += len(du_lieu)
+
+    # ==================== PHÁT LẠI ====================
+
+    def phat_lai(self, dich, tu_doan: int = 0) -> int:
+        """
+        Phát lại các đoạn nhật ký vào kho dữ liệu
+
+        Bản ghi cuối bị ghi dở (do crash) sẽ bị cắt bỏ khỏi file.
+
+        Tham số:
+            dich: Kho dữ liệu cần khôi phục (có nap(key, value, het_han) và pop(key))
+            tu_doan: Chỉ phát lại các đoạn có số thứ tự >= tu_doan
+
+        Trả về:
+            Số bản ghi đã phát lại
+        """
+        so_ban_ghi = 0
+        for so_doan in liet_ke_doan(self.thu_muc):
+            if so_doan < tu_doan:
+                continue
+            duong_dan = os.path.join(self.thu_muc, _ten_doan(so_doan))
+            with open(duong_dan, "rb") as f:
+                buf = f.read()
+
+            cac_ban_ghi, offset_hop_le = doc_ban_ghi(buf)
+            for loai, key, value, het_han in cac_ban_ghi:
+                if loai == LOAI_PUT:
+                    dich.nap(key, value, het_han)
+                else:
+                    dich.pop(key, None)
+            so_ban_ghi += len(cac_ban_ghi)
+
+            if offset_hop_le < len(buf):
+                # Cắt bỏ phần đuôi hỏng để lần ghi tiếp theo nối tiếp đúng vị trí
+                with open(duong_dan, "r+b") as f:
+                    f.truncate(offset_hop_le)
+        return so_ban_ghi
+
+    # ==================== ĐÓNG ====================
+
+    def lay_thong_ke(self) -> dict:
+        """
+        Trả về thống kê của nhật ký
+        """
+        with self._khoa:
+            dang_cho = len(self._buffer)
+        return {
+            **self.thong_ke,
+            'che_do_fsync': self.che_do_fsync,
+            'doan_hien_tai': self.doan_hien_tai,
+            'so_ban_ghi_dang_cho': dang_cho,
+        }
+
+    def dong(self):
+        """
+        Ghi nốt buffer còn lại và đóng file
+        """
+        with self._khoa:
+            if not self._dang_chay:
+                return
+            self._dang_chay = False
+            self._co_du_lieu.notify()
+        self._thread_ghi.join(timeout=5.0)
+        try:
+            self._file.close()
+        except Exception:
+            pass